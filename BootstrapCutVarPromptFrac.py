@@ -0,0 +1,167 @@
+'''
+python script for the bootstrap of the prompt / FD corrected yields and fractions obtained with the cut-variation
+method: the MC candidates behind the efficiencies and the raw yields are resampled and the minimisation is rerun
+run: python BootstrapCutVarPromptFrac.py cfgFileName.yml outFileName.root [--rebuildcache]
+'''
+
+import os
+import sys
+import argparse
+from multiprocessing import Pool
+import numpy as np
+import yaml
+from ROOT import TFile, TH1F, TH2F # pylint: disable=import-error,no-name-in-module
+from utils.CutVarUtils import LoadCutVarInputs, BuildBootstrapCache, PrepareBootstrapCache, RunBootstrapReplicas
+from utils.DfUtils import FilterBitDf, LoadDfFromRootOrParquet
+
+# cache shared by the processes of the pool
+prepCacheWorker = {}
+
+
+def InitWorker(prepCache):
+    '''
+    Helper method to share the prepared bootstrap cache with the processes of the pool
+    '''
+    prepCacheWorker.update(prepCache)
+
+
+def RunChunk(chunkArgs):
+    '''
+    Helper method to run a chunk of bootstrap replicas in a process of the pool
+    '''
+    seeds, inputs, corr, smearing = chunkArgs
+    return RunBootstrapReplicas(seeds, inputs, prepCacheWorker, corr, smearing)
+
+
+def LoadCache(cutSetCfg, inputs, cacheFileName):
+    '''
+    Helper method to build the bootstrap cache from the MC trees and the generated yields
+    '''
+    bootCfg = cutSetCfg['bootstrap']
+    cutSets = []
+    for cutSetFileName in bootCfg['cutsetfiles']:
+        with open(cutSetFileName, 'r') as ymlCutSetFile:
+            cutSets.append(yaml.load(ymlCutSetFile, yaml.FullLoader)['cutvars'])
+    if len(cutSets) != inputs['rawYield'].shape[1]:
+        print('ERROR: number of cut-set files not consistent with the number of raw yield files! Exit')
+        sys.exit()
+
+    with open(bootCfg['mcconfig'], 'r') as ymlCfgFile:
+        mcCfg = yaml.load(ymlCfgFile, yaml.FullLoader)
+    bitSignal, bitPrompt, bitFD, bitRefl = 0, 2, 3, 4
+    dataFrames, nGen = {}, {}
+    inFileGen = TFile.Open(bootCfg['projfile'])
+    for candType, bitCandType in zip(['Prompt', 'FD'], [bitPrompt, bitFD]):
+        dataFrame = LoadDfFromRootOrParquet(mcCfg['tree'][f'filename{candType}'], mcCfg['tree']['dirname'],
+                                            mcCfg['tree']['treename'])
+        if 'cand_type' in dataFrame.columns: #if not filtered tree, select only prompt / FD and not reflected
+            dataFrame = FilterBitDf(dataFrame, 'cand_type', [bitSignal, bitCandType], 'and')
+            dataFrame = FilterBitDf(dataFrame, 'cand_type', [bitRefl], 'not')
+        dataFrames[candType] = dataFrame.astype(float)
+        nGen[candType] = []
+        for ptMin, ptMax in zip(inputs['ptLims'][:-1], inputs['ptLims'][1:]):
+            hGen = inFileGen.Get(f'h{candType}GenPt_{ptMin*10:.0f}_{ptMax*10:.0f}')
+            if not hGen:
+                print(f'ERROR: generated {candType} histogram for {ptMin} < pT < {ptMax} GeV/c not found! Exit')
+                sys.exit()
+            nGen[candType].append(hGen.Integral(0, hGen.GetNbinsX()+1))
+    inFileGen.Close()
+
+    cache = BuildBootstrapCache(dataFrames, cutSets, inputs['ptLims'], nGen)
+    np.savez_compressed(cacheFileName, **cache)
+    print(f'Bootstrap cache saved in {cacheFileName}')
+    return cache
+
+
+def main(): #pylint: disable=too-many-locals,too-many-statements
+    parser = argparse.ArgumentParser(description='Arguments to pass')
+    parser.add_argument('cfgFileName', metavar='text', default='cfgFileName.yml',
+                        help='cut-variation config file name (as for ComputeCutVarPromptFrac.py)')
+    parser.add_argument('outFileName', metavar='text', default='outFileName.root',
+                        help='output root file name')
+    parser.add_argument('--rebuildcache', action='store_true', default=False,
+                        help='rebuild the cache of per-candidate arrays even if it exists')
+    args = parser.parse_args()
+
+    with open(args.cfgFileName, 'r') as ymlCutSetFile:
+        cutSetCfg = yaml.load(ymlCutSetFile, yaml.FullLoader)
+    bootCfg = cutSetCfg['bootstrap']
+    inputs = LoadCutVarInputs(cutSetCfg)
+    nPtBins, nSets = inputs['rawYield'].shape
+
+    if os.path.isfile(bootCfg['cachefile']) and not args.rebuildcache:
+        with np.load(bootCfg['cachefile']) as cacheFile:
+            cache = dict(cacheFile)
+        if not np.allclose(cache['ptLims'], inputs['ptLims']) or cache['passPrompt'].shape[1] != nSets:
+            print('ERROR: bootstrap cache not consistent with the cut-variation inputs, use --rebuildcache! Exit')
+            sys.exit()
+    else:
+        cache = LoadCache(cutSetCfg, inputs, bootCfg['cachefile'])
+    prepCache = PrepareBootstrapCache(cache)
+
+    # one independent seed per replica, so that the results do not depend on the number of processes
+    nReplicas = bootCfg['nreplicas']
+    seeds = np.random.SeedSequence(bootCfg['seed']).spawn(nReplicas)
+    chunkArgs = [(seeds[iRep:iRep+bootCfg['chunksize']], inputs, cutSetCfg['minimisation']['correlated'],
+                  bootCfg['rawyieldsmearing']) for iRep in range(0, nReplicas, bootCfg['chunksize'])]
+    if bootCfg['nworkers'] > 1:
+        with Pool(bootCfg['nworkers'], initializer=InitWorker, initargs=(prepCache,)) as pool:
+            resultsChunks = pool.map(RunChunk, chunkArgs)
+    else:
+        InitWorker(prepCache)
+        resultsChunks = [RunChunk(chunk) for chunk in chunkArgs]
+    results = {var: np.concatenate([resultsChunk[var] for resultsChunk in resultsChunks])
+               for var in resultsChunks[0]}
+    results['ptLims'] = inputs['ptLims']
+    np.savez_compressed(args.outFileName.replace('.root', '_Bootstrap.npz'), **results)
+
+    quantiles = bootCfg['quantiles']
+    outFile = TFile(args.outFileName, 'recreate')
+    hCorrYieldQuantiles = {'Prompt': [], 'FD': []}
+    for yieldType in hCorrYieldQuantiles:
+        for quantile in quantiles:
+            hCorrYieldQuantiles[yieldType].append(TH1F(f'hCorrYield{yieldType}Boot_Q{quantile*100:.0f}',
+                                                       f';#it{{p}}_{{T}} (GeV/#it{{c}});#it{{N}}_{{{yieldType}}} '
+                                                       f'quantile {quantile}', nPtBins, inputs['ptLims']))
+    for iPt, (ptMin, ptMax) in enumerate(zip(inputs['ptLims'][:-1], inputs['ptLims'][1:])):
+        ptString = f'{ptMin:.0f}_{ptMax:.0f}'
+        corrYields = results['corrYield'][:, iPt]
+        isGood = np.all(np.isfinite(corrYields), axis=1)
+        if not np.all(isGood):
+            print(f'WARNING: minimisation failed for {np.count_nonzero(~isGood)} replicas in {ptMin:.0f} < pT < '
+                  f'{ptMax:.0f} GeV/c, skipped')
+        corrYields = corrYields[isGood]
+        for iType, (yieldType, yieldTitle) in enumerate(zip(['Prompt', 'FD'], ['prompt', 'non-prompt'])):
+            counts, edges = np.histogram(corrYields[:, iType], bins=100)
+            hCorrYield = TH1F(f'hCorrYield{yieldType}Boot_{ptString}',
+                              f'{ptMin:.0f} < #it{{p}}_{{T}} < {ptMax:.0f} GeV/#it{{c}};#it{{N}}_{{{yieldTitle}}};'
+                              'replicas', len(counts), edges[0], edges[-1])
+            for iBin, count in enumerate(counts):
+                hCorrYield.SetBinContent(iBin+1, count)
+            hCorrYield.SetEntries(len(corrYields))
+            hCorrYield.Write()
+            for iQuant, quantile in enumerate(np.quantile(corrYields[:, iType], quantiles)):
+                hCorrYieldQuantiles[yieldType][iQuant].SetBinContent(iPt+1, quantile)
+        fracPrompt = results['fracPrompt'][isGood, iPt]
+        for fracs, fracType, fracTitle in zip([fracPrompt, 1 - fracPrompt], ['Prompt', 'FD'], ['prompt', 'FD']):
+            hFrac = TH2F(f'h{fracType}FracVsCutBoot_{ptString}',
+                         f'{ptMin:.0f} < #it{{p}}_{{T}} < {ptMax:.0f} GeV/#it{{c}};cut set;#it{{f}}_{{{fracTitle}}}',
+                         nSets, 0.5, nSets + 0.5, 100, 0., 1.)
+            counts, _, _ = np.histogram2d(np.tile(np.arange(1, nSets + 1), len(fracs)), fracs.ravel(),
+                                          bins=[nSets, 100], range=[[0.5, nSets + 0.5], [0., 1.]])
+            for iCutSet in range(nSets):
+                for iBin in range(100):
+                    hFrac.SetBinContent(iCutSet+1, iBin+1, counts[iCutSet, iBin])
+            hFrac.SetEntries(fracs.size)
+            hFrac.Write()
+        print(f'{ptMin:.0f} < pT < {ptMax:.0f} GeV/c, {len(corrYields)} replicas: N_prompt quantiles '
+              f'{np.quantile(corrYields[:, 0], quantiles)}, N_FD quantiles {np.quantile(corrYields[:, 1], quantiles)}')
+    for yieldType in hCorrYieldQuantiles:
+        for hQuantile in hCorrYieldQuantiles[yieldType]:
+            hQuantile.Write()
+    outFile.Close()
+    print(f'\nBootstrap distributions saved in {args.outFileName}')
+
+
+if __name__ == '__main__':
+    main()
@@ -8,7 +8,7 @@ import numpy as np
 from ROOT import gROOT, TFile, TCanvas, TLegend  # pylint: disable=import-error,no-name-in-module
 from ROOT import kBlack, kFullDiamond, kRed, kAzure, kFullCircle, kOpenSquare  # pylint: disable=import-error,no-name-in-module
 from utils.StyleFormatter import SetGlobalStyle, SetObjectStyle
-from utils.AnalysisUtils import ComputeEfficiency
+from utils.AnalysisUtils import ComputeEfficiencyArrays, GetHistoArrays, SetHistoFromArrays
 
 parser = argparse.ArgumentParser(description='Arguments')
 parser.add_argument('effFileName', metavar='text', default='')
@@ -35,17 +35,19 @@ hAcc.SetLineColor(kBlack)
 hAcc.SetMarkerStyle(kFullDiamond)
 
 nPtBins = hEffPrompt.GetNbinsX()
-for iPt in range(nPtBins):
-    PtMin = hEffPrompt.GetBinLowEdge(iPt+1)
-    PtMax = PtMin+hEffPrompt.GetBinWidth(iPt+1)
-    PtBinMin = hAccNum.GetXaxis().FindBin(PtMin*1.0001)
-    PtBinMax = hAccNum.GetXaxis().FindBin(PtMax*0.9999)
+ptLims = GetHistoArrays(hEffPrompt)[2]
+# integrals of the acceptance histograms in the pT bins from cumulative sums (same bins as with TH1::FindBin)
+accNum, _, accBinEdges = GetHistoArrays(hAccNum)
+accDen = GetHistoArrays(hAccDen)[0]
+accNumCumul = np.concatenate(([0.], np.cumsum(accNum)))
+accDenCumul = np.concatenate(([0.], np.cumsum(accDen)))
+ptBinMins = np.clip(np.searchsorted(accBinEdges, ptLims[:-1]*1.0001, side='right') - 1, 0, len(accNum))
+ptBinMaxs = np.clip(np.searchsorted(accBinEdges, ptLims[1:]*0.9999, side='right'), ptBinMins, len(accNum))
+accNumInt = accNumCumul[ptBinMaxs] - accNumCumul[ptBinMins]
+accDenInt = accDenCumul[ptBinMaxs] - accDenCumul[ptBinMins]
 
-    acc, accUnc = ComputeEfficiency(hAccNum.Integral(PtBinMin, PtBinMax), hAccDen.Integral(PtBinMin, PtBinMax),
-                                    np.sqrt(hAccNum.Integral(PtBinMin, PtBinMax)),
-                                    np.sqrt(hAccDen.Integral(PtBinMin, PtBinMax)))
-    hAcc.SetBinContent(iPt+1, acc)
-    hAcc.SetBinError(iPt+1, accUnc)
+acc, accUnc = ComputeEfficiencyArrays(accNumInt, accDenInt, np.sqrt(accNumInt), np.sqrt(accDenInt))
+SetHistoFromArrays(hAcc, acc, accUnc)
 
 hAccEffPrompt = hEffPrompt.Clone('hAccEffPrompt')
 hAccEffPrompt.Multiply(hAcc)
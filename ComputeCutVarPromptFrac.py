@@ -1,34 +1,33 @@
 '''
 python script for the computation of the prompt / non-prompt fraction with the cut-variation method
-run: python ComputeCutVarPromptFrac.py cfgFileName.yml outFileName.root
+run: python ComputeCutVarPromptFrac.py cfgFileName.yml outFileName.root [--numbersOnly] [--saveTable]
+with --numbersOnly only the histograms are saved, without graphs, canvases and pdf files
+with --saveTable the table of results is saved, plots can be produced later with RenderCutVarPromptFrac.py
 '''
 
 import sys
 import argparse
 import os
-from itertools import product
 import numpy as np
 import yaml
-from ROOT import TFile, TH1F, TH2F, TCanvas, TLegend, TGraphAsymmErrors, TLatex, gRandom, TF1  # pylint: disable=import-error,no-name-in-module
-from ROOT import kBlack, kRed, kAzure, kGreen, kRainBow # pylint: disable=import-error,no-name-in-module
-from ROOT import kFullCircle, kFullSquare, kOpenSquare, kOpenCircle, kOpenCross, kOpenDiamond # pylint: disable=import-error,no-name-in-module
-from utils.AnalysisUtils import GetPromptFDFractionFc, GetFractionNb
-from utils.AnalysisUtils import GetPromptFDYieldsAnalyticMinimisation, ApplyVariationToList
-from utils.ReadModel import ReadTAMU, ReadPHSD, ReadMCatsHQ, ReadCatania
-from utils.StyleFormatter import SetGlobalStyle, SetObjectStyle
+from ROOT import TFile, gRandom  # pylint: disable=import-error,no-name-in-module
+from utils.AnalysisUtils import GetPromptFDFractionFcArrays, GetFractionNbArrays
+from utils.AnalysisUtils import GetPromptFDYieldsAnalyticMinimisationBatch, ApplyVariationToList
+from utils.AnalysisUtils import GetPoissonSmearedRawYields
+from utils.CutVarUtils import GetCutVarFractionsArrays, DrawCutVarResults
+from utils.ReadModel import ReadTAMU, ReadPHSD, ReadMCatsHQ, ReadCatania, EvaluateModel
 
 parser = argparse.ArgumentParser(description='Arguments to pass')
 parser.add_argument('cfgFileName', metavar='text', default='cfgFileName.yml',
                     help='config file name with root input files')
 parser.add_argument('outFileName', metavar='text', default='outFile.root',
                     help='output root file name')
+parser.add_argument('--numbersOnly', action='store_true', default=False,
+                    help='save only the histograms, without building the canvases and the plots')
+parser.add_argument('--saveTable', action='store_true', default=False,
+                    help='save the table of results in outFileName_Table.npz (input of RenderCutVarPromptFrac.py)')
 args = parser.parse_args()
 
-outFileNameEffPDF = args.outFileName.replace('.root', '_Eff.pdf')
-outFileNameDistrPDF = args.outFileName.replace('.root', '_Distr.pdf')
-outFileNameFracPDF = args.outFileName.replace('.root', '_Frac.pdf')
-outFileNameCorrMatrixPDF = args.outFileName.replace('.root', '_CorrMatrix.pdf')
-
 with open(args.cfgFileName, 'r') as ymlCutSetFile:
     cutSetCfg = yaml.load(ymlCutSetFile, yaml.FullLoader)
 
@@ -38,6 +37,16 @@ inputFilesBkg = cutSetCfg['background']['inputfiles']
 if inputFilesBkg is None:
     inputFilesBkg = inputFilesRaw.copy()
 
+# raw-yield covariance matrices from the simultaneous fit of the cut sets (optional)
+useRawYieldCov = 'covariance' in cutSetCfg['rawyields'] and cutSetCfg['rawyields']['covariance']['enable']
+inFileRawYieldCov = None
+if useRawYieldCov:
+    inFileRawYieldCov = TFile.Open(os.path.join(cutSetCfg['rawyields']['inputdir'],
+                                                cutSetCfg['rawyields']['covariance']['inputfile']))
+    if not inFileRawYieldCov or not inFileRawYieldCov.IsOpen():
+        print('ERROR: file with raw-yield covariance matrices cannot be opened! Exit')
+        sys.exit()
+
 inputDirRaw = cutSetCfg['rawyields']['inputdir']
 inputDirEff = cutSetCfg['efficiencies']['inputdir']
 inputDirBkg = cutSetCfg['background']['inputdir']
@@ -50,6 +59,7 @@ histoNameBkg = cutSetCfg['background']['histoname']
 nSets = len(cutSetCfg['rawyields']['inputfiles'])
 
 doRawYieldsSmearing = cutSetCfg['minimisation']['doRawYieldSmearing']
+doToys = 'toys' in cutSetCfg['minimisation'] and cutSetCfg['minimisation']['toys']['enable']
 
 applyEffVariation = cutSetCfg['minimisation']['applyEffVariation']['enable']
 relEffVariation = cutSetCfg['minimisation']['applyEffVariation']['relvariation']
@@ -145,68 +155,15 @@ if compareToFc or compareToNb:
     if compareToNb:
         sigmaMB = cutSetCfg['theorydriven']['sigmaMB']
 
-SetGlobalStyle(padleftmargin=0.15, padtopmargin=0.08, titleoffsetx=1.,
-               titleoffsety=1.4, opttitle=1, palette=kRainBow, maxdigits=2)
-
-legDistr = TLegend(0.45, 0.69, 0.75, 0.89)
-legDistr.SetFillStyle(0)
-legDistr.SetBorderSize(0)
-legDistr.SetTextSize(0.045)
-
-legEff = TLegend(0.2, 0.2, 0.4, 0.4)
-legEff.SetFillStyle(0)
-legEff.SetBorderSize(0)
-legEff.SetTextSize(0.045)
-
-legFrac = TLegend(0.2, 0.79, 0.4, 0.89)
-legFrac.SetFillStyle(0)
-legFrac.SetBorderSize(0)
-legFrac.SetTextSize(0.045)
-
-latInfo = TLatex()
-latInfo.SetNDC()
-latInfo.SetTextSize(0.045)
-latInfo.SetTextFont(42)
-latInfo.SetTextColor(1)
-
-hCorrYieldPrompt = hRawYields[0].Clone('hCorrYieldPrompt')
-hCorrYieldPrompt.SetTitle(';#it{p}_{T} (GeV/#it{c}); #it{N}_{prompt}')
-SetObjectStyle(hCorrYieldPrompt, color=kRed+1, fillcolor=kRed+1, markerstyle=kFullCircle)
-
-hCorrYieldFD = hRawYields[0].Clone('hCorrYieldFD')
-hCorrYieldFD.SetTitle(';#it{p}_{T} (GeV/#it{c}); #it{N}_{non-prompt}')
-SetObjectStyle(hCorrYieldFD, color=kAzure+4, fillcolor=kAzure+4, markerstyle=kFullSquare)
-
-hCovCorrYields = [[hRawYields[0].Clone('hCovPromptPrompt'), hRawYields[0].Clone('hCovPromptFD')],
-                  [hRawYields[0].Clone('hCovFDPrompt'), hRawYields[0].Clone('hCovFDFD')]]
-for iRow, row in enumerate(hCovCorrYields):
-    for iCol, hCov in enumerate(row):
-        SetObjectStyle(hCov, linecolor=kBlack)
-        if iRow == 0:
-            rowName = '#it{N}_{prompt}'
-        else:
-            rowName = '#it{N}_{non-prompt}'
-        if iCol == 0:
-            colName = '#it{N}_{prompt}'
-        else:
-            colName = '#it{N}_{non-prompt}'
-        hCov.SetTitle(f';#it{{p}}_{{T}} (GeV/#it{{c}}); #sigma({rowName}, {colName})')
-
-hRawYieldsVsCut, hRawYieldsVsCutReSum, hRawYieldPromptVsCut, hRawYieldFDVsCut, cDistr = [], [], [], [], []
-hEffPromptVsCut, hEffFDVsCut, cEff = [], [], []
-hPromptFracVsCut, hFDFracVsCut, gPromptFracFcVsCut, gFDFracFcVsCut, gPromptFracNbVsCut, \
-    gFDFracNbVsCut, cFrac = [], [], [], [], [], [], []
-hCorrMatrixCutSets, cCorrMatrix = [], []
-
-if cutSetCfg['linearplot']['enable']:
-    fNfdNprompt = []
-    cLinearPlot = []
-    legendLinearPlot = []
-    if cutSetCfg['linearplot']['uncbands']:
-        fNfdNpromptUpper = []
-        fNfdNpromptLower = []
-
-for iPt in range(hRawYields[0].GetNbinsX()):
+nPtBins = hRawYields[0].GetNbinsX()
+rawYields, rawYieldsUnc = np.zeros((nPtBins, nSets)), np.zeros((nPtBins, nSets))
+effsPrompt, effsPromptUnc = np.zeros((nPtBins, nSets)), np.zeros((nPtBins, nSets))
+effsFD, effsFDUnc = np.zeros((nPtBins, nSets)), np.zeros((nPtBins, nSets))
+rawYieldCovMatrices = np.zeros((nPtBins, nSets, nSets)) if useRawYieldCov else None
+rawYieldsNotSmeared, bkgs = np.zeros((nPtBins, nSets)), np.zeros((nPtBins, nSets))
+crossSecsPrompt, crossSecsFD = np.ones((nPtBins, 3)), np.ones((nPtBins, 3))
+raasPrompt, raasFD = np.ones(nPtBins), np.ones(nPtBins)
+for iPt in range(nPtBins):
     ptMin = hRawYields[0].GetBinLowEdge(iPt+1)
     ptMax = ptMin + hRawYields[0].GetBinWidth(iPt+1)
 
@@ -218,16 +175,9 @@ for iPt in range(hRawYields[0].GetNbinsX()):
     listEffFDUnc = [hEffF.GetBinError(iPt+1) for hEffF in hEffFD]
     listBkg = [hbkg.GetBinContent(iPt+1) for hbkg in hBkg]
     listBkgUnc = [hbkg.GetBinError(iPt+1) for hbkg in hBkg]
-
-    if cutSetCfg['linearplot']['enable']:
-        fNfdNprompt.append([])
-        cLinearPlot.append(TCanvas(f'LinearPlot_Pt{iPt+1}-{iPt+2}', '', 800, 800))
-        cLinearPlot[iPt].SetTitle(f'LinearPlot_Pt{iPt+1}-{iPt+2}')
-        legendLinearPlot.append(TLegend(0.6, 0.6, 0.9, 0.9))
-        legendLinearPlot[iPt].SetNColumns(3)
-        if cutSetCfg['linearplot']['uncbands']:
-            fNfdNpromptUpper.append([])
-            fNfdNpromptLower.append([])
+    rawYieldsNotSmeared[iPt] = listRawYield
+    if hBkg:
+        bkgs[iPt] = listBkg
 
     # apply smearing to raw yields
     if doRawYieldsSmearing:
@@ -267,294 +217,109 @@ for iPt in range(hRawYields[0].GetNbinsX()):
         if applyEffVarToFD:
             listEffFD = ApplyVariationToList(listEffFD, relEffVariation, effVariationOpt)
 
-    corrYields, covMatrixCorrYields, chiSquare, matrices = \
-        GetPromptFDYieldsAnalyticMinimisation(listEffPrompt, listEffFD, listRawYield, listEffPromptUnc, listEffFDUnc,
-                                              listRawYieldUnc, cutSetCfg['minimisation']['correlated'])
-
-    hCorrYieldPrompt.SetBinContent(iPt+1, corrYields.item(0))
-    hCorrYieldPrompt.SetBinError(iPt+1, np.sqrt(covMatrixCorrYields.item(0, 0)))
-    hCorrYieldFD.SetBinContent(iPt+1, corrYields.item(1))
-    hCorrYieldFD.SetBinError(iPt+1, np.sqrt(covMatrixCorrYields.item(1, 1)))
-    for covElem in product(range(2), range(2)):
-        hCovCorrYields[covElem[0]][covElem[1]].SetBinContent(iPt+1, covMatrixCorrYields.item(covElem))
-        hCovCorrYields[covElem[0]][covElem[1]].SetBinError(iPt+1, 0.)
-
-    ptString = f'pT{ptMin:.0f}_{ptMax:.0f}'
-    commonString = f'{ptMin:.0f} < #it{{p}}_{{T}} < {ptMax:.0f}  GeV/#it{{c}};cut set'
-    hRawYieldsVsCut.append(TH1F(f'hRawYieldsVsCutPt_{ptString}', f'{commonString};raw yield', nSets, 0.5, nSets + 0.5))
-    hRawYieldsVsCutReSum.append(TH1F(f'hRawYieldsVsCutReSum_{ptString}', f'{commonString};raw yield',
-                                     nSets, 0.5, nSets + 0.5))
-    hRawYieldPromptVsCut.append(TH1F(f'hRawYieldPromptVsCut_{ptString}', f'{commonString};raw yield',
-                                     nSets, 0.5, nSets + 0.5))
-    hRawYieldFDVsCut.append(TH1F(f'hRawYieldFDVsCut_{ptString}', f'{commonString};raw yield', nSets, 0.5, nSets + 0.5))
-    hEffPromptVsCut.append(TH1F(f'hEffPromptVsCut_{ptString}', f'{commonString};efficiency', nSets, 0.5, nSets + 0.5))
-    hEffFDVsCut.append(TH1F(f'hEffFDVsCut_{ptString}', f'{commonString};efficiency', nSets, 0.5, nSets + 0.5))
-    hPromptFracVsCut.append(TH1F(f'hPromptFracVsCut_{ptString}', f'{commonString};#it{{f}}_{{prompt}}',
-                                 nSets, 0.5, nSets + 0.5))
-    hFDFracVsCut.append(TH1F(f'hFDFracVsCut_{ptString}', f'{commonString};#it{{f}}_{{FD}}', nSets, 0.5, nSets + 0.5))
-
-    SetObjectStyle(hRawYieldsVsCut[iPt], linecolor=kBlack, markercolor=kBlack, markerstyle=kFullCircle)
-    SetObjectStyle(hRawYieldPromptVsCut[iPt], color=kRed+1, fillcolor=kRed+1, markerstyle=kOpenCircle, fillalpha=0.3)
-    SetObjectStyle(hRawYieldFDVsCut[iPt], color=kAzure+4, fillcolor=kAzure+4, markerstyle=kOpenSquare, fillalpha=0.3)
-    SetObjectStyle(hRawYieldsVsCutReSum[iPt], linecolor=kGreen+2)
-    SetObjectStyle(hEffPromptVsCut[iPt], color=kRed+1, markerstyle=kFullCircle)
-    SetObjectStyle(hEffFDVsCut[iPt], color=kAzure+4, markerstyle=kFullSquare)
-    SetObjectStyle(hPromptFracVsCut[iPt], color=kRed+1, markerstyle=kFullCircle)
-    SetObjectStyle(hFDFracVsCut[iPt], color=kAzure+4, markerstyle=kFullSquare)
-
-    hCorrMatrixCutSets.append(TH2F(f'hCorrMatrixCutSets_{ptString}', f'{commonString};cut set',
-                                   nSets, 0.5, nSets + 0.5, nSets, 0.5, nSets + 0.5))
-    for mEl in product(range(nSets), range(nSets)):
-        hCorrMatrixCutSets[iPt].SetBinContent(mEl[0]+1, mEl[1]+1, matrices['corrMatrix'].item(mEl[0], mEl[1]))
+    if useRawYieldCov:
+        hRawYieldCov = inFileRawYieldCov.Get(f"{cutSetCfg['rawyields']['covariance']['histoname']}"
+                                             f'_pT{ptMin*10:.0f}_{ptMax*10:.0f}')
+        if not hRawYieldCov or hRawYieldCov.GetNbinsX() != nSets:
+            print(f'ERROR: raw-yield covariance matrix for {ptMin} < pT < {ptMax} GeV/c not found or not '
+                  'consistent with the number of cut sets! Exit')
+            sys.exit()
+        rawYieldCovMatrices[iPt] = np.array([[hRawYieldCov.GetBinContent(iRow+1, iCol+1) for iCol in range(nSets)]
+                                            for iRow in range(nSets)])
+
+    rawYields[iPt], rawYieldsUnc[iPt] = listRawYield, listRawYieldUnc
+    effsPrompt[iPt], effsPromptUnc[iPt] = listEffPrompt, listEffPromptUnc
+    effsFD[iPt], effsFDUnc[iPt] = listEffFD, listEffFDUnc
 
     # cross sections from theory if comparison enabled
     if compareToFc or compareToNb:
-        crossSecPrompt = [h.Integral(h.GetXaxis().FindBin(ptMin*1.0001), h.GetXaxis().FindBin(ptMax*0.9999), 'width') /
-                          (ptMax - ptMin) for h in hCrossSecPrompt]
-        crossSecFD = [h.Integral(h.GetXaxis().FindBin(ptMin*1.0001), h.GetXaxis().FindBin(ptMax*0.9999), 'width') /
-                      (ptMax - ptMin) for h in hCrossSecFD]
-
-        if compareToFc:
-            gPromptFracFcVsCut.append(TGraphAsymmErrors(nSets))
-            gPromptFracFcVsCut[iPt].SetNameTitle(f'gPromptFracFcVsCut_{ptString}',
-                                                 f'{commonString};#it{{f}}_{{prompt}}')
-            gFDFracFcVsCut.append(TGraphAsymmErrors(nSets))
-            gFDFracFcVsCut[iPt].SetNameTitle(f'gFDFracFcVsCut_{ptString}', f'{commonString};#it{{f}}_{{FD}}')
-            SetObjectStyle(gPromptFracFcVsCut[iPt], color=kRed+3, fillalpha=0.3, markerstyle=kOpenCircle, markersize=2.)
-            SetObjectStyle(gFDFracFcVsCut[iPt], color=kAzure+3, fillalpha=0.3, markerstyle=kOpenSquare, markersize=2.)
-
-        if compareToNb:
-            gPromptFracNbVsCut.append(TGraphAsymmErrors(nSets))
-            gPromptFracNbVsCut[iPt].SetNameTitle(f'gPromptFracNbVsCut_{ptString}',
-                                                 f'{commonString};#it{{f}}_{{prompt}}')
-            gFDFracNbVsCut.append(TGraphAsymmErrors(nSets))
-            gFDFracNbVsCut[iPt].SetNameTitle(f'gFDFracNbVsCut_{ptString}', f'{commonString};#it{{f}}_{{FD}}')
-            SetObjectStyle(gPromptFracNbVsCut[iPt], color=kRed-7, markerstyle=kOpenDiamond, markersize=3.)
-            SetObjectStyle(gFDFracNbVsCut[iPt], color=kAzure+5, markerstyle=kOpenCross, markersize=2.)
-
-    for iCutSet, (rawY, effP, effF, rawYunc, effPunc, effFunc) in enumerate(zip(listRawYield, listEffPrompt, listEffFD,
-                                                                                listRawYieldUnc, listEffPromptUnc,
-                                                                                listEffFDUnc)):
-        # efficiency
-        hEffPromptVsCut[iPt].SetBinContent(iCutSet+1, effP)
-        hEffPromptVsCut[iPt].SetBinError(iCutSet+1, effPunc)
-        hEffFDVsCut[iPt].SetBinContent(iCutSet+1, effF)
-        hEffFDVsCut[iPt].SetBinError(iCutSet+1, effFunc)
-
-        # raw yields (including prompt and non-prompt raw yields)
-        hRawYieldsVsCut[iPt].SetBinContent(iCutSet+1, rawY)
-        hRawYieldsVsCut[iPt].SetBinError(iCutSet+1, rawYunc)
-        hRawYieldPromptVsCut[iPt].SetBinContent(iCutSet+1, corrYields.item(0) * effP)
-        hRawYieldPromptVsCut[iPt].SetBinError(iCutSet+1, np.sqrt(covMatrixCorrYields.item(0, 0)) * effP)
-        hRawYieldFDVsCut[iPt].SetBinContent(iCutSet+1, corrYields.item(1) * effF)
-        hRawYieldFDVsCut[iPt].SetBinError(iCutSet+1, np.sqrt(covMatrixCorrYields.item(1, 1)) * effF)
-        hRawYieldsVsCutReSum[iPt].SetBinContent(iCutSet+1, hRawYieldPromptVsCut[iPt].GetBinContent(iCutSet+1) +
-                                                hRawYieldFDVsCut[iPt].GetBinContent(iCutSet+1))
-
-        if cutSetCfg['linearplot']['enable']:
-            fNfdNprompt[iPt].append(TF1(f'cutset{iCutSet+1}', '[1]*x + [0]', 0., max(corrYields)/2.))
-            fNfdNprompt[iPt][iCutSet].SetParameter(0, rawY/effP)
-            fNfdNprompt[iPt][iCutSet].SetParameter(1, -effF/effP)
-            if cutSetCfg['linearplot']['uncbands']:
-                fNfdNpromptUpper[iPt].append(TF1(f'fNfdNpromptUpper{iPt}{iCutSet+1}',
-                                                 '[1]*x + [0]', 0., max(corrYields)/2.))
-                fNfdNpromptLower[iPt].append(TF1(f'fNfdNpromptLower{iPt}{iCutSet+1}',
-                                                 '[1]*x + [0]', 0., max(corrYields)/2.))
-                fNfdNpromptUpper[iPt][iCutSet].SetTitle(f'Lower Limit cutset{iCutSet+1}')
-                fNfdNpromptLower[iPt][iCutSet].SetTitle(f'Upper Limit cutset{iCutSet+1}')
-                fNfdNpromptUpper[iPt][iCutSet].SetParameter(0, (rawY+rawYunc)/(effP+effPunc))
-                fNfdNpromptUpper[iPt][iCutSet].SetParameter(1, -(effF+effFunc)/(effP+effPunc))
-                fNfdNpromptLower[iPt][iCutSet].SetParameter(0, (rawY-rawYunc)/(effP-effPunc))
-                fNfdNpromptLower[iPt][iCutSet].SetParameter(1, -(effF-effFunc)/(effP-effPunc))
-            fNfdNprompt[iPt][iCutSet].GetYaxis().SetTitle('#it{N}_{prompt}')
-            fNfdNprompt[iPt][iCutSet].GetXaxis().SetTitle('#it{N}_{feed-down}')
-            fNfdNprompt[iPt][iCutSet].GetYaxis().SetRangeUser(0., 1.5*max(corrYields))
-            fNfdNprompt[iPt][iCutSet].SetTitle('')
-            fNfdNprompt[iPt][iCutSet].SetLineColor(kRainBow+2*iCutSet)
-            cLinearPlot[iPt].cd()
-            if iCutSet != 0:
-                fNfdNprompt[iPt][iCutSet].Draw('same')
-                legendLinearPlot[iPt].AddEntry(fNfdNprompt[iPt][iCutSet], f'cutset{iCutSet+1}', 'l')
-            else:
-                fNfdNprompt[iPt][iCutSet].Draw()
-                legendLinearPlot[iPt].AddEntry(fNfdNprompt[iPt][iCutSet], f'cutset{iCutSet+1}', 'l')
-            if cutSetCfg['linearplot']['uncbands']:
-                fNfdNpromptUpper[iPt][iCutSet].SetLineColor(kRainBow+2*iCutSet)
-                fNfdNpromptLower[iPt][iCutSet].SetLineColor(kRainBow+2*iCutSet)
-                fNfdNpromptUpper[iPt][iCutSet].SetLineStyle(7)
-                fNfdNpromptLower[iPt][iCutSet].SetLineStyle(7)
-                fNfdNpromptUpper[iPt][iCutSet].Draw('same')
-                legendLinearPlot[iPt].AddEntry(fNfdNpromptUpper[iPt][iCutSet], f'lowerlimit cutset{iCutSet+1}')
-                fNfdNpromptLower[iPt][iCutSet].Draw('same')
-                legendLinearPlot[iPt].AddEntry(fNfdNpromptUpper[iPt][iCutSet], f'upperlimit cutset{iCutSet+1}')
-            legendLinearPlot[iPt].Draw()
-            cLinearPlot[iPt].Update()
-
-        # prompt fraction
-        fPrompt = effP * corrYields.item(0) / (effP * corrYields.item(0) + effF * corrYields.item(1))
-        defPdeNP = (effP * (effP * corrYields.item(0) + effF * corrYields.item(1)) - effP**2
-                    * corrYields.item(0)) / (effP * corrYields.item(0) + effF * corrYields.item(1))**2
-        defPdeNF = - effF * effP * corrYields.item(0) / (effP * corrYields.item(0) + effF * corrYields.item(1))**2
-        fPromptUnc = np.sqrt(defPdeNP**2 * covMatrixCorrYields.item(0, 0) +
-                             defPdeNF**2 * covMatrixCorrYields.item(1, 1) +
-                             2 * defPdeNP * defPdeNF * covMatrixCorrYields.item(1, 0))
-
-        # feed-down fraction
-        fFD = effF * corrYields.item(1) / (effP * corrYields.item(0) + effF * corrYields.item(1))
-        defFdeNF = (effF * (effF * corrYields.item(1) + effP * corrYields.item(0)) - effF**2
-                    * corrYields.item(1)) / (effP * corrYields.item(0) + effF * corrYields.item(1))**2
-        defFdeNP = - effF * effP * corrYields.item(1) / (effP * corrYields.item(0) + effF * corrYields.item(1))**2
-        fFDUnc = np.sqrt(defFdeNF**2 * covMatrixCorrYields.item(1, 1) +
-                         defFdeNP**2 * covMatrixCorrYields.item(0, 0) +
-                         2 * defFdeNF * defFdeNP * covMatrixCorrYields.item(1, 0))
-
-        hPromptFracVsCut[iPt].SetBinContent(iCutSet+1, fPrompt)
-        hPromptFracVsCut[iPt].SetBinError(iCutSet+1, fPromptUnc)
-        hFDFracVsCut[iPt].SetBinContent(iCutSet+1, fFD)
-        hFDFracVsCut[iPt].SetBinError(iCutSet+1, fFDUnc)
-
-        # theory-driven, if enabled
-        ptCent = (ptMax + ptMin) / 2.
-        if isinstance(RaaPrompt_config, str):
-            if ptMinRaaPrompt < ptCent < ptMaxRaaPrompt:
-                RaaPrompt = RaaPromptSpline['yCent'](ptCent)
-            elif ptCent > ptMaxRaaPrompt:
-                RaaPrompt = RaaPromptSpline['yCent'](ptMaxRaaPrompt)
-            else:
-                RaaPrompt = RaaPromptSpline['yCent'](ptMinRaaPrompt)
-            RaaPrompt = float(RaaPrompt)
-        if isinstance(RaaFD_config, str):
-            if ptMinRaaFD < ptCent < ptMaxRaaFD:
-                RaaFD = RaaFDSpline['yCent'](ptCent)
-            elif ptCent > ptMaxRaaFD:
-                RaaFD = RaaFDSpline['yCent'](ptMaxRaaFD)
-            else:
-                RaaFD = RaaFDSpline['yCent'](ptMinRaaFD)
-            RaaFD = float(RaaFD)
-        if compareToFc:
-            fPromptFc, fFDFc = GetPromptFDFractionFc(effP, effF, crossSecPrompt, crossSecFD, RaaPrompt, RaaFD)
-            gPromptFracFcVsCut[iPt].SetPoint(iCutSet, iCutSet+1, fPromptFc[0])
-            gPromptFracFcVsCut[iPt].SetPointError(iCutSet, 0.5, 0.5, fPromptFc[0] - fPromptFc[1],
-                                                  fPromptFc[2] - fPromptFc[0])
-            gFDFracFcVsCut[iPt].SetPoint(iCutSet, iCutSet+1, fFDFc[0])
-            gFDFracFcVsCut[iPt].SetPointError(iCutSet, 0.5, 0.5, fFDFc[0] - fFDFc[1], fFDFc[2] - fFDFc[0])
-
-        if compareToNb:
-            fPromptNb = GetFractionNb(rawY, effP, effF, crossSecFD, ptMax-ptMin, 1., 1.,
-                                      hEv[iCutSet].GetBinContent(1), sigmaMB)
-            fFDNb = [1 - fPromptNb[0], 1 - fPromptNb[2], 1 - fPromptNb[1]] #inverse Nb method not reliable
-            gPromptFracNbVsCut[iPt].SetPoint(iCutSet, iCutSet+1, fPromptNb[0])
-            gPromptFracNbVsCut[iPt].SetPointError(iCutSet, 0.5, 0.5, fPromptNb[0] - fPromptNb[1],
-                                                  fPromptNb[2] - fPromptNb[0])
-            gFDFracNbVsCut[iPt].SetPoint(iCutSet, iCutSet+1, fFDNb[0])
-            gFDFracNbVsCut[iPt].SetPointError(iCutSet, 0.5, 0.5, fFDNb[0] - fFDNb[1], fFDNb[2] - fFDNb[0])
-
-    if iPt == 0:
-        legDistr.AddEntry(hRawYieldsVsCut[iPt], 'Measured raw yield', 'lpe')
-        legDistr.AddEntry(hRawYieldPromptVsCut[iPt], 'Prompt', 'f')
-        legDistr.AddEntry(hRawYieldFDVsCut[iPt], 'Non-prompt', 'f')
-        legDistr.AddEntry(hRawYieldsVsCutReSum[iPt], 'Prompt + non-prompt', 'l')
-        legEff.AddEntry(hEffPromptVsCut[iPt], 'Prompt', 'lpe')
-        legEff.AddEntry(hEffFDVsCut[iPt], 'Non-prompt', 'lpe')
-        legFrac.AddEntry(hPromptFracVsCut[iPt], 'Prompt', 'lpe')
-        legFrac.AddEntry(hFDFracVsCut[iPt], 'Non-prompt', 'lpe')
-
-        deltaY = 0.
-        if compareToFc:
-            legFrac.AddEntry(gPromptFracFcVsCut[iPt], 'Prompt #it{f}_{c}', 'fp')
-            legFrac.AddEntry(gFDFracFcVsCut[iPt], 'Non-prompt #it{f}_{c}', 'fp')
-            deltaY += 0.1
-            legFrac.SetY1(0.83 - deltaY)
-        if compareToNb:
-            legFrac.AddEntry(gPromptFracNbVsCut[iPt], 'Prompt #it{N}_{b}', 'fp')
-            legFrac.AddEntry(gFDFracNbVsCut[iPt], 'Non-prompt #it{N}_{b}', 'fp')
-            deltaY += 0.1
-            legFrac.SetY1(0.83 - deltaY)
-
-    cEff.append(TCanvas(f'cEff_{ptString}', '', 800, 800))
-    cEff[iPt].DrawFrame(0.5, hEffPromptVsCut[iPt].GetMinimum()/5, nSets + 0.5, 1., f'{commonString};efficiency')
-    cEff[iPt].SetLogy()
-    hEffPromptVsCut[iPt].DrawCopy('same')
-    hEffFDVsCut[iPt].DrawCopy('same')
-    legEff.Draw()
-
-    cDistr.append(TCanvas(f'cDistr_{ptString}', '', 800, 800))
-    hFrameDistr = cDistr[iPt].DrawFrame(0.5, 0., nSets + 0.5, hRawYieldsVsCut[iPt].GetMaximum() * 1.2,
-                                        f'{commonString};raw yield')
-    hFrameDistr.GetYaxis().SetDecimals()
-    hRawYieldsVsCut[iPt].Draw('same')
-    hRawYieldPromptVsCut[iPt].DrawCopy('histsame')
-    hRawYieldFDVsCut[iPt].DrawCopy('histsame')
-    hRawYieldsVsCutReSum[iPt].Draw('same')
-    legDistr.Draw()
-    latInfo.DrawLatex(0.47, 0.65, f'#chi^{{2}} / ndf = {chiSquare:.3f}')
-
-    cFrac.append(TCanvas(f'cFrac_{ptString}', '', 800, 800))
-    cFrac[iPt].DrawFrame(0.5, 0., nSets + 0.5, 1.8, f'{commonString};fraction')
-    hPromptFracVsCut[iPt].DrawCopy('Esame')
-    hFDFracVsCut[iPt].DrawCopy('Esame')
-    if compareToFc:
-        gPromptFracFcVsCut[iPt].Draw('2PZ')
-        gFDFracFcVsCut[iPt].Draw('2PZ')
-    if compareToNb:
-        gPromptFracNbVsCut[iPt].Draw('2PZ')
-        gFDFracNbVsCut[iPt].Draw('2PZ')
-    legFrac.Draw()
-
-    cCorrMatrix.append(TCanvas(f'cCorrMatrix_{ptString}', '', 800, 800))
-    cCorrMatrix[-1].cd().SetRightMargin(0.14)
-    hCorrMatrixCutSets[iPt].Draw('colz')
-
-nPtBins = hCorrYieldPrompt.GetNbinsX()
-cCorrYield = TCanvas('cCorrYield', '', 800, 800)
-cCorrYield.DrawFrame(hCorrYieldPrompt.GetBinLowEdge(1), 1.,
-                     hCorrYieldPrompt.GetBinLowEdge(nPtBins) + hCorrYieldPrompt.GetBinWidth(nPtBins),
-                     hCorrYieldPrompt.GetMaximum() * 1.2, ';#it{p}_{T} (GeV/#it{c});corrected yield')
-cCorrYield.SetLogy()
-hCorrYieldPrompt.Draw('same')
-hCorrYieldFD.Draw('same')
-legEff.Draw()
-
-outFile = TFile(args.outFileName, 'recreate')
-cCorrYield.Write()
-hCorrYieldPrompt.Write()
-hCorrYieldFD.Write()
-for covElem in product(range(2), range(2)):
-    hCovCorrYields[covElem[0]][covElem[1]].Write()
-for iPt in range(hRawYields[0].GetNbinsX()):
-    cDistr[iPt].Write()
-    cEff[iPt].Write()
-    cFrac[iPt].Write()
-    hRawYieldsVsCut[iPt].Write()
-    hRawYieldPromptVsCut[iPt].Write()
-    hRawYieldFDVsCut[iPt].Write()
-    hRawYieldsVsCutReSum[iPt].Write()
-    hEffPromptVsCut[iPt].Write()
-    hEffFDVsCut[iPt].Write()
-    hPromptFracVsCut[iPt].Write()
-    hFDFracVsCut[iPt].Write()
-    hCorrMatrixCutSets[iPt].Write()
-    if cutSetCfg['linearplot']['enable']:
-        cLinearPlot[iPt].Write()
-outFile.Close()
-
-for iPt in range(hRawYields[0].GetNbinsX()):
-    if iPt == 0:
-        cEff[iPt].SaveAs(f'{outFileNameEffPDF}[')
-        cDistr[iPt].SaveAs(f'{outFileNameDistrPDF}[')
-        cFrac[iPt].SaveAs(f'{outFileNameFracPDF}[')
-        cCorrMatrix[iPt].SaveAs(f'{outFileNameCorrMatrixPDF}[')
-    cEff[iPt].SaveAs(outFileNameEffPDF)
-    cDistr[iPt].SaveAs(outFileNameDistrPDF)
-    cFrac[iPt].SaveAs(outFileNameFracPDF)
-    cCorrMatrix[iPt].SaveAs(outFileNameCorrMatrixPDF)
-    if iPt == hRawYields[0].GetNbinsX() - 1:
-        cEff[iPt].SaveAs(f'{outFileNameEffPDF}]')
-        cDistr[iPt].SaveAs(f'{outFileNameDistrPDF}]')
-        cFrac[iPt].SaveAs(f'{outFileNameFracPDF}]')
-        cCorrMatrix[iPt].SaveAs(f'{outFileNameCorrMatrixPDF}]')
-    if cutSetCfg['linearplot']['enable']:
-        for iformat in cutSetCfg['linearplot']['outfileformat']:
-            outFileNameLinPlot = args.outFileName.replace('.root', f'_LinearPlot{iPt+1}_{iPt+2}.{iformat}')
-            cLinearPlot[iPt].SaveAs(f'{outFileNameLinPlot}')
-input('Press enter to exit')
+        crossSecsPrompt[iPt] = [h.Integral(h.GetXaxis().FindBin(ptMin*1.0001), h.GetXaxis().FindBin(ptMax*0.9999),
+                                           'width') / (ptMax - ptMin) for h in hCrossSecPrompt]
+        crossSecsFD[iPt] = [h.Integral(h.GetXaxis().FindBin(ptMin*1.0001), h.GetXaxis().FindBin(ptMax*0.9999),
+                                       'width') / (ptMax - ptMin) for h in hCrossSecFD]
+
+# RAA from theory (evaluated at the pT-bin centres, constant outside the model range) if comparison enabled
+if compareToFc or compareToNb:
+    ptCents = np.array([hRawYields[0].GetBinCenter(iPt+1) for iPt in range(nPtBins)])
+    raasPrompt[:] = EvaluateModel(RaaPromptSpline, ptCents, ptMinRaaPrompt, ptMaxRaaPrompt)[0] \
+        if isinstance(RaaPrompt_config, str) else RaaPrompt
+    raasFD[:] = EvaluateModel(RaaFDSpline, ptCents, ptMinRaaFD, ptMaxRaaFD)[0] \
+        if isinstance(RaaFD_config, str) else RaaFD
+
+# minimisation for all the pT bins at once
+corrYieldsAll, covMatrixCorrYieldsAll, chiSquareAll, matricesAll = \
+    GetPromptFDYieldsAnalyticMinimisationBatch(effsPrompt, effsFD, rawYields, effsPromptUnc, effsFDUnc, rawYieldsUnc,
+                                               cutSetCfg['minimisation']['correlated'],
+                                               rawYieldCovMatrix=rawYieldCovMatrices)
+
+# theory-driven fractions for all the pT bins and cut sets at once
+if compareToFc:
+    fracsPromptFc, fracsFDFc = GetPromptFDFractionFcArrays(effsPrompt, effsFD, crossSecsPrompt[:, np.newaxis, :],
+                                                           crossSecsFD[:, np.newaxis, :],
+                                                           raasPrompt[:, np.newaxis, np.newaxis],
+                                                           raasFD[:, np.newaxis, np.newaxis])
+if compareToNb:
+    ptWidths = np.array([hRawYields[0].GetBinWidth(iPt+1) for iPt in range(nPtBins)])
+    fracsPromptNb = GetFractionNbArrays(rawYields, effsPrompt, effsFD, crossSecsFD[:, np.newaxis, :],
+                                        ptWidths[:, np.newaxis], 1., 1., [h.GetBinContent(1) for h in hEv], sigmaMB)
+
+# fractions of the cut sets for all the pT bins at once
+fracsPrompt, fracsPromptUnc, fracsFD, fracsFDUnc = GetCutVarFractionsArrays(effsPrompt, effsFD, corrYieldsAll,
+                                                                            covMatrixCorrYieldsAll)
+
+# high-statistics toys with Poissonian smearing of the raw yields, minimised for all the toys at once
+if doToys:
+    nToys = cutSetCfg['minimisation']['toys']['ntoys']
+    quantiles = cutSetCfg['minimisation']['toys']['quantiles']
+    rngToys = np.random.default_rng(cutSetCfg['minimisation']['toys']['seed'])
+    corrYieldsToys = np.zeros((nPtBins, nToys, 2))
+    chiSquareToys = np.zeros((nPtBins, nToys))
+    fracsPromptToys = np.zeros((nPtBins, nToys, nSets))
+    for iPt in range(nPtBins):
+        ptMin = hRawYields[0].GetBinLowEdge(iPt+1)
+        ptMax = ptMin + hRawYields[0].GetBinWidth(iPt+1)
+        rawYieldsToys = GetPoissonSmearedRawYields(rawYieldsNotSmeared[iPt], bkgs[iPt], nToys,
+                                                   cutSetCfg['minimisation']['correlated'], rngToys)
+        corrYieldsToys[iPt], _, chiSquareToys[iPt], _ = \
+            GetPromptFDYieldsAnalyticMinimisationBatch(effsPrompt[iPt], effsFD[iPt], rawYieldsToys, effsPromptUnc[iPt],
+                                                       effsFDUnc[iPt], rawYieldsUnc[iPt],
+                                                       cutSetCfg['minimisation']['correlated'],
+                                                       rawYieldCovMatrix=rawYieldCovMatrices[iPt] if useRawYieldCov
+                                                       else None)
+        promptYieldsToys = effsPrompt[iPt] * corrYieldsToys[iPt, :, 0:1]
+        fracsPromptToys[iPt] = promptYieldsToys / (promptYieldsToys + effsFD[iPt] * corrYieldsToys[iPt, :, 1:2])
+        print(f'{ptMin:.0f} < pT < {ptMax:.0f} GeV/c, {nToys} toys: N_prompt quantiles '
+              f'{np.quantile(corrYieldsToys[iPt, :, 0], quantiles)}, N_FD quantiles '
+              f'{np.quantile(corrYieldsToys[iPt, :, 1], quantiles)}')
+
+    fracsFDToys = 1. - fracsPromptToys
+    ptLimsToys = [hRawYields[0].GetBinLowEdge(iPt+1) for iPt in range(nPtBins+1)]
+    np.savez_compressed(args.outFileName.replace('.root', '_Toys.npz'), ptLims=ptLimsToys, corrYields=corrYieldsToys,
+                        redChiSquare=chiSquareToys, effPrompt=effsPrompt, effFD=effsFD,
+                        fracPromptToys=fracsPromptToys, fracFDToys=fracsFDToys, quantiles=quantiles,
+                        corrYieldsQuantiles=np.quantile(corrYieldsToys, quantiles, axis=1),
+                        fracPromptQuantiles=np.quantile(fracsPromptToys, quantiles, axis=1),
+                        fracFDQuantiles=np.quantile(fracsFDToys, quantiles, axis=1))
+
+# table of results, enough to produce all the plots (also afterwards with RenderCutVarPromptFrac.py)
+table = {'ptLims': np.array([hRawYields[0].GetBinLowEdge(iPt+1) for iPt in range(nPtBins+1)]),
+         'rawYields': rawYields, 'rawYieldsUnc': rawYieldsUnc, 'effsPrompt': effsPrompt, 'effsPromptUnc': effsPromptUnc,
+         'effsFD': effsFD, 'effsFDUnc': effsFDUnc, 'corrYields': corrYieldsAll,
+         'covMatrixCorrYields': covMatrixCorrYieldsAll, 'redChiSquare': chiSquareAll,
+         'corrMatrixCutSets': matricesAll['corrMatrix'], 'fracPrompt': fracsPrompt, 'fracPromptUnc': fracsPromptUnc,
+         'fracFD': fracsFD, 'fracFDUnc': fracsFDUnc}
+if compareToFc:
+    table['fracsPromptFc'], table['fracsFDFc'] = fracsPromptFc, fracsFDFc
+if compareToNb:
+    table['fracsPromptNb'] = fracsPromptNb
+if doToys:
+    table['corrYieldsToys'], table['fracPromptToys'] = corrYieldsToys, fracsPromptToys
+    table['fracFDToys'] = fracsFDToys
+    table['toysQuantiles'] = quantiles
+if args.saveTable:
+    np.savez_compressed(args.outFileName.replace('.root', '_Table.npz'), **table)
+    print(f"Table of results saved in {args.outFileName.replace('.root', '_Table.npz')}")
+
+DrawCutVarResults(table, cutSetCfg, args.outFileName, args.numbersOnly)
+if not args.numbersOnly:
+    input('Press enter to exit')
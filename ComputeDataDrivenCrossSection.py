@@ -12,6 +12,7 @@ import numpy as np
 from ROOT import TFile, TCanvas, TLegend, TGraphErrors, gROOT  # pylint: disable=import-error,no-name-in-module
 from ROOT import AliHFSystErr  # pylint: disable=import-error,no-name-in-module
 from utils.AnalysisUtils import ComputeCrossSection, GetPromptFDFractionCutSet
+from utils.AnalysisUtils import GetHistoArrays, SetHistoFromArrays, SetGraphFromArrays
 from utils.StyleFormatter import SetGlobalStyle, SetObjectStyle, GetROOTColor
 
 parser = argparse.ArgumentParser(description='Arguments to pass')
@@ -129,60 +130,44 @@ hFDFrac = hEffAccFD.Clone('hFDFrac')
 hPromptFrac.SetTitle(';#it{p}_{T} (GeV/#it{c}); #it{f}_{prompt}')
 hFDFrac.SetTitle(';#it{p}_{T} (GeV/#it{c}); #it{f}_{FD}')
 
-for iPt in range(hCrossSection.GetNbinsX()):
-    ptMin = hRawYields.GetBinLowEdge(iPt+1)
-    ptMax = ptMin+hRawYields.GetBinWidth(iPt+1)
-    ptCent = hRawYields.GetBinCenter(iPt+1)
-    rawYield = hRawYields.GetBinContent(iPt+1)
-    rawYieldUnc = hRawYields.GetBinError(iPt+1)
-    effAccPrompt = hEffAccPrompt.GetBinContent(iPt+1)
-    effAccFD = hEffAccFD.GetBinContent(iPt+1)
-    effAccPromptUnc = hEffAccPrompt.GetBinError(iPt+1)
-    effAccFDUnc = hEffAccFD.GetBinError(iPt+1)
-
-    # ingredients for (prompt or FD) fraction computation
-    corrYieldPrompt = hCorrYieldPrompt.GetBinContent(iPt+1)
-    corrYieldFD = hCorrYieldFD.GetBinContent(iPt+1)
-    covPromptPrompt = hCovPromptPrompt.GetBinContent(iPt+1)
-    covPromptFD = hCovPromptFD.GetBinContent(iPt+1)
-    covFDFD = hCovFDFD.GetBinContent(iPt+1)
-
-    # prompt and FD and fractions
-    fracPromptFD, uncFracPromptFD = GetPromptFDFractionCutSet(effAccPrompt, effAccFD, corrYieldPrompt, corrYieldFD,
-                                                              covPromptPrompt, covFDFD, covPromptFD)
-
-    hPromptFrac.SetBinContent(iPt+1, fracPromptFD[0])
-    hPromptFrac.SetBinError(iPt+1, uncFracPromptFD[0])
-    hFDFrac.SetBinContent(iPt+1, fracPromptFD[1])
-    hFDFrac.SetBinError(iPt+1, uncFracPromptFD[1])
-
-    if args.prompt:
-        effAcc = effAccPrompt
-        uncEffAcc = effAccPromptUnc
-        frac = fracPromptFD[0]
-        uncFrac = uncFracPromptFD[0]
-    else:
-        effAcc = effAccFD
-        uncEffAcc = effAccFDUnc
-        frac = fracPromptFD[1]
-        uncFrac = uncFracPromptFD[1]
-
-    # TODO: check if uncorrelated is the right option or anti-correlated is better
-    crossSec, crossSecUnc = ComputeCrossSection(rawYield, rawYieldUnc, frac, uncFrac, effAcc,
-                                                ptMax - ptMin, 1., sigmaMB, nEv, 1.,
-                                                propOpt) # TODO:check this
-
-    hCrossSection.SetBinContent(iPt+1, crossSec)
-    hCrossSection.SetBinError(iPt+1, crossSecUnc)
-
-    # systematic uncertainties (statistical uncertainty on eff included)
-    for systSource in systGetter:
-        gCrossSectionSyst[systSource].SetPoint(iPt, ptCent, crossSec)
-        if 'SelEff' not in systSource:
-            relSyst = getattr(systErr, systGetter[systSource])(ptCent)
-        else:
-            relSyst = np.sqrt(getattr(systErr, systGetter[systSource])(ptCent)**2 + (uncEffAcc/effAcc)**2)
-        gCrossSectionSyst[systSource].SetPointError(iPt, 0.4, relSyst * crossSec)
+# all pT bins at once with numpy arrays
+rawYield, rawYieldUnc, ptLims = GetHistoArrays(hRawYields)
+effAccPrompt, effAccPromptUnc, _ = GetHistoArrays(hEffAccPrompt)
+effAccFD, effAccFDUnc, _ = GetHistoArrays(hEffAccFD)
+ptMins, ptMaxs = ptLims[:-1], ptLims[1:]
+ptCents = (ptMins + ptMaxs) / 2
+ptMax = ptMaxs[-1]
+
+# ingredients for (prompt or FD) fraction computation
+corrYieldPrompt, corrYieldFD = GetHistoArrays(hCorrYieldPrompt)[0], GetHistoArrays(hCorrYieldFD)[0]
+covPromptPrompt, covPromptFD = GetHistoArrays(hCovPromptPrompt)[0], GetHistoArrays(hCovPromptFD)[0]
+covFDFD = GetHistoArrays(hCovFDFD)[0]
+
+# prompt and FD and fractions
+fracPromptFD, uncFracPromptFD = GetPromptFDFractionCutSet(effAccPrompt, effAccFD, corrYieldPrompt, corrYieldFD,
+                                                          covPromptPrompt, covFDFD, covPromptFD)
+SetHistoFromArrays(hPromptFrac, fracPromptFD[0], uncFracPromptFD[0])
+SetHistoFromArrays(hFDFrac, fracPromptFD[1], uncFracPromptFD[1])
+
+if args.prompt:
+    effAcc, uncEffAcc = effAccPrompt, effAccPromptUnc
+    frac, uncFrac = fracPromptFD[0], uncFracPromptFD[0]
+else:
+    effAcc, uncEffAcc = effAccFD, effAccFDUnc
+    frac, uncFrac = fracPromptFD[1], uncFracPromptFD[1]
+
+# TODO: check if uncorrelated is the right option or anti-correlated is better
+crossSec, crossSecUnc = ComputeCrossSection(rawYield, rawYieldUnc, frac, uncFrac, effAcc,
+                                            ptMaxs - ptMins, 1., sigmaMB, nEv, 1.,
+                                            propOpt) # TODO:check this
+SetHistoFromArrays(hCrossSection, crossSec, crossSecUnc)
+
+# systematic uncertainties (statistical uncertainty on eff included)
+for systSource in systGetter:
+    relSyst = np.array([getattr(systErr, systGetter[systSource])(ptCent) for ptCent in ptCents])
+    if 'SelEff' in systSource:
+        relSyst = np.sqrt(relSyst**2 + (uncEffAcc/effAcc)**2)
+    SetGraphFromArrays(gCrossSectionSyst[systSource], ptCents, crossSec, 0.4, relSyst * crossSec)
 
 if args.system == 'pp':
     gCrossSectionSystLumi = TGraphErrors(0)
@@ -5,7 +5,7 @@ run: python ComputeDataDrivenFraction.py effAccFile.root fracFile.root outFile.r
 
 import argparse
 from ROOT import TFile, TCanvas, TLegend  # pylint: disable=import-error,no-name-in-module
-from utils.AnalysisUtils import GetPromptFDFractionCutSet
+from utils.AnalysisUtils import GetPromptFDFractionCutSet, GetHistoArrays, SetHistoFromArrays
 from utils.StyleFormatter import SetGlobalStyle
 
 parser = argparse.ArgumentParser(description='Arguments to pass')
@@ -38,37 +38,27 @@ hFDFracCorr = hEffAccFD.Clone('hFDFracCorr')
 hPromptFracCorr.SetTitle(';#it{p}_{T} (GeV/#it{c}); corrected #it{f}_{prompt}')
 hFDFracCorr.SetTitle(';#it{p}_{T} (GeV/#it{c}); corrected #it{f}_{FD}')
 
-for iPt in range(hEffAccPrompt.GetNbinsX()):
-    ptMin = hEffAccPrompt.GetBinLowEdge(iPt+1)
-    ptMax = ptMin+hEffAccPrompt.GetBinWidth(iPt+1)
-    ptCent = hEffAccPrompt.GetBinCenter(iPt+1)
-    effAccPrompt = hEffAccPrompt.GetBinContent(iPt+1)
-    effAccFD = hEffAccFD.GetBinContent(iPt+1)
-    effAccPromptUnc = hEffAccPrompt.GetBinError(iPt+1)
-    effAccFDUnc = hEffAccFD.GetBinError(iPt+1)
-
-    # ingredients for (prompt or FD) fraction computation
-    corrYieldPrompt = hCorrYieldPrompt.GetBinContent(iPt+1)
-    corrYieldFD = hCorrYieldFD.GetBinContent(iPt+1)
-    covPromptPrompt = hCovPromptPrompt.GetBinContent(iPt+1)
-    covPromptFD = hCovPromptFD.GetBinContent(iPt+1)
-    covFDFD = hCovFDFD.GetBinContent(iPt+1)
-
-    # prompt and FD and fractions
-    fracPromptFD, uncFracPromptFD = GetPromptFDFractionCutSet(effAccPrompt, effAccFD, corrYieldPrompt, corrYieldFD,
-                                                              covPromptPrompt, covFDFD, covPromptFD)
-
-    fracPromptFDcorr, uncFracPromptFDcorr = GetPromptFDFractionCutSet(1., 1., corrYieldPrompt, corrYieldFD,
-                                                                      covPromptPrompt, covFDFD, covPromptFD)
-
-    hPromptFrac.SetBinContent(iPt+1, fracPromptFD[0])
-    hPromptFrac.SetBinError(iPt+1, uncFracPromptFD[0])
-    hFDFrac.SetBinContent(iPt+1, fracPromptFD[1])
-    hFDFrac.SetBinError(iPt+1, uncFracPromptFD[1])
-    hPromptFracCorr.SetBinContent(iPt+1, fracPromptFDcorr[0])
-    hPromptFracCorr.SetBinError(iPt+1, uncFracPromptFDcorr[0])
-    hFDFracCorr.SetBinContent(iPt+1, fracPromptFDcorr[1])
-    hFDFracCorr.SetBinError(iPt+1, uncFracPromptFDcorr[1])
+# all pT bins at once with numpy arrays
+effAccPrompt, _, ptLims = GetHistoArrays(hEffAccPrompt)
+effAccFD = GetHistoArrays(hEffAccFD)[0]
+ptMax = ptLims[-1]
+
+# ingredients for (prompt or FD) fraction computation
+corrYieldPrompt, corrYieldFD = GetHistoArrays(hCorrYieldPrompt)[0], GetHistoArrays(hCorrYieldFD)[0]
+covPromptPrompt, covPromptFD = GetHistoArrays(hCovPromptPrompt)[0], GetHistoArrays(hCovPromptFD)[0]
+covFDFD = GetHistoArrays(hCovFDFD)[0]
+
+# prompt and FD and fractions
+fracPromptFD, uncFracPromptFD = GetPromptFDFractionCutSet(effAccPrompt, effAccFD, corrYieldPrompt, corrYieldFD,
+                                                          covPromptPrompt, covFDFD, covPromptFD)
+
+fracPromptFDcorr, uncFracPromptFDcorr = GetPromptFDFractionCutSet(1., 1., corrYieldPrompt, corrYieldFD,
+                                                                  covPromptPrompt, covFDFD, covPromptFD)
+
+SetHistoFromArrays(hPromptFrac, fracPromptFD[0], uncFracPromptFD[0])
+SetHistoFromArrays(hFDFrac, fracPromptFD[1], uncFracPromptFD[1])
+SetHistoFromArrays(hPromptFracCorr, fracPromptFDcorr[0], uncFracPromptFDcorr[0])
+SetHistoFromArrays(hFDFracCorr, fracPromptFDcorr[1], uncFracPromptFDcorr[1])
 
 SetGlobalStyle(padleftmargin=0.18, padbottommargin=0.14)
 
@@ -10,6 +10,7 @@ import numpy as np
 
 from ROOT import gROOT, TFile, TGraphErrors, TCanvas, TLine # pylint: disable=import-error,no-name-in-module
 from utils.StyleFormatter import SetGlobalStyle, SetObjectStyle, GetROOTColor
+from utils.AnalysisUtils import GetHistoArrays, GetGraphArrays, SetGraphFromArrays
 
 parser = argparse.ArgumentParser(description='Arguments to pass')
 parser.add_argument('corrYieldFileName', metavar='text', default='corrYieldFile.root',
@@ -85,18 +86,12 @@ gRaaSystNorm.SetPoint(0, 1., 1.)
 gRaaSystNorm.SetPointError(0, 0.4, np.sqrt((taaUnc / taa)**2 + gCrossSectionPPSystLumi.GetErrorY(0)**2))
 SetObjectStyle(gRaaSystNorm, color=GetROOTColor('kAzure+4'), fillstyle=0)
 
-for iPt in range(hRaa.GetNbinsX()):
-    ppValue = gCrossSectionPPSystTot.GetPointY(iPt)
-    ppSystUnc = gCrossSectionPPSystTot.GetErrorY(iPt)
-    pbpbValue = gCorrYieldPbPbSystTot.GetPointY(iPt)
-    pbpbSystUnc = gCorrYieldPbPbSystTot.GetErrorY(iPt)
-
-    raa = hRaa.GetBinContent(iPt+1)
-    relRaaSystUnc = np.sqrt((ppSystUnc / ppValue)**2 + (pbpbSystUnc / pbpbValue)**2)
-    ptCent = hRaa.GetBinCenter(iPt+1)
-
-    gRaaSystTot.SetPoint(iPt, ptCent, raa)
-    gRaaSystTot.SetPointError(iPt, 0.4, relRaaSystUnc * raa)
+# all pT bins at once with numpy arrays
+raa, _, ptLims = GetHistoArrays(hRaa)
+_, ppValue, _, ppSystUnc = GetGraphArrays(gCrossSectionPPSystTot)
+_, pbpbValue, _, pbpbSystUnc = GetGraphArrays(gCorrYieldPbPbSystTot)
+relRaaSystUnc = np.sqrt((ppSystUnc / ppValue)**2 + (pbpbSystUnc / pbpbValue)**2)
+SetGraphFromArrays(gRaaSystTot, (ptLims[:-1] + ptLims[1:]) / 2, raa, 0.4, relRaaSystUnc * raa)
 
 gROOT.SetBatch(args.batch)
 SetGlobalStyle(padleftmargin=0.18, padbottommargin=0.14)
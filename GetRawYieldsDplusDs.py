@@ -1,6 +1,7 @@
 '''
 Script for fitting D+ and Ds+ invariant-mass spectra
 run: python GetRawYieldsDsDplus.py fitConfigFileName.yml centClass inputFileName.root outFileName.root
+with --numbersOnly only the fits are performed, plots can be produced later with RenderRawYieldsFits.py
 '''
 
 import sys
@@ -8,10 +9,11 @@ import argparse
 import ctypes
 import numpy as np
 import yaml
-from ROOT import TFile, TCanvas, TH1D, TH1F, TF1, TDatabasePDG, TDirectoryFile, AliHFInvMassFitter, AliVertexingHFUtils # pylint: disable=import-error,no-name-in-module
+from ROOT import TFile, TCanvas, TH1D, TH1F, TF1, TNtuple, TDatabasePDG, TDirectoryFile, AliHFInvMassFitter, AliVertexingHFUtils # pylint: disable=import-error,no-name-in-module
 from ROOT import gROOT, gPad, kBlack, kRed, kFullCircle, kFullSquare # pylint: disable=import-error,no-name-in-module
 from utils.StyleFormatter import SetGlobalStyle, SetObjectStyle, DivideCanvas
-from utils.FitUtils import SingleGaus, DoubleGaus, DoublePeakSingleGaus, DoublePeakDoubleGaus
+from utils.FitUtils import SingleGaus, DoubleGaus, DoublePeakSingleGaus, DoublePeakDoubleGaus, GetNumParsAtLimit
+from utils.FitResultsDB import AppendFitResults, GetConfigHash
 
 parser = argparse.ArgumentParser(description='Arguments')
 parser.add_argument('fitConfigFileName', metavar='text', default='config_Ds_Fit.yml')
@@ -20,6 +22,17 @@ parser.add_argument('inFileName', metavar='text', default='')
 parser.add_argument('outFileName', metavar='text', default='')
 parser.add_argument('--isMC', action='store_true', default=False)
 parser.add_argument('--batch', help='suppress video output', action='store_true')
+parser.add_argument('--numbersOnly', action='store_true', default=False,
+                    help='perform only the fits and store the results without drawing them')
+parser.add_argument('--fitdb', metavar='text', default=None,
+                    help='SQLite file in which the fit results are appended (see utils/FitResultsDB.py)')
+parser.add_argument('--cutset', metavar='text', default=None,
+                    help='name of the cut set for the fit results database (default: output file name)')
+parser.add_argument('--ptbins', type=int, nargs='+', default=None,
+                    help='indices of the pT bins to be fitted (all if not set), only with --numbersOnly: '
+                         'the histograms of the other bins are left empty')
+parser.add_argument('--initSigma', type=float, default=0.008,
+                    help='initial value of the signal width if no SigmaFile is used')
 args = parser.parse_args()
 
 cent = ''
@@ -37,7 +50,11 @@ elif args.centClass == 'kpp13TeVPrompt':
     cent = 'pp13TeVPrompt'
 else:
     print(f"ERROR: cent class \'{args.centClass}\' is not supported! Exit")
-    sys.exit()
+    sys.exit(1)
+
+if args.ptbins is not None and not args.numbersOnly:
+    print('ERROR: --ptbins can be used only with --numbersOnly, the output would contain only some pT bins! Exit')
+    sys.exit(1)
 
 
 with open(args.fitConfigFileName, 'r') as ymlfitConfigFile:
@@ -75,16 +92,16 @@ for iPt, (bkg, sgn) in enumerate(zip(fitConfig[cent]['BkgFunc'], fitConfig[cent]
         degPol[-1] = 3
         if len(ptMins) > 1 and inclSecPeak[iPt] == 1:
             print('ERROR: Pol3 and Pol4 fits work only with one bin if you have the secondary peak! Exit!')
-            sys.exit()
+            sys.exit(1)
     elif bkg == 'kPol4':
         BkgFunc.append(6)
         degPol[-1] = 4
         if len(ptMins) > 1 and inclSecPeak[iPt] == 1:
             print('ERROR: Pol3 and Pol4 fits work only with one bin if you have the secondary peak! Exit!')
-            sys.exit()
+            sys.exit(1)
     else:
         print('ERROR: only kExpo, kLin, kPol2, kPol3, and kPol4 background functions supported! Exit')
-        sys.exit()
+        sys.exit(1)
 
     if sgn == 'kGaus':
         SgnFunc.append(AliHFInvMassFitter.kGaus)
@@ -94,7 +111,7 @@ for iPt, (bkg, sgn) in enumerate(zip(fitConfig[cent]['BkgFunc'], fitConfig[cent]
         SgnFunc.append(AliHFInvMassFitter.k2GausSigmaRatioPar)
     else:
         print('ERROR: only kGaus, k2Gaus and k2GausSigmaRatioPar signal functions supported! Exit!')
-        sys.exit()
+        sys.exit(1)
 
 if particleName == 'Dplus':
     massAxisTit = '#it{M}(K#pi#pi) (GeV/#it{c}^{2})'
@@ -104,13 +121,13 @@ elif particleName == 'Lc':
     massAxisTit = '#it{M}(pK^{0}_{s}) (GeV/#it{c}^{2})'
 else:
     print(f'ERROR: the particle "{particleName}" is not supported! Choose between Dplus, Ds and Lc. Exit!')
-    sys.exit()
+    sys.exit(1)
 
 # load inv-mass histos
 infile = TFile.Open(args.inFileName)
 if not infile or not infile.IsOpen():
     print(f'ERROR: file "{args.inFileName}" cannot be opened! Exit!')
-    sys.exit()
+    sys.exit(1)
 
 hMass, hMassForFit = [], []
 for iPt, (ptMin, ptMax, secPeak) in enumerate(zip(ptMins, ptMaxs, inclSecPeak)):
@@ -138,7 +155,7 @@ if sum(fixSigma) > 0:
     infileSigma = TFile.Open(fitConfig[cent]['SigmaFile'])
     if not infileSigma:
         print(f'ERROR: file "{infileSigma}" cannot be opened! Exit!')
-        sys.exit()
+        sys.exit(1)
     hSigmaToFix = infileSigma.Get('hRawYieldsSigma')
     hSigmaToFix.SetDirectory(0)
     if hSigmaToFix.GetNbinsX() != nPtBins:
@@ -150,7 +167,7 @@ if fitConfig[cent]['FixSigmaRatio']:
     infileSigma = TFile.Open(fitConfig[cent]['SigmaRatioFile'])
     if not infileSigma:
         print(f'ERROR: file "{infileSigma}" cannot be opened! Exit!')
-        sys.exit()
+        sys.exit(1)
     hSigmaToFix = infileSigma.Get('hRawYieldsSigma')
     hSigmaToFix.SetDirectory(0)
     if hSigmaToFix.GetNbinsX() != nPtBins:
@@ -160,7 +177,7 @@ if fitConfig[cent]['FixSigmaRatio']:
     infileSigma2 = TFile.Open(fitConfig[cent]['SigmaRatioFile'])
     if not infileSigma2:
         print(f'ERROR: file "{infileSigma2}" cannot be opened! Exit!')
-        sys.exit()
+        sys.exit(1)
     hSigmaToFix2 = infileSigma2.Get('hRawYieldsSigma2')
     hSigmaToFix2.SetDirectory(0)
     if hSigmaToFix2.GetNbinsX() != nPtBins:
@@ -172,7 +189,7 @@ if sum(fixMean) > 0:
     infileMean = TFile.Open(fitConfig[cent]['MeanFile'])
     if not infileMean:
         print(f'ERROR: file "{infileMean}" cannot be opened! Exit!')
-        sys.exit()
+        sys.exit(1)
     hMeanToFix = infileMean.Get('hRawYieldsMean')
     hMeanToFix.SetDirectory(0)
     if hMeanToFix.GetNbinsX() != nPtBins:
@@ -186,7 +203,7 @@ if fitConfig[cent]['SigmaFileSecPeak']:
     infileSigmaSecPeak = TFile.Open(fitConfig[cent]['SigmaFileSecPeak'])
 if fitConfig[cent]['FixSigmaToFirstPeak'] and not infileSigmaSecPeak:
     print(f'ERROR: file "{fitConfig[cent]["SigmaFileSecPeak"]}" cannot be opened! Exit!')
-    sys.exit()
+    sys.exit(1)
 if infileSigmaSecPeak:
     hSigmaFirstPeakMC = infileSigmaSecPeak.Get("hRawYieldsSigma")
     hSigmaToFixSecPeak = infileSigmaSecPeak.Get("hRawYieldsSigmaSecondPeak")
@@ -294,14 +311,19 @@ if nPtBins == 1:
 nMaxCanvases = 20 # do not put more than 20 bins per canvas to make them visible
 nCanvases = int(np.ceil(nPtBins / nMaxCanvases))
 cMass, cResiduals = [], []
-for iCanv in range(nCanvases):
+for iCanv in range(nCanvases if not args.numbersOnly else 0):
     nPads = nPtBins if nCanvases == 1 else nMaxCanvases
     cMass.append(TCanvas(f'cMass{iCanv}', f'cMass{iCanv}', canvSizes[0], canvSizes[1]))
     DivideCanvas(cMass[iCanv], nPads)
     cResiduals.append(TCanvas(f'cResiduals{iCanv}', f'cResiduals{iCanv}', canvSizes[0], canvSizes[1]))
     DivideCanvas(cResiduals[iCanv], nPads)
 
-massFitter = []
+# compact table with fit results, stored in case of numbers-only mode and/or in the fit results database
+fitResultsVars = ['PtMin', 'PtMax', 'MassMin', 'MassMax', 'RawYield', 'RawYieldUnc', 'Sigma', 'SigmaUnc', 'Mean',
+                  'MeanUnc', 'RedChiSquare', 'Signif', 'SignifUnc', 'Signal', 'SignalUnc', 'Bkg', 'BkgUnc',
+                  'FitStatus', 'NumParsAtLimit', 'PtBin']
+fitResults = []
+massFitter, massFuncMC = [], []
 for iPt, (hM, ptMin, ptMax, reb, sgn, bkg, secPeak, massMin, massMax) in enumerate(
         zip(hMass, ptMins, ptMaxs, fitConfig[cent]['Rebin'], SgnFunc, BkgFunc, inclSecPeak, fitConfig[cent]['MassMin'],
             fitConfig[cent]['MassMax'])):
@@ -319,6 +341,13 @@ for iPt, (hM, ptMin, ptMax, reb, sgn, bkg, secPeak, massMin, massMax) in enumera
         markerSize = 0.5
     SetObjectStyle(hMassForFit[iPt], color=kBlack, markerstyle=kFullCircle, markersize=markerSize)
 
+    if args.ptbins is not None and iPt not in args.ptbins:
+        if not args.isMC:
+            massFitter.append(None)
+        elif args.numbersOnly:
+            massFuncMC.append(None)
+        continue
+
     # MC
     if args.isMC:
         parRawYield, parMean, parSigma1 = 0, 1, 2 # always the same
@@ -351,13 +380,17 @@ for iPt, (hM, ptMin, ptMax, reb, sgn, bkg, secPeak, massMin, massMax) in enumera
                 parSigmaSecPeak = 7
         else:
             print("ERROR: Only kGaus and k2Gaus are supported for MC. Exit!") #TODO: add support for k2GausSigmaRatioPar
-            sys.exit()
+            sys.exit(1)
 
-        if nPtBins > 1:
-            cMass[iCanv].cd(iPt-nMaxCanvases*iCanv+1)
+        if args.numbersOnly:
+            fitStatus = 1 if int(hMassForFit[iPt].Fit(massFunc, 'E0')) == 0 else 0  # fit with chi2, not drawn
+            massFuncMC.append(massFunc)
         else:
-            cMass[iCanv].cd()
-        hMassForFit[iPt].Fit(massFunc, 'E')  # fit with chi2
+            if nPtBins > 1:
+                cMass[iCanv].cd(iPt-nMaxCanvases*iCanv+1)
+            else:
+                cMass[iCanv].cd()
+            fitStatus = 1 if int(hMassForFit[iPt].Fit(massFunc, 'E')) == 0 else 0  # fit with chi2
 
         rawyield = massFunc.GetParameter(parRawYield)
         rawyielderr = massFunc.GetParError(parRawYield)
@@ -375,6 +408,9 @@ for iPt, (hM, ptMin, ptMax, reb, sgn, bkg, secPeak, massMin, massMax) in enumera
         hRawYieldsMean.SetBinError(iPt+1, meanerr)
         hRawYieldsChiSquare.SetBinContent(iPt+1, redchi2)
         hRawYieldsChiSquare.SetBinError(iPt+1, 0.)
+        fitResults.append(dict(zip(fitResultsVars, [ptMin, ptMax, massMin, massMax, rawyield, rawyielderr, sigma,
+                                                    sigmaerr, mean, meanerr, redchi2] + [0. for _ in range(6)] +
+                                   [fitStatus, GetNumParsAtLimit(massFunc), iPt])))
 
         hRawYieldsTrue.SetBinContent(iPt+1, hMassForFit[iPt].Integral())
         hRawYieldsTrue.SetBinError(iPt+1, np.sqrt(hMassForFit[iPt].Integral()))
@@ -446,7 +482,7 @@ for iPt, (hM, ptMin, ptMax, reb, sgn, bkg, secPeak, massMin, massMax) in enumera
                 massFitter[iPt].SetInitialGaussianSigma(
                     hSigmaToFix.GetBinContent(iPt+1)*fitConfig[cent]['SigmaMultFactor'])
             else:
-                massFitter[iPt].SetInitialGaussianSigma(0.008)
+                massFitter[iPt].SetInitialGaussianSigma(args.initSigma)
 
         if secPeak and particleName == 'Ds':
             if hSigmaToFixSecPeak:
@@ -460,7 +496,7 @@ for iPt, (hM, ptMin, ptMax, reb, sgn, bkg, secPeak, massMin, massMax) in enumera
                     massFitter[iPt].IncludeSecondGausPeak(massDplus, False, sigmaRatioMC * sigmaFirstPeak, True)
             else:
                 massFitter[iPt].IncludeSecondGausPeak(massDplus, False, fitConfig[cent]['SigmaSecPeak'][iPt], True)
-        massFitter[iPt].MassFitter(False)
+        fitStatus = massFitter[iPt].MassFitter(False)
 
         rawyield = massFitter[iPt].GetRawYield()
         rawyielderr = massFitter[iPt].GetRawYieldError()
@@ -493,6 +529,10 @@ for iPt, (hM, ptMin, ptMax, reb, sgn, bkg, secPeak, massMin, massMax) in enumera
         hRawYieldsBkg.SetBinError(iPt+1, bkgerr.value)
         hRawYieldsChiSquare.SetBinContent(iPt+1, redchi2)
         hRawYieldsChiSquare.SetBinError(iPt+1, 1.e-20)
+        fitResults.append(dict(zip(fitResultsVars, [ptMin, ptMax, massMin, massMax, rawyield, rawyielderr, sigma,
+                                                    sigmaerr, mean, meanerr, redchi2, signif.value, signiferr.value,
+                                                    sgn.value, sgnerr.value, bkg.value, bkgerr.value, fitStatus,
+                                                    GetNumParsAtLimit(massFitter[iPt].GetMassFunc()), iPt])))
 
         fTotFunc = massFitter[iPt].GetMassFunc()
         fBkgFunc = massFitter[iPt].GetBackgroundRecalcFunc()
@@ -555,6 +595,9 @@ for iPt, (hM, ptMin, ptMax, reb, sgn, bkg, secPeak, massMin, massMax) in enumera
             hRawYieldsBkgSecPeak.SetBinContent(iPt+1, bkgSecPeak)
             hRawYieldsBkgSecPeak.SetBinError(iPt+1, bkgSecPeakerr)
 
+        if args.numbersOnly:
+            continue
+
         if nPtBins > 1:
             cMass[iCanv].cd(iPt-nMaxCanvases*iCanv+1)
         else:
@@ -573,6 +616,8 @@ for iPt, (hM, ptMin, ptMax, reb, sgn, bkg, secPeak, massMin, massMax) in enumera
             cResiduals[iCanv].cd()
         massFitter[iPt].DrawHistoMinusFit(gPad)
 
+    if args.numbersOnly:
+        continue
     cMass[iCanv].Modified()
     cMass[iCanv].Update()
     cResiduals[iCanv].Modified()
@@ -587,7 +632,22 @@ if not args.isMC:
         canv.Write()
 for hist in hMass:
     hist.Write()
+if args.numbersOnly:
+    # rebinned histograms, fit functions and table of results needed to draw the fits afterwards
+    for hist, ptLow, ptHigh in zip(hMassForFit, ptMins, ptMaxs):
+        hist.Write(f'hMassForFit_{ptLow*10:.0f}_{ptHigh*10:.0f}')
+    for func, ptLow, ptHigh in zip(massFuncMC, ptMins, ptMaxs):
+        if not func:
+            continue
+        func.SetName(f'fTot_{ptLow}_{ptHigh}')
+        func.Write()
+    tFitResults = TNtuple('tFitResults', 'tFitResults', ':'.join(fitResultsVars))
+    for result in fitResults:
+        tFitResults.Fill(np.array([result[var] for var in fitResultsVars], 'f'))
+    tFitResults.Write()
 for fitter, ptLow, ptHigh in zip(massFitter, ptMins, ptMaxs):
+    if not fitter:
+        continue
     fitter.GetMassFunc().SetName(f'fTot_{ptLow}_{ptHigh}')
     fitter.GetSignalFunc().SetName(f'fSgn_{ptLow}_{ptHigh}')
     fitter.GetBackgroundRecalcFunc().SetName(f'fBkg_{ptLow}_{ptHigh}')
@@ -629,6 +689,11 @@ if not args.isMC:
     dirSB.Close()
 outFile.Close()
 
+if args.fitdb:
+    cutSetName = args.cutset if args.cutset else args.outFileName.split('/')[-1].replace('.root', '')
+    AppendFitResults(args.fitdb, fitResults, GetConfigHash([fitConfig[cent], args.inFileName]), cutSetName,
+                     args.fitConfigFileName, cent, args.isMC, hEv.GetBinContent(1), args.outFileName)
+
 outFileNamePDF = args.outFileName.replace('.root', '.pdf')
 outFileNameResPDF = outFileNamePDF.replace('.pdf', '_Residuals.pdf')
 for iCanv, (cM, cR) in enumerate(zip(cMass, cResiduals)):
@@ -0,0 +1,311 @@
+'''
+Script for the simultaneous fit of the invariant-mass spectra of all the cut sets used in the cut-variation method
+run: python GetRawYieldsSimFitCutVar.py fitConfigFileName.yml centClass cutVarConfigFileName.yml [--batch]
+
+In each pT bin the signal mean and width are shared among the cut sets, while signal yields and backgrounds
+are fitted jointly in one minimisation. The raw yields of each cut set are saved in the files defined in the
+rawyields section of the cut-variation config and their covariance in the file defined in rawyields/covariance
+'''
+
+import sys
+import os
+import argparse
+import ctypes
+import numpy as np
+import yaml
+from ROOT import TFile, TCanvas, TH1D, TH2D, TDatabasePDG, AliVertexingHFUtils # pylint: disable=import-error,no-name-in-module
+from ROOT import gROOT, kBlack, kRed, kBlue, kFullCircle # pylint: disable=import-error,no-name-in-module
+from utils.StyleFormatter import SetGlobalStyle, SetObjectStyle, DivideCanvas
+from utils.SimFitUtils import SimultaneousMassFit, GetSimFitModel
+from utils.FitResultsDB import AppendFitResults, GetConfigHash
+
+parser = argparse.ArgumentParser(description='Arguments')
+parser.add_argument('fitConfigFileName', metavar='text', default='config_Ds_Fit.yml')
+parser.add_argument('centClass', metavar='text', default='')
+parser.add_argument('cutVarConfigFileName', metavar='text', default='config_PromptFrac.yml')
+parser.add_argument('--batch', help='suppress video output', action='store_true')
+parser.add_argument('--fitdb', metavar='text', default=None,
+                    help='SQLite file in which the fit results are appended (see utils/FitResultsDB.py)')
+args = parser.parse_args()
+
+cent = ''
+if args.centClass == 'k010':
+    cent = 'Cent010'
+elif args.centClass == 'k3050':
+    cent = 'Cent3050'
+elif args.centClass == 'k6080':
+    cent = 'Cent6080'
+elif args.centClass == 'kpp5TeVPrompt':
+    cent = 'pp5TeVPrompt'
+elif args.centClass == 'kpp13TeVFD':
+    cent = 'pp13TeVFD'
+elif args.centClass == 'kpp13TeVPrompt':
+    cent = 'pp13TeVPrompt'
+else:
+    print(f"ERROR: cent class \'{args.centClass}\' is not supported! Exit")
+    sys.exit()
+
+with open(args.fitConfigFileName, 'r') as ymlfitConfigFile:
+    fitConfig = yaml.load(ymlfitConfigFile, yaml.FullLoader)[cent]
+
+with open(args.cutVarConfigFileName, 'r') as ymlCutVarConfigFile:
+    cutVarConfig = yaml.load(ymlCutVarConfigFile, yaml.FullLoader)
+
+gROOT.SetBatch(args.batch)
+SetGlobalStyle(padleftmargin=0.14, padbottommargin=0.12, padtopmargin=0.12, opttitle=1)
+
+simFitConfig = cutVarConfig['rawyields']['simfit']
+inFileNames = [os.path.join(simFitConfig['inputdir'], inFileName) for inFileName in simFitConfig['inputfiles']]
+outFileNames = [os.path.join(cutVarConfig['rawyields']['inputdir'], outFileName)
+                for outFileName in cutVarConfig['rawyields']['inputfiles']]
+outFileNameCov = os.path.join(cutVarConfig['rawyields']['inputdir'],
+                              cutVarConfig['rawyields']['covariance']['inputfile'])
+histoNameCov = cutVarConfig['rawyields']['covariance']['histoname']
+nSets = len(inFileNames)
+if nSets != len(outFileNames):
+    print('ERROR: number of distribution files and raw-yield files not consistent! Exit')
+    sys.exit()
+sigmaScaleFactors = simFitConfig['sigmascalefactors']
+if sigmaScaleFactors is not None and len(sigmaScaleFactors) != nSets:
+    print('ERROR: number of sigma scale factors and cut sets not consistent! Exit')
+    sys.exit()
+
+ptMins = fitConfig['PtMin']
+ptMaxs = fitConfig['PtMax']
+fixSigma = fitConfig['FixSigma']
+fixMean = fitConfig['FixMean']
+if not isinstance(fixSigma, list):
+    fixSigma = [fixSigma for _ in ptMins]
+if not isinstance(fixMean, list):
+    fixMean = [fixMean for _ in ptMins]
+ptLims = list(ptMins)
+nPtBins = len(ptMins)
+ptLims.append(ptMaxs[-1])
+particleName = fitConfig['Particle']
+inclSecPeak = fitConfig['InclSecPeak']
+
+bkgFuncNames = {'kExpo': 'expo', 'kLin': 'pol1', 'kPol2': 'pol2', 'kPol3': 'pol3'}
+BkgFunc = []
+for bkg, sgn in zip(fitConfig['BkgFunc'], fitConfig['SgnFunc']):
+    if bkg not in bkgFuncNames:
+        print('ERROR: only kExpo, kLin, kPol2, and kPol3 background functions supported in simultaneous fit! Exit')
+        sys.exit()
+    BkgFunc.append(bkgFuncNames[bkg])
+    if sgn != 'kGaus':
+        print('ERROR: only kGaus signal function supported in simultaneous fit! Exit')
+        sys.exit()
+
+if particleName == 'Dplus':
+    massAxisTit = '#it{M}(K#pi#pi) (GeV/#it{c}^{2})'
+    massForFit = TDatabasePDG.Instance().GetParticle(411).Mass()
+elif particleName == 'Ds':
+    massAxisTit = '#it{M}(KK#pi) (GeV/#it{c}^{2})'
+    massForFit = TDatabasePDG.Instance().GetParticle(431).Mass()
+elif particleName == 'Lc':
+    massAxisTit = '#it{M}(pK^{0}_{s}) (GeV/#it{c}^{2})'
+    massForFit = TDatabasePDG.Instance().GetParticle(4122).Mass()
+else:
+    print(f'ERROR: the particle "{particleName}" is not supported! Choose between Dplus, Ds and Lc. Exit!')
+    sys.exit()
+massDplus = TDatabasePDG.Instance().GetParticle(411).Mass()
+
+# load inv-mass histos of all cut sets
+hMass, hEv = [], []
+for inFileName in inFileNames:
+    inFile = TFile.Open(inFileName)
+    if not inFile or not inFile.IsOpen():
+        print(f'ERROR: file "{inFileName}" cannot be opened! Exit!')
+        sys.exit()
+    hMass.append([])
+    for ptMin, ptMax in zip(ptMins, ptMaxs):
+        hMass[-1].append(inFile.Get(f'hMass_{ptMin*10:.0f}_{ptMax*10:.0f}'))
+        hMass[-1][-1].SetDirectory(0)
+        hMass[-1][-1].Sumw2()
+    hEv.append(inFile.Get('hEvForNorm'))
+    hEv[-1].SetDirectory(0)
+    inFile.Close()
+
+hSigmaToFix = None
+if sum(fixSigma) > 0:
+    infileSigma = TFile.Open(fitConfig['SigmaFile'])
+    if not infileSigma:
+        print(f'ERROR: file "{fitConfig["SigmaFile"]}" cannot be opened! Exit!')
+        sys.exit()
+    hSigmaToFix = infileSigma.Get('hRawYieldsSigma')
+    hSigmaToFix.SetDirectory(0)
+    infileSigma.Close()
+
+hMeanToFix = None
+if sum(fixMean) > 0:
+    infileMean = TFile.Open(fitConfig['MeanFile'])
+    if not infileMean:
+        print(f'ERROR: file "{fitConfig["MeanFile"]}" cannot be opened! Exit!')
+        sys.exit()
+    hMeanToFix = infileMean.Get('hRawYieldsMean')
+    hMeanToFix.SetDirectory(0)
+    infileMean.Close()
+
+ptBinsArr = np.asarray(ptLims, 'd')
+ptTit = '#it{p}_{T} (GeV/#it{c})'
+hRawYields, hRawYieldsSigma, hRawYieldsMean, hRawYieldsSignificance, hRawYieldsSoverB, \
+    hRawYieldsSignal, hRawYieldsBkg, hRawYieldsChiSquare = ([] for _ in range(8))
+for iSet in range(nSets):
+    hRawYields.append(TH1D(f'hRawYields_{iSet}', f';{ptTit};raw yield', nPtBins, ptBinsArr))
+    hRawYieldsSigma.append(TH1D(f'hRawYieldsSigma_{iSet}', f';{ptTit};width (GeV/#it{{c}}^{{2}})',
+                                nPtBins, ptBinsArr))
+    hRawYieldsMean.append(TH1D(f'hRawYieldsMean_{iSet}', f';{ptTit};mean (GeV/#it{{c}}^{{2}})', nPtBins, ptBinsArr))
+    hRawYieldsSignificance.append(TH1D(f'hRawYieldsSignificance_{iSet}', f';{ptTit};significance (3#sigma)',
+                                       nPtBins, ptBinsArr))
+    hRawYieldsSoverB.append(TH1D(f'hRawYieldsSoverB_{iSet}', f';{ptTit};S/B (3#sigma)', nPtBins, ptBinsArr))
+    hRawYieldsSignal.append(TH1D(f'hRawYieldsSignal_{iSet}', f';{ptTit};Signal (3#sigma)', nPtBins, ptBinsArr))
+    hRawYieldsBkg.append(TH1D(f'hRawYieldsBkg_{iSet}', f';{ptTit};Background (3#sigma)', nPtBins, ptBinsArr))
+    hRawYieldsChiSquare.append(TH1D(f'hRawYieldsChiSquare_{iSet}', f';{ptTit};#chi^{{2}}/#it{{ndf}}',
+                                    nPtBins, ptBinsArr))
+    for hist in [hRawYields[iSet], hRawYieldsSigma[iSet], hRawYieldsMean[iSet], hRawYieldsSignificance[iSet],
+                 hRawYieldsSoverB[iSet], hRawYieldsSignal[iSet], hRawYieldsBkg[iSet], hRawYieldsChiSquare[iSet]]:
+        SetObjectStyle(hist, color=kBlack, markerstyle=kFullCircle)
+
+hRawYieldsCov, hRawYieldsCorr, cMass, hModel, hModelBkg, hMassForFit = ([] for _ in range(6))
+fitResults = [[] for _ in range(nSets)]
+for iPt, (ptMin, ptMax, reb, bkgFunc, secPeak, massMin, massMax) in enumerate(
+        zip(ptMins, ptMaxs, fitConfig['Rebin'], BkgFunc, inclSecPeak, fitConfig['MassMin'], fitConfig['MassMax'])):
+    print(f'Simultaneous fit of {nSets} cut sets for {ptMin} < pT < {ptMax} GeV/c')
+    hMassForFit.append([])
+    for iSet in range(nSets):
+        hMassForFit[iPt].append(AliVertexingHFUtils.RebinHisto(hMass[iSet][iPt], reb))
+        hMassForFit[iPt][iSet].SetDirectory(0)
+        hMassForFit[iPt][iSet].SetName(f'MassForFit{iPt}_{iSet}')
+    nMassBins = hMassForFit[iPt][0].GetNbinsX()
+    massBinEdges = np.array([hMassForFit[iPt][0].GetBinLowEdge(iBin) for iBin in range(1, nMassBins+2)])
+    massCounts = np.array([[hM.GetBinContent(iBin) for iBin in range(1, nMassBins+1)] for hM in hMassForFit[iPt]])
+    binWidth = hMassForFit[iPt][0].GetBinWidth(1)
+
+    sigmaInit = 0.008
+    if hSigmaToFix:
+        if isinstance(fitConfig['SigmaMultFactor'], (float, int)):
+            sigmaInit = hSigmaToFix.GetBinContent(iPt+1) * fitConfig['SigmaMultFactor']
+        elif fitConfig['SigmaMultFactor'] == 'MinusUnc':
+            sigmaInit = hSigmaToFix.GetBinContent(iPt+1) - hSigmaToFix.GetBinError(iPt+1)
+        elif fitConfig['SigmaMultFactor'] == 'PlusUnc':
+            sigmaInit = hSigmaToFix.GetBinContent(iPt+1) + hSigmaToFix.GetBinError(iPt+1)
+        else:
+            print('WARNING: impossible to fix sigma! Wrong mult factor set in config file!')
+    meanInit = hMeanToFix.GetBinContent(iPt+1) if fixMean[iPt] else massForFit
+    secPeakMean, secPeakSigma = None, None
+    if secPeak and particleName == 'Ds':
+        secPeakMean, secPeakSigma = massDplus, fitConfig['SigmaSecPeak'][iPt]
+
+    fitRes = SimultaneousMassFit(massCounts, massBinEdges, massMin, massMax, bkgFunc, meanInit, sigmaInit,
+                                 sigmaScaleFactors, bool(fixMean[iPt]), bool(fixSigma[iPt]), secPeakMean,
+                                 secPeakSigma, bool(fitConfig['UseLikelihood']))
+    if not fitRes['converged']:
+        print(f'WARNING: simultaneous fit for {ptMin} < pT < {ptMax} GeV/c did not converge!')
+
+    for iSet in range(nSets):
+        signif, signifErr = ctypes.c_double(), ctypes.c_double()
+        AliVertexingHFUtils.ComputeSignificance(fitRes['signal'][iSet], fitRes['signalUnc'][iSet],
+                                                fitRes['bkg'][iSet], fitRes['bkgUnc'][iSet], signif, signifErr)
+        sOverB = fitRes['signal'][iSet] / fitRes['bkg'][iSet]
+        hRawYields[iSet].SetBinContent(iPt+1, fitRes['rawYields'][iSet])
+        hRawYields[iSet].SetBinError(iPt+1, fitRes['rawYieldsUnc'][iSet])
+        hRawYieldsSigma[iSet].SetBinContent(iPt+1, fitRes['sigmas'][iSet])
+        hRawYieldsSigma[iSet].SetBinError(iPt+1, fitRes['sigmaUnc'] * fitRes['sigmas'][iSet] / fitRes['sigma'])
+        hRawYieldsMean[iSet].SetBinContent(iPt+1, fitRes['mean'])
+        hRawYieldsMean[iSet].SetBinError(iPt+1, fitRes['meanUnc'])
+        hRawYieldsSignificance[iSet].SetBinContent(iPt+1, signif.value)
+        hRawYieldsSignificance[iSet].SetBinError(iPt+1, signifErr.value)
+        hRawYieldsSoverB[iSet].SetBinContent(iPt+1, sOverB)
+        hRawYieldsSoverB[iSet].SetBinError(iPt+1, sOverB * np.sqrt(
+            fitRes['signalUnc'][iSet]**2 / fitRes['signal'][iSet]**2 +
+            fitRes['bkgUnc'][iSet]**2 / fitRes['bkg'][iSet]**2))
+        hRawYieldsSignal[iSet].SetBinContent(iPt+1, fitRes['signal'][iSet])
+        hRawYieldsSignal[iSet].SetBinError(iPt+1, fitRes['signalUnc'][iSet])
+        hRawYieldsBkg[iSet].SetBinContent(iPt+1, fitRes['bkg'][iSet])
+        hRawYieldsBkg[iSet].SetBinError(iPt+1, fitRes['bkgUnc'][iSet])
+        hRawYieldsChiSquare[iSet].SetBinContent(iPt+1, fitRes['redChiSquare'])
+        hRawYieldsChiSquare[iSet].SetBinError(iPt+1, 1.e-20)
+        fitResults[iSet].append({'PtMin': ptMin, 'PtMax': ptMax, 'RawYield': fitRes['rawYields'][iSet],
+                                 'RawYieldUnc': fitRes['rawYieldsUnc'][iSet], 'Sigma': fitRes['sigmas'][iSet],
+                                 'SigmaUnc': hRawYieldsSigma[iSet].GetBinError(iPt+1), 'Mean': fitRes['mean'],
+                                 'MeanUnc': fitRes['meanUnc'], 'RedChiSquare': fitRes['redChiSquare'],
+                                 'Signal': fitRes['signal'][iSet], 'SignalUnc': fitRes['signalUnc'][iSet],
+                                 'Bkg': fitRes['bkg'][iSet], 'BkgUnc': fitRes['bkgUnc'][iSet],
+                                 'Signif': signif.value, 'SignifUnc': signifErr.value})
+
+    ptString = f'pT{ptMin*10:.0f}_{ptMax*10:.0f}'
+    hRawYieldsCov.append(TH2D(f'{histoNameCov}_{ptString}', f'{ptMin} < #it{{p}}_{{T}} < {ptMax} GeV/#it{{c}};'
+                              'cut set;cut set', nSets, 0.5, nSets + 0.5, nSets, 0.5, nSets + 0.5))
+    hRawYieldsCorr.append(TH2D(f'{histoNameCov.replace("Cov", "Corr")}_{ptString}',
+                               f'{ptMin} < #it{{p}}_{{T}} < {ptMax} GeV/#it{{c}};cut set;cut set',
+                               nSets, 0.5, nSets + 0.5, nSets, 0.5, nSets + 0.5))
+    for iRow in range(nSets):
+        for iCol in range(nSets):
+            hRawYieldsCov[iPt].SetBinContent(iRow+1, iCol+1, fitRes['rawYieldsCov'][iRow, iCol])
+            hRawYieldsCorr[iPt].SetBinContent(iRow+1, iCol+1, fitRes['rawYieldsCov'][iRow, iCol] / \
+                np.sqrt(fitRes['rawYieldsCov'][iRow, iRow] * fitRes['rawYieldsCov'][iCol, iCol]))
+
+    # plot of the fitted distributions
+    cMass.append(TCanvas(f'cMass_{ptString}', '', 1920, 1080))
+    DivideCanvas(cMass[iPt], nSets)
+    hModel.append([])
+    hModelBkg.append([])
+    modelEdges = np.linspace(fitRes['minMass'], fitRes['maxMass'], 501)
+    for iSet in range(nSets):
+        hModel[iPt].append(TH1D(f'hModel_{ptString}_{iSet}', '', 500, modelEdges))
+        hModelBkg[iPt].append(TH1D(f'hModelBkg_{ptString}_{iSet}', '', 500, modelEdges))
+        modelScale = binWidth / (modelEdges[1] - modelEdges[0])
+        for iBin, (valTot, valBkg) in enumerate(zip(GetSimFitModel(fitRes, modelEdges, iSet),
+                                                    GetSimFitModel(fitRes, modelEdges, iSet, 'bkg'))):
+            hModel[iPt][iSet].SetBinContent(iBin+1, valTot * modelScale)
+            hModelBkg[iPt][iSet].SetBinContent(iBin+1, valBkg * modelScale)
+        SetObjectStyle(hModel[iPt][iSet], linecolor=kBlue, linewidth=2)
+        SetObjectStyle(hModelBkg[iPt][iSet], linecolor=kRed, linewidth=2, linestyle=2)
+        SetObjectStyle(hMassForFit[iPt][iSet], color=kBlack, markerstyle=kFullCircle, markersize=0.5)
+        hMassForFit[iPt][iSet].SetTitle(f'{ptMin} < #it{{p}}_{{T}} < {ptMax} GeV/#it{{c}}, cut set {iSet+1};'
+                                        f'{massAxisTit};Counts per {binWidth*1000:.0f} MeV/#it{{c}}^{{2}}')
+        hMassForFit[iPt][iSet].GetXaxis().SetRangeUser(fitRes['minMass'], fitRes['maxMass'])
+        cMass[iPt].cd(iSet+1 if nSets > 1 else 0)
+        hMassForFit[iPt][iSet].Draw('e')
+        hModelBkg[iPt][iSet].Draw('hist c same')
+        hModel[iPt][iSet].Draw('hist c same')
+    cMass[iPt].Modified()
+    cMass[iPt].Update()
+
+#save output histos
+for iSet, outFileName in enumerate(outFileNames):
+    outFile = TFile(outFileName, 'recreate')
+    for hist in hMass[iSet]:
+        hist.Write()
+    for hist, name in zip([hRawYields[iSet], hRawYieldsSigma[iSet], hRawYieldsMean[iSet], hRawYieldsSignificance[iSet],
+                           hRawYieldsSoverB[iSet], hRawYieldsSignal[iSet], hRawYieldsBkg[iSet],
+                           hRawYieldsChiSquare[iSet]],
+                          ['hRawYields', 'hRawYieldsSigma', 'hRawYieldsMean', 'hRawYieldsSignificance',
+                           'hRawYieldsSoverB', 'hRawYieldsSignal', 'hRawYieldsBkg', 'hRawYieldsChiSquare']):
+        hist.Write(name)
+    hEv[iSet].Write()
+    outFile.Close()
+    print(f'Saved raw yields in {outFileName}')
+    if args.fitdb:
+        AppendFitResults(args.fitdb, fitResults[iSet], GetConfigHash([fitConfig, simFitConfig, 'simfit']),
+                         os.path.basename(outFileName).replace('.root', ''), args.fitConfigFileName, cent, False,
+                         hEv[iSet].GetBinContent(1), outFileName)
+
+outFile = TFile(outFileNameCov, 'recreate')
+for canv in cMass:
+    canv.Write()
+for hCov, hCorr in zip(hRawYieldsCov, hRawYieldsCorr):
+    hCov.Write()
+    hCorr.Write()
+outFile.Close()
+print(f'Saved raw-yield covariance matrices in {outFileNameCov}')
+
+outFileNamePDF = outFileNameCov.replace('.root', '.pdf')
+for iPt, canv in enumerate(cMass):
+    if iPt == 0 and nPtBins > 1:
+        canv.SaveAs(f'{outFileNamePDF}[')
+    canv.SaveAs(outFileNamePDF)
+    if iPt == nPtBins-1 and nPtBins > 1:
+        canv.SaveAs(f'{outFileNamePDF}]')
+
+if not args.batch:
+    input('Press enter to exit')
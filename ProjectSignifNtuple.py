@@ -9,6 +9,7 @@ import numpy as np
 from ROOT import TFile, TH1F, TCanvas, kGreen, kOpenCrossX # pylint: disable=import-error,no-name-in-module
 from utils.StyleFormatter import SetObjectStyle
 from utils.DfUtils import LoadDfFromRootOrParquet
+from utils.ScanUtils import ReadScanParquet, GetScanTopK, GetScanTopKFromDf
 
 parser = argparse.ArgumentParser(description='Arguments to pass')
 parser.add_argument('cfgFileName', metavar='text', default='cfgFileName.yml',
@@ -23,9 +24,14 @@ args = parser.parse_args()
 with open(args.cfgFileName, 'r') as ymlCfgFile:
     inputCfg = yaml.load(ymlCfgFile, yaml.FullLoader)
 inFileNames = inputCfg['infiles']['name']
-dfSignif = LoadDfFromRootOrParquet(inputCfg['infiles']['name'], inputCfg['infiles']['dirname'],
-                                   inputCfg['infiles']['treename'])
-dfSignif['Pt'] = dfSignif.apply(lambda row: (row.PtMin + row.PtMax) / 2, axis=1)
+if not isinstance(inFileNames, list):
+    inFileNames = [inFileNames]
+# parquet outputs of the scans are read only partially, for each pT bin
+isParquet = all('.parquet' in inFileName for inFileName in inFileNames)
+if not isParquet:
+    dfSignif = LoadDfFromRootOrParquet(inputCfg['infiles']['name'], inputCfg['infiles']['dirname'],
+                                       inputCfg['infiles']['treename'])
+    dfSignif['Pt'] = (dfSignif['PtMin'] + dfSignif['PtMax']) / 2
 VarDrawList = inputCfg['VarDrawList']
 if not isinstance(VarDrawList, list):
     VarDrawList = [VarDrawList]
@@ -47,6 +53,34 @@ for iPt, (ptMin, ptMax) in enumerate(zip(cutVars['Pt']['min'], cutVars['Pt']['ma
                                 f" {cutVars[varName]['max'][counter]}")
     counter += 1
 
+# cut sets selected in each pT bin, with predicate pushdown to the parquet files
+dfSignifSel = []
+for iPt, _ in enumerate(cutVars['Pt']['min']):
+    if isParquet:
+        filters = []
+        for varName in cutVars:
+            if cutVars[varName]['name'] == 'Pt':
+                filters += [('PtMax', '>', cutVars[varName]['min'][iPt]), ('PtMin', '<', cutVars[varName]['max'][iPt])]
+            else:
+                filters += [(cutVars[varName]['name'], '>', cutVars[varName]['min'][iPt]),
+                            (cutVars[varName]['name'], '<=', cutVars[varName]['max'][iPt])]
+        dfSignifPt = ReadScanParquet(inFileNames, filters)
+        dfSignifPt['Pt'] = (dfSignifPt['PtMin'] + dfSignifPt['PtMax']) / 2
+    else:
+        dfSignifPt = dfSignif
+    dfSignifSel.append(dfSignifPt.query(selToApply[iPt]))
+
+# best cut sets of each pT bin, from the index of the parquet files if available
+if 'topk' in inputCfg and inputCfg['topk']['enable']:
+    figureOfMerit, topK = inputCfg['topk']['figureofmerit'], inputCfg['topk']['k']
+    if isParquet:
+        dfTopK = GetScanTopK(inFileNames, figureOfMerit, topK)
+    else:
+        dfTopK = GetScanTopKFromDf(dfSignif, figureOfMerit, topK)
+    for (ptMin, ptMax), dfTopKPt in dfTopK.groupby(['PtMin', 'PtMax']):
+        print(f'\nBest {topK} cut sets for {ptMin} < pT < {ptMax} GeV/c ({figureOfMerit}):')
+        print(dfTopKPt.to_string(index=False))
+
 #output file preparation
 outFile = TFile(args.outFileName, 'RECREATE')
 outFile.cd()
@@ -62,14 +96,13 @@ for iVar, VartoDraw in enumerate(VarDrawList):
                          nbins, np.asarray(xbins, float)))
     SetObjectStyle(hProject[iVar], color=kGreen-iVar, markerstyle=kOpenCrossX, markersize=1.5, linewidh=2, linestyle=7)
     for iPt, _ in enumerate(cutVars['Pt']['min']):
-        dfSignifSel = dfSignif.query(selToApply[iPt])
-        hProject[iVar].SetBinContent(iPt+1, dfSignifSel[f'{VartoDraw}'])
+        hProject[iVar].SetBinContent(iPt+1, dfSignifSel[iPt][f'{VartoDraw}'])
         if VartoDraw in ('EffAccFD', 'EffAccPrompt'):
-            hProject[iVar].SetBinError(iPt+1, dfSignifSel[f'{VartoDraw}Error'])
+            hProject[iVar].SetBinError(iPt+1, dfSignifSel[iPt][f'{VartoDraw}Error'])
         if VartoDraw == 'S':
-            hProject[iVar].SetBinError(iPt+1, dfSignifSel['S'] / dfSignifSel['Signif'])
+            hProject[iVar].SetBinError(iPt+1, dfSignifSel[iPt]['S'] / dfSignifSel[iPt]['Signif'])
         if VartoDraw == 'B':
-            hProject[iVar].SetBinError(iPt+1, np.sqrt(dfSignifSel['B']))
+            hProject[iVar].SetBinError(iPt+1, np.sqrt(dfSignifSel[iPt]['B']))
     TProject.cd(iVar+1)
     hProject[iVar].DrawCopy()
     TProject.Update()
@@ -0,0 +1,38 @@
+'''
+Script for drawing the results of the cut-variation method stored by ComputeCutVarPromptFrac.py run with --saveTable
+run: python RenderCutVarPromptFrac.py cfgFileName.yml inFileName_Table.npz outFileName.root [--batch]
+'''
+
+import sys
+import argparse
+import numpy as np
+import yaml
+from ROOT import gROOT # pylint: disable=import-error,no-name-in-module
+from utils.CutVarUtils import DrawCutVarResults
+
+parser = argparse.ArgumentParser(description='Arguments')
+parser.add_argument('cfgFileName', metavar='text', default='cfgFileName.yml',
+                    help='cut-variation config file name (for the linear-plot options)')
+parser.add_argument('inFileName', metavar='text', default='outFileName_Table.npz',
+                    help='table of results of ComputeCutVarPromptFrac.py')
+parser.add_argument('outFileName', metavar='text', default='outFileName.root',
+                    help='output root file name (the pdf file names are derived from it)')
+parser.add_argument('--batch', help='suppress video output', action='store_true')
+args = parser.parse_args()
+
+gROOT.SetBatch(args.batch)
+
+with open(args.cfgFileName, 'r') as ymlCutSetFile:
+    cutSetCfg = yaml.load(ymlCutSetFile, yaml.FullLoader)
+
+try:
+    with np.load(args.inFileName) as inFile:
+        table = dict(inFile)
+except OSError:
+    print(f'ERROR: file "{args.inFileName}" cannot be opened! Exit!')
+    sys.exit()
+
+DrawCutVarResults(table, cutSetCfg, args.outFileName)
+
+if not args.batch:
+    input('Press enter to exit')
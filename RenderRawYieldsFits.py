@@ -0,0 +1,140 @@
+'''
+Script for drawing the invariant-mass fits stored by GetRawYieldsDplusDs.py run with --numbersOnly
+run: python RenderRawYieldsFits.py inFileName.root [--ptbins 0 3 5] [--outFileName fits.pdf]
+'''
+
+import sys
+import argparse
+import numpy as np
+from ROOT import TFile, TCanvas, TLatex, gROOT, kBlack, kBlue, kRed, kFullCircle # pylint: disable=import-error,no-name-in-module
+from utils.StyleFormatter import SetGlobalStyle, SetObjectStyle, DivideCanvas
+
+
+def GetFitFunc(inFile, funcName, ptMin, ptMax):
+    '''
+    Helper method to get a fit function stored as {funcName}_{ptMin}_{ptMax}, independently of
+    the pT limits being written as integers or floats in the fit config file
+    '''
+    for ptMinStr in {f'{ptMin:.0f}', f'{ptMin:.1f}', f'{ptMin:g}'}:
+        for ptMaxStr in {f'{ptMax:.0f}', f'{ptMax:.1f}', f'{ptMax:g}'}:
+            func = inFile.Get(f'{funcName}_{ptMinStr}_{ptMaxStr}')
+            if func:
+                return func
+    return None
+
+
+parser = argparse.ArgumentParser(description='Arguments')
+parser.add_argument('inFileName', metavar='text', default='RawYields.root',
+                    help='output file of GetRawYieldsDplusDs.py obtained with --numbersOnly')
+parser.add_argument('--ptbins', type=int, nargs='+', default=None,
+                    help='indices of the pT bins of the fit config to be drawn (all the fitted ones if not set)')
+parser.add_argument('--outFileName', metavar='text', default=None,
+                    help='output pdf file name (default: input file name with .pdf extension)')
+parser.add_argument('--batch', help='suppress video output', action='store_true')
+args = parser.parse_args()
+
+gROOT.SetBatch(args.batch)
+SetGlobalStyle(padleftmargin=0.14, padbottommargin=0.12, padtopmargin=0.12, opttitle=1)
+
+inFile = TFile.Open(args.inFileName)
+if not inFile or not inFile.IsOpen():
+    print(f'ERROR: file "{args.inFileName}" cannot be opened! Exit!')
+    sys.exit()
+tFitResults = inFile.Get('tFitResults')
+if not tFitResults:
+    print(f'ERROR: fit results not found in "{args.inFileName}", run GetRawYieldsDplusDs.py with --numbersOnly. Exit!')
+    sys.exit()
+
+# fit results per pT-bin index of the fit config (row index for files without it, in which all the bins are fitted)
+hasPtBin = any(branch.GetName() == 'PtBin' for branch in tFitResults.GetListOfBranches())
+fitResults = {}
+for iEntry, entry in enumerate(tFitResults):
+    fitResults[int(round(entry.PtBin)) if hasPtBin else iEntry] = {
+        var: getattr(entry, var) for var in ['PtMin', 'PtMax', 'RawYield', 'RawYieldUnc', 'Sigma', 'SigmaUnc', 'Mean',
+                                             'MeanUnc', 'RedChiSquare', 'Signif', 'SignifUnc', 'Signal', 'Bkg']}
+ptBins = args.ptbins if args.ptbins is not None else sorted(fitResults)
+if any(iPt not in fitResults for iPt in ptBins):
+    print(f'ERROR: pT bin indices must be among the fitted ones {sorted(fitResults)}! Exit!')
+    sys.exit()
+
+hMassForFit, funcTot, funcSgn, funcBkg, hResiduals = [], [], [], [], []
+for iPt in ptBins:
+    ptMin, ptMax = fitResults[iPt]['PtMin'], fitResults[iPt]['PtMax']
+    hMassForFit.append(inFile.Get(f'hMassForFit_{ptMin*10:.0f}_{ptMax*10:.0f}'))
+    hMassForFit[-1].SetDirectory(0)
+    funcTot.append(GetFitFunc(inFile, 'fTot', ptMin, ptMax))
+    funcSgn.append(GetFitFunc(inFile, 'fSgn', ptMin, ptMax))
+    funcBkg.append(GetFitFunc(inFile, 'fBkg', ptMin, ptMax))
+    if funcBkg[-1]: # data: residuals w.r.t. background function
+        hResiduals.append(hMassForFit[-1].Clone(f'hResiduals_{ptMin*10:.0f}_{ptMax*10:.0f}'))
+        binWidth = hResiduals[-1].GetBinWidth(1)
+        for iBin in range(1, hResiduals[-1].GetNbinsX()+1):
+            bkgInBin = funcBkg[-1].Integral(hResiduals[-1].GetBinLowEdge(iBin),
+                                            hResiduals[-1].GetBinLowEdge(iBin) + binWidth) / binWidth
+            hResiduals[-1].SetBinContent(iBin, hResiduals[-1].GetBinContent(iBin) - bkgInBin)
+inFile.Close()
+
+nPtBins = len(ptBins)
+canvSizes = [1920, 1080] if nPtBins > 1 else [500, 500]
+nMaxCanvases = 20 # do not put more than 20 bins per canvas to make them visible
+nCanvases = int(np.ceil(nPtBins / nMaxCanvases))
+lat = TLatex()
+lat.SetNDC()
+lat.SetTextFont(42)
+lat.SetTextSize(0.04 if nPtBins < 15 else 0.06)
+
+cMass, cResiduals = [], []
+for iCanv in range(nCanvases):
+    nPads = nPtBins if nCanvases == 1 else nMaxCanvases
+    cMass.append(TCanvas(f'cMass{iCanv}', f'cMass{iCanv}', canvSizes[0], canvSizes[1]))
+    DivideCanvas(cMass[iCanv], nPads)
+    if hResiduals:
+        cResiduals.append(TCanvas(f'cResiduals{iCanv}', f'cResiduals{iCanv}', canvSizes[0], canvSizes[1]))
+        DivideCanvas(cResiduals[iCanv], nPads)
+
+for iBin, iPt in enumerate(ptBins):
+    iCanv = int(np.floor(iBin / nMaxCanvases))
+    iPad = iBin - nMaxCanvases * iCanv + 1 if nPtBins > 1 else 0
+    res = fitResults[iPt]
+    SetObjectStyle(hMassForFit[iBin], color=kBlack, markerstyle=kFullCircle, markersize=1. if nPtBins < 15 else 0.5)
+
+    cMass[iCanv].cd(iPad)
+    hMassForFit[iBin].GetYaxis().SetRangeUser(hMassForFit[iBin].GetMinimum()*0.95,
+                                              hMassForFit[iBin].GetMaximum()*1.2)
+    hMassForFit[iBin].DrawCopy('E')
+    for func, color, style in zip([funcBkg[iBin], funcTot[iBin]], [kRed, kBlue], [2, 1]):
+        if func:
+            func.SetNpx(500)
+            func.SetLineColor(color)
+            func.SetLineStyle(style)
+            func.Draw('same')
+    lat.DrawLatex(0.18, 0.80, f'#it{{S}} = {res["RawYield"]:.0f} #pm {res["RawYieldUnc"]:.0f}')
+    lat.DrawLatex(0.18, 0.75, f'#mu = {res["Mean"]*1000:.1f} #pm {res["MeanUnc"]*1000:.1f} MeV/#it{{c}}^{{2}}')
+    lat.DrawLatex(0.18, 0.70, f'#sigma = {res["Sigma"]*1000:.1f} #pm {res["SigmaUnc"]*1000:.1f} MeV/#it{{c}}^{{2}}')
+    lat.DrawLatex(0.18, 0.65, f'#chi^{{2}}/#it{{ndf}} = {res["RedChiSquare"]:.2f}')
+    if res['Bkg'] > 0:
+        lat.DrawLatex(0.18, 0.60, f'Signif. (3#sigma) = {res["Signif"]:.1f} #pm {res["SignifUnc"]:.1f}')
+        lat.DrawLatex(0.18, 0.55, f'S/B (3#sigma) = {res["Signal"]/res["Bkg"]:.3f}')
+
+    if hResiduals:
+        cResiduals[iCanv].cd(iPad)
+        hResiduals[iBin].DrawCopy('E')
+        if funcSgn[iBin]:
+            funcSgn[iBin].SetNpx(500)
+            funcSgn[iBin].SetLineColor(kBlue)
+            funcSgn[iBin].Draw('same')
+
+outFileNamePDF = args.outFileName if args.outFileName else args.inFileName.replace('.root', '.pdf')
+outFileNameResPDF = outFileNamePDF.replace('.pdf', '_Residuals.pdf')
+for canvases, fileName in zip([cMass, cResiduals], [outFileNamePDF, outFileNameResPDF]):
+    for iCanv, canv in enumerate(canvases):
+        canv.Modified()
+        canv.Update()
+        if iCanv == 0 and nCanvases > 1:
+            canv.SaveAs(f'{fileName}[')
+        canv.SaveAs(fileName)
+        if iCanv == nCanvases-1 and nCanvases > 1:
+            canv.SaveAs(f'{fileName}]')
+
+if not args.batch:
+    input('Press enter to exit')
@@ -0,0 +1,296 @@
+'''
+Script for running the invariant-mass fits of many cut sets with GetRawYieldsDplusDs.py, refitting with
+alternative strategies only the pT bins in which the fit failed or has bad quality
+run: python RunBatchRawYieldsFits.py fitConfigFileName.yml centClass batchConfigFileName.yml [--isMC] [--noRender]
+'''
+
+import sys
+import os
+import argparse
+import copy
+import subprocess
+import numpy as np
+import yaml
+from ROOT import TFile, TNtuple, TObject # pylint: disable=import-error,no-name-in-module
+from utils.FitResultsDB import AppendFitResults, GetConfigHash
+
+
+def RunFit(fitConfigFileName, centClass, inFileName, outFileName, isMC, ptBins=None, initSigma=None):
+    '''
+    Helper method to run GetRawYieldsDplusDs.py in numbers-only mode
+
+    Parameters
+    ----------
+    - fitConfigFileName: fit config file
+    - centClass: centrality class
+    - inFileName: file with invariant-mass distributions
+    - outFileName: output file
+    - isMC: flag for MC distributions
+    - ptBins: indices of pT bins to be fitted (all if None)
+    - initSigma: initial value of the signal width (default of GetRawYieldsDplusDs.py if None)
+
+    Returns
+    ----------
+    - success: True if the script ended without errors and produced a non-empty table of fit results
+    '''
+    # a file left by a previous run must not be taken as the output of a failed fit
+    if os.path.isfile(outFileName):
+        os.remove(outFileName)
+    scriptDir = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, os.path.join(scriptDir, 'GetRawYieldsDplusDs.py'), fitConfigFileName, centClass,
+               inFileName, outFileName, '--batch', '--numbersOnly']
+    if isMC:
+        command.append('--isMC')
+    if ptBins is not None:
+        command += ['--ptbins'] + [str(iPt) for iPt in ptBins]
+    if initSigma is not None:
+        command += ['--initSigma', str(initSigma)]
+
+    if subprocess.run(command, check=False).returncode != 0 or not os.path.isfile(outFileName):
+        return False
+    outFile = TFile.Open(outFileName)
+    tFitResults = outFile.Get('tFitResults') if outFile and not outFile.IsZombie() else None
+    success = bool(tFitResults) and tFitResults.GetEntries() > 0
+    if outFile:
+        outFile.Close()
+
+    return success
+
+
+def ReadFitResults(fileName, ptMins):
+    '''
+    Helper method to read the table of fit results stored by GetRawYieldsDplusDs.py in numbers-only mode
+
+    Parameters
+    ----------
+    - fileName: output file of GetRawYieldsDplusDs.py
+    - ptMins: lower pT limits of the fit config, to associate the results to the pT bins
+
+    Returns
+    ----------
+    - fitResults: dictionary with fit results (dictionaries) per pT-bin index
+    - fitResultsVars: names of the variables in the table of fit results
+    '''
+    inFile = TFile.Open(fileName)
+    tFitResults = inFile.Get('tFitResults')
+    fitResultsVars = [branch.GetName() for branch in tFitResults.GetListOfBranches()]
+    fitResults = {}
+    for entry in tFitResults:
+        result = {var: getattr(entry, var) for var in fitResultsVars}
+        iPt = int(np.argmin(np.abs(np.array(ptMins) - result['PtMin'])))
+        fitResults[iPt] = result
+    inFile.Close()
+
+    return fitResults, fitResultsVars
+
+
+def CheckFitQuality(result, qualityConfig):
+    '''
+    Helper method to check the quality of a fit
+
+    Parameters
+    ----------
+    - result: dictionary with the fit results of a pT bin
+    - qualityConfig: dictionary with quality criteria (maxredchisquare, checkparlimits)
+
+    Returns
+    ----------
+    - reason: reason of the bad quality of the fit, empty string for good fits
+    '''
+    if result['FitStatus'] < 0.5:
+        return 'fit failed'
+    if not np.isfinite([result['RawYield'], result['RawYieldUnc'], result['RedChiSquare']]).all():
+        return 'not finite results'
+    if result['RedChiSquare'] <= 0. or result['RedChiSquare'] > qualityConfig['maxredchisquare']:
+        return f'chi2/ndf = {result["RedChiSquare"]:.2f}'
+    if qualityConfig['checkparlimits'] and result['NumParsAtLimit'] > 0:
+        return f'{result["NumParsAtLimit"]:.0f} parameter(s) at limit'
+    return ''
+
+
+def MakeStrategyConfig(fitConfigCent, strategy, ptBins):
+    '''
+    Helper method to apply the overrides of a refit strategy to the fit configuration
+
+    Parameters
+    ----------
+    - fitConfigCent: fit configuration of the centrality class
+    - strategy: dictionary with the strategy name and the fit-config keys to override
+                (MassRangeShrink and InitSigma are special keys)
+    - ptBins: indices of the pT bins to which the overrides of per-pT-bin lists are applied
+
+    Returns
+    ----------
+    - strategyConfig: modified fit configuration
+    '''
+    strategyConfig = copy.deepcopy(fitConfigCent)
+    for key, value in strategy.items():
+        if key in ['name', 'InitSigma']:
+            continue
+        if key == 'MassRangeShrink':
+            for iPt in ptBins:
+                strategyConfig['MassMin'][iPt] += value
+                strategyConfig['MassMax'][iPt] -= value
+        elif isinstance(strategyConfig[key], list):
+            for iPt in ptBins:
+                strategyConfig[key][iPt] = value
+        else:
+            strategyConfig[key] = value
+
+    return strategyConfig
+
+
+def MergeRefitResults(outFileName, refitFileName, ptBins, ptMins, ptMaxs):
+    '''
+    Helper method to replace the results of some pT bins with those of a refit
+
+    Parameters
+    ----------
+    - outFileName: output file of the first fit, updated
+    - refitFileName: output file of the refit
+    - ptBins: indices of the pT bins to be replaced
+    - ptMins: lower pT limits of the fit config
+    - ptMaxs: upper pT limits of the fit config
+    '''
+    outFile = TFile.Open(outFileName, 'update')
+    refitFile = TFile.Open(refitFileName)
+    funcSuffixes = [f'_{ptMins[iPt]}_{ptMaxs[iPt]}' for iPt in ptBins]
+    for key in refitFile.GetListOfKeys():
+        objName = key.GetName()
+        obj = key.ReadObj()
+        if obj.InheritsFrom('TH1') and objName.startswith('hRawYields'):
+            hOut = outFile.Get(objName)
+            for iPt in ptBins:
+                hOut.SetBinContent(iPt+1, obj.GetBinContent(iPt+1))
+                hOut.SetBinError(iPt+1, obj.GetBinError(iPt+1))
+            outFile.cd()
+            hOut.Write(objName, TObject.kOverwrite)
+        elif obj.InheritsFrom('TF1') and any(objName.endswith(suffix) for suffix in funcSuffixes):
+            outFile.cd()
+            obj.Write(objName, TObject.kOverwrite)
+    refitFile.Close()
+    outFile.Close()
+
+
+parser = argparse.ArgumentParser(description='Arguments')
+parser.add_argument('fitConfigFileName', metavar='text', default='config_Ds_Fit.yml')
+parser.add_argument('centClass', metavar='text', default='')
+parser.add_argument('batchConfigFileName', metavar='text', default='config_BatchFits.yml')
+parser.add_argument('--isMC', action='store_true', default=False)
+parser.add_argument('--noRender', action='store_true', default=False,
+                    help='do not produce the pdf files with the fits')
+args = parser.parse_args()
+
+cent = ''
+if args.centClass == 'k010':
+    cent = 'Cent010'
+elif args.centClass == 'k3050':
+    cent = 'Cent3050'
+elif args.centClass == 'k6080':
+    cent = 'Cent6080'
+elif args.centClass == 'kpp5TeVPrompt':
+    cent = 'pp5TeVPrompt'
+elif args.centClass == 'kpp13TeVFD':
+    cent = 'pp13TeVFD'
+elif args.centClass == 'kpp13TeVPrompt':
+    cent = 'pp13TeVPrompt'
+else:
+    print(f"ERROR: cent class \'{args.centClass}\' is not supported! Exit")
+    sys.exit()
+
+with open(args.fitConfigFileName, 'r') as ymlfitConfigFile:
+    fitConfig = yaml.load(ymlfitConfigFile, yaml.FullLoader)
+with open(args.batchConfigFileName, 'r') as ymlBatchConfigFile:
+    batchConfig = yaml.load(ymlBatchConfigFile, yaml.FullLoader)
+
+ptMins = fitConfig[cent]['PtMin']
+ptMaxs = fitConfig[cent]['PtMax']
+inFileNames = [os.path.join(batchConfig['inputdir'], inFileName) for inFileName in batchConfig['inputfiles']]
+outFileNames = [os.path.join(batchConfig['outputdir'], outFileName) for outFileName in batchConfig['outputfiles']]
+if len(inFileNames) != len(outFileNames):
+    print('ERROR: number of input and output files not consistent! Exit')
+    sys.exit()
+strategies = batchConfig['strategies'] if batchConfig['strategies'] else []
+for strategy in strategies:
+    for key in strategy:
+        if key not in ['name', 'MassRangeShrink', 'InitSigma'] and key not in fitConfig[cent]:
+            print(f'ERROR: key \'{key}\' of strategy \'{strategy["name"]}\' not in fit config! Exit')
+            sys.exit()
+
+refitSummary = {}
+for inFileName, outFileName in zip(inFileNames, outFileNames):
+    cutSetName = os.path.basename(outFileName).replace('.root', '')
+    print(f'\nFitting {inFileName}')
+    if not RunFit(args.fitConfigFileName, args.centClass, inFileName, outFileName, args.isMC):
+        print(f'ERROR: fits of {inFileName} ended with errors, skipping it')
+        refitSummary[cutSetName] = 'error'
+        continue
+    fitResults, fitResultsVars = ReadFitResults(outFileName, ptMins)
+
+    strategyUsed, badFits = {}, {}
+    for iPt, result in fitResults.items():
+        reason = CheckFitQuality(result, batchConfig['quality'])
+        if reason:
+            badFits[iPt] = reason
+        else:
+            strategyUsed[iPt] = 'default'
+    for iPt, reason in badFits.items():
+        print(f'WARNING: bad fit for {cutSetName}, {ptMins[iPt]} < pT < {ptMaxs[iPt]} GeV/c: {reason}')
+
+    for strategy in strategies:
+        if not badFits:
+            break
+        ptBinsToRefit = sorted(badFits)
+        if strategy.get('FixSigma') and not fitConfig[cent]['SigmaFile']:
+            print(f'WARNING: strategy \'{strategy["name"]}\' needs SigmaFile in fit config, skipping it')
+            continue
+        strategyConfigFileName = outFileName.replace('.root', f'_{strategy["name"]}.yml')
+        with open(strategyConfigFileName, 'w') as ymlStrategyConfigFile:
+            yaml.dump({cent: MakeStrategyConfig(fitConfig[cent], strategy, ptBinsToRefit)}, ymlStrategyConfigFile,
+                      default_flow_style=None)
+        refitFileName = outFileName.replace('.root', f'_{strategy["name"]}.root')
+        if RunFit(strategyConfigFileName, args.centClass, inFileName, refitFileName, args.isMC, ptBinsToRefit,
+                  strategy.get('InitSigma')):
+            refitResults, _ = ReadFitResults(refitFileName, ptMins)
+            recoveredPtBins = [iPt for iPt in ptBinsToRefit if iPt in refitResults and
+                               not CheckFitQuality(refitResults[iPt], batchConfig['quality'])]
+            if recoveredPtBins:
+                MergeRefitResults(outFileName, refitFileName, recoveredPtBins, ptMins, ptMaxs)
+            for iPt in recoveredPtBins:
+                print(f'Fit for {cutSetName}, {ptMins[iPt]} < pT < {ptMaxs[iPt]} GeV/c recovered with strategy '
+                      f'\'{strategy["name"]}\'')
+                fitResults[iPt] = refitResults[iPt]
+                strategyUsed[iPt] = strategy['name']
+                del badFits[iPt]
+            os.remove(refitFileName)
+        os.remove(strategyConfigFileName)
+
+    for iPt in badFits:
+        strategyUsed[iPt] = 'failed'
+        print(f'WARNING: no strategy succeeded for {cutSetName}, {ptMins[iPt]} < pT < {ptMaxs[iPt]} GeV/c')
+    refitSummary[cutSetName] = {f'{ptMins[iPt]}-{ptMaxs[iPt]}': strategyUsed[iPt] for iPt in sorted(strategyUsed)}
+
+    # table of fit results with the merged refits
+    outFile = TFile.Open(outFileName, 'update')
+    tFitResults = TNtuple('tFitResults', 'tFitResults', ':'.join(fitResultsVars))
+    for iPt in sorted(fitResults):
+        tFitResults.Fill(np.array([fitResults[iPt][var] for var in fitResultsVars], 'f'))
+    tFitResults.Write('tFitResults', TObject.kOverwrite)
+    nEvents = outFile.Get('hEvForNorm').GetBinContent(1)
+    outFile.Close()
+
+    if batchConfig['fitdb']:
+        for iPt, result in fitResults.items():
+            result['Strategy'] = strategyUsed[iPt]
+        AppendFitResults(batchConfig['fitdb'], [fitResults[iPt] for iPt in sorted(fitResults)],
+                         GetConfigHash([fitConfig[cent], inFileName]), cutSetName, args.fitConfigFileName, cent,
+                         args.isMC, nEvents, outFileName)
+
+    if not args.noRender:
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                     'RenderRawYieldsFits.py'), outFileName, '--batch'], check=False)
+
+summaryFileName = os.path.join(batchConfig['outputdir'], 'RefitSummary.yml')
+with open(summaryFileName, 'w') as ymlSummaryFile:
+    yaml.dump(refitSummary, ymlSummaryFile, default_flow_style=False)
+print(f'\nStrategies used for each fit saved in {summaryFileName}')
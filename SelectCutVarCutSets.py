@@ -0,0 +1,72 @@
+'''
+python script for the search of the subsets of cut sets that minimise the uncertainty of the prompt or
+feed-down corrected yields obtained with the cut-variation method
+run: python SelectCutVarCutSets.py cfgFileName.yml outFileName.yml [--method greedy] [--target prompt]
+'''
+
+import sys
+import argparse
+from functools import partial
+from multiprocessing import Pool
+import yaml
+from utils.CutVarUtils import LoadCutVarInputs, SearchCutSetSubsets
+
+
+def main(): #pylint: disable=too-many-locals
+    parser = argparse.ArgumentParser(description='Arguments to pass')
+    parser.add_argument('cfgFileName', metavar='text', default='cfgFileName.yml',
+                        help='cut-variation config file name (as for ComputeCutVarPromptFrac.py)')
+    parser.add_argument('outFileName', metavar='text', default='BestCutSets.yml',
+                        help='output yaml file name')
+    parser.add_argument('--method', choices=['greedy', 'beam', 'exhaustive'], default='greedy',
+                        help='search method')
+    parser.add_argument('--target', choices=['prompt', 'FD'], default='prompt',
+                        help='corrected yield whose relative uncertainty is minimised')
+    parser.add_argument('--minsets', type=int, default=3, help='minimum number of cut sets in a subset')
+    parser.add_argument('--maxsets', type=int, default=None, help='maximum number of cut sets in a subset')
+    parser.add_argument('--beamwidth', type=int, default=5, help='number of subsets kept at each beam-search step')
+    parser.add_argument('--maxredchi2', type=float, default=None,
+                        help='maximum reduced chi2 of the minimisation for a subset to be accepted')
+    parser.add_argument('--ntop', type=int, default=5, help='number of best subsets reported per pT bin')
+    parser.add_argument('--nworkers', type=int, default=1, help='number of parallel processes')
+    args = parser.parse_args()
+
+    with open(args.cfgFileName, 'r') as ymlCutSetFile:
+        cutSetCfg = yaml.load(ymlCutSetFile, yaml.FullLoader)
+    inputs = LoadCutVarInputs(cutSetCfg)
+    nPtBins, nSets = inputs['rawYield'].shape
+    if args.minsets < 3 or args.minsets > nSets:
+        print(f'ERROR: minimum number of cut sets must be between 3 and {nSets}! Exit')
+        sys.exit()
+
+    inputsPerPt = [{var: (inputs[var][iPt] if inputs[var] is not None else None)
+                    for var in ['rawYield', 'rawYieldUnc', 'effPrompt', 'effPromptUnc', 'effFD', 'effFDUnc',
+                                'rawYieldCov']} for iPt in range(nPtBins)]
+    search = partial(SearchCutSetSubsets, method=args.method, target=args.target, minSets=args.minsets,
+                     maxSets=args.maxsets, beamWidth=args.beamwidth, maxRedChiSquare=args.maxredchi2,
+                     nTop=args.ntop, corr=cutSetCfg['minimisation']['correlated'])
+    if args.nworkers > 1:
+        with Pool(args.nworkers) as pool:
+            bestSubsetsPerPt = pool.map(search, inputsPerPt)
+    else:
+        bestSubsetsPerPt = [search(inputsPt) for inputsPt in inputsPerPt]
+
+    outDict = {'method': args.method, 'target': args.target, 'ptbins': []}
+    for ptMin, ptMax, bestSubsets in zip(inputs['ptLims'][:-1], inputs['ptLims'][1:], bestSubsetsPerPt):
+        print(f'\n{ptMin:.0f} < pT < {ptMax:.0f} GeV/c')
+        if not bestSubsets:
+            print('  no subset satisfying the requirements found')
+        for subset in bestSubsets:
+            subset['rawyieldfiles'] = [cutSetCfg['rawyields']['inputfiles'][iSet] for iSet in subset['cutsets']]
+            subset['efficiencyfiles'] = [cutSetCfg['efficiencies']['inputfiles'][iSet] for iSet in subset['cutsets']]
+            print(f'  cut sets {subset["cutsets"]}: rel. unc. prompt = {subset["reluncprompt"]:.4f}, '
+                  f'rel. unc. FD = {subset["reluncfd"]:.4f}, chi2/ndf = {subset["redchi2"]:.2f}')
+        outDict['ptbins'].append({'ptmin': float(ptMin), 'ptmax': float(ptMax), 'subsets': bestSubsets})
+
+    with open(args.outFileName, 'w') as outFile:
+        yaml.dump(outDict, outFile, default_flow_style=None, sort_keys=False)
+    print(f'\nBest subsets of cut sets saved in {args.outFileName}')
+
+
+if __name__ == '__main__':
+    main()
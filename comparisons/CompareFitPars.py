@@ -6,8 +6,9 @@ from ROOT import kFullCircle, kOpenCircle, kFullSquare, kFullDiamond, kFullCross
 sys.path.append('..')
 from utils.StyleFormatter import SetGlobalStyle, SetObjectStyle #pylint: disable=wrong-import-position,import-error
 from utils.AnalysisUtils import ComputeRatioDiffBins #pylint: disable=wrong-import-position,import-error
+from utils.FitResultsDB import QueryFitResults, GetFitResultsHisto #pylint: disable=wrong-import-position,import-error
 
-def comp_fit_pars(do_ratio=False, meson='Ds'): #pylint: disable-msg=too-many-statements,too-many-locals
+def comp_fit_pars(do_ratio=False, meson='Ds', fitdb=None, cutsets=None, confighashes=None): #pylint: disable-msg=too-many-statements,too-many-locals
     inputdir = '../../AnalysisNonPromptDpp2017/Dplus/outputs/rawyields'
     input_files = ['RawYieldsDplus_pp5TeV_prompt_central.root', 'RawYieldsDplus_pp5TeV_FD_central_freesigma.root']
     input_files_MC = ['RawYieldsDplusMC_pp5TeV_prompt_central.root', 'RawYieldsDplusMC_pp5TeV_FD_central.root']
@@ -44,12 +45,34 @@ def comp_fit_pars(do_ratio=False, meson='Ds'): #pylint: disable-msg=too-many-sta
     legMean.SetTextSize(0.04)
     legMean.AddEntry(lineMass, "PDG", 'l')
 
+    if fitdb: # fit results queried from database instead of RawYields files
+        n_entries = max(len(cutsets) if cutsets else 0, len(confighashes) if confighashes else 0)
+        selections, legendnames = [], []
+        for i_entry in range(n_entries):
+            selections.append({})
+            if cutsets:
+                selections[i_entry]['CutSet'] = cutsets[i_entry]
+            if confighashes:
+                selections[i_entry]['ConfigHash'] = confighashes[i_entry]
+            legendnames.append(' '.join(selections[i_entry].values()))
+        input_files = selections
+        colors = [colors[i_entry % len(colors)] for i_entry in range(n_entries)]
+        markers = [markers[i_entry % len(markers)] for i_entry in range(n_entries)]
+
     for file_path, color, marker, legend_name in zip(input_files, colors, markers, legendnames):
-        input_file = TFile(f'{inputdir}/{file_path}')
-        histo_mean = input_file.Get('hRawYieldsMean')
-        histo_sigma = input_file.Get('hRawYieldsSigma')
-        histo_mean.SetDirectory(0)
-        histo_sigma.SetDirectory(0)
+        if fitdb:
+            df_results = QueryFitResults(fitdb, ['PtMin', 'PtMax', 'Mean', 'MeanUnc', 'Sigma', 'SigmaUnc'], **file_path)
+            if df_results.empty:
+                print(f'ERROR: no fit results found in {fitdb} for {legend_name}! Exit')
+                sys.exit()
+            histo_mean = GetFitResultsHisto(df_results, 'Mean', f'hRawYieldsMean_{legend_name}')
+            histo_sigma = GetFitResultsHisto(df_results, 'Sigma', f'hRawYieldsSigma_{legend_name}')
+        else:
+            input_file = TFile(f'{inputdir}/{file_path}')
+            histo_mean = input_file.Get('hRawYieldsMean')
+            histo_sigma = input_file.Get('hRawYieldsSigma')
+            histo_mean.SetDirectory(0)
+            histo_sigma.SetDirectory(0)
         SetObjectStyle(histo_mean, linecolor=color, markercolor=color, markerstyle=marker)
         SetObjectStyle(histo_sigma, linecolor=color, markercolor=color, markerstyle=marker)
         legMean.AddEntry(histo_mean, legend_name, 'p')
@@ -129,7 +152,17 @@ def main():
     parser = argparse.ArgumentParser(description='Arguments')
     parser.add_argument("--ratio", help="make ratio to MC", action="store_true")
     parser.add_argument("--Dspecie", help="Dplus or Ds mesons", metavar="text", default="Ds")
+    parser.add_argument("--fitdb", help="fit results database to query instead of opening RawYields files",
+                        metavar="text", default=None)
+    parser.add_argument("--cutsets", help="cut sets to compare (with --fitdb)", nargs='+', default=None)
+    parser.add_argument("--confighashes", help="fit config hashes to compare (with --fitdb)", nargs='+', default=None)
     args = parser.parse_args()
-    comp_fit_pars(args.ratio, args.Dspecie)
+    if args.fitdb and not (args.cutsets or args.confighashes):
+        print('ERROR: cut sets and/or config hashes to compare needed with --fitdb! Exit')
+        sys.exit()
+    if args.cutsets and args.confighashes and len(args.cutsets) != len(args.confighashes):
+        print('ERROR: number of cut sets and config hashes to compare not consistent! Exit')
+        sys.exit()
+    comp_fit_pars(args.ratio, args.Dspecie, args.fitdb, args.cutsets, args.confighashes)
 
 main()
@@ -1,11 +1,12 @@
 import sys
 import math
-from ROOT import TCanvas, TFile, TLegend # pylint: disable=import-error,no-name-in-module
+from ROOT import TCanvas, TFile, TLegend, TH1F # pylint: disable=import-error,no-name-in-module
 from ROOT import kRed, kAzure # pylint: disable=import-error,no-name-in-module
 from ROOT import kFullCircle, kFullSquare # pylint: disable=import-error,no-name-in-module
 sys.path.append('..')
 from utils.AnalysisUtils import ComputeRatioDiffBins #pylint: disable=wrong-import-position,import-error
 from utils.StyleFormatter import SetGlobalStyle, SetObjectStyle #pylint: disable=wrong-import-position,import-error
+from utils.FitResultsDB import QueryFitResults, GetFitResultsHisto #pylint: disable=wrong-import-position,import-error
 
 inputdir = 'inputdir'
 inputfilenames = ['file1.root', 'file2.root']
@@ -19,6 +20,9 @@ evhistonames = ['hEvForNorm', 'hEvForNorm']
 colors = [kRed+1, kAzure+4]
 markers = [kFullSquare, kFullCircle]
 legendnames = ['title1', 'title2']
+# if not None, the fit results are queried from this database (see utils/FitResultsDB.py) instead of the input files
+fitdbfilename = None
+fitdbselections = [{'CutSet': 'cutset1'}, {'CutSet': 'cutset2'}]
 
 SetGlobalStyle(padleftmargin=0.18, padtopmargin=0.05, padbottommargin=0.14,
                titleoffsety=1.8, titlesize=0.045, labelsize=0.04, maxdigits=2)
@@ -30,13 +34,31 @@ leg.SetFillStyle(0)
 leg.SetBorderSize(0)
 leg.SetTextSize(0.04)
 
+if fitdbfilename:
+    inputfilenames = fitdbselections
+
 for iFile, filename in enumerate(inputfilenames):
-    inputfile = TFile(f'{inputdir}/{filename}')
-    hSignal.append(inputfile.Get(signalhistonames[iFile]))
-    hBackground.append(inputfile.Get(bkghistonames[iFile]))
-    hSignif.append(inputfile.Get(signifhistonames[iFile]))
-    hSoverB.append(inputfile.Get(SoverBhistonames[iFile]))
-    hEv.append(inputfile.Get(evhistonames[iFile]))
+    if fitdbfilename:
+        dfResults = QueryFitResults(fitdbfilename, **filename)
+        if dfResults.empty:
+            print(f'ERROR: no fit results found in {fitdbfilename} for {filename}! Exit')
+            sys.exit()
+        dfResults['SoverB'] = dfResults['Signal'] / dfResults['Bkg']
+        dfResults['SoverBUnc'] = dfResults['SoverB'] * ((dfResults['SignalUnc'] / dfResults['Signal'])**2 +
+                                                        (dfResults['BkgUnc'] / dfResults['Bkg'])**2)**0.5
+        hSignal.append(GetFitResultsHisto(dfResults, 'RawYield', f'hSignal{iFile}'))
+        hBackground.append(GetFitResultsHisto(dfResults, 'Bkg', f'hBackground{iFile}'))
+        hSignif.append(GetFitResultsHisto(dfResults, 'Signif', f'hSignif{iFile}'))
+        hSoverB.append(GetFitResultsHisto(dfResults, 'SoverB', f'hSoverB{iFile}'))
+        hEv.append(TH1F(f'hEv{iFile}', '', 1, 0., 1.))
+        hEv[iFile].SetBinContent(1, dfResults['NEvents'].iloc[0])
+    else:
+        inputfile = TFile(f'{inputdir}/{filename}')
+        hSignal.append(inputfile.Get(signalhistonames[iFile]))
+        hBackground.append(inputfile.Get(bkghistonames[iFile]))
+        hSignif.append(inputfile.Get(signifhistonames[iFile]))
+        hSoverB.append(inputfile.Get(SoverBhistonames[iFile]))
+        hEv.append(inputfile.Get(evhistonames[iFile]))
     hSignal[iFile].SetDirectory(0)
     hBackground[iFile].SetDirectory(0)
     hSoverB[iFile].SetDirectory(0)
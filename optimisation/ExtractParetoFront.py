@@ -0,0 +1,92 @@
+'''
+python script for the extraction of the Pareto front of the working points from the output of the scans
+(ScanSelectionsTree.py, ScanSignificanceSparse.py or ScanMLThresholds.py) and the production of the cutset files
+run: python ExtractParetoFront.py cfgFileName.yml outFileName.parquet
+'''
+
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import yaml
+sys.path.append('..')
+from utils.DfUtils import LoadDfFromRootOrParquet  #pylint: disable=wrong-import-position,import-error
+from utils.ScanUtils import ReadScanParquet, GetScanGroupColumns, GetParetoFrontFromDf  #pylint: disable=wrong-import-position,import-error
+
+
+def GetCutSetDict(dfPoints, cutVarsCfg, ptName):
+    '''
+    Helper method to get the cutvars dictionary of a cutset file (one cut set per pT bin) from the selected points
+    '''
+    cutSet = {'Pt': {'axisnum': None, 'min': [float(ptMin) for ptMin in dfPoints['PtMin']],
+                     'max': [float(ptMax) for ptMax in dfPoints['PtMax']], 'name': ptName}}
+    for var in cutVarsCfg:
+        cuts = [float(np.round(cut, 6)) for cut in dfPoints[var]]
+        bounds = [float(cutVarsCfg[var]['bound'])] * len(cuts)
+        cutSet[var] = {'axisnum': None, 'min': bounds if cutVarsCfg[var]['upperlowercut'] == 'Upper' else cuts,
+                       'max': cuts if cutVarsCfg[var]['upperlowercut'] == 'Upper' else bounds,
+                       'name': cutVarsCfg[var]['name'] if 'name' in cutVarsCfg[var] else var}
+
+    return {'cutvars': cutSet}
+
+
+parser = argparse.ArgumentParser(description='Arguments')
+parser.add_argument('cfgFileName', metavar='text', default='cfgFileName.yml', help='input config yaml file name')
+parser.add_argument('outFileName', metavar='text', default='outFileName.parquet',
+                    help='output parquet file name with the Pareto fronts (the cutset files are saved in the same '
+                         'directory)')
+args = parser.parse_args()
+
+with open(args.cfgFileName, 'r') as ymlCfgFile:
+    inputCfg = yaml.load(ymlCfgFile, yaml.FullLoader)
+objectives = inputCfg['objectives']
+cutVarsCfg = inputCfg['cutvars']
+for obj in objectives:
+    if objectives[obj] not in ['max', 'min']:
+        print(f'ERROR: objective {obj} must be either max or min! Exit')
+        sys.exit()
+
+# only the columns needed for the fronts are read from the parquet files
+inFileNames = inputCfg['infiles']['name']
+if not isinstance(inFileNames, list):
+    inFileNames = [inFileNames]
+if all('.parquet' in inFileName for inFileName in inFileNames):
+    groupColumns = GetScanGroupColumns(pq.read_schema(inFileNames[0]).names)
+    dfScan = ReadScanParquet(inFileNames, columns=groupColumns + list(cutVarsCfg)
+                             + [obj for obj in objectives if obj not in cutVarsCfg])
+else:
+    dfScan = LoadDfFromRootOrParquet(inputCfg['infiles']['name'], inputCfg['infiles']['dirname'],
+                                     inputCfg['infiles']['treename'])
+    groupColumns = GetScanGroupColumns(dfScan.columns)
+    dfScan = dfScan[groupColumns + list(cutVarsCfg) + [obj for obj in objectives if obj not in cutVarsCfg]]
+print(f'Number of cut sets: {len(dfScan)}')
+
+dfFront = GetParetoFrontFromDf(dfScan, objectives)
+sortBy = inputCfg['export']['sortby']
+dfFront = dfFront.sort_values(sortBy, ascending=objectives[sortBy] == 'min', kind='stable')
+dfFront = dfFront.assign(Rank=dfFront.groupby(groupColumns, sort=False).cumcount())
+dfFront = dfFront.sort_values(groupColumns + ['Rank']).reset_index(drop=True)
+dfFront.to_parquet(args.outFileName, index=False)
+with pd.option_context('display.max_rows', None, 'display.width', 200):
+    for groupValues, dfFrontGroup in dfFront.groupby(groupColumns):
+        print(f'\nPareto front for {", ".join(f"{col} {val}" for col, val in zip(groupColumns, groupValues))}: '
+              f'{len(dfFrontGroup)} cut sets')
+        print(dfFrontGroup.drop(columns=groupColumns).to_string(index=False))
+
+# cutset files with the points of the fronts with the same rank in all the pT bins (the last point of the front
+# if the front of a pT bin has less points), one for each parameter-cut bin if more than one
+outFilePrefix = os.path.splitext(args.outFileName)[0]
+parCutColumns = [col for col in groupColumns if 'ParCut' in col]
+dfsFrontParCut = dfFront.groupby(parCutColumns) if parCutColumns else [((), dfFront)]
+nParCutBins = dfFront.groupby(parCutColumns).ngroups if parCutColumns else 1
+for parCutValues, dfFrontParCut in dfsFrontParCut:
+    parCutSuffix = f'_ParCut{parCutValues[0]}-{parCutValues[1]}' if nParCutBins > 1 else ''
+    for rank in inputCfg['export']['ranks']:
+        dfPoints = dfFrontParCut.query(f'Rank <= {rank}').groupby(['PtMin', 'PtMax']).tail(1).sort_values('PtMin')
+        outCutSetName = f'{outFilePrefix}_cutset{parCutSuffix}_rank{rank}.yml'
+        with open(outCutSetName, 'w') as ymlOutFile:
+            yaml.dump(GetCutSetDict(dfPoints, cutVarsCfg, inputCfg['export']['ptname']), ymlOutFile,
+                      default_flow_style=None, sort_keys=False, indent=4)
+        print(f'Cut set file saved in {outCutSetName}')
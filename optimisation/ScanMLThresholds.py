@@ -0,0 +1,182 @@
+'''
+python script for the scan of the threshold on a ML output using the sorted-score index of the ModelApplied files
+run: python ScanMLThresholds.py cfgFileName.yml outFileName.root [--rebuild] [--topk K] [--batch]
+'''
+
+import os
+import sys
+import argparse
+import hashlib
+import numpy as np
+import pandas as pd
+import yaml
+from ROOT import TFile, TH1F, TF1, TCanvas, gROOT, kBlack, kFullCircle  # pylint: disable=import-error,no-name-in-module
+sys.path.append('..')
+from utils.ScanUtils import GetCutGrid, BuildScoreIndex, GetScoreIndexCounts, GetScoreIndexMassCounts  #pylint: disable=wrong-import-position,import-error
+from utils.ScanUtils import SaveScoreIndices, LoadScoreIndices, GetExpectedBkgFromSideBandsChunks  #pylint: disable=wrong-import-position,import-error
+from utils.ScanUtils import WriteScanParquet  #pylint: disable=wrong-import-position,import-error
+from utils.FitUtils import SingleGaus #pylint: disable=wrong-import-position,import-error
+from utils.StyleFormatter import SetGlobalStyle, SetObjectStyle  #pylint: disable=wrong-import-position,import-error
+from utils.DfUtils import LoadDfFromRootOrParquet  #pylint: disable=wrong-import-position,import-error
+
+
+def GetIndexHash(inputCfg):
+    '''
+    Helper method to get the hash of the inputs of the sorted-score index (input files with their modification
+    times, score, preselection, pT bins and mass binning)
+    '''
+    inputs = []
+    for sample in ['prompt', 'feeddown', 'data']:
+        fileNames = inputCfg['infiles'][sample]['filename']
+        for fileName in fileNames if isinstance(fileNames, list) else [fileNames]:
+            fileName = os.path.expanduser(fileName)
+            inputs.append(f'{os.path.abspath(fileName)}:{os.stat(fileName).st_mtime}')
+    inputs += [inputCfg['scorevar']['name'], f'{inputCfg["preselection"]}', f'{inputCfg["ptmin"]}',
+               f'{inputCfg["ptmax"]}', f'{inputCfg["index"]["massbins"]}', f'{inputCfg["index"]["knotstep"]}']
+
+    return hashlib.sha1(';'.join(inputs).encode()).hexdigest()
+
+
+def BuildIndices(inputCfg, ptMins, ptMaxs):
+    '''
+    Helper method to build the sorted-score indices of prompt, FD and data candidates in each pT bin, and the
+    mean and width of the signal peak from a gaussian fit of the MC invariant-mass distribution
+    '''
+    scoreName = inputCfg['scorevar']['name']
+    dfs = {}
+    for sample in ['prompt', 'feeddown', 'data']:
+        dfs[sample] = LoadDfFromRootOrParquet(inputCfg['infiles'][sample]['filename'],
+                                              inputCfg['infiles'][sample]['dirname'],
+                                              inputCfg['infiles'][sample]['treename'])
+        if inputCfg['preselection']:
+            dfs[sample] = dfs[sample].query(inputCfg['preselection'])
+
+    indices = {}
+    for iPt, (ptMin, ptMax) in enumerate(zip(ptMins, ptMaxs)):
+        dfsPt = {sample: dfs[sample].query(f'{ptMin} < pt_cand < {ptMax}') for sample in dfs}
+        massBinEdges = np.linspace(min(dfsPt['data']['inv_mass']), max(dfsPt['data']['inv_mass']),
+                                   inputCfg['index']['massbins'] + 1)
+        indices[f'prompt_pt{iPt}'] = BuildScoreIndex(dfsPt['prompt'][scoreName].to_numpy())
+        indices[f'feeddown_pt{iPt}'] = BuildScoreIndex(dfsPt['feeddown'][scoreName].to_numpy())
+        indices[f'data_pt{iPt}'] = BuildScoreIndex(dfsPt['data'][scoreName].to_numpy(), None,
+                                                   dfsPt['data']['inv_mass'].to_numpy(), massBinEdges,
+                                                   inputCfg['index']['knotstep'])
+
+        hMassSignal = TH1F(f'hMassSignal_pT{ptMin}-{ptMax}', ';#it{M} (GeV/#it{c});Counts', 400,
+                           min(dfsPt['prompt']['inv_mass']), max(dfsPt['prompt']['inv_mass']))
+        for mass in np.concatenate((dfsPt['prompt']['inv_mass'].to_numpy(), dfsPt['feeddown']['inv_mass'].to_numpy())):
+            hMassSignal.Fill(mass)
+        funcSignal = TF1('funcSignal', SingleGaus, 1.6, 2.2, 3)
+        funcSignal.SetParameters(hMassSignal.Integral('width'), hMassSignal.GetMean(), hMassSignal.GetRMS())
+        hMassSignal.Fit('funcSignal', 'Q0')
+        indices[f'signal_pt{iPt}'] = {'mean': np.array(funcSignal.GetParameter(1)),
+                                      'sigma': np.array(funcSignal.GetParameter(2))}
+    indices['info'] = {'scoreName': np.array(scoreName), 'ptMins': np.array(ptMins, dtype=np.float64),
+                       'ptMaxs': np.array(ptMaxs, dtype=np.float64)}
+
+    return indices
+
+
+parser = argparse.ArgumentParser(description='Arguments')
+parser.add_argument('cfgFileName', metavar='text', default='cfgFileName.yml', help='input config yaml file name')
+parser.add_argument('outFileName', metavar='text', default='outFileName.root', help='output root file name')
+parser.add_argument('--rebuild', action='store_true', default=False,
+                    help='rebuild the sorted-score index even if it is up to date')
+parser.add_argument('--topk', type=int, default=100,
+                    help='number of best thresholds per pT bin in the index of the parquet output')
+parser.add_argument('--batch', help='suppress video output', action='store_true')
+args = parser.parse_args()
+
+with open(args.cfgFileName, 'r') as ymlCfgFile:
+    inputCfg = yaml.load(ymlCfgFile, yaml.FullLoader)
+
+ptMins = inputCfg['ptmin']
+ptMaxs = inputCfg['ptmax']
+if not isinstance(ptMins, list):
+    ptMins = [ptMins]
+if not isinstance(ptMaxs, list):
+    ptMaxs = [ptMaxs]
+scoreName = inputCfg['scorevar']['name']
+_, cutRanges, upperLowerCuts = GetCutGrid({scoreName: inputCfg['scorevar']})
+thresholds = cutRanges[0]
+if upperLowerCuts[0] == 'Upper':
+    scoreMins, scoreMaxs = np.full(len(thresholds), -np.inf), thresholds
+else:
+    scoreMins, scoreMaxs = thresholds, np.full(len(thresholds), np.inf)
+
+# sorted-score index, built once and rebuilt only if the inputs change
+indexFileName = inputCfg['index']['filename'] if inputCfg['index']['filename'] \
+    else args.outFileName.replace('.root', '_ScoreIndex.npz')
+indexHash = GetIndexHash(inputCfg)
+indices = None
+if os.path.isfile(indexFileName) and not args.rebuild:
+    indices, indexHashStored = LoadScoreIndices(indexFileName)
+    if indexHashStored != indexHash:
+        print(f'Sorted-score index {indexFileName} obtained with different inputs, rebuilding it')
+        indices = None
+if indices is None:
+    indices = BuildIndices(inputCfg, ptMins, ptMaxs)
+    SaveScoreIndices(indexFileName, indices, indexHash)
+    print(f'Sorted-score index saved in {indexFileName}')
+
+if args.batch:
+    gROOT.SetBatch(True)
+    gROOT.ProcessLine("gErrorIgnoreLevel = kFatal;")
+
+SetGlobalStyle(padleftmargin=0.14, padbottommargin=0.14, titleoffsety=1.4)
+
+estNames = {'Signif': 'expected significance', 'SoverB': 'S/B', 'S': 'expected signal', 'B': 'expected background',
+            'EffPrompt': '#font[152]{e}_{prompt}', 'EffFD': '#font[152]{e}_{FD}'}
+bkgConfig = inputCfg['background']
+thrBinEdges = np.concatenate((thresholds - inputCfg['scorevar']['step'] / 2,
+                              [thresholds[-1] + inputCfg['scorevar']['step'] / 2]))
+
+outFile = TFile(args.outFileName, 'recreate')
+dfsScan, cEstimVsThr = [], []
+for iPt, (ptMin, ptMax) in enumerate(zip(ptMins, ptMaxs)):
+    # efficiencies (with respect to the preselection) and background for all the thresholds from the index
+    effPrompt = GetScoreIndexCounts(indices[f'prompt_pt{iPt}'], scoreMins, scoreMaxs) \
+        / indices[f'prompt_pt{iPt}']['cumWeights'][-1]
+    effFD = GetScoreIndexCounts(indices[f'feeddown_pt{iPt}'], scoreMins, scoreMaxs) \
+        / indices[f'feeddown_pt{iPt}']['cumWeights'][-1]
+    massCounts = GetScoreIndexMassCounts(indices[f'data_pt{iPt}'], scoreMins, scoreMaxs)
+    expBkg, errExpBkg = GetExpectedBkgFromSideBandsChunks(massCounts, indices[f'data_pt{iPt}']['massBinEdges'],
+                                                          bkgConfig['fitFunc'], bkgConfig['nSigma'],
+                                                          float(indices[f'signal_pt{iPt}']['mean']),
+                                                          float(indices[f'signal_pt{iPt}']['sigma']))
+    expSignal = inputCfg['expectedsignal']['yield'][iPt] * (inputCfg['expectedsignal']['fprompt'][iPt] * effPrompt +
+                                                            (1 - inputCfg['expectedsignal']['fprompt'][iPt]) * effFD)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        figures = {'Signif': expSignal / np.sqrt(expSignal + expBkg), 'SoverB': expSignal / expBkg, 'S': expSignal,
+                   'B': expBkg, 'EffPrompt': effPrompt, 'EffFD': effFD}
+    dfsScan.append(pd.DataFrame({scoreName: thresholds, 'PtMin': ptMin, 'PtMax': ptMax, 'BError': errExpBkg,
+                                 **figures}))
+
+    iBest = np.nanargmax(figures['Signif']) if np.any(np.isfinite(figures['Signif'])) else 0
+    print(f'{ptMin} < pT < {ptMax} GeV/c: best {scoreName} threshold {thresholds[iBest]:.4f}, expected '
+          f'significance {figures["Signif"][iBest]:.2f}, S/B {figures["SoverB"][iBest]:.4f}')
+
+    outFile.mkdir(f'pT{ptMin}-{ptMax}')
+    outFile.cd(f'pT{ptMin}-{ptMax}')
+    cEstimVsThr.append(TCanvas(f'cEstimVsThr_pT{ptMin}-{ptMax}', '', 1200, 800))
+    cEstimVsThr[iPt].Divide(3, 2)
+    for iEst, est in enumerate(estNames):
+        hEstimVsThr = TH1F(f'h{est}Vs{scoreName}_pT{ptMin}-{ptMax}', f';{scoreName};{estNames[est]}',
+                           len(thresholds), thrBinEdges)
+        for iThr, value in enumerate(figures[est]):
+            hEstimVsThr.SetBinContent(iThr + 1, value if np.isfinite(value) else 0.)
+            if est == 'B':
+                hEstimVsThr.SetBinError(iThr + 1, errExpBkg[iThr])
+            else:
+                hEstimVsThr.SetBinError(iThr + 1, 0.)
+        SetObjectStyle(hEstimVsThr, color=kBlack, markerstyle=kFullCircle)
+        cEstimVsThr[iPt].cd(iEst + 1)
+        hEstimVsThr.DrawCopy('p')
+        hEstimVsThr.Write()
+    cEstimVsThr[iPt].Write()
+outFile.Close()
+
+WriteScanParquet(args.outFileName.replace('.root', '.parquet'), dfsScan, [scoreName], ['Signif', 'SoverB'], args.topk)
+
+if not args.batch:
+    input('Press enter to exit')
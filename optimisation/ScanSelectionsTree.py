@@ -3,29 +3,343 @@ python script for the optimisation of the working point using TTrees or pandas d
 run: python ScanSelectionTree.py cfgFileName.yml outFileName.root
 '''
 
+import os
 import sys
 import argparse
+import hashlib
 import time
-import itertools
+from multiprocessing import get_context
 import numpy as np
+import pandas as pd
 import yaml
 from ROOT import TFile, TH1F, TH2F, TF1, TCanvas, TNtuple, TDirectoryFile  # pylint: disable=import-error,no-name-in-module
 from ROOT import gROOT, kRainBow, kBlack, kFullCircle  # pylint: disable=import-error,no-name-in-module
 sys.path.append('..')
-from utils.AnalysisUtils import ComputeEfficiency, GetPromptFDFractionFc, GetExpectedBkgFromSideBands  #pylint: disable=wrong-import-position,import-error
-from utils.AnalysisUtils import  GetExpectedBkgFromMC, GetExpectedSignal  #pylint: disable=wrong-import-position,import-error
+from utils.AnalysisUtils import ComputeEfficiency, GetExpectedBkgFromSideBands, GetExpectedBkgFromMC  #pylint: disable=wrong-import-position,import-error
+from utils.AnalysisUtils import SetHistoFromArrays  #pylint: disable=wrong-import-position,import-error
+from utils.ScanUtils import GetCutGrid, GetCutSetValues, GetCutSetCounts, GetExpectedBkgFromSideBandsChunks  #pylint: disable=wrong-import-position,import-error
+from utils.ScanUtils import ComputeScanFigures, GetCutSetCountsAtPoints, RunCutSetSearch  #pylint: disable=wrong-import-position,import-error
+from utils.ScanUtils import WriteScanParquet, BuildCutTemplates, GetCutSetCountsFromTemplate  #pylint: disable=wrong-import-position,import-error
+from utils.ScanUtils import GetScanCacheKey, LoadScanCache, SaveScanCache, GetCutSetMassCountsOwnRange  #pylint: disable=wrong-import-position,import-error
 from utils.FitUtils import SingleGaus #pylint: disable=wrong-import-position,import-error
 from utils.StyleFormatter import SetGlobalStyle, SetObjectStyle  #pylint: disable=wrong-import-position,import-error
-from utils.DfUtils import LoadDfFromRootOrParquet  #pylint: disable=wrong-import-position,import-error
-from utils.ReadModel import ReadTAMU, ReadPHSD, ReadMCatsHQ, ReadCatania  #pylint: disable=wrong-import-position,import-error
+from utils.DfUtils import LoadDfFromRootOrParquet, IterateDfFromRootOrParquet  #pylint: disable=wrong-import-position,import-error
+from utils.ReadModel import ReadTAMU, ReadPHSD, ReadMCatsHQ, ReadCatania, EvaluateModel  #pylint: disable=wrong-import-position,import-error
+
+
+def EstimateBkgCutSets(massCounts, massBinEdges, scanInputs, firstSet=0):
+    '''
+    Helper method to estimate the background of many cut sets from their invariant-mass spectra
+    (with bin edges shared by all the cut sets or one set of edges per cut set)
+    '''
+    bkgConfig = scanInputs['bkgConfig']
+    if bkgConfig.get('closedForm', False) and not bkgConfig['isMC']:
+        return GetExpectedBkgFromSideBandsChunks(massCounts, massBinEdges, bkgConfig['fitFunc'],
+                                                 bkgConfig['nSigma'], *scanInputs['peakPars'])
+
+    massBinEdges = np.broadcast_to(massBinEdges, (len(massCounts), massCounts.shape[1] + 1))
+    expBkg, errExpBkg = np.zeros(len(massCounts)), np.zeros(len(massCounts))
+    for iSet, (massCountsSet, massBinEdgesSet) in enumerate(zip(massCounts, massBinEdges)):
+        hMassBkg = TH1F(f'{scanInputs["histoName"]}_cutSet{iSet+firstSet}', ';#it{M} (GeV/#it{c});Counts',
+                        len(massBinEdgesSet)-1, massBinEdgesSet[0], massBinEdgesSet[-1])
+        SetHistoFromArrays(hMassBkg, massCountsSet, np.sqrt(massCountsSet))
+        scanInputs['outDir'].cd()
+        if bkgConfig['isMC']:
+            expBkg[iSet], errExpBkg[iSet], hMassBkg = GetExpectedBkgFromMC(hMassBkg, *scanInputs['peakPars'][:2])
+        else:
+            expBkg[iSet], errExpBkg[iSet], hMassBkg = GetExpectedBkgFromSideBands(
+                hMassBkg, bkgConfig['fitFunc'], bkgConfig['nSigma'], *scanInputs['peakPars'])
+        hMassBkg.Write()
+
+    return expBkg, errExpBkg
+
+
+def EvaluateCutGrid(cutRangesEval, scanInputs, firstSet=0):
+    '''
+    Helper method to compute the figures of merit of all the cut sets of a rectangular grid
+    with the cumulative count tensors
+    '''
+    massBinEdges = scanInputs['massBinEdges']
+    if scanInputs['bkgTemplate'] is not None:
+        nSelPrompt, nSelFD = [GetCutSetCounts(df, scanInputs['varNames'], cutRangesEval, scanInputs['upperLowerCuts'])
+                              for df in scanInputs['dfs'][:2]]
+        massCountsBkg = GetCutSetCountsFromTemplate(scanInputs['bkgTemplate'], scanInputs['cutRanges'],
+                                                    GetCutSetValues(cutRangesEval))
+    elif scanInputs['sharedMassBinning']:
+        nSelPrompt, nSelFD, massCountsBkg = [GetCutSetCounts(df, scanInputs['varNames'], cutRangesEval,
+                                                             scanInputs['upperLowerCuts'], massBinEdgesDf)
+                                             for df, massBinEdgesDf in zip(scanInputs['dfs'],
+                                                                           [None, None, massBinEdges])]
+    else:
+        nSelPrompt, nSelFD = [GetCutSetCounts(df, scanInputs['varNames'], cutRangesEval, scanInputs['upperLowerCuts'])
+                              for df in scanInputs['dfs'][:2]]
+        massCountsBkg, massBinEdges = GetCutSetMassCountsOwnRange(scanInputs['dfs'][2], GetCutSetValues(cutRangesEval),
+                                                                  scanInputs['varNames'],
+                                                                  scanInputs['upperLowerCuts'], len(massBinEdges)-1)
+    expBkg, errExpBkg = EstimateBkgCutSets(massCountsBkg, massBinEdges, scanInputs, firstSet)
+
+    return ComputeScanFigures(nSelPrompt, nSelFD, expBkg, errExpBkg, scanInputs['scanConsts'],
+                              scanInputs['signalFrom'])
+
+
+def EvaluateCutSets(cutSetValuesEval, scanInputs, firstSet=0):
+    '''
+    Helper method to compute the figures of merit of arbitrary cut sets
+    '''
+    massBinEdges = scanInputs['massBinEdges']
+    if scanInputs['bkgTemplate'] is not None:
+        nSelPrompt, nSelFD = [GetCutSetCountsAtPoints(df, scanInputs['varNames'], cutSetValuesEval,
+                                                      scanInputs['upperLowerCuts']) for df in scanInputs['dfs'][:2]]
+        massCountsBkg = GetCutSetCountsFromTemplate(scanInputs['bkgTemplate'], scanInputs['cutRanges'],
+                                                    cutSetValuesEval)
+    elif scanInputs['sharedMassBinning']:
+        nSelPrompt, nSelFD, massCountsBkg = [GetCutSetCountsAtPoints(df, scanInputs['varNames'], cutSetValuesEval,
+                                                                     scanInputs['upperLowerCuts'], massBinEdgesDf)
+                                             for df, massBinEdgesDf in zip(scanInputs['dfs'],
+                                                                           [None, None, massBinEdges])]
+    else:
+        nSelPrompt, nSelFD = [GetCutSetCountsAtPoints(df, scanInputs['varNames'], cutSetValuesEval,
+                                                      scanInputs['upperLowerCuts']) for df in scanInputs['dfs'][:2]]
+        massCountsBkg, massBinEdges = GetCutSetMassCountsOwnRange(scanInputs['dfs'][2], cutSetValuesEval,
+                                                                  scanInputs['varNames'],
+                                                                  scanInputs['upperLowerCuts'], len(massBinEdges)-1)
+    expBkg, errExpBkg = EstimateBkgCutSets(massCountsBkg, massBinEdges, scanInputs, firstSet)
+
+    return ComputeScanFigures(nSelPrompt, nSelFD, expBkg, errExpBkg, scanInputs['scanConsts'],
+                              scanInputs['signalFrom'])
+
+
+def RunScanTask(scanInputs, cutRangesTask, searchCfg, firstSet=0):
+    '''
+    Helper method to scan the cut sets of a pT bin (or of a chunk of its grid), exhaustively or with
+    the search strategy
+    '''
+    if searchCfg['strategy'] == 'grid':
+        return GetCutSetValues(cutRangesTask), EvaluateCutGrid(cutRangesTask, scanInputs, firstSet)
+
+    nEvaluated = [firstSet]
+    def EvaluateAndCount(cutSetValuesEval):
+        figuresEval = EvaluateCutSets(cutSetValuesEval, scanInputs, nEvaluated[0])
+        nEvaluated[0] += len(cutSetValuesEval)
+        return figuresEval
+
+    return RunCutSetSearch(EvaluateAndCount, cutRangesTask, searchCfg['strategy'], searchCfg['maxevaluations'],
+                           searchCfg['maxtime'], searchCfg['figureofmerit'], searchCfg['batchsize'],
+                           searchCfg['seed'], nPoints=searchCfg['npoints'], shrink=searchCfg['shrink'],
+                           nStartup=searchCfg['nstartup'])
+
+
+def GetNtupleValues(cutSetValuesTask, figures, task, figureNames, dtype='f'):
+    '''
+    Helper method to get the rows of the output ntuple (or parquet table) for the cut sets of a scan task
+    '''
+    return np.column_stack([cutSetValuesTask, np.tile([task['ptMin'], task['ptMax'], task['ParCutMin'],
+                                                       task['ParCutMax']], (len(cutSetValuesTask), 1))]
+                           + [figures[est] for est in figureNames]).astype(dtype)
+
+
+# inputs shared by the processes of the pool
+scanShared = {}
+
+
+def InitWorker(sharedInputs):
+    '''
+    Helper method to share the scan inputs with the (forked) processes of the pool
+    '''
+    scanShared.update(sharedInputs)
+
+
+def RunScanShard(shardArgs):
+    '''
+    Helper method to scan a shard (chunk of the grid of a scan task) in a process of the pool, writing the
+    side-band fits in a partial output file and the results (in double precision) in a npy file next to it
+    '''
+    iShard, (iTask, _, firstValue, lastValue, shardFileName) = shardArgs
+    startTimeShard = time.time()
+    task = scanShared['tasks'][iTask]
+    cutRangesShard = [scanShared['cutRanges'][0][firstValue:lastValue]] + scanShared['cutRanges'][1:]
+    firstSet = firstValue * int(np.prod([len(cutRange) for cutRange in scanShared['cutRanges'][1:]]))
+    shardFile = TFile(shardFileName, 'recreate')
+    cutSetValuesShard, figures = RunScanTask(dict(task['scanInputs'], outDir=shardFile), cutRangesShard,
+                                             scanShared['searchCfg'], firstSet)
+    shardFile.Close()
+    np.save(os.path.splitext(shardFileName)[0] + '.npy',
+            GetNtupleValues(cutSetValuesShard, figures, task, scanShared['figureNames'], 'd'))
+
+    return iShard, time.time() - startTimeShard
+
+
+def ComputeScanConstsPt(inputCfg, ptMins, ptMaxs, dfPrompt, dfFD, dfSecPeakPrompt, dfSecPeakFD):
+    '''
+    Helper method to compute the constants of each pT bin that do not depend on the tested cut sets (preselection
+    efficiency, acceptance, cross sections, RAA, background correction factor and signal-peak parameters)
+    '''
+    # load preselection efficiency
+    if inputCfg['infiles']['preseleff']['filename']:
+        infilePreselEff = TFile.Open(inputCfg['infiles']['preseleff']['filename'])
+        hPreselEffPrompt = infilePreselEff.Get(inputCfg['infiles']['preseleff']['prompthistoname'])
+        hPreselEffFD = infilePreselEff.Get(inputCfg['infiles']['preseleff']['feeddownhistoname'])
+
+    # load acceptance
+    infileAcc = TFile.Open(inputCfg['infiles']['acceptance'])
+    hPtGenAcc = infileAcc.Get('hPtGenAcc')
+    hPtGenLimAcc = infileAcc.Get('hPtGenLimAcc')
+
+    # load cross sections
+    inFileCrossSec = TFile.Open(inputCfg['predictions']['crosssec']['filename'])
+    hCrossSecPrompt = inFileCrossSec.Get(inputCfg['predictions']['crosssec']['histonames']['prompt'])
+    hCrossSecFD = inFileCrossSec.Get(inputCfg['predictions']['crosssec']['histonames']['feeddown'])
+
+    # load RAA
+    RaaPrompt_config = inputCfg['predictions']['Raa']['prompt']
+    if not isinstance(RaaPrompt_config, float) and not isinstance(RaaPrompt_config, int):
+        if not isinstance(RaaPrompt_config, str):
+            print('ERROR: RAA must be at least a string or a number. Exit')
+            sys.exit()
+        else:
+            Raa_model_name = inputCfg['predictions']['Raa']['model']
+            if Raa_model_name not in ['phsd', 'Catania', 'tamu', 'MCatsHQ']:
+                print('ERROR: wrong model name, please check the list of avaliable models. Exit')
+                sys.exit()
+            else:
+                if Raa_model_name == 'phsd':
+                    RaaPromptSpline, _, ptMinRaaPrompt, ptMaxRaaPrompt = ReadPHSD(RaaPrompt_config)
+                elif Raa_model_name == 'Catania':
+                    RaaPromptSpline, _, ptMinRaaPrompt, ptMaxRaaPrompt = ReadCatania(RaaPrompt_config)
+                elif Raa_model_name == 'MCatsHQ':
+                    RaaPromptSpline, _, ptMinRaaPrompt, ptMaxRaaPrompt = ReadMCatsHQ(RaaPrompt_config)
+                elif Raa_model_name == 'tamu':
+                    RaaPromptSpline, _, ptMinRaaPrompt, ptMaxRaaPrompt = ReadTAMU(RaaPrompt_config)
+    else:
+        RaaPrompt = RaaPrompt_config
 
-parser = argparse.ArgumentParser(description='Arguments to pass')
+    RaaFD_config = inputCfg['predictions']['Raa']['feeddown']
+    if not isinstance(RaaFD_config, float) and not isinstance(RaaFD_config, int):
+        if not isinstance(RaaFD_config, str):
+            print('ERROR: RAA must be at least a string or a number. Exit')
+            sys.exit()
+        else:
+            Raa_model_name = inputCfg['predictions']['Raa']['model']
+            if Raa_model_name not in ['phsd', 'Catania', 'tamu', 'MCatsHQ']:
+                print('ERROR: wrong model name, please check the list of avaliable models. Exit')
+                sys.exit()
+            else:
+                if Raa_model_name == 'phsd':
+                    RaaFDSpline, _, ptMinRaaFD, ptMaxRaaFD = ReadPHSD(RaaFD_config)
+                elif Raa_model_name == 'Catania':
+                    RaaFDSpline, _, ptMinRaaFD, ptMaxRaaFD = ReadCatania(RaaFD_config)
+                elif Raa_model_name == 'MCatsHQ':
+                    RaaFDSpline, _, ptMinRaaFD, ptMaxRaaFD = ReadMCatsHQ(RaaFD_config)
+                elif Raa_model_name == 'tamu':
+                    RaaFDSpline, _, ptMinRaaFD, ptMaxRaaFD = ReadTAMU(RaaFD_config)
+    else:
+        RaaFD = RaaFD_config
+
+    # load background correction factor
+    bkgConfig = inputCfg['infiles']['background']
+    if bkgConfig['corrfactor']['filename']:
+        inFileBkgCorrFactor = TFile.Open(bkgConfig['corrfactor']['filename'])
+        hBkgCorrFactor = inFileBkgCorrFactor.Get(bkgConfig['corrfactor']['histoname'])
+
+    scanConstsPt = []
+    for ptMin, ptMax in zip(ptMins, ptMaxs):
+        dfPromptPt = dfPrompt.query(f'{ptMin} < pt_cand < {ptMax}')
+        dfFDPt = dfFD.query(f'{ptMin} < pt_cand < {ptMax}')
+
+        # Raa
+        ptCent = (ptMax + ptMin) / 2.
+        if isinstance(RaaPrompt_config, str):
+            RaaPrompt = float(EvaluateModel(RaaPromptSpline, ptCent, ptMinRaaPrompt, ptMaxRaaPrompt)[0])
+        if isinstance(RaaFD_config, str):
+            RaaFD = float(EvaluateModel(RaaFDSpline, ptCent, ptMinRaaFD, ptMaxRaaFD)[0])
+
+        # preselection efficiency (if input provided)
+        if inputCfg['infiles']['preseleff']['filename']:
+            ptBinPreselEff = hPreselEffPrompt.GetXaxis().FindBin(ptMin*1.0001)
+            preselEffPrompt = hPreselEffPrompt.GetBinContent(ptBinPreselEff)
+            preselEffFD = hPreselEffFD.GetBinContent(ptBinPreselEff)
+            preselEffPromptUnc = hPreselEffPrompt.GetBinError(ptBinPreselEff)
+            preselEffFDUnc = hPreselEffFD.GetBinError(ptBinPreselEff)
+        else:
+            preselEffPrompt = 1.
+            preselEffFD = 1.
+            preselEffPromptUnc = 0.
+            preselEffFDUnc = 0.
+
+        # acceptance
+        ptBinAccMin = hPtGenAcc.GetXaxis().FindBin(ptMin*1.0001)
+        ptBinAccMax = hPtGenAcc.GetXaxis().FindBin(ptMax*0.9999)
+        numAcc = hPtGenAcc.Integral(ptBinAccMin, ptBinAccMax)
+        denAcc = hPtGenLimAcc.Integral(ptBinAccMin, ptBinAccMax)
+        acc, accUnc = ComputeEfficiency(numAcc, denAcc, np.sqrt(numAcc), np.sqrt(denAcc))
+
+        # cross section from theory
+        ptBinCrossSecMin = hCrossSecPrompt.GetXaxis().FindBin(ptMin*1.0001)
+        ptBinCrossSecMax = hCrossSecPrompt.GetXaxis().FindBin(ptMax*0.9999)
+        crossSecPrompt = hCrossSecPrompt.Integral(ptBinCrossSecMin, ptBinCrossSecMax, 'width') / (ptMax - ptMin)
+        crossSecFD = hCrossSecFD.Integral(ptBinCrossSecMin, ptBinCrossSecMax, 'width') / (ptMax - ptMin)
+
+        # background correction factor
+        bkgCorrFactor = hBkgCorrFactor.GetBinContent(hBkgCorrFactor.FindBin(ptCent)) \
+            if bkgConfig['corrfactor']['filename'] else 1.
+
+        # signal histograms
+        hMassSignal = TH1F(f'hMassSignal_pT{ptMin}-{ptMax}', ';#it{M} (GeV/#it{c});Counts', 400,
+                           min(dfPromptPt['inv_mass']), max(dfPromptPt['inv_mass']))
+        for mass in np.concatenate((dfPromptPt['inv_mass'].to_numpy(), dfFDPt['inv_mass'].to_numpy())):
+            hMassSignal.Fill(mass)
+        funcSignal = TF1('funcSignal', SingleGaus, 1.6, 2.2, 3)
+        funcSignal.SetParameters(hMassSignal.Integral('width'), hMassSignal.GetMean(), hMassSignal.GetRMS())
+        hMassSignal.Fit('funcSignal', 'Q0')
+        mean = funcSignal.GetParameter(1)
+        sigma = funcSignal.GetParameter(2)
+        # SecPeak
+        meanSecPeak = inputCfg['infiles']['secpeak']['mean']
+        sigmaSecPeak = inputCfg['infiles']['secpeak']['sigma']
+        if dfSecPeakPrompt and dfSecPeakFD:
+            hMassSecPeak = TH1F(f'hMassSignal_pT{ptMin}-{ptMax}', ';#it{M} (GeV/#it{c});Counts', 400,
+                                min(dfSecPeakPrompt['inv_mass']), max(dfSecPeakPrompt['inv_mass']))
+            for mass in np.concatenate((dfSecPeakPrompt['inv_mass'].to_numpy(),
+                                        dfSecPeakFD['inv_mass'].to_numpy())):
+                hMassSecPeak.Fill(mass)
+            funcSignal.SetParameters(hMassSecPeak.Integral('width'), hMassSecPeak.GetMean(), hMassSecPeak.GetRMS())
+            hMassSecPeak.Fit('funcSignal', 'Q0')
+            meanSecPeak = funcSignal.GetParameter(1)
+            sigmaSecPeak = funcSignal.GetParameter(2)
+
+        scanConstsPt.append({'preselEffPrompt': preselEffPrompt, 'preselEffFD': preselEffFD,
+                             'preselEffPromptUnc': preselEffPromptUnc, 'preselEffFDUnc': preselEffFDUnc,
+                             'acc': acc, 'accUnc': accUnc, 'crossSecPrompt': crossSecPrompt,
+                             'crossSecFD': crossSecFD, 'raaPrompt': RaaPrompt, 'raaFD': RaaFD,
+                             'bkgCorrFactor': bkgCorrFactor, 'mean': mean, 'sigma': sigma,
+                             'meanSecPeak': meanSecPeak, 'sigmaSecPeak': sigmaSecPeak})
+        scanConstsPt[-1] = {key: float(value) for key, value in scanConstsPt[-1].items()}
+
+    return scanConstsPt
+
+
+parser =argparse.ArgumentParser(description='Arguments to pass')
 parser.add_argument('cfgFileName', metavar='text', default='cfgFileName.yml',
                     help='config file name with root input files')
 parser.add_argument('outFileName', metavar='text', default='outFile.root',
                     help='output root file name')
 parser.add_argument("--batch", help="suppress video output",
                     action="store_true")
+parser.add_argument('--nworkers', type=int, default=1,
+                    help='number of parallel processes (scan split in shards merged at the end if > 1)')
+parser.add_argument('--nchunks', type=int, default=None,
+                    help='number of chunks of the first cut variable per pT bin in the parallel scan '
+                         '(default: nworkers)')
+parser.add_argument('--parquet', action='store_true', default=False,
+                    help='write the scan results also in a parquet file, with an index of the best cut sets '
+                         'per pT bin')
+parser.add_argument('--topk', type=int, default=100,
+                    help='number of best cut sets per pT bin in the index of the parquet output')
+parser.add_argument('--checkpoint', action='store_true', default=False,
+                    help='record the completed shards of the scan and skip them when the scan is restarted')
+parser.add_argument('--nocache', action='store_true', default=False,
+                    help='recompute the constants of the pT bins (efficiencies, cross sections, RAA, signal peak) '
+                         'instead of loading them from the cache')
 args = parser.parse_args()
 
 with open(args.cfgFileName, 'r') as ymlCfgFile:
@@ -38,9 +352,18 @@ dfPrompt = LoadDfFromRootOrParquet(inputCfg['infiles']['signal']['prompt']['file
 dfFD = LoadDfFromRootOrParquet(inputCfg['infiles']['signal']['feeddown']['filename'],
                                inputCfg['infiles']['signal']['feeddown']['dirname'],
                                inputCfg['infiles']['signal']['feeddown']['treename'])
-dfBkg_tot = LoadDfFromRootOrParquet(inputCfg['infiles']['background']['filename'],
-                                    inputCfg['infiles']['background']['dirname'],
-                                    inputCfg['infiles']['background']['treename'])
+# with background templates the full background sample is streamed in chunks instead of being loaded
+bkgTemplatesCfg = inputCfg['infiles']['background']['templates'] \
+    if 'templates' in inputCfg['infiles']['background'] else {'enable': False}
+# background mass spectra of all the cut sets binned in the mass range of the pT bin (always with templates)
+# instead of the range of the candidates selected by each cut set
+sharedMassBinning = bkgTemplatesCfg['enable'] or inputCfg['infiles']['background'].get('sharedMassBinning', False)
+if bkgTemplatesCfg['enable'] and not inputCfg['infiles']['background'].get('sharedMassBinning', False):
+    print('WARNING: background templates enabled, the mass spectra of all the cut sets share the binning of the pT bin')
+if not bkgTemplatesCfg['enable']:
+    dfBkg_tot = LoadDfFromRootOrParquet(inputCfg['infiles']['background']['filename'],
+                                        inputCfg['infiles']['background']['dirname'],
+                                        inputCfg['infiles']['background']['treename'])
 if inputCfg['infiles']['secpeak']['prompt']['filename']:
     dfSecPeakPrompt = LoadDfFromRootOrParquet(inputCfg['infiles']['secpeak']['prompt']['filename'],
                                               inputCfg['infiles']['secpeak']['prompt']['dirname'],
@@ -54,8 +377,6 @@ if inputCfg['infiles']['secpeak']['feeddown']['filename']:
 else:
     dfSecPeakFD = None
 
-fractionstokeep = inputCfg['infiles']['background']['fractiontokeep']
-
 # load cut values to scan
 ptMins = inputCfg['ptmin']
 ptMaxs = inputCfg['ptmax']
@@ -63,6 +384,22 @@ if not isinstance(ptMins, list):
     ptMins = [ptMins]
 if not isinstance(ptMaxs, list):
     ptMaxs = [ptMaxs]
+
+if bkgTemplatesCfg['enable']:
+    fractionstokeep = [1.] * len(ptMins)
+    # first pass on the background sample (only pT and mass) for the invariant-mass limits of each pT bin
+    bkgMassLimits = [[np.inf, -np.inf] for _ in ptMins]
+    for dfBkgChunk in IterateDfFromRootOrParquet(inputCfg['infiles']['background']['filename'],
+                                                 inputCfg['infiles']['background']['dirname'],
+                                                 inputCfg['infiles']['background']['treename'],
+                                                 ['pt_cand', 'inv_mass'], bkgTemplatesCfg['chunksize']):
+        for iPt, (ptMin, ptMax) in enumerate(zip(ptMins, ptMaxs)):
+            massBkgChunk = dfBkgChunk.query(f'{ptMin} < pt_cand < {ptMax}')['inv_mass']
+            if len(massBkgChunk) > 0:
+                bkgMassLimits[iPt] = [min(bkgMassLimits[iPt][0], massBkgChunk.min()),
+                                      max(bkgMassLimits[iPt][1], massBkgChunk.max())]
+else:
+    fractionstokeep = inputCfg['infiles']['background']['fractiontokeep']
 ParCutsName = inputCfg['dfparametercuts']['name']
 EnableParCuts = inputCfg['dfparametercuts']['enable']
 if EnableParCuts:
@@ -79,82 +416,40 @@ else:
     ParCutMaxs.append(1.e10)
 
 cutVars = inputCfg['cutvars']
-cutRanges, upperLowerCuts, varNames = [], [], []
-for var in cutVars:
-    cutRanges.append(np.arange(cutVars[var]['min'], cutVars[var]['max'] +
-                               cutVars[var]['step'] / 10, cutVars[var]['step']).tolist())
-    if cutVars[var]['upperlowercut'] == 'Upper':
-        upperLowerCuts.append('<')
-    else:
-        upperLowerCuts.append('>')
-    varNames.append(var)
-
-# load preselection efficiency
-if inputCfg['infiles']['preseleff']['filename']:
-    infilePreselEff = TFile.Open(inputCfg['infiles']['preseleff']['filename'])
-    hPreselEffPrompt = infilePreselEff.Get(inputCfg['infiles']['preseleff']['prompthistoname'])
-    hPreselEffFD = infilePreselEff.Get(inputCfg['infiles']['preseleff']['feeddownhistoname'])
-
-# load acceptance
-infileAcc = TFile.Open(inputCfg['infiles']['acceptance'])
-hPtGenAcc = infileAcc.Get('hPtGenAcc')
-hPtGenLimAcc = infileAcc.Get('hPtGenLimAcc')
-
-# load cross sections
-inFileCrossSec = TFile.Open(inputCfg['predictions']['crosssec']['filename'])
-hCrossSecPrompt = inFileCrossSec.Get(inputCfg['predictions']['crosssec']['histonames']['prompt'])
-hCrossSecFD = inFileCrossSec.Get(inputCfg['predictions']['crosssec']['histonames']['feeddown'])
-
-# load RAA
-RaaPrompt_config = inputCfg['predictions']['Raa']['prompt']
-if not isinstance(RaaPrompt_config, float) and not isinstance(RaaPrompt_config, int):
-    if not isinstance(RaaPrompt_config, str):
-        print('ERROR: RAA must be at least a string or a number. Exit')
-        sys.exit()
-    else:
-        Raa_model_name = inputCfg['predictions']['Raa']['model']
-        if Raa_model_name not in ['phsd', 'Catania', 'tamu', 'MCatsHQ']:
-            print('ERROR: wrong model name, please check the list of avaliable models. Exit')
-            sys.exit()
-        else:
-            if Raa_model_name == 'phsd':
-                RaaPromptSpline, _, ptMinRaaPrompt, ptMaxRaaPrompt = ReadPHSD(RaaPrompt_config)
-            elif Raa_model_name == 'Catania':
-                RaaPromptSpline, _, ptMinRaaPrompt, ptMaxRaaPrompt = ReadCatania(RaaPrompt_config)
-            elif Raa_model_name == 'MCatsHQ':
-                RaaPromptSpline, _, ptMinRaaPrompt, ptMaxRaaPrompt = ReadMCatsHQ(RaaPrompt_config)
-            elif Raa_model_name == 'tamu':
-                RaaPromptSpline, _, ptMinRaaPrompt, ptMaxRaaPrompt = ReadTAMU(RaaPrompt_config)
+varNames, cutRanges, upperLowerCuts = GetCutGrid(cutVars)
+cutSetValues = GetCutSetValues(cutRanges)
+
+# strategy to search the working point, exhaustive scan of the grid by default
+searchCfg = inputCfg['search'] if 'search' in inputCfg else {'strategy': 'grid'}
+if searchCfg['strategy'] not in ['grid', 'coarsetofine', 'random', 'sobol', 'tpe']:
+    print(f'ERROR: search strategy {searchCfg["strategy"]} not implemented! Exit')
+    sys.exit()
+
+# constants of each pT bin independent of the cut sets, cached to be reused by the scans with the same inputs
+scanCacheKey = GetScanCacheKey(
+    [inputCfg['infiles'][key] for key in ['signal', 'secpeak', 'preseleff', 'acceptance']]
+    + [inputCfg['infiles']['background']['corrfactor'], inputCfg['predictions'], ptMins, ptMaxs],
+    [inputCfg['infiles']['signal']['prompt']['filename'], inputCfg['infiles']['signal']['feeddown']['filename'],
+     inputCfg['infiles']['secpeak']['prompt']['filename'], inputCfg['infiles']['secpeak']['feeddown']['filename'],
+     inputCfg['infiles']['preseleff']['filename'], inputCfg['infiles']['acceptance'],
+     inputCfg['predictions']['crosssec']['filename'], inputCfg['infiles']['background']['corrfactor']['filename']]
+    + [inputCfg['predictions']['Raa'][sample] for sample in ['prompt', 'feeddown']
+       if isinstance(inputCfg['predictions']['Raa'][sample], str)])
+scanConstsPt = LoadScanCache(scanCacheKey) if not args.nocache else None
+if scanConstsPt is None:
+    scanConstsPt = ComputeScanConstsPt(inputCfg, ptMins, ptMaxs, dfPrompt, dfFD, dfSecPeakPrompt, dfSecPeakFD)
+    SaveScanCache(scanCacheKey, scanConstsPt)
 else:
-    RaaPrompt = RaaPrompt_config
-
-RaaFD_config = inputCfg['predictions']['Raa']['feeddown']
-if not isinstance(RaaFD_config, float) and not isinstance(RaaFD_config, int):
-    if not isinstance(RaaFD_config, str):
-        print('ERROR: RAA must be at least a string or a number. Exit')
-        sys.exit()
-    else:
-        Raa_model_name = inputCfg['predictions']['Raa']['model']
-        if Raa_model_name not in ['phsd', 'Catania', 'tamu', 'MCatsHQ']:
-            print('ERROR: wrong model name, please check the list of avaliable models. Exit')
-            sys.exit()
-        else:
-            if Raa_model_name == 'phsd':
-                RaaFDSpline, _, ptMinRaaFD, ptMaxRaaFD = ReadPHSD(RaaFD_config)
-            elif Raa_model_name == 'Catania':
-                RaaFDSpline, _, ptMinRaaFD, ptMaxRaaFD = ReadCatania(RaaFD_config)
-            elif Raa_model_name == 'MCatsHQ':
-                RaaFDSpline, _, ptMinRaaFD, ptMaxRaaFD = ReadMCatsHQ(RaaFD_config)
-            elif Raa_model_name == 'tamu':
-                RaaFDSpline, _, ptMinRaaFD, ptMaxRaaFD = ReadTAMU(RaaFD_config)
-else:
-    RaaFD = RaaFD_config
+    print(f'Constants of the pT bins loaded from the cache {scanCacheKey}')
 
 # load constant terms
 nExpEv = inputCfg['nExpectedEvents']
 Taa = inputCfg['Taa']
 sigmaMB = inputCfg['sigmaMB']
 
+# background configuration
+bkgConfig = inputCfg['infiles']['background']
+
 # set batch mode if enabled
 if args.batch:
     gROOT.SetBatch(True)
@@ -175,24 +470,31 @@ estNames = {'Signif': 'expected significance', 'SoverB': 'S/B', 'S': 'expected s
             'EffAccPrompt': '(Acc#times#font[152]{e})_{prompt}', 'EffAccFD': '(Acc#times#font[152]{e})_{FD}',
             'fPrompt': '#it{f}_{ prompt}^{ fc}', 'fFD': '#it{f}_{ FD}^{ fc}'}
 
-varsName4Tuple = (':'.join(cutVars) + ':PtMin:PtMax:ParCutMin:ParCutMax:EffAccPromptError:EffAccFDError:SError:BError'
-                  ':SignifError:SoverBError:' + ':'.join(estNames.keys()))
+estErrNames = ['EffAccPromptError', 'EffAccFDError', 'SError', 'BError', 'SignifError', 'SoverBError']
+varsName4Tuple = (':'.join(cutVars) + ':PtMin:PtMax:ParCutMin:ParCutMax:' + ':'.join(estErrNames) + ':'
+                  + ':'.join(estNames.keys()))
 tSignif = TNtuple('tSignif', 'tSignif', varsName4Tuple)
 
-totSets = 1
-for cutRange in cutRanges:
-    totSets *= len(cutRange)
+totSets = len(cutSetValues)
 print(f'Total number of sets per pT bin: {totSets}')
+if searchCfg['strategy'] != 'grid':
+    print(f'Search strategy {searchCfg["strategy"]}: at most {searchCfg["maxevaluations"]} sets tested per pT bin')
 
 SetGlobalStyle(padleftmargin=0.12, padrightmargin=0.2, padbottommargin=0.15, padtopmargin=0.075,
                titleoffset=1., palette=kRainBow, titlesize=0.06, labelsize=0.055, maxdigits=4)
 
+scanTasks, dfsScan = [], []
 cSignifVsRest, hSignifVsRest, cEstimVsCut, hEstimVsCut = [], [], [], []
 counter = 0
 for iPt, (ptMin, ptMax) in enumerate(zip(ptMins, ptMaxs)):
-    # reshuffle bkg and take only a fraction of it, seed fixed for reproducibility
-    dfBkgPt = dfBkg_tot.query(f'{ptMin} < pt_cand  and pt_cand < {ptMax}').sample(
-        frac=fractionstokeep[iPt], random_state=42).reset_index(drop=True)
+    if bkgTemplatesCfg['enable']:
+        dfBkgPt = None
+        massBinEdges = np.linspace(bkgMassLimits[iPt][0], bkgMassLimits[iPt][1], 201)
+    else:
+        # reshuffle bkg and take only a fraction of it, seed fixed for reproducibility
+        dfBkgPt = dfBkg_tot.query(f'{ptMin} < pt_cand  and pt_cand < {ptMax}').sample(
+            frac=fractionstokeep[iPt], random_state=42).reset_index(drop=True)
+        massBinEdges = np.linspace(min(dfBkgPt['inv_mass']), max(dfBkgPt['inv_mass']), 201)
 
     outDirFitSB.cd()
     outDirFitSBPt.append(TDirectoryFile(f'pT{ptMin}-{ptMax}', f'pT{ptMin}-{ptMax}'))
@@ -203,276 +505,275 @@ for iPt, (ptMin, ptMax) in enumerate(zip(ptMins, ptMaxs)):
     dfPromptPt = dfPrompt.query(f'{ptMin} < pt_cand < {ptMax}')
     dfFDPt = dfFD.query(f'{ptMin} < pt_cand < {ptMax}')
 
-    # Raa
-    ptCent = (ptMax + ptMin) / 2.
-    if isinstance(RaaPrompt_config, str):
-        if ptMinRaaPrompt < ptCent < ptMaxRaaPrompt:
-            RaaPrompt = RaaPromptSpline['yCent'](ptCent)
-        elif ptCent > ptMaxRaaPrompt:
-            RaaPrompt = RaaPromptSpline['yCent'](ptMaxRaaPrompt)
-        else:
-            RaaPrompt = RaaPromptSpline['yCent'](ptMinRaaPrompt)
-        RaaPrompt = float(RaaPrompt)
-    if isinstance(RaaFD_config, str):
-        if ptMinRaaFD < ptCent < ptMaxRaaFD:
-            RaaFD = RaaFDSpline['yCent'](ptCent)
-        elif ptCent > ptMaxRaaFD:
-            RaaFD = RaaFDSpline['yCent'](ptMaxRaaFD)
-        else:
-            RaaFD = RaaFDSpline['yCent'](ptMinRaaFD)
-        RaaFD = float(RaaFD)
-
     # denominator for efficiency
     nTotPrompt = len(dfPromptPt)
     nTotFD = len(dfFDPt)
 
-    # preselection efficiency (if input provided)
-    if inputCfg['infiles']['preseleff']['filename']:
-        ptBinPreselEff = hPreselEffPrompt.GetXaxis().FindBin(ptMin*1.0001)
-        preselEffPrompt = hPreselEffPrompt.GetBinContent(ptBinPreselEff)
-        preselEffFD = hPreselEffFD.GetBinContent(ptBinPreselEff)
-        preselEffPromptUnc = hPreselEffPrompt.GetBinError(ptBinPreselEff)
-        preselEffFDUnc = hPreselEffFD.GetBinError(ptBinPreselEff)
+    # per-pT-bin constants for the figures of merit
+    mean, sigma = scanConstsPt[iPt]['mean'], scanConstsPt[iPt]['sigma']
+    meanSecPeak, sigmaSecPeak = scanConstsPt[iPt]['meanSecPeak'], scanConstsPt[iPt]['sigmaSecPeak']
+    bkgScale = nExpEv / bkgConfig['nEvents'] / fractionstokeep[iPt] * scanConstsPt[iPt]['bkgCorrFactor']
+    scanConsts = {'nTotPrompt': nTotPrompt, 'nTotFD': nTotFD, 'deltaPt': ptMax - ptMin, 'nExpEv': nExpEv,
+                  'sigmaMB': sigmaMB, 'taa': Taa, 'bkgScale': bkgScale,
+                  **{key: scanConstsPt[iPt][key] for key in ['preselEffPrompt', 'preselEffFD', 'preselEffPromptUnc',
+                                                             'preselEffFDUnc', 'acc', 'accUnc', 'crossSecPrompt',
+                                                             'crossSecFD', 'raaPrompt', 'raaFD']}}
+
+    # scan tasks, evaluated once the inputs of all the pT bins are prepared
+    for iParCut, (ParCutMin, ParCutMax) in enumerate(zip(ParCutMins, ParCutMaxs)):
+        if ParCutsName and EnableParCuts:
+            selParCut = f'{ParCutMin} < {ParCutsName} < {ParCutMax}'
+            dfPromptPtSel, dfFDPtSel, dfBkgPtSel = [df.query(selParCut) if df is not None else None
+                                                    for df in [dfPromptPt, dfFDPt, dfBkgPt]]
+        else:
+            dfPromptPtSel, dfFDPtSel, dfBkgPtSel = dfPromptPt, dfFDPt, dfBkgPt
+
+        scanInputs = {'dfs': [dfPromptPtSel, dfFDPtSel, dfBkgPtSel], 'varNames': varNames,
+                      'upperLowerCuts': upperLowerCuts, 'cutRanges': cutRanges, 'bkgTemplate': None,
+                      'massBinEdges': massBinEdges, 'sharedMassBinning': sharedMassBinning,
+                      'peakPars': (mean, sigma, meanSecPeak, sigmaSecPeak), 'bkgConfig': bkgConfig,
+                      'scanConsts': scanConsts, 'signalFrom': inputCfg['expectedSignalFrom'],
+                      'outDir': outDirFitSBPt[iPt], 'histoName': f'hMassBkg_pT{ptMin}-{ptMax}'}
+        scanTasks.append({'iPt': iPt, 'ptMin': ptMin, 'ptMax': ptMax, 'iParCut': iParCut, 'ParCutMin': ParCutMin,
+                          'ParCutMax': ParCutMax, 'scanInputs': scanInputs})
+
+if bkgTemplatesCfg['enable']:
+    # full background sample streamed once into invariant mass x binned cut variables templates (one per scan
+    # task), from which the mass spectra of all the cut sets are read instead of selecting a random fraction
+    startTimeTemplates = time.time()
+    bkgSelections = []
+    for task in scanTasks:
+        bkgSelections.append(f'{task["ptMin"]} < pt_cand < {task["ptMax"]}')
+        if ParCutsName and EnableParCuts:
+            bkgSelections[-1] += f' and {task["ParCutMin"]} < {ParCutsName} < {task["ParCutMax"]}'
+    bkgColumns = list(dict.fromkeys(varNames + ['pt_cand', 'inv_mass'] + ([ParCutsName] if EnableParCuts else [])))
+    bkgTemplates = BuildCutTemplates(IterateDfFromRootOrParquet(inputCfg['infiles']['background']['filename'],
+                                                                inputCfg['infiles']['background']['dirname'],
+                                                                inputCfg['infiles']['background']['treename'],
+                                                                bkgColumns, bkgTemplatesCfg['chunksize']),
+                                     bkgSelections, varNames, cutRanges, upperLowerCuts,
+                                     [task['scanInputs']['massBinEdges'] for task in scanTasks])
+    for task, bkgTemplate in zip(scanTasks, bkgTemplates):
+        task['scanInputs']['bkgTemplate'] = bkgTemplate
+    print(f'Background templates filled in {time.time() - startTimeTemplates:.1f} s')
+
+# figures of merit for all the cut sets at once, from cumulative sums of the count tensors of the cut variables
+# binned on the scan grid, or for the cut sets proposed by the search strategy
+taskResults = []
+if args.nworkers > 1 or args.checkpoint:
+    # shards (chunks of the first cut variable for each scan task) evaluated by a pool of forked processes,
+    # sharing the dataframes copy-on-write, and written in partial output files merged afterwards. With
+    # checkpointing, the completed shards are recorded in an index file and skipped when the scan is restarted
+    shardDir = os.path.splitext(args.outFileName)[0] + '_shards'
+    os.makedirs(shardDir, exist_ok=True)
+    nChunks = args.nchunks if args.nchunks else args.nworkers
+    nSetsPerValue = totSets // len(cutRanges[0])
+    shardArgs = []
+    for iTask, task in enumerate(scanTasks):
+        chunks = np.array_split(np.arange(len(cutRanges[0])), min(nChunks, len(cutRanges[0]))) \
+            if searchCfg['strategy'] == 'grid' else [np.arange(len(cutRanges[0]))]
+        for iChunk, chunk in enumerate(chunks):
+            shardArgs.append((iTask, iChunk, chunk[0], chunk[-1] + 1, os.path.join(
+                shardDir, f'tSignif_pT{task["ptMin"]}-{task["ptMax"]}_{ParCutsName}{task["ParCutMin"]}-'
+                f'{task["ParCutMax"]}_chunk{iChunk}.root')))
+    shardWeights = [(shard[3] - shard[2]) * nSetsPerValue if searchCfg['strategy'] == 'grid'
+                    else min(searchCfg['maxevaluations'], totSets) for shard in shardArgs]
+
+    indexFileName = os.path.join(shardDir, 'index.yml')
+    with open(args.cfgFileName, 'rb') as cfgFile:
+        scanHash = hashlib.sha1(cfgFile.read() + f'{nChunks}'.encode()).hexdigest()
+    completedShards = []
+    if args.checkpoint and os.path.isfile(indexFileName):
+        with open(indexFileName, 'r') as ymlIndexFile:
+            shardIndex = yaml.load(ymlIndexFile, yaml.FullLoader)
+        if shardIndex['hash'] != scanHash:
+            print(f'ERROR: checkpoint in {shardDir} obtained with a different config or number of chunks! Exit')
+            sys.exit()
+        completedShards = shardIndex['completed']
+        print(f'Resuming scan: {len(completedShards)}/{len(shardArgs)} shards already completed')
+    pendingShards = [(iShard, shard) for iShard, shard in enumerate(shardArgs)
+                     if os.path.basename(shard[4]) not in completedShards]
+    print(f'Scan split in {len(shardArgs)} shards, {len(pendingShards)} evaluated by {args.nworkers} processes')
+
+    sharedInputs = {'tasks': scanTasks, 'cutRanges': cutRanges, 'searchCfg': searchCfg,
+                    'figureNames': estErrNames + list(estNames)}
+    if args.nworkers > 1:
+        pool = get_context('fork').Pool(args.nworkers, initializer=InitWorker, initargs=(sharedInputs,))
+        shardResults = pool.imap_unordered(RunScanShard, pendingShards)
     else:
-        preselEffPrompt = 1.
-        preselEffFD = 1.
-
-    # acceptance
-    ptBinAccMin = hPtGenAcc.GetXaxis().FindBin(ptMin*1.0001)
-    ptBinAccMax = hPtGenAcc.GetXaxis().FindBin(ptMax*0.9999)
-    numAcc = hPtGenAcc.Integral(ptBinAccMin, ptBinAccMax)
-    denAcc = hPtGenLimAcc.Integral(ptBinAccMin, ptBinAccMax)
-    acc, accUnc = ComputeEfficiency(numAcc, denAcc, np.sqrt(numAcc), np.sqrt(denAcc))
-
-    # cross section from theory
-    ptBinCrossSecMin = hCrossSecPrompt.GetXaxis().FindBin(ptMin*1.0001)
-    ptBinCrossSecMax = hCrossSecPrompt.GetXaxis().FindBin(ptMax*0.9999)
-    crossSecPrompt = hCrossSecPrompt.Integral(ptBinCrossSecMin, ptBinCrossSecMax, 'width') / (ptMax - ptMin)
-    crossSecFD = hCrossSecFD.Integral(ptBinCrossSecMin, ptBinCrossSecMax, 'width') / (ptMax - ptMin)
-
-    # signal histograms
-    hMassSignal = TH1F(f'hMassSignal_pT{ptMin}-{ptMax}', ';#it{M} (GeV/#it{c});Counts', 400,
-                       min(dfPromptPt['inv_mass']), max(dfPromptPt['inv_mass']))
-    for mass in np.concatenate((dfPromptPt['inv_mass'].to_numpy(), dfFDPt['inv_mass'].to_numpy())):
-        hMassSignal.Fill(mass)
-    funcSignal = TF1('funcSignal', SingleGaus, 1.6, 2.2, 3)
-    funcSignal.SetParameters(hMassSignal.Integral('width'), hMassSignal.GetMean(), hMassSignal.GetRMS())
-    hMassSignal.Fit('funcSignal', 'Q0')
-    mean = funcSignal.GetParameter(1)
-    sigma = funcSignal.GetParameter(2)
-    # SecPeak
-    meanSecPeak = inputCfg['infiles']['secpeak']['mean']
-    sigmaSecPeak = inputCfg['infiles']['secpeak']['sigma']
-    if dfSecPeakPrompt and dfSecPeakFD:
-        hMassSecPeak = TH1F(f'hMassSignal_pT{ptMin}-{ptMax}', ';#it{M} (GeV/#it{c});Counts', 400,
-                            min(dfSecPeakPrompt['inv_mass']), max(dfSecPeakPrompt['inv_mass']))
-        for mass in np.concatenate((dfSecPeakPrompt['inv_mass'].to_numpy(), dfSecPeakFD['inv_mass'].to_numpy())):
-            hMassSecPeak.Fill(mass)
-        funcSignal.SetParameters(hMassSecPeak.Integral('width'), hMassSecPeak.GetMean(), hMassSecPeak.GetRMS())
-        hMassSecPeak.Fit('funcSignal', 'Q0')
-        meanSecPeak = funcSignal.GetParameter(1)
-        sigmaSecPeak = funcSignal.GetParameter(2)
+        InitWorker(sharedInputs)
+        shardResults = map(RunScanShard, pendingShards)
+    startTime = time.time()
+    nSetsDone, nSetsToDo = 0, sum(shardWeights[iShard] for iShard, _ in pendingShards)
+    for iDone, (iShard, timeShard) in enumerate(shardResults):
+        nSetsDone += shardWeights[iShard]
+        elapsedTime = time.time() - startTime
+        task = scanTasks[shardArgs[iShard][0]]
+        print(f'Shard {iDone+1}/{len(pendingShards)} (pT bin {task["ptMin"]}-{task["ptMax"]}, chunk '
+              f'{shardArgs[iShard][1]}) done in {timeShard:.2f}s, elapsed time: {elapsedTime:.0f}s, estimated '
+              f'remaining time: {elapsedTime * (nSetsToDo - nSetsDone) / nSetsDone:.0f}s')
+        if args.checkpoint:
+            completedShards.append(os.path.basename(shardArgs[iShard][4]))
+            with open(f'{indexFileName}.tmp', 'w') as ymlIndexFile:
+                yaml.dump({'hash': scanHash, 'completed': completedShards}, ymlIndexFile)
+            os.replace(f'{indexFileName}.tmp', indexFileName)
+    if args.nworkers > 1:
+        pool.close()
+        pool.join()
+
+    # merge of the partial outputs, in the same order as the serial scan
+    for iTask, task in enumerate(scanTasks):
+        valuesTask = []
+        for shard in [shard for shard in shardArgs if shard[0] == iTask]:
+            valuesFileName = os.path.splitext(shard[4])[0] + '.npy'
+            valuesTask.append(np.load(valuesFileName))
+            shardFile = TFile.Open(shard[4])
+            for key in shardFile.GetListOfKeys():
+                outDirFitSBPt[task['iPt']].cd()
+                key.ReadObj().Write()
+            shardFile.Close()
+            os.remove(shard[4])
+            os.remove(valuesFileName)
+        dfTask = pd.DataFrame(np.concatenate(valuesTask), columns=varsName4Tuple.split(':'))
+        taskResults.append((dfTask[varNames].to_numpy(),
+                            {est: dfTask[est].to_numpy() for est in estErrNames + list(estNames)}))
+    if os.path.isfile(indexFileName):
+        os.remove(indexFileName)
+    os.rmdir(shardDir)
+    print(f'Time elapsed to test cut sets for all pT bins: {time.time()-startTime:.2f}s')
+else:
+    for task in scanTasks:
+        startTime = time.time()
+        taskResults.append(RunScanTask(task['scanInputs'], cutRanges, searchCfg))
+        if ParCutsName != 'Integral':
+            print(f'Time elapsed to test {len(taskResults[-1][0])} cut sets for pT bin {task["ptMin"]}-'
+                  f'{task["ptMax"]} and {ParCutsName} bin {task["ParCutMin"]}-{task["ParCutMax"]}: '
+                  f'{time.time()-startTime:.2f}s')
+        else:
+            print(f'Time elapsed to test {len(taskResults[-1][0])} cut sets for pT bin {task["ptMin"]}-'
+                  f'{task["ptMax"]}: {time.time()-startTime:.2f}s')
 
+for task, (cutSetValuesPt, figures) in zip(scanTasks, taskResults):
+    iPt, ptMin, ptMax, ParCutMin, ParCutMax = [task[key] for key in ['iPt', 'ptMin', 'ptMax', 'ParCutMin', 'ParCutMax']]
     # output histos
-    hSignifVsRest.append(dict())
-    hEstimVsCut.append(dict())
-    for iParCut, (ParCutMin, ParCutMax) in enumerate(zip(ParCutMins, ParCutMaxs)):
-        if len(varNames) == 1:
+    if task['iParCut'] == 0:
+        hSignifVsRest.append(dict())
+        hEstimVsCut.append(dict())
+    if len(varNames) == 1:
+        for est in estNames:
+            minVar = cutVars[varNames[0]]['min'] - cutVars[varNames[0]]['step'] / 2
+            maxVar = cutVars[varNames[0]]['max'] + cutVars[varNames[0]]['step'] / 2
+            nBinsVar = int((maxVar - minVar) / cutVars[varNames[0]]['step'])
+            hEstimVsCut[iPt][est] = TH1F(f'h{est}VsCut_pT{ptMin}-{ptMax}_{ParCutsName}{ParCutMin}-{ParCutMax}',
+                                         f';{varNames[0]};{estNames[est]}', nBinsVar, minVar, maxVar)
+            SetObjectStyle(hEstimVsCut[iPt][est], color=kBlack, marker=kFullCircle, linewidth=1)
+    elif len(varNames) == 2:
+        for est in estNames:
+            minVar0 = cutVars[varNames[0]]['min'] - cutVars[varNames[0]]['step'] / 2
+            minVar1 = cutVars[varNames[1]]['min'] - cutVars[varNames[1]]['step'] / 2
+            maxVar0 = cutVars[varNames[0]]['max'] + cutVars[varNames[0]]['step'] / 2
+            maxVar1 = cutVars[varNames[1]]['max'] + cutVars[varNames[1]]['step'] / 2
+            nBinsVar0 = int((maxVar0 - minVar0) / cutVars[varNames[0]]['step'])
+            nBinsVar1 = int((maxVar1 - minVar1) / cutVars[varNames[1]]['step'])
+            hEstimVsCut[iPt][est] = TH2F(f'h{est}VsCut_pT{ptMin}-{ptMax}_{ParCutsName}{ParCutMin}-{ParCutMax}',
+                                         f';{varNames[0]};{varNames[1]};{estNames[est]}',
+                                         nBinsVar0, minVar0, maxVar0, nBinsVar1, minVar1, maxVar1)
+    for values in GetNtupleValues(cutSetValuesPt, figures, task, estErrNames + list(estNames)):
+        tSignif.Fill(values)
+    if args.parquet:
+        dfsScan.append(pd.DataFrame(GetNtupleValues(cutSetValuesPt, figures, task, estErrNames + list(estNames), 'd'),
+                                    columns=varsName4Tuple.split(':')))
+
+    if len(varNames) == 1:
+        for iSet, cutSet in enumerate(cutSetValuesPt):
+            binVar = hEstimVsCut[iPt]['Signif'].GetXaxis().FindBin(cutSet[0])
             for est in estNames:
-                minVar = cutVars[varNames[0]]['min'] - cutVars[varNames[0]]['step'] / 2
-                maxVar = cutVars[varNames[0]]['max'] + cutVars[varNames[0]]['step'] / 2
-                nBinsVar = int((maxVar - minVar) / cutVars[varNames[0]]['step'])
-                hEstimVsCut[iPt][est] = TH1F(f'h{est}VsCut_pT{ptMin}-{ptMax}_{ParCutsName}{ParCutMin}-{ParCutMax}',
-                                             f';{varNames[0]};{estNames[est]}', nBinsVar, minVar, maxVar)
-                SetObjectStyle(hEstimVsCut[iPt][est], color=kBlack, marker=kFullCircle, linewidth=1)
-        elif len(varNames) == 2:
+                hEstimVsCut[iPt][est].SetBinContent(binVar, figures[est][iSet])
+                if f'{est}Error' in figures:
+                    hEstimVsCut[iPt][est].SetBinError(binVar, figures[f'{est}Error'][iSet])
+    elif len(varNames) == 2:
+        for iSet, cutSet in enumerate(cutSetValuesPt):
+            binVar0 = hEstimVsCut[iPt]['Signif'].GetXaxis().FindBin(cutSet[0])
+            binVar1 = hEstimVsCut[iPt]['Signif'].GetYaxis().FindBin(cutSet[1])
             for est in estNames:
+                hEstimVsCut[iPt][est].SetBinContent(binVar0, binVar1, figures[est][iSet])
+
+    # plots
+    outDirPlotsPt[iPt].mkdir(f'{ParCutsName}{ParCutMin}-{ParCutMax}')
+    cSignifVsRest.append(TCanvas(f'cSignifVsRest_pT{ptMin}-{ptMax}_{ParCutsName}{ParCutMin}-{ParCutMax}',
+                                 '', 800, 1000))
+    cSignifVsRest[counter].Divide(2, 4)
+    for iPad, est in enumerate(estNames):
+        if est != 'Signif':
+            hFrame = cSignifVsRest[counter].cd(iPad).DrawFrame(tSignif.GetMinimum(est)*0.8,
+                                                               tSignif.GetMinimum('Signif')*0.8,
+                                                               tSignif.GetMaximum(est)*1.2,
+                                                               tSignif.GetMaximum('Signif')*1.2,
+                                                               f";{estNames[est]};{estNames['Signif']}")
+            hFrame.GetXaxis().SetDecimals()
+            hFrame.GetYaxis().SetDecimals()
+            hSignifVsRest[iPt][est] = (TH2F((f'hSignifVs{est}_pT{ptMin}-{ptMax}_{ParCutsName}'
+                                             f'{ParCutMin}-{ParCutMax}'),
+                                            f";{estNames[est]};{estNames['Signif']}", 50,
+                                            tSignif.GetMinimum(est)*0.8, tSignif.GetMaximum(est)*1.2, 50,
+                                            tSignif.GetMinimum('Signif')*0.8, tSignif.GetMaximum('Signif')*1.))
+            tSignif.Draw(f'Signif:{est}>>hSignifVs{est}_pT{ptMin}-{ptMax}_{ParCutsName}{ParCutMin}-{ParCutMax}',
+                         f'PtMin == {ptMin} && PtMax == {ptMax}', 'colz same')
+            cSignifVsRest[counter].Update()
+            cSignifVsRest[counter].Modified()
+            outDirPlotsPt[iPt].cd(f'{ParCutsName}{ParCutMin}-{ParCutMax}')
+            hSignifVsRest[iPt][est].Write()
+    outDirPlotsPt[iPt].cd(f'{ParCutsName}{ParCutMin}-{ParCutMax}')
+    cSignifVsRest[counter].Write()
+    if 1 <= len(varNames) <= 2:
+        if len(varNames) == 1:
+            cEstimVsCut.append(TCanvas(
+                f'cEstimVsCut_pT{ptMin}-{ptMax}_{ParCutsName}{ParCutMin}-{ParCutMax}', '', 800, 1000))
+            cEstimVsCut[counter].Divide(2, 4)
+            for iPad, est in enumerate(hEstimVsCut[iPt]):
+                hFrame = cEstimVsCut[counter].cd(iPad+1).DrawFrame(minVar, tSignif.GetMinimum(est)*0.8,
+                                                                   maxVar, tSignif.GetMaximum(est)*1.2,
+                                                                   f';{varNames[0]};{estNames[est]}')
+                if 'Eff' in est:
+                    cEstimVsCut[counter].cd(iPad+1).SetLogy()
+                    hFrame.GetYaxis().SetMoreLogLabels()
+                hFrame.GetXaxis().SetNdivisions(505)
+                hFrame.GetXaxis().SetDecimals()
+                hFrame.GetYaxis().SetDecimals()
+                hEstimVsCut[iPt][est].DrawCopy('psame')
+                outDirPlotsPt[iPt].cd(f'{ParCutsName}{ParCutMin}-{ParCutMax}')
+                hEstimVsCut[iPt][est].Write()
+        elif len(varNames) == 2:
+            cEstimVsCut.append(TCanvas(f'cEstimVsCut_pT{ptMin}-{ptMax}_{ParCutsName}{ParCutMin}-{ParCutMax}',
+                                       '', 800, 1000))
+            cEstimVsCut[counter].Divide(2, 4)
+            for iPad, est in enumerate(hEstimVsCut[iPt]):
                 minVar0 = cutVars[varNames[0]]['min'] - cutVars[varNames[0]]['step'] / 2
                 minVar1 = cutVars[varNames[1]]['min'] - cutVars[varNames[1]]['step'] / 2
                 maxVar0 = cutVars[varNames[0]]['max'] + cutVars[varNames[0]]['step'] / 2
                 maxVar1 = cutVars[varNames[1]]['max'] + cutVars[varNames[1]]['step'] / 2
-                nBinsVar0 = int((maxVar0 - minVar0) / cutVars[varNames[0]]['step'])
-                nBinsVar1 = int((maxVar1 - minVar1) / cutVars[varNames[1]]['step'])
-                hEstimVsCut[iPt][est] = TH2F(f'h{est}VsCut_pT{ptMin}-{ptMax}_{ParCutsName}{ParCutMin}-{ParCutMax}',
-                                             f';{varNames[0]};{varNames[1]};{estNames[est]}',
-                                             nBinsVar0, minVar0, maxVar0, nBinsVar1, minVar1, maxVar1)
-        startTime = time.time()
-        for iSet, cutSet in enumerate(itertools.product(*cutRanges)):
-            for iCut, (cut, upperLower, varName) in enumerate(zip(cutSet, upperLowerCuts, varNames)):
-                if iCut == 0:
-                    selToApply = f'{varName}{upperLower}{cut}'
-                else:
-                    selToApply += f' & {varName}{upperLower}{cut}'
-            if ParCutsName and EnableParCuts:
-                selToApply += f' & {ParCutMin} < {ParCutsName} < {ParCutMax}'
-
-            if (iSet+1) % 100 == 0:
-                print(f'Time elapsed to test up to cut set number {iSet+1}: {time.time()-startTime:.2f}s', end='\r')
-
-            dfPromptPtSel = dfPromptPt.query(selToApply)
-            dfFDPtSel = dfFDPt.query(selToApply)
-            dfBkgPtSel = dfBkgPt.query(selToApply)
-            effPrompt, effPromptUnc = ComputeEfficiency(len(dfPromptPtSel), nTotPrompt,
-                                                        np.sqrt(len(dfPromptPtSel)), np.sqrt(nTotPrompt))
-            effFD, effFDUnc = ComputeEfficiency(len(dfFDPtSel), nTotFD, np.sqrt(len(dfFDPtSel)), np.sqrt(nTotFD))
-            effTimesAccPrompt = effPrompt * preselEffPrompt * acc
-            effTimesAccFD = effFD * preselEffFD * acc
-            fPrompt, fFD = GetPromptFDFractionFc(effTimesAccPrompt, effTimesAccFD,
-                                                 crossSecPrompt, crossSecFD, RaaPrompt, RaaFD)
-            hMassBkg = TH1F(f'hMassBkg_pT{ptMin}-{ptMax}_cutSet{iSet}', ';#it{M} (GeV/#it{c});Counts', 200,
-                            min(dfBkgPtSel['inv_mass']), max(dfBkgPtSel['inv_mass']))
-            for mass in dfBkgPtSel['inv_mass'].to_numpy():
-                hMassBkg.Fill(mass)
-
-            # expected signal, BR already included in cross section
-            if inputCfg['expectedSignalFrom'] == 'prompt':
-                expSignal = GetExpectedSignal(crossSecPrompt, ptMax-ptMin, 1., effTimesAccPrompt,
-                                              fPrompt[0], 1., 1., nExpEv, sigmaMB, Taa, RaaPrompt)
-            elif inputCfg['expectedSignalFrom'] == 'feeddown':
-                expSignal = GetExpectedSignal(crossSecFD, ptMax-ptMin, 1., effTimesAccFD,
-                                              fFD[0], 1., 1., nExpEv, sigmaMB, Taa, RaaFD)
-
-            # expected background
-            bkgConfig = inputCfg['infiles']['background']
-            outDirFitSBPt[iPt].cd()
-            expBkg = 0.
-            errExpBkg = 0.
-            if bkgConfig['isMC']:
-                expBkg, errExpBkg, hMassBkg = GetExpectedBkgFromMC(hMassBkg, mean, sigma)
-            else:
-                expBkg, errExpBkg, hMassBkg = GetExpectedBkgFromSideBands(hMassBkg, bkgConfig['fitFunc'],
-                                                                          bkgConfig['nSigma'], mean, sigma,
-                                                                          meanSecPeak, sigmaSecPeak)
-            hMassBkg.Write()
-            expBkg *= nExpEv / bkgConfig['nEvents'] / fractionstokeep[iPt]
-            errExpBkg *= nExpEv / bkgConfig['nEvents'] / fractionstokeep[iPt]
-
-            if inputCfg['infiles']['background']['corrfactor']['filename']:
-                inFile = TFile.Open(inputCfg['infiles']['background']['corrfactor']['filename'])
-                hBkgCorrFactor = inFile.Get(inputCfg['infiles']['background']['corrfactor']['histoname'])
-                expBkg *= hBkgCorrFactor.GetBinContent(hBkgCorrFactor.FindBin(ptCent))
-                errExpBkg *= hBkgCorrFactor.GetBinContent(hBkgCorrFactor.FindBin(ptCent))
-
-            # S/B and significance
-            expSoverB = 0.
-            expSignif = 0.
-            errS = 0. # TODO: think how to define a meaningful error on the estimated signal and propagate it
-            errSoverB = 0.
-            errSignif = 0.
-            if expBkg > 0:
-                expSoverB = expSignal / expBkg
-                expSignif = expSignal / np.sqrt(expSignal + expBkg)
-                errSoverB = expSoverB * errExpBkg / expBkg
-                errSignif = expSignif * 0.5 * errExpBkg / (expSignal + expBkg)
-
-            # Efficiency
-            EffAccFDError = np.sqrt((effFDUnc/effFD)**2
-                                    + (preselEffFDUnc/preselEffFD)**2
-                                    + (accUnc/acc)**2)*effTimesAccFD
-            EffAccPromptError = np.sqrt((effPromptUnc/effPrompt)**2
-                                        + (preselEffPromptUnc/preselEffPrompt)**2
-                                        + (accUnc/acc)**2)*effTimesAccPrompt
-
-            tupleForNtuple = cutSet + (ptMin, ptMax, ParCutMin, ParCutMax, EffAccPromptError, EffAccFDError,
-                                       errS, errExpBkg, errSignif, errSoverB, expSignif, expSoverB, expSignal, expBkg,
-                                       effTimesAccPrompt, effTimesAccFD, fPrompt[0], fFD[0])
-            tSignif.Fill(np.array(tupleForNtuple, 'f'))
-            estValues = {'Signif': expSignif, 'SoverB': expSoverB, 'S': expSignal, 'B': expBkg,
-                         'EffAccPrompt': effTimesAccPrompt, 'EffAccFD': effTimesAccFD,
-                         'fPrompt': fPrompt[0], 'fFD': fFD[0]}
-            estValuesErr = {'SignifError': errSignif, 'SoverBError': errSoverB, 'SError': errS, 'BError': errExpBkg,
-                            'EffAccPromptError': EffAccPromptError, 'EffAccFDError': EffAccFDError}
-            if len(varNames) == 1:
-                binVar = hEstimVsCut[iPt]['Signif'].GetXaxis().FindBin(cutSet[0])
-                for est in estValues:
-                    hEstimVsCut[iPt][est].SetBinContent(binVar, estValues[est])
-                    if f'{est}Error' in estValuesErr:
-                        hEstimVsCut[iPt][est].SetBinError(binVar, estValuesErr[f'{est}Error'])
-            if len(varNames) == 2:
-                binVar0 = hEstimVsCut[iPt]['Signif'].GetXaxis().FindBin(cutSet[0])
-                binVar1 = hEstimVsCut[iPt]['Signif'].GetYaxis().FindBin(cutSet[1])
-                for est in estValues:
-                    hEstimVsCut[iPt][est].SetBinContent(binVar0, binVar1, estValues[est])
-
-        if ParCutsName != 'Integral':
-            print(f'Time elapsed to test cut sets for pT bin {ptMin}-{ptMax} '
-                  f'and {ParCutsName} bin {ParCutMin}-{ParCutMax}: {time.time()-startTime:.2f}s')
-        else:
-            print(f'Time elapsed to test cut sets for pT bin {ptMin}-{ptMax}: {time.time()-startTime:.2f}s')
-        # plots
-        outDirPlotsPt[iPt].mkdir(f'{ParCutsName}{ParCutMin}-{ParCutMax}')
-        cSignifVsRest.append(TCanvas(f'cSignifVsRest_pT{ptMin}-{ptMax}_{ParCutsName}{ParCutMin}-{ParCutMax}',
-                                     '', 800, 1000))
-        cSignifVsRest[counter].Divide(2, 4)
-        for iPad, est in enumerate(estNames):
-            if est != 'Signif':
-                hFrame = cSignifVsRest[counter].cd(iPad).DrawFrame(tSignif.GetMinimum(est)*0.8,
-                                                                   tSignif.GetMinimum('Signif')*0.8,
-                                                                   tSignif.GetMaximum(est)*1.2,
-                                                                   tSignif.GetMaximum('Signif')*1.2,
-                                                                   f";{estNames[est]};{estNames['Signif']}")
+                hFrame = cEstimVsCut[counter].cd(iPad+1).DrawFrame(minVar0, minVar1, maxVar0, maxVar1,
+                                                                   f';{varNames[0]};{varNames[1]};{estNames[est]}')
+                if 'Eff' in est:
+                    cEstimVsCut[counter].cd(iPad+1).SetLogz()
+                    hFrame.GetZaxis().SetMoreLogLabels()
+                hFrame.GetXaxis().SetNdivisions(505)
+                hFrame.GetYaxis().SetNdivisions(505)
                 hFrame.GetXaxis().SetDecimals()
                 hFrame.GetYaxis().SetDecimals()
-                hSignifVsRest[iPt][est] = (TH2F((f'hSignifVs{est}_pT{ptMin}-{ptMax}_{ParCutsName}'
-                                                 f'{ParCutMin}-{ParCutMax}'),
-                                                f";{estNames[est]};{estNames['Signif']}", 50,
-                                                tSignif.GetMinimum(est)*0.8, tSignif.GetMaximum(est)*1.2, 50,
-                                                tSignif.GetMinimum('Signif')*0.8, tSignif.GetMaximum('Signif')*1.))
-                tSignif.Draw(f'Signif:{est}>>hSignifVs{est}_pT{ptMin}-{ptMax}_{ParCutsName}{ParCutMin}-{ParCutMax}',
-                             f'PtMin == {ptMin} && PtMax == {ptMax}', 'colz same')
-                cSignifVsRest[counter].Update()
-                cSignifVsRest[counter].Modified()
+                hEstimVsCut[iPt][est].DrawCopy('colzsame')
                 outDirPlotsPt[iPt].cd(f'{ParCutsName}{ParCutMin}-{ParCutMax}')
-                hSignifVsRest[iPt][est].Write()
+                hEstimVsCut[iPt][est].Write()
+        cEstimVsCut[counter].Update()
+        cEstimVsCut[counter].Modified()
         outDirPlotsPt[iPt].cd(f'{ParCutsName}{ParCutMin}-{ParCutMax}')
-        cSignifVsRest[counter].Write()
-        if 1 <= len(varNames) <= 2:
-            if len(varNames) == 1:
-                cEstimVsCut.append(TCanvas(
-                    f'cEstimVsCut_pT{ptMin}-{ptMax}_{ParCutsName}{ParCutMin}-{ParCutMax}', '', 800, 1000))
-                cEstimVsCut[counter].Divide(2, 4)
-                for iPad, est in enumerate(hEstimVsCut[iPt]):
-                    hFrame = cEstimVsCut[counter].cd(iPad+1).DrawFrame(minVar, tSignif.GetMinimum(est)*0.8,
-                                                                       maxVar, tSignif.GetMaximum(est)*1.2,
-                                                                       f';{varNames[0]};{estNames[est]}')
-                    if 'Eff' in est:
-                        cEstimVsCut[counter].cd(iPad+1).SetLogy()
-                        hFrame.GetYaxis().SetMoreLogLabels()
-                    hFrame.GetXaxis().SetNdivisions(505)
-                    hFrame.GetXaxis().SetDecimals()
-                    hFrame.GetYaxis().SetDecimals()
-                    hEstimVsCut[iPt][est].DrawCopy('psame')
-                    outDirPlotsPt[iPt].cd(f'{ParCutsName}{ParCutMin}-{ParCutMax}')
-                    hEstimVsCut[iPt][est].Write()
-            elif len(varNames) == 2:
-                cEstimVsCut.append(TCanvas(f'cEstimVsCut_pT{ptMin}-{ptMax}_{ParCutsName}{ParCutMin}-{ParCutMax}',
-                                           '', 800, 1000))
-                cEstimVsCut[counter].Divide(2, 4)
-                for iPad, est in enumerate(hEstimVsCut[iPt]):
-                    minVar0 = cutVars[varNames[0]]['min'] - cutVars[varNames[0]]['step'] / 2
-                    minVar1 = cutVars[varNames[1]]['min'] - cutVars[varNames[1]]['step'] / 2
-                    maxVar0 = cutVars[varNames[0]]['max'] + cutVars[varNames[0]]['step'] / 2
-                    maxVar1 = cutVars[varNames[1]]['max'] + cutVars[varNames[1]]['step'] / 2
-                    hFrame = cEstimVsCut[counter].cd(iPad+1).DrawFrame(minVar0, minVar1, maxVar0, maxVar1,
-                                                                       f';{varNames[0]};{varNames[1]};{estNames[est]}')
-                    if 'Eff' in est:
-                        cEstimVsCut[counter].cd(iPad+1).SetLogz()
-                        hFrame.GetZaxis().SetMoreLogLabels()
-                    hFrame.GetXaxis().SetNdivisions(505)
-                    hFrame.GetYaxis().SetNdivisions(505)
-                    hFrame.GetXaxis().SetDecimals()
-                    hFrame.GetYaxis().SetDecimals()
-                    hEstimVsCut[iPt][est].DrawCopy('colzsame')
-                    outDirPlotsPt[iPt].cd(f'{ParCutsName}{ParCutMin}-{ParCutMax}')
-                    hEstimVsCut[iPt][est].Write()
-            cEstimVsCut[counter].Update()
-            cEstimVsCut[counter].Modified()
-            outDirPlotsPt[iPt].cd(f'{ParCutsName}{ParCutMin}-{ParCutMax}')
-            cEstimVsCut[counter].Write()
-        counter += 1
+        cEstimVsCut[counter].Write()
+    counter += 1
 outFile.cd()
 tSignif.Write()
 outFile.Close()
+if args.parquet:
+    WriteScanParquet(args.outFileName.replace('.root', '.parquet'), dfsScan, varNames, ['Signif', 'SoverB'], args.topk)
 
 if not args.batch:
     input('Press enter to exit')
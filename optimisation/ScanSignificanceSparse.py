@@ -9,10 +9,16 @@ import math
 import array
 import time
 import six
+import numpy as np
+import pandas as pd
 import yaml
-from ROOT import TFile, TF1, TNtuple, TSpline3, gROOT # pylint: disable=import-error,no-name-in-module
+from ROOT import TFile, TF1, TH1F, TNtuple, TSpline3, gROOT # pylint: disable=import-error,no-name-in-module
 sys.path.append('..')
 from utils.ReadModel import ReadFONLL, ReadTAMU #pylint: disable=wrong-import-position,import-error
+from utils.AnalysisUtils import GetExpectedBkgFromSideBandsArrays #pylint: disable=wrong-import-position,import-error
+from utils.AnalysisUtils import SetHistoFromArrays #pylint: disable=wrong-import-position,import-error
+from utils.ScanUtils import GetCutSetCounts, GetCutSetValues #pylint: disable=wrong-import-position,import-error
+from utils.ScanUtils import GetSparseBinArrays, WriteScanParquet #pylint: disable=wrong-import-position,import-error
 
 #TODO: not working now, adapt to new ReadModel functions and functions to get expected quantities from utils
 
@@ -38,15 +44,15 @@ def ApplyCuts(sparse, bins, axesnum, upperlowercuts, name):
         sparse.GetAxis(iAxis).SetRange(-1, -1)
     return hProj, index, cutvalues
 
-def GetSideBandHisto(hMassData, mean, sigma):
+def GetSideBandHisto(hMassData, mean, sigma, nSigma=4):
     '''
     method that returns a mass histogram with the side-bands
     '''
     hMassDataReb = hMassData.Clone('hSB')
     hMassDataReb.Rebin(5)
     hSB = hMassDataReb.Clone('hSB')
-    massbinmin = hSB.GetXaxis().FindBin(mean-4*sigma)
-    massbinmax = hSB.GetXaxis().FindBin(mean+4*sigma)
+    massbinmin = hSB.GetXaxis().FindBin(mean-nSigma*sigma)
+    massbinmax = hSB.GetXaxis().FindBin(mean+nSigma*sigma)
     for iMassBin in range(1, hSB.GetNbinsX()):
         if massbinmin <= iMassBin <= massbinmax:
             hSB.SetBinContent(iMassBin, 0.)
@@ -56,15 +62,47 @@ def GetSideBandHisto(hMassData, mean, sigma):
             hSB.SetBinError(iMassBin, hMassDataReb.GetBinError(iMassBin))
     return hSB
 
-def GetExpectedBackgroundFromSB(hSB, mean, sigma, Nexp, Nanal):
+def GetExpectedBackgroundFromSB(hSB, mean, sigma, Nexp, Nanal, fitFunc='expo'):
     '''
     method that returns the expected background from a side-band histogram
     '''
-    fMassBkg = TF1('fMassBkg', 'expo', 1.8, 2.12)
+    fMassBkg = TF1('fMassBkg', fitFunc, 1.8, 2.12)
     hSB.Fit('fMassBkg', 'QR')
     B = fMassBkg.Integral(mean-3*sigma, mean+3*sigma) / hSB.GetBinWidth(1) * Nexp / Nanal
     return B
 
+def GetSideBandArrays(hMassData, minMass=1.8, maxMass=2.12, rebin=5):
+    '''
+    method that returns the bin contents and bin edges of a rebinned mass histogram within the fit range
+    '''
+    counts = np.array([hMassData.GetBinContent(iBin) for iBin in range(1, hMassData.GetNbinsX()+1)])
+    edges = np.array([hMassData.GetBinLowEdge(iBin) for iBin in range(1, hMassData.GetNbinsX()+2)])
+    return RebinMassArrays(counts, edges, minMass, maxMass, rebin)
+
+def RebinMassArrays(massCounts, massBinEdges, minMass=1.8, maxMass=2.12, rebin=5):
+    '''
+    method that returns the bin contents (last axis) and bin edges of rebinned mass distributions within the fit range
+    '''
+    nBins = (len(massBinEdges) - 1) // rebin * rebin
+    counts = massCounts[..., :nBins].reshape(massCounts.shape[:-1] + (-1, rebin)).sum(axis=-1)
+    edges = massBinEdges[:nBins+1:rebin]
+    inRange = (edges[:-1] >= minMass - 1.e-6) & (edges[1:] <= maxMass + 1.e-6)
+    edges = np.append(edges[:-1][inRange], edges[1:][inRange][-1])
+    return counts[..., inRange], edges
+
+def GetDenseCutSetCounts(sparseArrays, ptBinMin, ptBinMax, cutBinRanges, upperlowercuts, nMassBins):
+    '''
+    method that returns the mass distributions of all the cut sets (bin numbers of the cut axes as cut values)
+    from the filled bins of a sparse exported with the pt, cut and mass axes
+    '''
+    coords, contents = sparseArrays
+    inPt = (coords[:, 0] >= ptBinMin) & (coords[:, 0] <= ptBinMax)
+    binData = {f'axis{iVar}': coords[inPt, iVar+1] for iVar, _ in enumerate(cutBinRanges)}
+    binData['mass'] = coords[inPt, -1]
+    binData['content'] = contents[inPt]
+    return GetCutSetCounts(binData, list(binData)[:-2], cutBinRanges, upperlowercuts,
+                           np.arange(0.5, nMassBins+1), 'mass', weightName='content')
+
 def GetExpectedBackgroundFromMC(hBkgMC, mean, sigma, Nexp, Nanal):
     '''
     method that returns the expected background from the MC
@@ -149,6 +187,8 @@ if inputCfg['bkgConfiguration']['getbkgfromMC']:
 if inputCfg['bkgConfiguration']['applyCorrFactor']:
     infileCorrFactor = TFile.Open(inputCfg['bkgConfiguration']['bkgCorrFactorfilename'])
     hBkgCorrFactor = infileCorrFactor.Get(inputCfg['bkgConfiguration']['bkgCorrFactorhistoname'])
+bkgFitFunc = inputCfg['bkgConfiguration'].get('fitFunc', 'expo')
+bkgNSigmaSB = inputCfg['bkgConfiguration'].get('nSigma', 4)
 
 PtThreshold = inputCfg['PtThreshold']
 
@@ -193,6 +233,24 @@ for varnum, iVar in enumerate(cutVars):
     axesnum.append(cutVars[iVar]['axisnum'])
     upperlowercuts.append(cutVars[iVar]['upperlowercut'])
 
+# dense mode: sparses exported once per pt range, counts of all the cut sets from cumulative sums
+denseScan = 'denseScan' in inputCfg and inputCfg['denseScan']
+if denseScan:
+    axesDense = [1] + axesnum + [0]
+    # a bin passes an 'Upper' ('Lower') cut on bin b if it is <= b (>= b) as with SetRange in ApplyCuts
+    cutBinRanges = [np.array(rangeVar) + (0.5 if upperlower == 'Upper' else -0.5)
+                    for rangeVar, upperlower in zip(ranges, upperlowercuts)]
+    cutValueRanges = []
+    for rangeVar, iAxis, upperlower in zip(ranges, axesnum, upperlowercuts):
+        axis = sMassPtCutVarsPromptLowPt.GetAxis(iAxis)
+        cutValueRanges.append([axis.GetBinLowEdge(iBin) + (axis.GetBinWidth(iBin) if upperlower == 'Upper' else 0.)
+                               for iBin in rangeVar])
+    cutSetValues = GetCutSetValues(cutValueRanges)
+    massAxis = sMassPtCutVarsPromptLowPt.GetAxis(0)
+    nMassBins = massAxis.GetNbins()
+    massBinEdgesFine = np.array([massAxis.GetBinLowEdge(iBin) for iBin in range(1, nMassBins+2)])
+    sparseArrays = {}
+
 gROOT.SetBatch(True)
 gROOT.ProcessLine("gErrorIgnoreLevel = kFatal;")
 outfile = TFile(outFileName, 'recreate')
@@ -205,6 +263,8 @@ for varnum, iVar in enumerate(cutVars):
     totSets *= int((cutVars[iVar]['binmax']-cutVars[iVar]['binmin'])/steps[varnum])+1
 
 print('Total number of sets per pT bin: %d' % totSets)
+parquetOutput = 'parquetOutput' in inputCfg and inputCfg['parquetOutput']
+dfsScan = []
 
 for iPt, _ in enumerate(PtMin):
     #check if low or high pt
@@ -229,6 +289,15 @@ for iPt, _ in enumerate(PtMin):
         else:
             sMassPtCutVars = sMassPtCutVarsHighPt.Clone('sMassPtCutVars')
 
+    ptRegion = 'LowPt' if PtMax[iPt] <= PtThreshold else 'HighPt'
+    if denseScan and ptRegion not in sparseArrays:
+        print(f'Exporting {ptRegion} sparses to arrays')
+        sparseArrays[ptRegion] = {
+            'Prompt': GetSparseBinArrays(sMassPtCutVarsPrompt, axesDense),
+            'FD': GetSparseBinArrays(sMassPtCutVarsFD, axesDense),
+            'Bkg': GetSparseBinArrays(sMassPtCutVarsBkg if inputCfg['bkgConfiguration']['getbkgfromMC'] \
+                else sMassPtCutVars, axesDense)}
+
     #gen for efficiency
     binGenPtMin = sGenPrompt.GetAxis(0).FindBin(PtMin[iPt]*1.0001)
     binGenPtMax = sGenPrompt.GetAxis(0).FindBin(PtMax[iPt]*0.9999)
@@ -261,54 +330,125 @@ for iPt, _ in enumerate(PtMin):
 
     cutSetCount = 0
     start_time = time.time()
-    for iBins in itertools.product(*ranges):
-        cutSetCount += 1
-        if cutSetCount % 100 == 0:
-            elapsed_time = time.time() - start_time
-            print('tested cut set number %d, elapsed time: %f s' % (cutSetCount, elapsed_time))
-
-        hMassPrompt, index, array4Ntuple = ApplyCuts(sMassPtCutVarsPrompt, iBins, axesnum, upperlowercuts, 'hMassPrompt')
-        hMassFD, index, array4Ntuple = ApplyCuts(sMassPtCutVarsFD, iBins, axesnum, upperlowercuts, 'hMassFD')
-
-        if inputCfg['bkgConfiguration']['getbkgfromMC']:
-            hMassBkg, index, array4Ntuple = ApplyCuts(sMassPtCutVarsBkg, iBins, axesnum, upperlowercuts, 'hMassBkg')
-            if inputCfg['bkgConfiguration']['applyCorrFactor']:
-                binCorrFactor = hBkgCorrFactor.GetXaxis().FindBin((PtMax[iPt]+PtMin[iPt])/2)
-                corrfactor = hBkgCorrFactor.GetBinContent(binCorrFactor)
-                hMassBkg.Scale(corrfactor)
-        else:
-            hMassData, index, array4Ntuple = ApplyCuts(sMassPtCutVars, iBins, axesnum, upperlowercuts, 'hMassData')
-            if inputCfg['bkgConfiguration']['applyCorrFactor']:
-                binCorrFactor = hBkgCorrFactor.GetXaxis().FindBin((PtMax[iPt]+PtMin[iPt])/2)
-                corrfactor = hBkgCorrFactor.GetBinContent(binCorrFactor)
-                hMassData.Scale(corrfactor)
-
-        hMassSgn = hMassPrompt.Clone('hMassSgn')
-        hMassSgn.Add(hMassFD)
+    useClosedForm = inputCfg['bkgConfiguration'].get('closedForm', False) \
+        and not inputCfg['bkgConfiguration']['getbkgfromMC']
+    corrfactor = 1.
+    if inputCfg['bkgConfiguration']['applyCorrFactor']:
+        binCorrFactor = hBkgCorrFactor.GetXaxis().FindBin((PtMax[iPt]+PtMin[iPt])/2)
+        corrfactor = hBkgCorrFactor.GetBinContent(binCorrFactor)
+    setValues, massCountsSB, meanSets, sigmaSets = [], [], [], []
+    if denseScan:
+        massCounts = {sample: GetDenseCutSetCounts(sparseArrays[ptRegion][sample], binRecoPtMin, binRecoPtMax,
+                                                   cutBinRanges, upperlowercuts, nMassBins)
+                      for sample in sparseArrays[ptRegion]}
+        massUncsBkg = np.sqrt(massCounts['Bkg'])
+        if inputCfg['bkgConfiguration']['applyCorrFactor'] and not useClosedForm: # closed form: B scaled after fit
+            massCounts['Bkg'] *= corrfactor
+            massUncsBkg *= corrfactor
+
+        # signal peak fitted once per pt bin, with the loosest tested cut set
+        iLoosestSet = np.ravel_multi_index([len(rangeVar)-1 if upperlower == 'Upper' else 0 for rangeVar, upperlower
+                                            in zip(ranges, upperlowercuts)], [len(rangeVar) for rangeVar in ranges])
+        massCountsSgn = massCounts['Prompt'][iLoosestSet] + massCounts['FD'][iLoosestSet]
+        hMassSgn = TH1F('hMassSgn', '', nMassBins, massBinEdgesFine)
+        SetHistoFromArrays(hMassSgn, massCountsSgn, np.sqrt(massCountsSgn))
         fMassSgn = TF1('fMassSgn', 'gaus', 1.7, 2.15)
         hMassSgn.Fit('fMassSgn', 'Q')
         mean = fMassSgn.GetParameter(1)
         sigma = fMassSgn.GetParameter(2)
 
-        nRecoPrompt = hMassPrompt.Integral()
-        nRecoFD = hMassFD.Integral()
-        effPrompt = nRecoPrompt / nGenPrompt
-        effFD = nRecoFD / nGenFD
+        effPrompt = massCounts['Prompt'].sum(axis=1) / nGenPrompt
+        effFD = massCounts['FD'].sum(axis=1) / nGenFD
 
         if inputCfg['bkgConfiguration']['getbkgfromMC']:
-            B = GetExpectedBackgroundFromMC(hMassBkg, mean, sigma, Nexp, nEvBkg)        
+            binmin = massAxis.FindBin(mean-3*sigma)
+            binmax = massAxis.FindBin(mean+3*sigma)
+            B = massCounts['Bkg'][:, binmin-1:binmax].sum(axis=1) / massAxis.GetBinWidth(1) * Nexp / nEvBkg
+        elif useClosedForm: # B estimated below for all cut sets at once
+            B = np.zeros(len(cutSetValues))
+            massCountsSB, massBinEdges = RebinMassArrays(massCounts['Bkg'], massBinEdgesFine)
+            meanSets, sigmaSets = mean, sigma
         else:
-            hMassSB = GetSideBandHisto(hMassData, mean, sigma)
-            B = GetExpectedBackgroundFromSB(hMassSB, mean, sigma, Nexp, nEvBkg)
+            B = np.zeros(len(cutSetValues))
+            hMassData = TH1F('hMassData', '', nMassBins, massBinEdgesFine)
+            for iSet, (massCountsData, massUncsData) in enumerate(zip(massCounts['Bkg'], massUncsBkg)):
+                SetHistoFromArrays(hMassData, massCountsData, massUncsData)
+                hMassSB = GetSideBandHisto(hMassData, mean, sigma, bkgNSigmaSB)
+                B[iSet] = GetExpectedBackgroundFromSB(hMassSB, mean, sigma, Nexp, nEvBkg, bkgFitFunc)
 
         if inputCfg['PredForFprompt']['estimateFprompt']:
             fprompt = ComputeExpectedFprompt(PtMin[iPt], PtMax[iPt], effPrompt, \
                 hPredPrompt, effFD, hPredFD, RatioRaaFDPrompt)
         else:
-            fprompt = inputCfg['fprompt']
+            fprompt = np.full(len(cutSetValues), inputCfg['fprompt'])
 
         S = GetExpectedSignal(PtMin[iPt]-PtMax[iPt], sigmaFONLL, Raa, Taa, effPrompt, Acc, fprompt, BR, fractoD, Nexp)
 
+        setValues = [[list(cutValues), *values] for cutValues, values
+                     in zip(cutSetValues, zip(S, B, effPrompt, effFD, fprompt))]
+        print(f'tested {len(setValues)} cut sets, elapsed time: {time.time() - start_time:.2f} s')
+    else:
+        for iBins in itertools.product(*ranges):
+            cutSetCount += 1
+            if cutSetCount % 100 == 0:
+                elapsed_time = time.time() - start_time
+                print('tested cut set number %d, elapsed time: %f s' % (cutSetCount, elapsed_time))
+
+            hMassPrompt, index, array4Ntuple = ApplyCuts(sMassPtCutVarsPrompt, iBins, axesnum, upperlowercuts,
+                                                         'hMassPrompt')
+            hMassFD, index, array4Ntuple = ApplyCuts(sMassPtCutVarsFD, iBins, axesnum, upperlowercuts, 'hMassFD')
+
+            if inputCfg['bkgConfiguration']['getbkgfromMC']:
+                hMassBkg, index, array4Ntuple = ApplyCuts(sMassPtCutVarsBkg, iBins, axesnum, upperlowercuts, 'hMassBkg')
+                if inputCfg['bkgConfiguration']['applyCorrFactor']:
+                    hMassBkg.Scale(corrfactor)
+            else:
+                hMassData, index, array4Ntuple = ApplyCuts(sMassPtCutVars, iBins, axesnum, upperlowercuts, 'hMassData')
+                if inputCfg['bkgConfiguration']['applyCorrFactor'] and not useClosedForm: # B scaled after fit
+                    hMassData.Scale(corrfactor)
+
+            hMassSgn = hMassPrompt.Clone('hMassSgn')
+            hMassSgn.Add(hMassFD)
+            fMassSgn = TF1('fMassSgn', 'gaus', 1.7, 2.15)
+            hMassSgn.Fit('fMassSgn', 'Q')
+            mean = fMassSgn.GetParameter(1)
+            sigma = fMassSgn.GetParameter(2)
+
+            nRecoPrompt = hMassPrompt.Integral()
+            nRecoFD = hMassFD.Integral()
+            effPrompt = nRecoPrompt / nGenPrompt
+            effFD = nRecoFD / nGenFD
+
+            if inputCfg['bkgConfiguration']['getbkgfromMC']:
+                B = GetExpectedBackgroundFromMC(hMassBkg, mean, sigma, Nexp, nEvBkg)
+            elif useClosedForm: # B estimated after the loop for all cut sets at once
+                B = 0.
+                massCounts, massBinEdges = GetSideBandArrays(hMassData)
+                massCountsSB.append(massCounts)
+                meanSets.append(mean)
+                sigmaSets.append(sigma)
+            else:
+                hMassSB = GetSideBandHisto(hMassData, mean, sigma, bkgNSigmaSB)
+                B = GetExpectedBackgroundFromSB(hMassSB, mean, sigma, Nexp, nEvBkg, bkgFitFunc)
+
+            if inputCfg['PredForFprompt']['estimateFprompt']:
+                fprompt = ComputeExpectedFprompt(PtMin[iPt], PtMax[iPt], effPrompt, \
+                    hPredPrompt, effFD, hPredFD, RatioRaaFDPrompt)
+            else:
+                fprompt = inputCfg['fprompt']
+
+            S = GetExpectedSignal(PtMin[iPt]-PtMax[iPt], sigmaFONLL, Raa, Taa, effPrompt, Acc, fprompt, BR, fractoD,
+                                  Nexp)
+
+            setValues.append([array4Ntuple, S, B, effPrompt, effFD, fprompt])
+
+    if useClosedForm:
+        BSets, _ = GetExpectedBkgFromSideBandsArrays(massCountsSB, massBinEdges, bkgFitFunc, bkgNSigmaSB,
+                                                     meanSets, sigmaSets)
+        for iSet, B in enumerate(BSets):
+            setValues[iSet][2] = B * corrfactor * Nexp / nEvBkg
+
+    for array4Ntuple, S, B, effPrompt, effFD, fprompt in setValues:
         array4Ntuple.append(PtMin[iPt])
         array4Ntuple.append(PtMax[iPt])
         array4Ntuple.append(S)
@@ -319,9 +459,14 @@ for iPt, _ in enumerate(PtMin):
         array4Ntuple.append(effFD)
         array4Ntuple.append(fprompt)
         tSignif.Fill(array.array("f", array4Ntuple))
+    if parquetOutput:
+        dfsScan.append(pd.DataFrame([array4Ntuple for array4Ntuple, *_ in setValues],
+                                    columns=varsName4Tuple.split(':')))
 
 elapsed_time = time.time() - start_time
 print('total elapsed time: %f s' % elapsed_time)
 
 tSignif.Write()
 outfile.Close()
+if parquetOutput:
+    WriteScanParquet(outFileName.replace('.root', '.parquet'), dfsScan, list(cutVars), ['Signif', 'SoverB'])
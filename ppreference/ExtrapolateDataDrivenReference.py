@@ -9,7 +9,7 @@ import numpy as np
 import yaml
 from ROOT import TFile, TF1, TCanvas, TH1F, TLegend, TGraphAsymmErrors  # pylint: disable=import-error,no-name-in-module
 sys.path.append('..')
-from utils.AnalysisUtils import ComputeRatioDiffBins
+from utils.AnalysisUtils import GetHistoArrays, SetHistoFromArrays, ExtrapolateWithFONLLArrays
 from utils.StyleFormatter import SetGlobalStyle, SetObjectStyle, GetROOTColor, GetROOTMarker
 
 SetGlobalStyle(padbottommargin=0.13)
@@ -34,24 +34,10 @@ SetObjectStyle(hCrossSec, color=GetROOTColor('kBlack'), markerstyle=GetROOTMarke
 SetObjectStyle(gCrossSec, color=GetROOTColor('kBlack'), fillstyle=0)
 inFile.Close()
 
-ptMaxMeas = hCrossSec.GetXaxis().GetXmax()
-ptLimsMeas = [hCrossSec.GetBinLowEdge(iPt) for iPt in range(1, hCrossSec.GetNbinsX()+1)]
-ptLimsMeas.append(ptMaxMeas)
-ptMinMeas = ptLimsMeas[0]
-
-colors = {'cent': GetROOTColor('kBlack'), 'min': GetROOTColor('kRed+1'), 'max': GetROOTColor('kAzure+4')}
-legNamesFONLL = {'cent': 'FONL central', 'min': 'FONLL min', 'max': 'FONLL max'}
-hFONLL, hDataOverFONLL, fDataOverFONLL = {}, {}, {}
-inFileFONLL = TFile.Open(inCfg['extrap']['FONLLfilename'])
-for var in ['cent', 'min', 'max']:
-    hFONLL[var] = inFileFONLL.Get(inCfg['extrap']['hist'][var])
-    SetObjectStyle(hFONLL[var], color=GetROOTColor('kAzure+4'), fillstyle=0)
-    hDataOverFONLL[var] = ComputeRatioDiffBins(hCrossSec, hFONLL[var])
-    hDataOverFONLL[var].Scale(1.e6)
-    SetObjectStyle(hDataOverFONLL[var], color=colors[var], fillstyle=0)
-    fDataOverFONLL[var] = TF1(f'fDataOverFONLL{var}', 'pol0', ptMinMeas, ptMaxMeas)
-    SetObjectStyle(fDataOverFONLL[var], color=colors[var])
-    hDataOverFONLL[var].Fit(fDataOverFONLL[var], '0')
+crossSecMeas, crossSecMeasUnc, ptLimsMeas = GetHistoArrays(hCrossSec)
+crossSecMeasSystLow = np.array([gCrossSec.GetErrorYlow(iPt) for iPt in range(len(crossSecMeas))])
+crossSecMeasSystHigh = np.array([gCrossSec.GetErrorYhigh(iPt) for iPt in range(len(crossSecMeas))])
+ptMinMeas, ptMaxMeas = ptLimsMeas[0], ptLimsMeas[-1]
 
 ptLimsForExtrap = inCfg['extrap']['ptlims']
 
@@ -59,16 +45,58 @@ if ptLimsForExtrap[0] != ptMaxMeas:
    print('ERROR: pT range of measurement and extrapolation do not match! Exit')
    sys.exit()
 
-ptLimsAll = np.unique(ptLimsMeas + ptLimsForExtrap)
-nPtBinsAll = len(ptLimsAll)-1
-hFONLLReb = {}
-for var in ['cent', 'min', 'max']:
-    hFONLLReb[var] = hFONLL[var].Rebin(nPtBinsAll, f'hFONLLReb{var}', np.array(ptLimsAll, 'd'))
-    hFONLLReb[var].Scale(hFONLL[var].GetBinWidth(1), 'width')
+# all FONLL variations (central first, then min, max and additional scale choices) extrapolated at once
+histNamesFONLL = [inCfg['extrap']['hist'][var] for var in ['cent', 'min', 'max']]
+if 'scalegrid' in inCfg['extrap']:
+    histNamesFONLL += inCfg['extrap']['scalegrid']
+hFONLL, crossSecFONLL, crossSecFONLLUnc = {}, [], []
+inFileFONLL = TFile.Open(inCfg['extrap']['FONLLfilename'])
+for iVar, histName in enumerate(histNamesFONLL):
+    hFONLLVar = inFileFONLL.Get(histName)
+    if not hFONLLVar:
+        print(f'ERROR: FONLL histogram {histName} not found! Exit')
+        sys.exit()
+    contents, uncs, binEdgesFONLL = GetHistoArrays(hFONLLVar)
+    crossSecFONLL.append(contents)
+    crossSecFONLLUnc.append(uncs)
+    if iVar < 3:
+        hFONLLVar.SetDirectory(0)
+        SetObjectStyle(hFONLLVar, color=GetROOTColor('kAzure+4'), fillstyle=0)
+        hFONLL[['cent', 'min', 'max'][iVar]] = hFONLLVar
+inFileFONLL.Close()
+
+extrap = ExtrapolateWithFONLLArrays(ptLimsMeas, crossSecMeas, crossSecMeasUnc, binEdgesFONLL,
+                                    np.array(crossSecFONLL), ptLimsForExtrap, 0, np.array(crossSecFONLLUnc))
+print('data/FONLL (x 1e6) for each FONLL variation:')
+for histName, norm, normUnc in zip(histNamesFONLL, extrap['norm'], extrap['normUnc']):
+    print(f'  {histName}: {norm*1.e6:.4f} +/- {normUnc*1.e6:.4f}')
+
+colors = {'cent': GetROOTColor('kBlack'), 'min': GetROOTColor('kRed+1'), 'max': GetROOTColor('kAzure+4')}
+legNamesFONLL = {'cent': 'FONL central', 'min': 'FONLL min', 'max': 'FONLL max'}
+hDataOverFONLL, fDataOverFONLL = {}, {}
+for iVar, var in enumerate(['cent', 'min', 'max']):
+    hDataOverFONLL[var] = TH1F(f'hDataOverFONLL{var}', ';#it{p}_{T} (GeV/#it{c});data/FONLL',
+                               len(ptLimsMeas)-1, ptLimsMeas)
+    SetHistoFromArrays(hDataOverFONLL[var], extrap['ratio'][iVar] * 1.e6, extrap['ratioUnc'][iVar] * 1.e6)
+    SetObjectStyle(hDataOverFONLL[var], color=colors[var], fillstyle=0)
+    fDataOverFONLL[var] = TF1(f'fDataOverFONLL{var}', 'pol0', ptMinMeas, ptMaxMeas)
+    fDataOverFONLL[var].SetParameter(0, extrap['norm'][iVar] * 1.e6)
+    fDataOverFONLL[var].SetParError(0, extrap['normUnc'][iVar] * 1.e6)
+    SetObjectStyle(fDataOverFONLL[var], color=colors[var])
+
+ptLimsAll = extrap['ptLims']
+nPtBinsMeas, nPtBinsAll = len(ptLimsMeas)-1, len(ptLimsAll)-1
+crossSecExtrap, systLowExtrap, systHighExtrap = extrap['centAndEnvelope'].T
+crossSecAll = np.concatenate((crossSecMeas, crossSecExtrap))
+systLowAll = np.concatenate((crossSecMeasSystLow, crossSecExtrap - systLowExtrap))
+systHighAll = np.concatenate((crossSecMeasSystHigh, systHighExtrap - crossSecExtrap))
+systLowExtrapAll = np.concatenate((np.zeros(nPtBinsMeas), systLowAll[nPtBinsMeas:]))
+systHighExtrapAll = np.concatenate((np.zeros(nPtBinsMeas), systHighAll[nPtBinsMeas:]))
 
 hCrossSecExtrap = TH1F('hCrossSection',
                        ';#it{p}_{T} (GeV/#it{c});d#sigma/d#it{p}_{T} #times BR (#mub GeV^{-1} #it{c})',
                        nPtBinsAll, np.array(ptLimsAll, 'd'))
+SetHistoFromArrays(hCrossSecExtrap, crossSecAll, np.concatenate((crossSecMeasUnc, np.zeros(len(crossSecExtrap)))))
 gCrossSecExtrap = TGraphAsymmErrors(0) # put all systematics together
 gCrossSecExtrap.SetName('gCrossSectionSystTot')
 gCrossSecExtrapSyst = TGraphAsymmErrors(0)
@@ -77,29 +105,12 @@ SetObjectStyle(hCrossSecExtrap, color=GetROOTColor('kRed+1'), markersize=0.8)
 SetObjectStyle(gCrossSecExtrap, color=GetROOTColor('kRed+1'), fillstyle=0)
 SetObjectStyle(gCrossSecExtrapSyst, color=GetROOTColor('kRed+1'), fillstyle=0)
 
-for iPt in range(1, hCrossSec.GetNbinsX()+1):
-    ptCent = hCrossSec.GetBinCenter(iPt)
-    crossSec = hCrossSec.GetBinContent(iPt)
-    statUnc = hCrossSec.GetBinError(iPt)
-    systLow = gCrossSec.GetErrorYlow(iPt-1)
-    systHigh = gCrossSec.GetErrorYhigh(iPt-1)
-    hCrossSecExtrap.SetBinContent(iPt, crossSec)
-    hCrossSecExtrap.SetBinError(iPt, statUnc)
-    gCrossSecExtrap.SetPoint(iPt-1, ptCent, crossSec)
-    gCrossSecExtrapSyst.SetPoint(iPt-1, ptCent, crossSec)
-    gCrossSecExtrap.SetPointError(iPt-1, 0.4, 0.4, systLow, systHigh)
-    gCrossSecExtrapSyst.SetPointError(iPt-1, 0.4, 0.4, 0., 0.)
-for iPt in range(hCrossSec.GetNbinsX()+1, hCrossSecExtrap.GetNbinsX()+1):
-    ptCent = hCrossSecExtrap.GetBinCenter(iPt)
-    extrapCross = hFONLLReb['cent'].GetBinContent(iPt) * fDataOverFONLL['cent'].GetParameter(0) * 1.e-6
-    systLow = extrapCross - hFONLLReb['cent'].GetBinContent(iPt) * fDataOverFONLL['max'].GetParameter(0) * 1.e-6
-    systHigh = hFONLLReb['cent'].GetBinContent(iPt) * fDataOverFONLL['min'].GetParameter(0) * 1.e-6 - extrapCross
-    hCrossSecExtrap.SetBinContent(iPt, extrapCross)
-    hCrossSecExtrap.SetBinError(iPt, 0.)
-    gCrossSecExtrap.SetPoint(iPt-1, ptCent, extrapCross)
-    gCrossSecExtrapSyst.SetPoint(iPt-1, ptCent, extrapCross)
-    gCrossSecExtrap.SetPointError(iPt-1, 0.4, 0.4, systLow, systHigh)
-    gCrossSecExtrapSyst.SetPointError(iPt-1, 0.4, 0.4, systLow, systHigh)
+ptCentAll = (ptLimsAll[:-1] + ptLimsAll[1:]) / 2
+for iPt, (ptCent, crossSec) in enumerate(zip(ptCentAll, crossSecAll)):
+    gCrossSecExtrap.SetPoint(iPt, ptCent, crossSec)
+    gCrossSecExtrapSyst.SetPoint(iPt, ptCent, crossSec)
+    gCrossSecExtrap.SetPointError(iPt, 0.4, 0.4, systLowAll[iPt], systHighAll[iPt])
+    gCrossSecExtrapSyst.SetPointError(iPt, 0.4, 0.4, systLowExtrapAll[iPt], systHighExtrapAll[iPt])
 
 legFit = TLegend(0.2, 0.7, 0.4, 0.9)
 legFit.SetTextSize(0.045)
@@ -1,12 +1,14 @@
 '''
 python script for the check of the mass shaping effect
 run: python CheckMassShaping.py cfgFileName.yml cutSetFileName.yml outputPath
-                                [--tree] [--particle specie] [--rebin rebin] [--fitfunc func]
+                                [--tree] [--scoreindex indexFileName.npz] [--particle specie] [--rebin rebin]
+                                [--fitfunc func]
 '''
 
 import os
 import sys
 import argparse
+import numpy as np
 import yaml
 from ROOT import TCanvas, TLegend, TDatabasePDG, TH1F, TH2F, TF1, TLine, TGraph, TVirtualFitter, TLatex # pylint: disable=import-error,no-name-in-module
 from ROOT import kFullCircle, kFullSquare, kRainBow, kRed, kAzure, kGray, kBlack # pylint: disable=import-error,no-name-in-module
@@ -14,6 +16,8 @@ from ROOT import RooStats # pylint: disable=import-error,no-name-in-module
 sys.path.append('../..')
 from utils.TaskFileLoader import LoadSingleSparseFromTask  #pylint: disable=wrong-import-position,import-error
 from utils.DfUtils import LoadDfFromRootOrParquet  #pylint: disable=wrong-import-position,import-error
+from utils.ScanUtils import LoadScoreIndices, GetScoreIndexMassCounts  #pylint: disable=wrong-import-position,import-error
+from utils.AnalysisUtils import SetHistoFromArrays  #pylint: disable=wrong-import-position,import-error
 from utils.StyleFormatter import SetObjectStyle, SetGlobalStyle, DivideCanvas  #pylint: disable=wrong-import-position,import-error
 
 SetGlobalStyle(palette=kRainBow, padbottommargin=0.14, padrightmargin=0.14,
@@ -27,6 +31,9 @@ parser.add_argument('cutSetFileName', metavar='text', default='cutset.yml',
 parser.add_argument('outputPath', metavar='text', default='outputPath', help='output path')
 parser.add_argument('--tree', action='store_true', default=False,
                     help='flag for imput tree/dataframe instead of sparse')
+parser.add_argument('--scoreindex', metavar='text', default=None,
+                    help='sorted-score index of the data built by optimisation/ScanMLThresholds.py, used instead of '
+                         'the tree/dataframe (selections only on the indexed ML output)')
 parser.add_argument('--particle', metavar='text', default='Ds',
                     help='particle, options: Ds, Dplus, Lc')
 parser.add_argument('--rebin', type=int, required=False, default=1, help='mass rebin (optional)')
@@ -68,7 +75,7 @@ with open(args.cutSetFileName, 'r') as ymlCutSetFile:
 cutVars = cutSetCfg['cutvars']
 
 hMassVsML, hMassNoSel, hMassSel = ([] for _ in range(3))
-if not args.tree: # data from sparse
+if not args.tree and not args.scoreindex: # data from sparse
     for iFile, infilename in enumerate(inFileNames):
         if iFile == 0:
             sparseBkg = LoadSingleSparseFromTask(infilename, inputCfg, 'sparsenameBkg')
@@ -102,6 +109,56 @@ if not args.tree: # data from sparse
         for iAxis in range(sparseBkg.GetNdimensions()):
             sparseBkg.GetAxis(iAxis).SetRange(-1, -1)
 
+elif args.scoreindex: # data from the sorted-score index
+    indices, _ = LoadScoreIndices(args.scoreindex)
+    scoreName = str(indices['info']['scoreName'])
+    for var in cutVars:
+        if var not in ['InvMass', 'Pt'] and cutVars[var]['name'] != scoreName:
+            print(f'ERROR: only selections on {scoreName} can be applied with the sorted-score index! Exit')
+            sys.exit()
+
+    for iPt, (ptMin, ptMax) in enumerate(zip(cutVars['Pt']['min'], cutVars['Pt']['max'])):
+        print(f'Projecting distributions for {ptMin:.1f} < pT < {ptMax:.1f} GeV/c')
+        iPtIndex = np.flatnonzero(np.isclose(indices['info']['ptMins'], ptMin) &
+                                  np.isclose(indices['info']['ptMaxs'], ptMax))
+        if len(iPtIndex) == 0:
+            print(f'ERROR: pT bin {ptMin}-{ptMax} not present in the sorted-score index! Exit')
+            sys.exit()
+        dataIndex = indices[f'data_pt{iPtIndex[0]}']
+        massBinEdges = dataIndex['massBinEdges']
+
+        # score ranges (min < score < max) for no selection, the selection of the cut set and the bins of the
+        # score axis (lower edge included)
+        scoreMins, scoreMaxs = [-np.inf], [np.inf]
+        for var in cutVars:
+            if var not in ['InvMass', 'Pt']:
+                scoreMins.append(cutVars[var]['min'][iPt])
+                scoreMaxs.append(cutVars[var]['max'][iPt])
+        if len(scoreMins) == 1:
+            scoreMins.append(-np.inf)
+            scoreMaxs.append(np.inf)
+        finiteScores = dataIndex['scores'][np.isfinite(dataIndex['scores'])]
+        scoreBinEdges = np.linspace(min(finiteScores), max(finiteScores), 101)
+        scoreMins += list(np.nextafter(scoreBinEdges[:-1], -np.inf))
+        scoreMaxs += list(scoreBinEdges[1:-1]) + [np.nextafter(scoreBinEdges[-1], np.inf)]
+        massCounts = GetScoreIndexMassCounts(dataIndex, scoreMins, scoreMaxs)
+
+        hMassNoSel.append(TH1F(f'hMassNoSelPt{ptMin:.0f}_{ptMax:.0f}',
+                               f'{ptMin} < #it{{p}}_{{T}} < {ptMax} (GeV/#it{{c}});{massTitle};Counts',
+                               len(massBinEdges) - 1, massBinEdges))
+        SetHistoFromArrays(hMassNoSel[iPt], massCounts[0], np.sqrt(massCounts[0]))
+        hMassSel.append(TH1F(f'hMassSelPt{ptMin:.0f}_{ptMax:.0f}',
+                             f'{ptMin} < #it{{p}}_{{T}} < {ptMax} (GeV/#it{{c}});{massTitle};Counts',
+                             len(massBinEdges) - 1, massBinEdges))
+        SetHistoFromArrays(hMassSel[iPt], massCounts[1], np.sqrt(massCounts[1]))
+
+        hMassVsML.append({})
+        hMassVsML[iPt][scoreName] = TH2F(f'hMassVs{scoreName}Pt{ptMin:.0f}_{ptMax:.0f}', f';{massTitle};{scoreName}',
+                                         len(massBinEdges) - 1, massBinEdges, len(scoreBinEdges) - 1, scoreBinEdges)
+        for iScoreBin, massCountsScoreBin in enumerate(massCounts[2:]):
+            for iMassBin, counts in enumerate(massCountsScoreBin):
+                hMassVsML[iPt][scoreName].SetBinContent(iMassBin + 1, iScoreBin + 1, counts)
+
 else: # data from tree/dataframe
     dataFrameBkg = LoadDfFromRootOrParquet(inputCfg['tree']['filenameBkg'], inputCfg['tree']['dirname'],
                                            inputCfg['tree']['treename'])
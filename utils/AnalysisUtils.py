@@ -34,9 +34,36 @@ def ComputeEfficiency(recoCounts, genCounts, recoCountsError, genCountsError):
     return hTmpNum.GetBinContent(1), hTmpNum.GetBinError(1)
 
 
+def ComputeEfficiencyArrays(recoCounts, genCounts, recoCountsError, genCountsError):
+    '''
+    Method to compute efficiencies with binomial uncertainties (same as ComputeEfficiency, i.e. TH1::Divide
+    with option B) for arrays of counts, e.g. for all pT bins and cut sets at once
+
+    Parameters
+    ----------
+    - recoCounts: array of numbers of reconstructed D
+    - genCounts: array of numbers of generated D (broadcastable to the shape of recoCounts)
+    - recoCountsError: array of errors on numbers of reconstructed D
+    - genCountsError: array of errors on numbers of generated D
+
+    Returns
+    ----------
+    - efficiency, error on efficiency (numpy arrays)
+    '''
+    recoCounts, genCounts, recoCountsError, genCountsError = np.broadcast_arrays(
+        *[np.asarray(var, dtype=np.float64) for var in [recoCounts, genCounts, recoCountsError, genCountsError]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eff = np.where(genCounts != 0, recoCounts / genCounts, 0.)
+        effUncSq = np.abs(((1. - 2. * eff) * recoCountsError**2 + eff**2 * genCountsError**2) / genCounts**2)
+    effUncSq = np.where((genCounts != 0) & (recoCounts != genCounts), effUncSq, 0.)
+
+    return eff, np.sqrt(effUncSq)
+
+
 # pylint: disable=too-many-locals
 def GetPromptFDYieldsAnalyticMinimisation(effPromptList, effFDList, rawYieldList, effPromptUncList, effFDUncList,
-                                          rawYieldUncList, corr=True, precision=1.e-8, nMaxIter=100):
+                                          rawYieldUncList, corr=True, precision=1.e-8, nMaxIter=100,
+                                          rawYieldCovMatrix=None):
     '''
     Method to retrieve prompt and FD corrected yields with an analytic system minimisation
 
@@ -51,89 +78,131 @@ def GetPromptFDYieldsAnalyticMinimisation(effPromptList, effFDList, rawYieldList
     - corr (bool, optional): whether to compute the correlation
     - precision (float, optional): target precision for minimisation procedure
     - nMaxIter (int, optional): max number of iterations for minimisation procedure
+    - rawYieldCovMatrix (optional): covariance matrix of raw yields (e.g. from a simultaneous fit of the cut
+      sets). If set, it replaces the raw-yield uncertainties and the correlation scheme is applied only to the
+      efficiency uncertainties
 
     Returns
     ----------
-    - mCorrYield (numpy matrix): corrected yields (Nprompt, NFD)
-    - mCovariance (numpy matrix): covariance matrix for corrected yields
+    - mCorrYield (numpy array): corrected yields (Nprompt, NFD) with shape (2, 1)
+    - mCovariance (numpy array): covariance matrix for corrected yields
     - redChiSquare (float): reduced chi square
     - dicOfMatrices (dictionary): dictionary with all matrices used in minimisation procedure
     '''
-    nCutSets = len(effPromptList)
-
-    mRawYield = np.zeros(shape=(nCutSets, 1))
-    mEff = np.zeros(shape=(nCutSets, 2))
-    mCovSets = np.zeros(shape=(nCutSets, nCutSets))
-    mCorrSets = np.zeros(shape=(nCutSets, nCutSets))
-    mWeights = np.zeros(shape=(nCutSets, nCutSets))
-
-    mCorrYield = np.zeros(shape=(2, 1))
-    mCorrYieldOld = np.zeros(shape=(2, 1))
-    mCovariance = np.zeros(shape=(2, 2))
-    mRes = np.zeros(shape=(nCutSets, 1))
-
-    for iCutSet, (rawYield, effPrompt, effFD) in enumerate(zip(rawYieldList, effPromptList, effFDList)):
-        mRawYield.itemset(iCutSet, rawYield)
-        mEff.itemset((iCutSet, 0), effPrompt)
-        mEff.itemset((iCutSet, 1), effFD)
-
-    mRawYield = np.matrix(mRawYield)
-    mEff = np.matrix(mEff)
-
-    for iIter in range(nMaxIter):
-        if iIter == 0:
-            mCorrYield.itemset(0, 0)
-            mCorrYield.itemset(1, 0)
-        for iCutSetRow, (rawYieldUncRow, effPromptUncRow, effFDUncRow) in enumerate(\
-            zip(rawYieldUncList, effPromptUncList, effFDUncList)):
-            for iCutSetCol, (rawYieldUncCol, effPromptUncCol, effFDUncCol) in enumerate(\
-                zip(rawYieldUncList, effPromptUncList, effFDUncList)):
-                uncRow = np.sqrt(rawYieldUncRow**2 + effPromptUncRow**2 *
-                                 mCorrYield.item(0)**2 + effFDUncRow**2 * mCorrYield.item(1)**2)
-                uncCol = np.sqrt(rawYieldUncCol**2 + effPromptUncCol**2 *
-                                 mCorrYield.item(0)**2 + effFDUncCol**2 * mCorrYield.item(1)**2)
-                if corr and uncRow > 0 and uncCol > 0:
-                    if uncRow < uncCol:
-                        rho = uncRow / uncCol
-                    else:
-                        rho = uncCol / uncRow
-                else:
-                    if iCutSetRow == iCutSetCol:
-                        rho = 1.
-                    else:
-                        rho = 0.
-                covRowCol = rho * uncRow * uncCol
-                mCovSets.itemset((iCutSetRow, iCutSetCol), covRowCol)
-                mCorrSets.itemset((iCutSetRow, iCutSetCol), rho)
-
-        mCovSets = np.matrix(mCovSets)
+    corrYield, covariance, redChiSquare, dicOfMatrices = GetPromptFDYieldsAnalyticMinimisationBatch(
+        effPromptList, effFDList, rawYieldList, effPromptUncList, effFDUncList, rawYieldUncList, corr, precision,
+        nMaxIter, rawYieldCovMatrix)
+
+    return corrYield.reshape(2, 1), covariance, float(redChiSquare), dicOfMatrices
+
+
+# pylint: disable=too-many-locals,too-many-statements
+def GetPromptFDYieldsAnalyticMinimisationBatch(effPrompt, effFD, rawYield, effPromptUnc, effFDUnc, rawYieldUnc,
+                                               corr=True, precision=1.e-8, nMaxIter=100, rawYieldCovMatrix=None):
+    '''
+    Vectorised version of GetPromptFDYieldsAnalyticMinimisation: solves the minimisation for many pT bins
+    (and/or toys) at once with batched linear algebra. The iterations stop independently for each element
+    of the batch, so that the results are the same as those obtained calling the minimisation one by one
+
+    Parameters
+    ----------
+    - effPrompt: array of efficiencies for prompt D with shape (..., nCutSets), e.g. (nPtBins, nCutSets)
+      or (nPtBins, nToys, nCutSets)
+    - effFD: array of efficiencies for FD D (broadcastable to the shape of rawYield)
+    - rawYield: array of raw yields with shape (..., nCutSets)
+    - effPromptUnc: array of uncertainties on efficiencies for prompt D (broadcastable to the shape of rawYield)
+    - effFDUnc: array of uncertainties on efficiencies for FD D (broadcastable to the shape of rawYield)
+    - rawYieldUnc: array of uncertainties on raw yields (broadcastable to the shape of rawYield)
+    - corr (bool, optional): whether to compute the correlation
+    - precision (float, optional): target precision for minimisation procedure
+    - nMaxIter (int, optional): max number of iterations for minimisation procedure
+    - rawYieldCovMatrix (optional): array of covariance matrices of raw yields with shape (..., nCutSets, nCutSets).
+      If set, it replaces the raw-yield uncertainties and the correlation scheme is applied only to the
+      efficiency uncertainties
+
+    Returns
+    ----------
+    - corrYield (numpy array): corrected yields (Nprompt, NFD) with shape (..., 2)
+    - covariance (numpy array): covariance matrices for corrected yields with shape (..., 2, 2)
+    - redChiSquare (numpy array): reduced chi squares with shape (...)
+    - dicOfMatrices (dictionary): dictionary with all matrices used in minimisation procedure,
+      each with shape (..., nCutSets, nCutSets)
+    '''
+    rawYield = np.asarray(rawYield, dtype=np.float64)
+    batchShape, nCutSets = rawYield.shape[:-1], rawYield.shape[-1]
+    nBatch = int(np.prod(batchShape, dtype=int))
+
+    def Flatten(arr, lastShape):
+        return np.broadcast_to(np.asarray(arr, dtype=np.float64), batchShape + lastShape).reshape((nBatch,) + lastShape)
+
+    rawYield = rawYield.reshape(nBatch, nCutSets)
+    eff = np.stack((Flatten(effPrompt, (nCutSets,)), Flatten(effFD, (nCutSets,))), axis=-1)
+    effUncSq = np.stack((Flatten(effPromptUnc, (nCutSets,))**2, Flatten(effFDUnc, (nCutSets,))**2), axis=-1)
+    if rawYieldCovMatrix is not None:
+        rawYieldUncSq = np.zeros((nBatch, nCutSets))
+        rawYieldCov = Flatten(rawYieldCovMatrix, (nCutSets, nCutSets))
+    else:
+        rawYieldUncSq = Flatten(rawYieldUnc, (nCutSets,))**2
+    diagMask = np.eye(nCutSets)
+
+    corrYield = np.zeros((nBatch, 2))
+    covariance = np.zeros((nBatch, 2, 2))
+    covSets = np.zeros((nBatch, nCutSets, nCutSets))
+    corrSets = np.zeros((nBatch, nCutSets, nCutSets))
+    weights = np.zeros((nBatch, nCutSets, nCutSets))
+    res = np.zeros((nBatch, nCutSets))
+    idx = np.arange(nBatch)
+
+    for _ in range(nMaxIter):
+        corrYieldOld = corrYield[idx]
+        unc = np.sqrt(rawYieldUncSq[idx] + effUncSq[idx, :, 0] * corrYieldOld[:, np.newaxis, 0]**2 +
+                      effUncSq[idx, :, 1] * corrYieldOld[:, np.newaxis, 1]**2)
+        uncRow, uncCol = unc[:, :, np.newaxis], unc[:, np.newaxis, :]
+        if corr:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rho = np.where(uncRow < uncCol, uncRow / uncCol, uncCol / uncRow)
+            rho = np.where((uncRow > 0) & (uncCol > 0), rho, diagMask)
+        else:
+            rho = np.broadcast_to(diagMask, (idx.size, nCutSets, nCutSets))
+        mCovSets = rho * uncRow * uncCol
+        mCorrSets = rho
+        if rawYieldCovMatrix is not None:
+            mCovSets = mCovSets + rawYieldCov[idx]
+            uncSets = np.sqrt(np.diagonal(mCovSets, axis1=1, axis2=2))
+            mCorrSets = mCovSets / (uncSets[:, :, np.newaxis] * uncSets[:, np.newaxis, :])
+
         mWeights = np.linalg.inv(np.linalg.cholesky(mCovSets))
-        mWeights = mWeights.T * mWeights
-        mEffT = mEff.T
+        mWeights = np.swapaxes(mWeights, 1, 2) @ mWeights
+        mEff = eff[idx]
+        mEffT = np.swapaxes(mEff, 1, 2)
 
-        mCovariance = (mEffT * mWeights) * mEff
+        mCovariance = (mEffT @ mWeights) @ mEff
         mCovariance = np.linalg.inv(np.linalg.cholesky(mCovariance))
-        mCovariance = mCovariance.T * mCovariance
+        mCovariance = np.swapaxes(mCovariance, 1, 2) @ mCovariance
 
-        mCorrYield = mCovariance * (mEffT * mWeights) * mRawYield
-        mRes = mEff * mCorrYield - mRawYield
-        mResT = np.transpose(mRes)
+        mCorrYield = (mCovariance @ (mEffT @ mWeights) @ rawYield[idx, :, np.newaxis])[:, :, 0]
+        mRes = (mEff @ mCorrYield[:, :, np.newaxis])[:, :, 0] - rawYield[idx]
 
-        if (mCorrYield.item(0)-mCorrYieldOld.item(0)) / mCorrYield.item(0) < precision and \
-            (mCorrYield.item(1)-mCorrYieldOld.item(1)) / mCorrYield.item(1) < precision:
-            break
+        corrYield[idx], covariance[idx], res[idx] = mCorrYield, mCovariance, mRes
+        covSets[idx], corrSets[idx], weights[idx] = mCovSets, mCorrSets, mWeights
 
-        mCorrYieldOld = np.copy(mCorrYield)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            isConverged = np.all((mCorrYield - corrYieldOld) / mCorrYield < precision, axis=1)
+        idx = idx[~isConverged]
+        if idx.size == 0:
+            break
 
     #reduced chi2
-    redChiSquare = mResT * mWeights * mRes / (nCutSets - 2)
+    redChiSquare = np.einsum('bi,bij,bj->b', res, weights, res) / (nCutSets - 2)
     #dictionary with matrices used in minimisation procedure
-    dicOfMatrices = {'covMatrix':mCovSets, 'weightMatrix':mWeights, 'corrMatrix':mCorrSets}
+    dicOfMatrices = {'covMatrix': covSets.reshape(batchShape + (nCutSets, nCutSets)),
+                     'weightMatrix': weights.reshape(batchShape + (nCutSets, nCutSets)),
+                     'corrMatrix': corrSets.reshape(batchShape + (nCutSets, nCutSets))}
 
-    return mCorrYield, mCovariance, float(redChiSquare), dicOfMatrices
+    return corrYield.reshape(batchShape + (2,)), covariance.reshape(batchShape + (2, 2)), \
+        redChiSquare.reshape(batchShape), dicOfMatrices
 
 
-# pylint: disable=too-many-branches
 def GetPromptFDFractionFc(accEffPrompt, accEffFD, crossSecPrompt, crossSecFD, raaPrompt=1., raaFD=1.):
     '''
     Method to get fraction of prompt / FD fraction with fc method
@@ -152,50 +221,79 @@ def GetPromptFDFractionFc(accEffPrompt, accEffFD, crossSecPrompt, crossSecFD, ra
     - fracPrompt: list of fraction of prompt D (cent, min, max)
     - fracFD: list of fraction of feed-down D (cent, min, max)
     '''
-    if not isinstance(crossSecPrompt, list) and isinstance(crossSecPrompt, float):
-        crossSecPrompt = [crossSecPrompt]
-    if not isinstance(crossSecFD, list) and isinstance(crossSecFD, float):
-        crossSecFD = [crossSecFD]
-    if not isinstance(raaPrompt, list) and isinstance(raaPrompt, float):
-        raaPrompt = [raaPrompt]
-    if not isinstance(raaFD, list) and isinstance(raaFD, float):
-        raaFD = [raaFD]
-
-    fracPrompt, fracFD = [], []
-    if accEffPrompt == 0:
-        fracFDCent = 1.
-        fracPromptCent = 0.
-        fracPrompt = [fracPromptCent, fracPromptCent, fracPromptCent]
-        fracFD = [fracFDCent, fracFDCent, fracFDCent]
-        return fracPrompt, fracFD
-    if accEffFD == 0:
-        fracFDCent = 0.
-        fracPromptCent = 1.
-        fracPrompt = [fracPromptCent, fracPromptCent, fracPromptCent]
-        fracFD = [fracFDCent, fracFDCent, fracFDCent]
-        return fracPrompt, fracFD
-
-    for iSigma, (sigmaP, sigmaF) in enumerate(zip(crossSecPrompt, crossSecFD)):
-        for iRaa, (raaP, raaF) in enumerate(zip(raaPrompt, raaFD)):
-            if iSigma == 0 and iRaa == 0:
-                fracPromptCent = 1./(1 + accEffFD / accEffPrompt * sigmaF / sigmaP * raaF / raaP)
-                fracFDCent = 1./(1 + accEffPrompt / accEffFD * sigmaP / sigmaF * raaP / raaF)
-            else:
-                fracPrompt.append(1./(1 + accEffFD / accEffPrompt * sigmaF / sigmaP * raaF / raaP))
-                fracFD.append(1./(1 + accEffPrompt / accEffFD * sigmaP / sigmaF * raaP / raaF))
-
-    if fracPrompt and fracFD:
-        fracPrompt.sort()
-        fracFD.sort()
-        fracPrompt = [fracPromptCent, fracPrompt[0], fracPrompt[-1]]
-        fracFD = [fracFDCent, fracFD[0], fracFD[-1]]
-    else:
-        fracPrompt = [fracPromptCent, fracPromptCent, fracPromptCent]
-        fracFD = [fracFDCent, fracFDCent, fracFDCent]
+    fracPrompt, fracFD = GetPromptFDFractionFcArrays(accEffPrompt, accEffFD, crossSecPrompt, crossSecFD,
+                                                     raaPrompt, raaFD)
+
+    return fracPrompt.tolist(), fracFD.tolist()
+
+
+def GetPromptFDFractionFcArrays(accEffPrompt, accEffFD, crossSecPrompt, crossSecFD, raaPrompt=1., raaFD=1.):
+    '''
+    Method to get fraction of prompt / FD fraction with fc method for many pT bins (and/or cut sets) at once
+
+    Parameters
+    ----------
+    - accEffPrompt: array of efficiencies times acceptance of prompt D with shape (...), e.g. (nPtBins)
+    - accEffFD: array of efficiencies times acceptance of feed-down D with shape (...)
+    - crossSecPrompt: array of production cross sections of prompt D in pp collisions from theory with
+      shape (..., nVariations), the first variation being the central one (e.g. cent, min, max)
+    - crossSecFD: array of production cross sections of feed-down D in pp collisions from theory with
+      shape (..., nVariations), paired with those of prompt D
+    - raaPrompt: array of nuclear modification factors of prompt D from theory with shape (..., nRaaVariations),
+      the first variation being the central one (or a number)
+    - raaFD: array of nuclear modification factors of feed-down D from theory with shape (..., nRaaVariations),
+      paired with those of prompt D (or a number)
+
+    Returns
+    ----------
+    - fracPrompt: array of fractions of prompt D (cent, min, max) with shape (..., 3), the envelope
+      being computed over all the combinations of cross-section and RAA variations
+    - fracFD: array of fractions of feed-down D (cent, min, max) with shape (..., 3)
+    '''
+    accEffPrompt = np.asarray(accEffPrompt, dtype=np.float64)[..., np.newaxis, np.newaxis]
+    accEffFD = np.asarray(accEffFD, dtype=np.float64)[..., np.newaxis, np.newaxis]
+    crossSecPrompt, crossSecFD = np.atleast_1d(crossSecPrompt), np.atleast_1d(crossSecFD)
+    raaPrompt, raaFD = np.atleast_1d(raaPrompt), np.atleast_1d(raaFD)
+    nSigma = min(crossSecPrompt.shape[-1], crossSecFD.shape[-1])
+    nRaa = min(raaPrompt.shape[-1], raaFD.shape[-1])
+    sigmaP, sigmaF = crossSecPrompt[..., :nSigma, np.newaxis], crossSecFD[..., :nSigma, np.newaxis]
+    raaP, raaF = raaPrompt[..., np.newaxis, :nRaa], raaFD[..., np.newaxis, :nRaa]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fracPrompt = 1. / (1 + accEffFD / accEffPrompt * sigmaF / sigmaP * raaF / raaP)
+        fracFD = 1. / (1 + accEffPrompt / accEffFD * sigmaP / sigmaF * raaP / raaF)
+    fracPrompt = GetCentralAndEnvelope(fracPrompt.reshape(fracPrompt.shape[:-2] + (-1,)))
+    fracFD = GetCentralAndEnvelope(fracFD.reshape(fracFD.shape[:-2] + (-1,)))
+
+    # null efficiencies
+    nullEffPrompt = np.broadcast_to(accEffPrompt[..., 0, 0] == 0, fracPrompt.shape[:-1])[..., np.newaxis]
+    nullEffFD = np.broadcast_to(accEffFD[..., 0, 0] == 0, fracPrompt.shape[:-1])[..., np.newaxis]
+    fracPrompt = np.where(nullEffPrompt, 0., np.where(nullEffFD, 1., fracPrompt))
+    fracFD = np.where(nullEffPrompt, 1., np.where(nullEffFD, 0., fracFD))
 
     return fracPrompt, fracFD
 
 
+def GetCentralAndEnvelope(values):
+    '''
+    Helper method to get the central value and the envelope of a set of variations
+
+    Parameters
+    ----------
+    - values: array with shape (..., nVariations), the first variation being the central one
+
+    Returns
+    ----------
+    - centAndEnvelope: array with shape (..., 3) with central value, minimum and maximum of the variations
+      other than the central one (central value if no other variation)
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[-1] == 1:
+        return np.repeat(values, 3, axis=-1)
+
+    return np.stack((values[..., 0], np.min(values[..., 1:], axis=-1), np.max(values[..., 1:], axis=-1)), axis=-1)
+
+
 # pylint: disable=too-many-arguments, too-many-branches
 def GetFractionNb(rawYield, accEffSame, accEffOther, crossSec, deltaPt, deltaY, BR, nEvents, \
     sigmaMB, raaRatio=1., taa=1., ppRef=1.):
@@ -222,56 +320,68 @@ def GetFractionNb(rawYield, accEffSame, accEffOther, crossSec, deltaPt, deltaY,
     ----------
     - frac: list of fraction of prompt (feed-down) D (cent, min, max)
     '''
-    if not isinstance(crossSec, list) and isinstance(crossSec, float):
-        crossSec = [crossSec]
-
-    if not isinstance(raaRatio, list) and isinstance(raaRatio, float):
-        raaRatio = [raaRatio]
-
-    frac = []
-    for iSigma, sigma in enumerate(crossSec):
-        for iRaaRatio, raaRat in enumerate(raaRatio):
-            raaOther = 1.
-            if iSigma == 0 and iRaaRatio == 0:
-                if raaRat == 1. and ppRef == 1. and taa == 1.: #pp
-                    fracCent = 1 - sigma * deltaPt * deltaY * accEffOther * BR * nEvents * 2 / rawYield / sigmaMB
-                else: #p-Pb or Pb-Pb: iterative evaluation of Raa needed
-                    deltaRaa = 1.
-                    while deltaRaa > 1.e-3:
-                        fracCent = 1 - taa * raaRat * raaOther * sigma * \
-                            deltaPt * deltaY * accEffOther * BR * nEvents * 2 / rawYield
-                        raaOtherOld = raaOther
-                        raaOther = fracCent * rawYield * sigmaMB / (2 * accEffSame * deltaPt * deltaY * BR * nEvents)
-                        deltaRaa = abs((raaOther-raaOtherOld) / raaOther)
+    return GetFractionNbArrays(rawYield, accEffSame, accEffOther, crossSec, deltaPt, deltaY, BR, nEvents, sigmaMB,
+                               raaRatio, taa, ppRef).tolist()
 
-            else:
-                if raaRat == 1. and ppRef == 1. and taa == 1.: #pp
-                    frac.append(1 - sigma * deltaPt * deltaY * accEffOther * BR * nEvents * 2 / rawYield / sigmaMB)
-                else:
-                    deltaRaa = 1.
-                    fracTmp = 1.
-                    while deltaRaa > 1.e-3:
-                        fracTmp = 1 - taa * raaRat * raaOther * sigma * \
-                            deltaPt * deltaY * accEffOther * BR * nEvents * 2 / rawYield
-                        raaOtherOld = raaOther
-                        raaOther = fracTmp * rawYield * sigmaMB / (2 * accEffSame * deltaPt * deltaY * BR * nEvents)
-                        deltaRaa = abs((raaOther-raaOtherOld) / raaOther)
-                    frac.append(fracTmp)
-
-    if frac:
-        frac.sort()
-        frac = [fracCent, frac[0], frac[-1]]
-    else:
-        frac = [fracCent, fracCent, fracCent]
 
-    return frac
+# pylint: disable=too-many-arguments
+def GetFractionNbArrays(rawYield, accEffSame, accEffOther, crossSec, deltaPt, deltaY, BR, nEvents, \
+    sigmaMB, raaRatio=1., taa=1., ppRef=1.):
+    '''
+    Method to get fraction of prompt / FD fraction with Nb method for many pT bins (and/or cut sets) at once
+
+    Parameters
+    ----------
+    - rawYield: array of raw yields with shape (...), e.g. (nPtBins)
+    - accEffSame: array of efficiencies times acceptance of prompt (feed-down) D with shape (...)
+    - accEffOther: array of efficiencies times acceptance of feed-down (prompt) D with shape (...)
+    - crossSec: array of production cross sections of feed-down (prompt) D in pp collisions from theory
+      with shape (..., nVariations), the first variation being the central one (e.g. cent, min, max)
+    - deltaPt: widths of pT intervals with shape (...)
+    - deltaY: width of Y interval
+    - BR: branching ratio for the chosen decay channel
+    - nEvents: number of events corresponding to the raw yields (broadcastable to shape (...))
+    - sigmaMB: MB cross section (=1 for p-Pb and Pb-Pb)
+    - raaRatio: array of D nuclear modification factor ratios feed-down / prompt (prompt / feed-down)
+      with shape (..., nRaaVariations), the first variation being the central one (=1 in case of pp)
+    - taa: average nuclear overlap function (=1 in case of pp)
+    - ppRef: value of pp reference for prompt (feed-down) D (=1 in case of pp)
+
+    Returns
+    ----------
+    - frac: array of fractions of prompt (feed-down) D (cent, min, max) with shape (..., 3), the envelope
+      being computed over all the combinations of cross-section and RAA-ratio variations
+    '''
+    rawYield, accEffSame, accEffOther, deltaPt, nEvents = [
+        np.asarray(var, dtype=np.float64)[..., np.newaxis, np.newaxis]
+        for var in [rawYield, accEffSame, accEffOther, deltaPt, nEvents]]
+    sigma = np.atleast_1d(crossSec)[..., :, np.newaxis]
+    raaRat = np.atleast_1d(raaRatio)[..., np.newaxis, :]
+
+    isPP = (raaRat == 1.) & (ppRef == 1.) & (taa == 1.)
+    fracPP = 1 - sigma * deltaPt * deltaY * accEffOther * BR * nEvents * 2 / rawYield / sigmaMB
+    # p-Pb or Pb-Pb: iterative evaluation of Raa needed (stopped independently for each element)
+    shape = np.broadcast_shapes(fracPP.shape, raaRat.shape)
+    frac, raaOther = np.ones(shape), np.ones(shape)
+    isActive = np.broadcast_to(~isPP, shape).copy()
+    while np.any(isActive):
+        fracTmp = 1 - taa * raaRat * raaOther * sigma * deltaPt * deltaY * accEffOther * BR * nEvents * 2 / rawYield
+        raaOtherNew = fracTmp * rawYield * sigmaMB / (2 * accEffSame * deltaPt * deltaY * BR * nEvents)
+        frac = np.where(isActive, fracTmp, frac)
+        deltaRaa = np.abs((raaOtherNew - raaOther) / raaOtherNew)
+        raaOther = np.where(isActive, raaOtherNew, raaOther)
+        isActive &= deltaRaa > 1.e-3
+    frac = np.where(isPP, fracPP, frac)
+
+    return GetCentralAndEnvelope(frac.reshape(frac.shape[:-2] + (-1,)))
 
 
 def GetPromptFDFractionCutSet(accEffPrompt, accEffFD, corrYieldPrompt, corrYieldFD,
                               covPromptPrompt, covFDFD, covPromptFD):
     '''
     Helper method to get the prompt and FD fractions for a given cut set with the cut-variation method
-    The Uncertainties on the efficiencies are neglected
+    The Uncertainties on the efficiencies are neglected. All the inputs can be numpy arrays (e.g. all
+    pT bins at once)
 
     Parameters
     ----------
@@ -355,6 +465,96 @@ def GetExpectedBkgFromSideBands(hMassData, bkgFunc='pol2', nSigmaForSB=4, mean=0
     return expBkg3s, errExpBkg3s, hMassData
 
 
+def GetExpectedBkgFromSideBandsArrays(massCounts, massBinEdges, bkgFunc='pol2', nSigmaForSB=4, mean=0., sigma=0.,
+                                      meanSecPeak=0., sigmaSecPeak=0.):
+    '''
+    Helper method to get the expected bkg from side-bands for a stack of invariant-mass distributions
+    (e.g. one per tested cut set) at once, with closed-form weighted least-squares fits of the bin
+    contents instead of a TF1 fit per distribution. Polynomials are fitted to the counts with weights
+    1/counts, the exponential is fitted as a straight line to the log of the counts with weights equal
+    to the counts. In both cases only the non-empty side-band bins are used: unlike the binned
+    log-likelihood fit of GetExpectedBkgFromSideBands, which also accounts for the empty bins, the
+    estimate is biased upwards for side bands with few counts per bin
+
+    Parameters
+    ----------
+    - massCounts: bin contents of the invariant-mass distributions, shape (nSets, nBins) or (nBins,)
+    - massBinEdges: bin edges of the invariant-mass distributions (uniform binning), shape (nBins+1,) if shared
+      by all the distributions or (nSets, nBins+1)
+    - bkgFunc: expression for bkg fit function ('expo', 'pol0', 'pol1', 'pol2', 'pol3')
+    - nSigmaForSB: number of sigmas away from the invariant-mass peak to define SB windows
+    - mean: mean of invariant-mass peak of the signal (single value or one per distribution)
+    - sigma: width of invariant-mass peak of the signal (single value or one per distribution)
+    - meanSecPeak: mean of invariant-mass peak of the second peak (only Ds)
+    - sigmaSecPeak: width of invariant-mass peak of the second peak (only Ds)
+
+    Returns
+    ----------
+    - expBkg3s: array of expected backgrounds within 3 sigma from signal peak mean
+    - errExpBkg3s: array of errors on the expected backgrounds
+    '''
+    if bkgFunc != 'expo' and bkgFunc not in ('pol0', 'pol1', 'pol2', 'pol3'):
+        raise ValueError(f'Function \'{bkgFunc}\' not implemented')
+
+    massCounts = np.atleast_2d(np.asarray(massCounts, dtype=float))
+    nSets = massCounts.shape[0]
+    massBinEdges = np.broadcast_to(np.asarray(massBinEdges, dtype=float), (nSets, massCounts.shape[1] + 1))
+    mean = np.broadcast_to(np.asarray(mean, dtype=float), (nSets,))[:, np.newaxis]
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), (nSets,))[:, np.newaxis]
+    hasPeakWidth = sigma[:, 0] > 0
+    sigma = np.where(sigma > 0, sigma, 1.)
+    binWidth = massBinEdges[:, 1] - massBinEdges[:, 0]
+    binCentres = (massBinEdges[:, :-1] + massBinEdges[:, 1:]) / 2
+    isSB = np.abs(binCentres - mean) > nSigmaForSB * sigma
+    if meanSecPeak > 0 and sigmaSecPeak > 0:
+        isSB &= np.abs(binCentres - meanSecPeak) > nSigmaForSB * sigmaSecPeak
+
+    # fit variable centred on the peak to keep the normal equations well conditioned
+    massVar = (binCentres - mean) / sigma
+    countsSB = np.where(isSB, massCounts, 0.)
+
+    if bkgFunc == 'expo':
+        nPars = 2
+        weights = countsSB
+        valuesSB = np.log(np.where(countsSB > 0, countsSB, 1.))
+    else:
+        nPars = int(bkgFunc[-1]) + 1
+        weights = np.where(countsSB > 0, 1. / np.where(countsSB > 0, countsSB, 1.), 0.)
+        valuesSB = countsSB
+    designMatrix = massVar[:, :, np.newaxis]**np.arange(nPars)
+
+    # weighted normal equations solved for all the sets at once
+    normMatrix = np.einsum('sb,sbi,sbj->sij', weights, designMatrix, designMatrix)
+    normVector = np.einsum('sb,sbi,sb->si', weights, designMatrix, valuesSB)
+    isValid = (countsSB.sum(axis=1) > 5) & (np.count_nonzero(weights, axis=1) > nPars) & hasPeakWidth
+    isValid &= np.linalg.cond(normMatrix) < 1.e12
+    normMatrix[~isValid] = np.eye(nPars)
+    normVector[~isValid] = 0.
+    covMatrix = np.linalg.inv(normMatrix)
+    pars = np.einsum('sij,sj->si', covMatrix, normVector)
+
+    halfWidth = 3.
+    if bkgFunc == 'expo':
+        slope = pars[:, 1]
+        isFlat = np.abs(slope * halfWidth) < 1.e-6
+        safeSlope = np.where(isFlat, 1., slope)
+        sinhTerm = np.where(isFlat, 2 * halfWidth, 2 * np.sinh(safeSlope * halfWidth) / safeSlope)
+        coshTerm = np.where(isFlat, 0., (2 * halfWidth * np.cosh(safeSlope * halfWidth) - sinhTerm) / safeSlope)
+        integral = np.exp(pars[:, 0]) * sinhTerm
+        gradient = np.stack((integral, np.exp(pars[:, 0]) * coshTerm), axis=1)
+    else:
+        powers = np.arange(nPars)
+        gradient = np.tile((halfWidth**(powers + 1) * (1 - (-1)**(powers + 1)) / (powers + 1)), (nSets, 1))
+        integral = np.einsum('si,si->s', gradient, pars)
+    integralErr = np.sqrt(np.maximum(np.einsum('si,sij,sj->s', gradient, covMatrix, gradient), 0.))
+
+    # integrals computed in units of sigma, converted to counts within 3 sigma
+    expBkg3s = np.where(isValid, integral * sigma[:, 0] / binWidth, 0.)
+    errExpBkg3s = np.where(isValid, integralErr * sigma[:, 0] / binWidth, 0.)
+
+    return expBkg3s, errExpBkg3s
+
+
 def GetExpectedBkgFromMC(hMassBkg, mean=0., sigma=0., doFit=True, bkgFunc='pol3'):
     '''
     Helper method to get the expected bkg from MC
@@ -425,7 +625,8 @@ def ComputeCrossSection(rawY, uncRawY, frac, uncFrac, effTimesAcc,
     '''
     Method to compute cross section and its statistical uncertainty
     Only the statistical uncertainty on the raw yield and prompt (feed-down)
-    fraction are considered (the others are systematics)
+    fraction are considered (the others are systematics). All the inputs can be
+    numpy arrays (e.g. all pT bins and/or systematic variations at once)
 
     Parameters
     ----------
@@ -454,7 +655,7 @@ def ComputeCrossSection(rawY, uncRawY, frac, uncFrac, effTimesAcc,
     elif corrRawYieldFrac == 'uncorr':
         crossSecUnc = np.sqrt((uncRawY / rawY)**2 + (uncFrac / frac)**2) * crossSection
     elif corrRawYieldFrac == 'anticorr':
-        crossSecUnc = abs((uncRawY / rawY) - (uncFrac / frac)) * crossSection
+        crossSecUnc = np.abs((uncRawY / rawY) - (uncFrac / frac)) * crossSection
 
     return crossSection, crossSecUnc
 
@@ -483,6 +684,94 @@ def MergeHists(listOfHists):
     return hMerged
 
 
+def GetHistoArrays(histo):
+    '''
+    Helper method to get the bin contents, uncertainties and edges of a TH1 as numpy arrays
+
+    Parameters
+    ----------
+    - histo: TH1 object
+
+    Returns
+    ----------
+    - contents: array of bin contents
+    - uncs: array of bin uncertainties
+    - binEdges: array of bin edges (number of bins + 1)
+    '''
+    nBins = histo.GetNbinsX()
+    contents = np.array([histo.GetBinContent(iBin+1) for iBin in range(nBins)])
+    uncs = np.array([histo.GetBinError(iBin+1) for iBin in range(nBins)])
+    binEdges = np.array([histo.GetXaxis().GetBinLowEdge(iBin+1) for iBin in range(nBins+1)])
+
+    return contents, uncs, binEdges
+
+
+def SetHistoFromArrays(histo, contents, uncs=None):
+    '''
+    Helper method to set the bin contents (and uncertainties) of a TH1 from numpy arrays
+
+    Parameters
+    ----------
+    - histo: TH1 object with the same number of bins as the arrays
+    - contents: array of bin contents
+    - uncs: array of bin uncertainties (not set if None)
+
+    Returns
+    ----------
+    - histo: the same TH1 object
+    '''
+    for iBin, content in enumerate(contents):
+        histo.SetBinContent(iBin+1, content)
+        if uncs is not None:
+            histo.SetBinError(iBin+1, uncs[iBin])
+
+    return histo
+
+
+def GetGraphArrays(graph):
+    '''
+    Helper method to get the points and (symmetric) uncertainties of a TGraph(Errors) as numpy arrays
+
+    Parameters
+    ----------
+    - graph: TGraph object
+
+    Returns
+    ----------
+    - x, y, xUnc, yUnc: arrays of x and y coordinates and uncertainties
+    '''
+    nPoints = graph.GetN()
+    x = np.array([graph.GetPointX(iPoint) for iPoint in range(nPoints)])
+    y = np.array([graph.GetPointY(iPoint) for iPoint in range(nPoints)])
+    xUnc = np.array([graph.GetErrorX(iPoint) for iPoint in range(nPoints)])
+    yUnc = np.array([graph.GetErrorY(iPoint) for iPoint in range(nPoints)])
+
+    return x, y, xUnc, yUnc
+
+
+def SetGraphFromArrays(graph, x, y, xUnc=None, yUnc=None):
+    '''
+    Helper method to set the points (and uncertainties) of a TGraphErrors from numpy arrays
+
+    Parameters
+    ----------
+    - graph: TGraphErrors object
+    - x, y: arrays (or numbers for x) of x and y coordinates
+    - xUnc, yUnc: arrays (or numbers) of x and y uncertainties (not set if None)
+
+    Returns
+    ----------
+    - graph: the same TGraphErrors object
+    '''
+    x, y = np.broadcast_arrays(x, y)
+    for iPoint, (xPoint, yPoint) in enumerate(zip(x, y)):
+        graph.SetPoint(iPoint, xPoint, yPoint)
+        if xUnc is not None and yUnc is not None:
+            graph.SetPointError(iPoint, np.broadcast_to(xUnc, x.shape)[iPoint], np.broadcast_to(yUnc, x.shape)[iPoint])
+
+    return graph
+
+
 def ApplySplineFuncToColumn(df, column, spline, minRange=-1.e10, maxRange=1.e10):
     '''
     Method to apply a function to a pandas column via a spline object
@@ -619,6 +908,93 @@ def ComputeRatioDiffBins(hNum, hDen, uncOpt=''):
     return hRatio
 
 
+def RebinDensityArrays(contents, binEdges, newBinEdges, uncs=None):
+    '''
+    Helper method to rebin arrays of densities (e.g. differential cross sections) into a compatible binning, as
+    in ComputeRatioDiffBins: each new bin is the width-weighted average of the original bins fully contained in it
+
+    Parameters
+    ----------
+    - contents: array with shape (..., number of bins) of bin contents
+    - binEdges: array of original bin edges (number of bins + 1)
+    - newBinEdges: array of new bin edges
+    - uncs: array of bin uncertainties with the same shape as contents, considered uncorrelated (optional)
+
+    Returns
+    ----------
+    - contentsReb: array with shape (..., number of new bins) of rebinned contents
+    - uncsReb: array of rebinned uncertainties (None if uncs is None)
+    '''
+    binEdges = np.asarray(binEdges, dtype=np.float64)
+    newBinEdges = np.asarray(newBinEdges, dtype=np.float64)
+    isContained = (binEdges[np.newaxis, :-1] >= newBinEdges[:-1, np.newaxis]) & \
+        (binEdges[np.newaxis, 1:] <= newBinEdges[1:, np.newaxis])
+    rebinMatrix = np.where(isContained, np.diff(binEdges)[np.newaxis, :], 0.) / np.diff(newBinEdges)[:, np.newaxis]
+
+    contentsReb = np.asarray(contents, dtype=np.float64) @ rebinMatrix.T
+    if uncs is None:
+        return contentsReb, None
+
+    return contentsReb, np.sqrt(np.asarray(uncs, dtype=np.float64)**2 @ (rebinMatrix**2).T)
+
+
+def ExtrapolateWithFONLLArrays(ptLimsMeas, crossSec, crossSecUnc, binEdgesFONLL, crossSecFONLL, ptLimsExtrap,
+                               shapeIdx=0, crossSecFONLLUnc=None):
+    '''
+    Method to extrapolate a measured cross section in pT with an arbitrary number of FONLL variations: the data/FONLL
+    ratio in the measured pT bins is fitted with a constant for each variation, and the FONLL shape is scaled by it
+    in the pT bins of the extrapolation
+
+    Parameters
+    ----------
+    - ptLimsMeas: array of pT limits of the measurement
+    - crossSec: array of measured cross sections
+    - crossSecUnc: array of uncertainties on the measured cross sections used in the fit
+    - binEdgesFONLL: array of bin edges of the FONLL predictions
+    - crossSecFONLL: array with shape (..., number of variations, number of FONLL bins) of FONLL predictions, the first
+      variation being the central one
+    - ptLimsExtrap: array of pT limits of the extrapolation, the first one being the upper pT limit of the measurement
+    - shapeIdx: index of the variation used for the FONLL shape in the extrapolation (if None, the shape of each
+      variation is used)
+    - crossSecFONLLUnc: array of uncertainties on the FONLL predictions propagated to the data/FONLL ratio (optional)
+
+    Returns
+    ----------
+    - extrap: dictionary with arrays ptLims (union of the measured and extrapolated pT limits), ratio and ratioUnc
+      (data/FONLL in the measured pT bins), norm and normUnc (fitted data/FONLL constant for each variation),
+      crossSec (extrapolated cross section for each variation), and centAndEnvelope (with shape (..., number of
+      extrapolated pT bins, 3) with central value, minimum and maximum of the extrapolated cross sections)
+    '''
+    ptLimsMeas = np.asarray(ptLimsMeas, dtype=np.float64)
+    ptLimsExtrap = np.asarray(ptLimsExtrap, dtype=np.float64)
+    if not np.isclose(ptLimsExtrap[0], ptLimsMeas[-1]):
+        raise ValueError('pT range of measurement and extrapolation do not match')
+
+    crossSecFONLL = np.asarray(crossSecFONLL, dtype=np.float64)
+    crossSecFONLLMeas, crossSecFONLLMeasUnc = RebinDensityArrays(crossSecFONLL, binEdgesFONLL, ptLimsMeas,
+                                                                 crossSecFONLLUnc)
+    if crossSecFONLLMeasUnc is None:
+        crossSecFONLLMeasUnc = np.zeros_like(crossSecFONLLMeas)
+    crossSecFONLLExtrap, _ = RebinDensityArrays(crossSecFONLL, binEdgesFONLL, ptLimsExtrap)
+
+    # constant fit of data/FONLL as a chi2 fit (pol0), the bins without uncertainty being skipped
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(crossSecFONLLMeas != 0, crossSec / crossSecFONLLMeas, 0.)
+        ratioUnc = np.where(crossSecFONLLMeas != 0, np.sqrt(np.asarray(crossSecUnc)**2 + (
+            ratio * crossSecFONLLMeasUnc)**2) / np.abs(crossSecFONLLMeas), 0.)
+        weights = np.where(ratioUnc > 0, 1. / ratioUnc**2, 0.)
+    norm = np.sum(weights * ratio, axis=-1) / np.sum(weights, axis=-1)
+    normUnc = 1. / np.sqrt(np.sum(weights, axis=-1))
+
+    if shapeIdx is not None:
+        crossSecFONLLExtrap = crossSecFONLLExtrap[..., shapeIdx:shapeIdx+1, :]
+    crossSecExtrap = crossSecFONLLExtrap * norm[..., np.newaxis]
+
+    return {'ptLims': np.union1d(ptLimsMeas, ptLimsExtrap), 'ratio': ratio, 'ratioUnc': ratioUnc, 'norm': norm,
+            'normUnc': normUnc, 'crossSec': crossSecExtrap,
+            'centAndEnvelope': GetCentralAndEnvelope(np.swapaxes(crossSecExtrap, -1, -2))}
+
+
 def ScaleGraph(graph, scaleFactor):
     '''
     Helper method to scale a TGraph
@@ -764,6 +1140,41 @@ def ApplyVariationToList(listToVary, relVar, option='decreasing'):
     return listVaried
 
 
+def GetPoissonSmearedRawYields(rawYields, bkgs=None, nToys=1, correlated=True, rng=None):
+    '''
+    Helper method to generate Poissonian smearings of the raw yields of a set of cut sets (same procedure as
+    the doRawYieldSmearing option of ComputeCutVarPromptFrac.py). In the correlated case, the yields are smeared
+    cumulatively starting from the last cut set, so that the smearings of tighter cut sets are propagated to
+    the looser ones
+
+    Parameters
+    ----------
+    - rawYields: array of raw yields with shape (..., nCutSets)
+    - bkgs: array of background yields with the same shape as rawYields (only for correlated smearing)
+    - nToys: number of smeared realisations
+    - correlated: whether to apply a correlated smearing
+    - rng: numpy random generator (a new default one if None)
+
+    Returns
+    ----------
+    - rawYieldsSmeared: array of smeared raw yields with shape (..., nToys, nCutSets)
+    '''
+    if rng is None:
+        rng = np.random.default_rng()
+    rawYields = np.asarray(rawYields, dtype=np.float64)[..., np.newaxis, :]
+    outShape = rawYields.shape[:-2] + (nToys, rawYields.shape[-1])
+    if not correlated:
+        return rng.poisson(np.clip(np.broadcast_to(rawYields, outShape), 0., None)).astype(np.float64)
+
+    bkgs = np.zeros_like(rawYields) if bkgs is None else np.asarray(bkgs, dtype=np.float64)[..., np.newaxis, :]
+    rawYieldsRev, bkgsRev = rawYields[..., ::-1], bkgs[..., ::-1]
+    meanRev = np.concatenate((rawYieldsRev[..., :1] + bkgsRev[..., :1],
+                              np.diff(rawYieldsRev, axis=-1) + np.diff(bkgsRev, axis=-1)), axis=-1)
+    smearedRev = np.cumsum(rng.poisson(np.clip(np.broadcast_to(meanRev, outShape), 0., None)), axis=-1) - bkgsRev
+
+    return smearedRev[..., ::-1]
+
+
 def ComputeWeightedAverage(values, weights, uncValues, uncWeights=None):
     '''
     Helper method to compute a weighted average
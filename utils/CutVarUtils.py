@@ -0,0 +1,790 @@
+'''
+Module with utils for the cut-variation method: loading of the inputs as numpy arrays,
+search of the optimal subset of cut sets, bootstrap of the efficiencies and raw yields, and drawing of the results
+'''
+
+import os
+import sys
+from itertools import combinations, product
+import numpy as np
+from ROOT import TFile, TH1F, TH2F, TCanvas, TLegend, TGraphAsymmErrors, TLatex, TF1 # pylint: disable=import-error,no-name-in-module
+from ROOT import kBlack, kRed, kAzure, kGreen, kRainBow # pylint: disable=import-error,no-name-in-module
+from ROOT import kFullCircle, kFullSquare, kOpenSquare, kOpenCircle, kOpenCross, kOpenDiamond # pylint: disable=import-error,no-name-in-module
+from .AnalysisUtils import GetPromptFDYieldsAnalyticMinimisationBatch, GetPoissonSmearedRawYields, SetHistoFromArrays
+from .StyleFormatter import SetGlobalStyle, SetObjectStyle
+
+
+def LoadCutVarInputs(cutSetCfg):
+    '''
+    Method to load the raw yields, efficiencies and (optionally) backgrounds and raw-yield covariance
+    matrices of all the cut sets defined in a cut-variation config file
+
+    Parameters
+    ----------
+    - cutSetCfg: dictionary from the cut-variation config file (see ComputeCutVarPromptFrac.py)
+
+    Returns
+    ----------
+    - inputs: dictionary with numpy arrays of shape (nPtBins, nCutSets) for rawYield, rawYieldUnc, effPrompt,
+              effPromptUnc, effFD, effFDUnc and bkg (zeros if not provided), of shape (nPtBins, nCutSets, nCutSets)
+              for rawYieldCov (None if not enabled), and of shape (nPtBins+1) for ptLims
+    '''
+    inputFilesRaw = cutSetCfg['rawyields']['inputfiles']
+    inputFilesEff = cutSetCfg['efficiencies']['inputfiles']
+    inputFilesBkg = cutSetCfg['background']['inputfiles']
+    if inputFilesBkg is None:
+        inputFilesBkg = [None] * len(inputFilesRaw)
+    if len(inputFilesRaw) != len(inputFilesEff):
+        print('ERROR: number or raw yield files and efficiency files not consistent! Please check your config file. '
+              'Exit')
+        sys.exit()
+
+    histos = {'rawYield': [], 'effPrompt': [], 'effFD': [], 'bkg': []}
+    for inFileNameRaw, inFileNameEff, inFileNameBkg in zip(inputFilesRaw, inputFilesEff, inputFilesBkg):
+        inFileRaw = TFile.Open(os.path.join(cutSetCfg['rawyields']['inputdir'], inFileNameRaw))
+        histos['rawYield'].append(inFileRaw.Get(cutSetCfg['rawyields']['histoname']))
+        histos['rawYield'][-1].SetDirectory(0)
+        inFileRaw.Close()
+        inFileEff = TFile.Open(os.path.join(cutSetCfg['efficiencies']['inputdir'], inFileNameEff))
+        histos['effPrompt'].append(inFileEff.Get(cutSetCfg['efficiencies']['histonames']['prompt']))
+        histos['effFD'].append(inFileEff.Get(cutSetCfg['efficiencies']['histonames']['feeddown']))
+        histos['effPrompt'][-1].SetDirectory(0)
+        histos['effFD'][-1].SetDirectory(0)
+        inFileEff.Close()
+        if cutSetCfg['background']['inputdir'] is not None and inFileNameBkg is not None:
+            inFileBkg = TFile.Open(os.path.join(cutSetCfg['background']['inputdir'], inFileNameBkg))
+            histos['bkg'].append(inFileBkg.Get(cutSetCfg['background']['histoname']))
+            histos['bkg'][-1].SetDirectory(0)
+            inFileBkg.Close()
+
+    nPtBins = histos['rawYield'][0].GetNbinsX()
+    inputs = {'ptLims': np.array([histos['rawYield'][0].GetBinLowEdge(iPt+1) for iPt in range(nPtBins+1)])}
+    for var in ['rawYield', 'effPrompt', 'effFD', 'bkg']:
+        inputs[var] = np.array([[histo.GetBinContent(iPt+1) for histo in histos[var]] for iPt in range(nPtBins)])
+        inputs[f'{var}Unc'] = np.array([[histo.GetBinError(iPt+1) for histo in histos[var]] for iPt in range(nPtBins)])
+    if not histos['bkg']:
+        inputs['bkg'] = np.zeros_like(inputs['rawYield'])
+        inputs['bkgUnc'] = np.zeros_like(inputs['rawYield'])
+
+    inputs['rawYieldCov'] = None
+    if 'covariance' in cutSetCfg['rawyields'] and cutSetCfg['rawyields']['covariance']['enable']:
+        nSets = len(inputFilesRaw)
+        inFileCov = TFile.Open(os.path.join(cutSetCfg['rawyields']['inputdir'],
+                                            cutSetCfg['rawyields']['covariance']['inputfile']))
+        inputs['rawYieldCov'] = np.zeros((nPtBins, nSets, nSets))
+        for iPt, (ptMin, ptMax) in enumerate(zip(inputs['ptLims'][:-1], inputs['ptLims'][1:])):
+            hCov = inFileCov.Get(f"{cutSetCfg['rawyields']['covariance']['histoname']}"
+                                 f'_pT{ptMin*10:.0f}_{ptMax*10:.0f}')
+            if not hCov or hCov.GetNbinsX() != nSets:
+                print(f'ERROR: raw-yield covariance matrix for {ptMin} < pT < {ptMax} GeV/c not found or not '
+                      'consistent with the number of cut sets! Exit')
+                sys.exit()
+            inputs['rawYieldCov'][iPt] = [[hCov.GetBinContent(iRow+1, iCol+1) for iCol in range(nSets)]
+                                          for iRow in range(nSets)]
+        inFileCov.Close()
+
+    return inputs
+
+
+def EvaluateCutSetSubsets(inputsPt, subsets, corr=True):
+    '''
+    Method to evaluate the corrected-yield uncertainties and the chi2 of the cut-variation minimisation
+    for many subsets of cut sets with the same number of elements in one pT bin
+
+    Parameters
+    ----------
+    - inputsPt: dictionary with numpy arrays of shape (nCutSets) for rawYield, rawYieldUnc, effPrompt,
+                effPromptUnc, effFD, effFDUnc and of shape (nCutSets, nCutSets) for rawYieldCov (or None)
+    - subsets: array of indices of the cut sets with shape (nSubsets, nCutSetsInSubset)
+    - corr: whether to assume fully correlated efficiency uncertainties
+
+    Returns
+    ----------
+    - relUncPrompt: relative uncertainties of the prompt corrected yields (inf if the minimisation failed)
+    - relUncFD: relative uncertainties of the FD corrected yields (inf if the minimisation failed)
+    - redChiSquare: reduced chi2 of the minimisations (inf if the minimisation failed)
+    '''
+    subsets = np.asarray(subsets)
+    rawYieldCov = None
+    if inputsPt['rawYieldCov'] is not None:
+        rawYieldCov = inputsPt['rawYieldCov'][subsets[:, :, np.newaxis], subsets[:, np.newaxis, :]]
+    args = [inputsPt[var][subsets] for var in ['effPrompt', 'effFD', 'rawYield', 'effPromptUnc', 'effFDUnc',
+                                               'rawYieldUnc']]
+    try:
+        corrYields, covMatrices, redChiSquare, _ = GetPromptFDYieldsAnalyticMinimisationBatch(
+            *args, corr, rawYieldCovMatrix=rawYieldCov)
+    except np.linalg.LinAlgError: # at least one singular system, evaluate the subsets one by one
+        corrYields, covMatrices = np.zeros((len(subsets), 2)), np.full((len(subsets), 2, 2), np.inf)
+        redChiSquare = np.full(len(subsets), np.inf)
+        for iSubset in range(len(subsets)):
+            try:
+                corrYields[iSubset], covMatrices[iSubset], redChiSquare[iSubset], _ = \
+                    GetPromptFDYieldsAnalyticMinimisationBatch(
+                        *[arg[iSubset] for arg in args], corr,
+                        rawYieldCovMatrix=rawYieldCov[iSubset] if rawYieldCov is not None else None)
+            except np.linalg.LinAlgError:
+                continue
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relUnc = np.sqrt(np.diagonal(covMatrices, axis1=1, axis2=2)) / corrYields
+    relUnc = np.where((corrYields > 0) & np.isfinite(relUnc), relUnc, np.inf)
+    redChiSquare = np.where(np.isfinite(redChiSquare), redChiSquare, np.inf)
+
+    return relUnc[:, 0], relUnc[:, 1], redChiSquare
+
+
+# pylint: disable=too-many-arguments,too-many-branches
+def SearchCutSetSubsets(inputsPt, method='greedy', target='prompt', minSets=3, maxSets=None, beamWidth=5,
+                        maxRedChiSquare=None, nTop=5, corr=True):
+    '''
+    Method to search the subsets of cut sets minimising the relative uncertainty of the prompt or
+    FD corrected yield in one pT bin
+
+    Parameters
+    ----------
+    - inputsPt: dictionary with the inputs of the pT bin (see EvaluateCutSetSubsets)
+    - method: search method among
+        - exhaustive: all the subsets with a number of cut sets between minSets and maxSets
+        - greedy: starting from the best subset with minSets cut sets, the cut set which minimises the
+                  uncertainty is added one at a time up to maxSets
+        - beam: as greedy, but the best beamWidth subsets are kept at each step
+    - target: corrected yield whose relative uncertainty is minimised (prompt or FD)
+    - minSets: minimum number of cut sets in a subset (at least 3 for a meaningful chi2)
+    - maxSets: maximum number of cut sets in a subset (all if None)
+    - beamWidth: number of subsets kept at each step of the beam search
+    - maxRedChiSquare: subsets with larger reduced chi2 are discarded (no selection if None)
+    - nTop: number of subsets returned
+    - corr: whether to assume fully correlated efficiency uncertainties
+
+    Returns
+    ----------
+    - bestSubsets: list of dictionaries with cutsets (indices), reluncprompt, reluncfd and redchi2 of the
+                   best nTop subsets, sorted by the target relative uncertainty
+    '''
+    if method not in ['exhaustive', 'greedy', 'beam']:
+        raise ValueError(f'Search method \'{method}\' not implemented')
+    if target not in ['prompt', 'FD']:
+        raise ValueError(f'Target \'{target}\' not implemented')
+    nSets = len(inputsPt['rawYield'])
+    maxSets = nSets if maxSets is None else min(maxSets, nSets)
+    width = beamWidth if method == 'beam' else 1
+
+    evaluated = {}
+    def Evaluate(subsets):
+        subsets = sorted({tuple(sorted(subset)) for subset in subsets} - set(evaluated))
+        if subsets:
+            for subset, *results in zip(subsets, *EvaluateCutSetSubsets(inputsPt, subsets, corr)):
+                score = results[0] if target == 'prompt' else results[1]
+                if maxRedChiSquare is not None and results[2] > maxRedChiSquare:
+                    score = np.inf
+                evaluated[subset] = (score, *results)
+
+    if method == 'exhaustive':
+        for nSetsInSubset in range(minSets, maxSets+1):
+            Evaluate(combinations(range(nSets), nSetsInSubset))
+    else:
+        Evaluate(combinations(range(nSets), minSets))
+        beam = sorted((subset for subset in evaluated), key=lambda subset: evaluated[subset][0])[:width]
+        for nSetsInSubset in range(minSets+1, maxSets+1):
+            candidates = {tuple(sorted(subset + (iSet,))) for subset in beam for iSet in range(nSets)
+                          if iSet not in subset}
+            Evaluate(candidates)
+            beam = sorted(candidates, key=lambda subset: evaluated[subset][0])[:width]
+
+    bestSubsets = []
+    for subset in sorted(evaluated, key=lambda subset: evaluated[subset][0])[:nTop]:
+        score, relUncPrompt, relUncFD, redChiSquare = evaluated[subset]
+        if not np.isfinite(score):
+            break
+        bestSubsets.append({'cutsets': list(subset), 'reluncprompt': float(relUncPrompt),
+                            'reluncfd': float(relUncFD), 'redchi2': float(redChiSquare)})
+
+    return bestSubsets
+
+
+def GetCutSetSelections(cutVars):
+    '''
+    Method to build the selection strings (pandas query) of a cut set for all its pT bins, as in
+    ProjectDplusDsTree.py
+
+    Parameters
+    ----------
+    - cutVars: dictionary with the cut variables of the cut set (cutvars of the cut-set config file)
+
+    Returns
+    ----------
+    - selections: list of selection strings, one per pT bin of the cut set
+    '''
+    selections = []
+    for iPt, _ in enumerate(cutVars['Pt']['min']):
+        selections.append(' & '.join([f"({cutVars[varName]['min'][iPt]}<{cutVars[varName]['name']}"
+                                      f"<{cutVars[varName]['max'][iPt]})"
+                                      for varName in cutVars if varName != 'InvMass']))
+    return selections
+
+
+def BuildBootstrapCache(dataFrames, cutSets, ptLims, nGen, ptName='pt_cand'):
+    '''
+    Method to build the per-candidate arrays needed by the bootstrap of the efficiencies: the pT bin of each
+    reconstructed MC candidate and whether it passes each of the cut sets. Only the candidates passing at
+    least one cut set in the pT range are kept
+
+    Parameters
+    ----------
+    - dataFrames: dictionary with the pandas dataframes of the prompt and FD reconstructed candidates
+                  (keys Prompt and FD)
+    - cutSets: list of dictionaries with the cut variables of each cut set (cutvars of the cut-set config files)
+    - ptLims: array with the pT limits of the cut-variation pT bins
+    - nGen: dictionary with the arrays of generated prompt and FD D mesons in each pT bin (keys Prompt and FD)
+    - ptName: name of the pT column in the dataframes
+
+    Returns
+    ----------
+    - cache: dictionary with numpy arrays ptLims, and for each of Prompt and FD candBin{type} (nCand),
+             pass{type} (nCand, nCutSets) and nGen{type} (nPtBins)
+    '''
+    ptLims = np.asarray(ptLims, dtype=np.float64)
+    cache = {'ptLims': ptLims}
+    for candType, dataFrame in dataFrames.items():
+        passMatrix = np.zeros((len(dataFrame), len(cutSets)), dtype=bool)
+        for iSet, cutVars in enumerate(cutSets):
+            for selection in GetCutSetSelections(cutVars):
+                passMatrix[:, iSet] |= dataFrame.eval(selection).to_numpy()
+        candBin = np.searchsorted(ptLims, dataFrame[ptName].to_numpy(), side='right') - 1
+        isSelected = (candBin >= 0) & (candBin < len(ptLims) - 1) & np.any(passMatrix, axis=1)
+        cache[f'candBin{candType}'] = candBin[isSelected].astype(np.int32)
+        cache[f'pass{candType}'] = passMatrix[isSelected]
+        cache[f'nGen{candType}'] = np.asarray(nGen[candType], dtype=np.float64)
+
+    return cache
+
+
+def PrepareBootstrapCache(cache):
+    '''
+    Helper method to prepare the bootstrap cache (see BuildBootstrapCache) for fast replicas. The candidates
+    with the same pT bin and the same selection outcome for all the cut sets are grouped, since the sum of
+    the Poisson(1) weights of N candidates is distributed as a Poisson(N), and the flat indices of the
+    (group, cut set) pairs are precomputed, so that the efficiencies of each replica are obtained with
+    a single weighted bincount
+
+    Parameters
+    ----------
+    - cache: dictionary with the bootstrap cache
+
+    Returns
+    ----------
+    - prepCache: dictionary with ptLims and, for each of Prompt and FD, groupBin{type}, groupSize{type},
+                 pairGroup{type}, pairIdx{type}, nGen{type} (nPtBins), nReco{type} (nPtBins, nCutSets)
+                 and nCandBin{type} (nPtBins)
+    '''
+    prepCache = {'ptLims': cache['ptLims']}
+    nPtBins = len(cache['ptLims']) - 1
+    for candType in ['Prompt', 'FD']:
+        nSets = cache[f'pass{candType}'].shape[1]
+        groups, groupSize = np.unique(np.column_stack((cache[f'candBin{candType}'], cache[f'pass{candType}'])),
+                                      axis=0, return_counts=True)
+        groupBin = groups[:, 0].astype(np.int64)
+        pairGroup, pairSet = np.nonzero(groups[:, 1:])
+        prepCache[f'groupBin{candType}'] = groupBin
+        prepCache[f'groupSize{candType}'] = groupSize.astype(np.float64)
+        prepCache[f'pairGroup{candType}'] = pairGroup
+        prepCache[f'pairIdx{candType}'] = groupBin[pairGroup] * nSets + pairSet
+        prepCache[f'nGen{candType}'] = cache[f'nGen{candType}']
+        prepCache[f'nReco{candType}'] = np.bincount(prepCache[f'pairIdx{candType}'], weights=groupSize[pairGroup],
+                                                    minlength=nPtBins*nSets).reshape(nPtBins, nSets)
+        prepCache[f'nCandBin{candType}'] = np.bincount(groupBin, weights=groupSize, minlength=nPtBins)
+
+    return prepCache
+
+
+def GetBootstrapEfficiencyRatios(prepCache, candType, rng):
+    '''
+    Method to compute the ratios between the efficiencies of a bootstrap replica of the MC candidates and the
+    nominal ones. Each candidate is given a Poisson(1) weight, shared by all the cut sets (i.e. each group of
+    equivalent candidates a Poisson(N) weight), and the generated candidates not in the cache are resampled
+    with a Poisson distribution
+
+    Parameters
+    ----------
+    - prepCache: dictionary with the prepared bootstrap cache (see PrepareBootstrapCache)
+    - candType: type of candidates (Prompt or FD)
+    - rng: numpy random generator
+
+    Returns
+    ----------
+    - effRatio: array of ratios between the replica and the nominal efficiencies with shape (nPtBins, nCutSets)
+    '''
+    nReco = prepCache[f'nReco{candType}']
+    nGen = prepCache[f'nGen{candType}']
+    nCandBin = prepCache[f'nCandBin{candType}']
+    weights = rng.poisson(prepCache[f'groupSize{candType}']).astype(np.float64)
+    nRecoRep = np.bincount(prepCache[f'pairIdx{candType}'], weights=weights[prepCache[f'pairGroup{candType}']],
+                           minlength=nReco.size).reshape(nReco.shape)
+    nNotCached = np.clip(nGen - nCandBin, 0., None)
+    nGenRep = np.bincount(prepCache[f'groupBin{candType}'], weights=weights, minlength=len(nGen)) + \
+        rng.poisson(nNotCached)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        effRatio = (nRecoRep / nReco) * ((nCandBin + nNotCached) / nGenRep)[:, np.newaxis]
+    return np.where(np.isfinite(effRatio) & (nReco > 0), effRatio, 1.)
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def RunBootstrapReplicas(seeds, inputs, prepCache, corr=True, smearing='poisson'):
+    '''
+    Method to run the bootstrap replicas of the cut-variation minimisation: for each replica the MC candidates
+    behind the efficiencies are resampled (see GetBootstrapEfficiencyRatios) and the raw yields are smeared,
+    then the minimisation is performed for all the replicas and pT bins at once
+
+    Parameters
+    ----------
+    - seeds: list of numpy SeedSequence (or integers), one per replica
+    - inputs: dictionary with the nominal inputs (see LoadCutVarInputs)
+    - prepCache: dictionary with the prepared bootstrap cache (see PrepareBootstrapCache)
+    - corr: whether to assume fully correlated efficiency uncertainties
+    - smearing: smearing of the raw yields among
+        - poisson: correlated Poissonian smearing (see GetPoissonSmearedRawYields)
+        - gaus: Gaussian smearing with the raw-yield uncertainties (or covariance matrices)
+        - none: no smearing
+
+    Returns
+    ----------
+    - results: dictionary with numpy arrays corrYield (nReplicas, nPtBins, 2), redChiSquare (nReplicas, nPtBins),
+               and effPrompt, effFD, rawYield and fracPrompt with shape (nReplicas, nPtBins, nCutSets)
+    '''
+    if smearing not in ['poisson', 'gaus', 'none']:
+        raise ValueError(f'Raw-yield smearing \'{smearing}\' not implemented')
+    nReplicas = len(seeds)
+    results = {var: np.zeros((nReplicas,) + inputs['rawYield'].shape)
+               for var in ['effPrompt', 'effFD', 'rawYield', 'fracPrompt']}
+    for iRep, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        results['effPrompt'][iRep] = inputs['effPrompt'] * GetBootstrapEfficiencyRatios(prepCache, 'Prompt', rng)
+        results['effFD'][iRep] = inputs['effFD'] * GetBootstrapEfficiencyRatios(prepCache, 'FD', rng)
+        if smearing == 'poisson':
+            results['rawYield'][iRep] = GetPoissonSmearedRawYields(inputs['rawYield'], inputs['bkg'],
+                                                                   1, True, rng)[:, 0]
+        elif smearing == 'gaus' and inputs['rawYieldCov'] is not None:
+            results['rawYield'][iRep] = [rng.multivariate_normal(rawYield, rawYieldCov) for rawYield, rawYieldCov
+                                         in zip(inputs['rawYield'], inputs['rawYieldCov'])]
+        elif smearing == 'gaus':
+            results['rawYield'][iRep] = rng.normal(inputs['rawYield'], inputs['rawYieldUnc'])
+        else:
+            results['rawYield'][iRep] = inputs['rawYield']
+
+    args = [results['effPrompt'], results['effFD'], results['rawYield'], inputs['effPromptUnc'], inputs['effFDUnc'],
+            inputs['rawYieldUnc']]
+    try:
+        results['corrYield'], _, results['redChiSquare'], _ = GetPromptFDYieldsAnalyticMinimisationBatch(
+            *args, corr, rawYieldCovMatrix=inputs['rawYieldCov'])
+    except np.linalg.LinAlgError: # at least one singular system, minimise the replicas one by one
+        results['corrYield'] = np.full((nReplicas, len(inputs['rawYield']), 2), np.nan)
+        results['redChiSquare'] = np.full((nReplicas, len(inputs['rawYield'])), np.nan)
+        for iRep in range(nReplicas):
+            try:
+                results['corrYield'][iRep], _, results['redChiSquare'][iRep], _ = \
+                    GetPromptFDYieldsAnalyticMinimisationBatch(*[arg[iRep] for arg in args[:3]], *args[3:], corr,
+                                                               rawYieldCovMatrix=inputs['rawYieldCov'])
+            except np.linalg.LinAlgError:
+                continue
+
+    promptYields = results['effPrompt'] * results['corrYield'][..., 0:1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        results['fracPrompt'] = promptYields / (promptYields + results['effFD'] * results['corrYield'][..., 1:2])
+
+    return results
+
+
+def GetCutVarFractionsArrays(effPrompt, effFD, corrYield, covariance):
+    '''
+    Method to compute the prompt and FD fractions of the cut sets and their uncertainties from the corrected
+    yields of the cut-variation minimisation, for many pT bins at once
+
+    Parameters
+    ----------
+    - effPrompt: array of efficiencies for prompt D with shape (..., nCutSets)
+    - effFD: array of efficiencies for FD D with shape (..., nCutSets)
+    - corrYield: array of corrected yields (Nprompt, NFD) with shape (..., 2)
+    - covariance: array of covariance matrices of the corrected yields with shape (..., 2, 2)
+
+    Returns
+    ----------
+    - fracPrompt, fracPromptUnc, fracFD, fracFDUnc: arrays of fractions and uncertainties with shape (..., nCutSets)
+    '''
+    effPrompt, effFD = np.asarray(effPrompt, dtype=np.float64), np.asarray(effFD, dtype=np.float64)
+    nPrompt, nFD = corrYield[..., 0:1], corrYield[..., 1:2]
+    covPP, covFF, covFP = covariance[..., 0, 0:1], covariance[..., 1, 1:2], covariance[..., 1, 0:1]
+    rawYieldSum = effPrompt * nPrompt + effFD * nFD
+
+    fracPrompt = effPrompt * nPrompt / rawYieldSum
+    defPdeNP = (effPrompt * rawYieldSum - effPrompt**2 * nPrompt) / rawYieldSum**2
+    defPdeNF = - effFD * effPrompt * nPrompt / rawYieldSum**2
+    fracPromptUnc = np.sqrt(defPdeNP**2 * covPP + defPdeNF**2 * covFF + 2 * defPdeNP * defPdeNF * covFP)
+
+    fracFD = effFD * nFD / rawYieldSum
+    defFdeNF = (effFD * rawYieldSum - effFD**2 * nFD) / rawYieldSum**2
+    defFdeNP = - effFD * effPrompt * nFD / rawYieldSum**2
+    fracFDUnc = np.sqrt(defFdeNF**2 * covFF + defFdeNP**2 * covPP + 2 * defFdeNF * defFdeNP * covFP)
+
+    return fracPrompt, fracPromptUnc, fracFD, fracFDUnc
+
+
+# pylint: disable=too-many-locals,too-many-statements,too-many-branches
+def DrawCutVarResults(table, cutSetCfg, outFileName, numbersOnly=False):
+    '''
+    Method to produce the histograms, graphs and canvases of the cut-variation method (raw yields, efficiencies,
+    fractions and correlation matrices vs cut set, linear plots, corrected yields vs pT) from the table of results
+    of ComputeCutVarPromptFrac.py, and to save them in a root file and in pdf files. With numbersOnly only the
+    histograms are produced and saved in the root file, without graphs, canvases and pdf files
+
+    Parameters
+    ----------
+    - table: dictionary with the numpy arrays of the table of results (see ComputeCutVarPromptFrac.py)
+    - cutSetCfg: dictionary from the cut-variation config file
+    - outFileName: name of the output root file (the pdf file names are derived from it)
+    - numbersOnly: flag to skip the graphs, canvases and pdf files
+    '''
+    ptLims = np.asarray(table['ptLims'], dtype=np.float64)
+    nPtBins, nSets = table['rawYields'].shape
+    compareToFc = 'fracsPromptFc' in table and not numbersOnly
+    compareToNb = 'fracsPromptNb' in table and not numbersOnly
+    doToys = 'corrYieldsToys' in table
+    doLinearPlot = cutSetCfg['linearplot']['enable'] and not numbersOnly
+    doUncBands = cutSetCfg['linearplot']['uncbands']
+
+    SetGlobalStyle(padleftmargin=0.15, padtopmargin=0.08, titleoffsetx=1.,
+                   titleoffsety=1.4, opttitle=1, palette=kRainBow, maxdigits=2)
+
+    legDistr = TLegend(0.45, 0.69, 0.75, 0.89)
+    legDistr.SetFillStyle(0)
+    legDistr.SetBorderSize(0)
+    legDistr.SetTextSize(0.045)
+
+    legEff = TLegend(0.2, 0.2, 0.4, 0.4)
+    legEff.SetFillStyle(0)
+    legEff.SetBorderSize(0)
+    legEff.SetTextSize(0.045)
+
+    legFrac = TLegend(0.2, 0.79, 0.4, 0.89)
+    legFrac.SetFillStyle(0)
+    legFrac.SetBorderSize(0)
+    legFrac.SetTextSize(0.045)
+
+    latInfo = TLatex()
+    latInfo.SetNDC()
+    latInfo.SetTextSize(0.045)
+    latInfo.SetTextFont(42)
+    latInfo.SetTextColor(1)
+
+    hCorrYieldPrompt = TH1F('hCorrYieldPrompt', ';#it{p}_{T} (GeV/#it{c}); #it{N}_{prompt}', nPtBins, ptLims)
+    SetObjectStyle(hCorrYieldPrompt, color=kRed+1, fillcolor=kRed+1, markerstyle=kFullCircle)
+    hCorrYieldFD = TH1F('hCorrYieldFD', ';#it{p}_{T} (GeV/#it{c}); #it{N}_{non-prompt}', nPtBins, ptLims)
+    SetObjectStyle(hCorrYieldFD, color=kAzure+4, fillcolor=kAzure+4, markerstyle=kFullSquare)
+    SetHistoFromArrays(hCorrYieldPrompt, table['corrYields'][:, 0], np.sqrt(table['covMatrixCorrYields'][:, 0, 0]))
+    SetHistoFromArrays(hCorrYieldFD, table['corrYields'][:, 1], np.sqrt(table['covMatrixCorrYields'][:, 1, 1]))
+
+    hCovCorrYields = []
+    for iRow, rowName in enumerate(['Prompt', 'FD']):
+        hCovCorrYields.append([])
+        for iCol, colName in enumerate(['Prompt', 'FD']):
+            rowTitle, colTitle = [f"#it{{N}}_{{{'prompt' if name == 'Prompt' else 'non-prompt'}}}"
+                                  for name in [rowName, colName]]
+            hCovCorrYields[iRow].append(TH1F(f'hCov{rowName}{colName}', f';#it{{p}}_{{T}} (GeV/#it{{c}}); '
+                                             f'#sigma({rowTitle}, {colTitle})', nPtBins, ptLims))
+            SetObjectStyle(hCovCorrYields[iRow][iCol], linecolor=kBlack)
+            SetHistoFromArrays(hCovCorrYields[iRow][iCol], table['covMatrixCorrYields'][:, iRow, iCol],
+                               np.zeros(nPtBins))
+
+    hRawYieldsVsCut, hRawYieldsVsCutReSum, hRawYieldPromptVsCut, hRawYieldFDVsCut, cDistr = [], [], [], [], []
+    hEffPromptVsCut, hEffFDVsCut, cEff = [], [], []
+    hPromptFracVsCut, hFDFracVsCut, gPromptFracFcVsCut, gFDFracFcVsCut, gPromptFracNbVsCut, \
+        gFDFracNbVsCut, cFrac = [], [], [], [], [], [], []
+    hCorrMatrixCutSets, cCorrMatrix = [], []
+    fNfdNprompt, fNfdNpromptUpper, fNfdNpromptLower, cLinearPlot, legendLinearPlot = [], [], [], [], []
+
+    for iPt, (ptMin, ptMax) in enumerate(zip(ptLims[:-1], ptLims[1:])):
+        corrYields, covMatrixCorrYields = table['corrYields'][iPt], table['covMatrixCorrYields'][iPt]
+        ptString = f'pT{ptMin:.0f}_{ptMax:.0f}'
+        commonString = f'{ptMin:.0f} < #it{{p}}_{{T}} < {ptMax:.0f}  GeV/#it{{c}};cut set'
+
+        hRawYieldsVsCut.append(TH1F(f'hRawYieldsVsCutPt_{ptString}', f'{commonString};raw yield',
+                                    nSets, 0.5, nSets + 0.5))
+        hRawYieldsVsCutReSum.append(TH1F(f'hRawYieldsVsCutReSum_{ptString}', f'{commonString};raw yield',
+                                         nSets, 0.5, nSets + 0.5))
+        hRawYieldPromptVsCut.append(TH1F(f'hRawYieldPromptVsCut_{ptString}', f'{commonString};raw yield',
+                                         nSets, 0.5, nSets + 0.5))
+        hRawYieldFDVsCut.append(TH1F(f'hRawYieldFDVsCut_{ptString}', f'{commonString};raw yield',
+                                     nSets, 0.5, nSets + 0.5))
+        hEffPromptVsCut.append(TH1F(f'hEffPromptVsCut_{ptString}', f'{commonString};efficiency',
+                                    nSets, 0.5, nSets + 0.5))
+        hEffFDVsCut.append(TH1F(f'hEffFDVsCut_{ptString}', f'{commonString};efficiency', nSets, 0.5, nSets + 0.5))
+        hPromptFracVsCut.append(TH1F(f'hPromptFracVsCut_{ptString}', f'{commonString};#it{{f}}_{{prompt}}',
+                                     nSets, 0.5, nSets + 0.5))
+        hFDFracVsCut.append(TH1F(f'hFDFracVsCut_{ptString}', f'{commonString};#it{{f}}_{{FD}}',
+                                 nSets, 0.5, nSets + 0.5))
+
+        SetObjectStyle(hRawYieldsVsCut[iPt], linecolor=kBlack, markercolor=kBlack, markerstyle=kFullCircle)
+        SetObjectStyle(hRawYieldPromptVsCut[iPt], color=kRed+1, fillcolor=kRed+1, markerstyle=kOpenCircle,
+                       fillalpha=0.3)
+        SetObjectStyle(hRawYieldFDVsCut[iPt], color=kAzure+4, fillcolor=kAzure+4, markerstyle=kOpenSquare,
+                       fillalpha=0.3)
+        SetObjectStyle(hRawYieldsVsCutReSum[iPt], linecolor=kGreen+2)
+        SetObjectStyle(hEffPromptVsCut[iPt], color=kRed+1, markerstyle=kFullCircle)
+        SetObjectStyle(hEffFDVsCut[iPt], color=kAzure+4, markerstyle=kFullSquare)
+        SetObjectStyle(hPromptFracVsCut[iPt], color=kRed+1, markerstyle=kFullCircle)
+        SetObjectStyle(hFDFracVsCut[iPt], color=kAzure+4, markerstyle=kFullSquare)
+
+        # efficiencies, raw yields (including prompt and non-prompt raw yields) and fractions
+        effPrompt, effFD = table['effsPrompt'][iPt], table['effsFD'][iPt]
+        SetHistoFromArrays(hEffPromptVsCut[iPt], effPrompt, table['effsPromptUnc'][iPt])
+        SetHistoFromArrays(hEffFDVsCut[iPt], effFD, table['effsFDUnc'][iPt])
+        SetHistoFromArrays(hRawYieldsVsCut[iPt], table['rawYields'][iPt], table['rawYieldsUnc'][iPt])
+        SetHistoFromArrays(hRawYieldPromptVsCut[iPt], corrYields[0] * effPrompt,
+                           np.sqrt(covMatrixCorrYields[0, 0]) * effPrompt)
+        SetHistoFromArrays(hRawYieldFDVsCut[iPt], corrYields[1] * effFD, np.sqrt(covMatrixCorrYields[1, 1]) * effFD)
+        SetHistoFromArrays(hRawYieldsVsCutReSum[iPt], corrYields[0] * effPrompt + corrYields[1] * effFD)
+        SetHistoFromArrays(hPromptFracVsCut[iPt], table['fracPrompt'][iPt], table['fracPromptUnc'][iPt])
+        SetHistoFromArrays(hFDFracVsCut[iPt], table['fracFD'][iPt], table['fracFDUnc'][iPt])
+
+        hCorrMatrixCutSets.append(TH2F(f'hCorrMatrixCutSets_{ptString}', f'{commonString};cut set',
+                                       nSets, 0.5, nSets + 0.5, nSets, 0.5, nSets + 0.5))
+        for mEl in product(range(nSets), range(nSets)):
+            hCorrMatrixCutSets[iPt].SetBinContent(mEl[0]+1, mEl[1]+1, table['corrMatrixCutSets'][iPt][mEl])
+
+        # graphs for theory-driven fractions if comparison enabled
+        if compareToFc:
+            gPromptFracFcVsCut.append(TGraphAsymmErrors(nSets))
+            gPromptFracFcVsCut[iPt].SetNameTitle(f'gPromptFracFcVsCut_{ptString}',
+                                                 f'{commonString};#it{{f}}_{{prompt}}')
+            gFDFracFcVsCut.append(TGraphAsymmErrors(nSets))
+            gFDFracFcVsCut[iPt].SetNameTitle(f'gFDFracFcVsCut_{ptString}', f'{commonString};#it{{f}}_{{FD}}')
+            SetObjectStyle(gPromptFracFcVsCut[iPt], color=kRed+3, fillalpha=0.3, markerstyle=kOpenCircle, markersize=2.)
+            SetObjectStyle(gFDFracFcVsCut[iPt], color=kAzure+3, fillalpha=0.3, markerstyle=kOpenSquare, markersize=2.)
+        if compareToNb:
+            gPromptFracNbVsCut.append(TGraphAsymmErrors(nSets))
+            gPromptFracNbVsCut[iPt].SetNameTitle(f'gPromptFracNbVsCut_{ptString}',
+                                                 f'{commonString};#it{{f}}_{{prompt}}')
+            gFDFracNbVsCut.append(TGraphAsymmErrors(nSets))
+            gFDFracNbVsCut[iPt].SetNameTitle(f'gFDFracNbVsCut_{ptString}', f'{commonString};#it{{f}}_{{FD}}')
+            SetObjectStyle(gPromptFracNbVsCut[iPt], color=kRed-7, markerstyle=kOpenDiamond, markersize=3.)
+            SetObjectStyle(gFDFracNbVsCut[iPt], color=kAzure+5, markerstyle=kOpenCross, markersize=2.)
+
+        if doLinearPlot:
+            fNfdNprompt.append([])
+            fNfdNpromptUpper.append([])
+            fNfdNpromptLower.append([])
+            cLinearPlot.append(TCanvas(f'LinearPlot_Pt{iPt+1}-{iPt+2}', '', 800, 800))
+            cLinearPlot[iPt].SetTitle(f'LinearPlot_Pt{iPt+1}-{iPt+2}')
+            legendLinearPlot.append(TLegend(0.6, 0.6, 0.9, 0.9))
+            legendLinearPlot[iPt].SetNColumns(3)
+
+        for iCutSet in range(nSets):
+            rawY, rawYunc = table['rawYields'][iPt, iCutSet], table['rawYieldsUnc'][iPt, iCutSet]
+            effP, effPunc = effPrompt[iCutSet], table['effsPromptUnc'][iPt, iCutSet]
+            effF, effFunc = effFD[iCutSet], table['effsFDUnc'][iPt, iCutSet]
+
+            if doLinearPlot:
+                fNfdNprompt[iPt].append(TF1(f'cutset{iCutSet+1}', '[1]*x + [0]', 0., max(corrYields)/2.))
+                fNfdNprompt[iPt][iCutSet].SetParameter(0, rawY/effP)
+                fNfdNprompt[iPt][iCutSet].SetParameter(1, -effF/effP)
+                if doUncBands:
+                    fNfdNpromptUpper[iPt].append(TF1(f'fNfdNpromptUpper{iPt}{iCutSet+1}',
+                                                     '[1]*x + [0]', 0., max(corrYields)/2.))
+                    fNfdNpromptLower[iPt].append(TF1(f'fNfdNpromptLower{iPt}{iCutSet+1}',
+                                                     '[1]*x + [0]', 0., max(corrYields)/2.))
+                    fNfdNpromptUpper[iPt][iCutSet].SetTitle(f'Lower Limit cutset{iCutSet+1}')
+                    fNfdNpromptLower[iPt][iCutSet].SetTitle(f'Upper Limit cutset{iCutSet+1}')
+                    fNfdNpromptUpper[iPt][iCutSet].SetParameter(0, (rawY+rawYunc)/(effP+effPunc))
+                    fNfdNpromptUpper[iPt][iCutSet].SetParameter(1, -(effF+effFunc)/(effP+effPunc))
+                    fNfdNpromptLower[iPt][iCutSet].SetParameter(0, (rawY-rawYunc)/(effP-effPunc))
+                    fNfdNpromptLower[iPt][iCutSet].SetParameter(1, -(effF-effFunc)/(effP-effPunc))
+                fNfdNprompt[iPt][iCutSet].GetYaxis().SetTitle('#it{N}_{prompt}')
+                fNfdNprompt[iPt][iCutSet].GetXaxis().SetTitle('#it{N}_{feed-down}')
+                fNfdNprompt[iPt][iCutSet].GetYaxis().SetRangeUser(0., 1.5*max(corrYields))
+                fNfdNprompt[iPt][iCutSet].SetTitle('')
+                fNfdNprompt[iPt][iCutSet].SetLineColor(kRainBow+2*iCutSet)
+                cLinearPlot[iPt].cd()
+                fNfdNprompt[iPt][iCutSet].Draw('same' if iCutSet != 0 else '')
+                legendLinearPlot[iPt].AddEntry(fNfdNprompt[iPt][iCutSet], f'cutset{iCutSet+1}', 'l')
+                if doUncBands:
+                    fNfdNpromptUpper[iPt][iCutSet].SetLineColor(kRainBow+2*iCutSet)
+                    fNfdNpromptLower[iPt][iCutSet].SetLineColor(kRainBow+2*iCutSet)
+                    fNfdNpromptUpper[iPt][iCutSet].SetLineStyle(7)
+                    fNfdNpromptLower[iPt][iCutSet].SetLineStyle(7)
+                    fNfdNpromptUpper[iPt][iCutSet].Draw('same')
+                    legendLinearPlot[iPt].AddEntry(fNfdNpromptUpper[iPt][iCutSet], f'lowerlimit cutset{iCutSet+1}')
+                    fNfdNpromptLower[iPt][iCutSet].Draw('same')
+                    legendLinearPlot[iPt].AddEntry(fNfdNpromptUpper[iPt][iCutSet], f'upperlimit cutset{iCutSet+1}')
+                legendLinearPlot[iPt].Draw()
+                cLinearPlot[iPt].Update()
+
+            # theory-driven, if enabled
+            if compareToFc:
+                fPromptFc, fFDFc = table['fracsPromptFc'][iPt, iCutSet], table['fracsFDFc'][iPt, iCutSet]
+                gPromptFracFcVsCut[iPt].SetPoint(iCutSet, iCutSet+1, fPromptFc[0])
+                gPromptFracFcVsCut[iPt].SetPointError(iCutSet, 0.5, 0.5, fPromptFc[0] - fPromptFc[1],
+                                                      fPromptFc[2] - fPromptFc[0])
+                gFDFracFcVsCut[iPt].SetPoint(iCutSet, iCutSet+1, fFDFc[0])
+                gFDFracFcVsCut[iPt].SetPointError(iCutSet, 0.5, 0.5, fFDFc[0] - fFDFc[1], fFDFc[2] - fFDFc[0])
+            if compareToNb:
+                fPromptNb = table['fracsPromptNb'][iPt, iCutSet]
+                fFDNb = [1 - fPromptNb[0], 1 - fPromptNb[2], 1 - fPromptNb[1]] #inverse Nb method not reliable
+                gPromptFracNbVsCut[iPt].SetPoint(iCutSet, iCutSet+1, fPromptNb[0])
+                gPromptFracNbVsCut[iPt].SetPointError(iCutSet, 0.5, 0.5, fPromptNb[0] - fPromptNb[1],
+                                                      fPromptNb[2] - fPromptNb[0])
+                gFDFracNbVsCut[iPt].SetPoint(iCutSet, iCutSet+1, fFDNb[0])
+                gFDFracNbVsCut[iPt].SetPointError(iCutSet, 0.5, 0.5, fFDNb[0] - fFDNb[1], fFDNb[2] - fFDNb[0])
+
+        if numbersOnly:
+            continue
+
+        if iPt == 0:
+            legDistr.AddEntry(hRawYieldsVsCut[iPt], 'Measured raw yield', 'lpe')
+            legDistr.AddEntry(hRawYieldPromptVsCut[iPt], 'Prompt', 'f')
+            legDistr.AddEntry(hRawYieldFDVsCut[iPt], 'Non-prompt', 'f')
+            legDistr.AddEntry(hRawYieldsVsCutReSum[iPt], 'Prompt + non-prompt', 'l')
+            legEff.AddEntry(hEffPromptVsCut[iPt], 'Prompt', 'lpe')
+            legEff.AddEntry(hEffFDVsCut[iPt], 'Non-prompt', 'lpe')
+            legFrac.AddEntry(hPromptFracVsCut[iPt], 'Prompt', 'lpe')
+            legFrac.AddEntry(hFDFracVsCut[iPt], 'Non-prompt', 'lpe')
+            deltaY = 0.
+            if compareToFc:
+                legFrac.AddEntry(gPromptFracFcVsCut[iPt], 'Prompt #it{f}_{c}', 'fp')
+                legFrac.AddEntry(gFDFracFcVsCut[iPt], 'Non-prompt #it{f}_{c}', 'fp')
+                deltaY += 0.1
+                legFrac.SetY1(0.83 - deltaY)
+            if compareToNb:
+                legFrac.AddEntry(gPromptFracNbVsCut[iPt], 'Prompt #it{N}_{b}', 'fp')
+                legFrac.AddEntry(gFDFracNbVsCut[iPt], 'Non-prompt #it{N}_{b}', 'fp')
+                deltaY += 0.1
+                legFrac.SetY1(0.83 - deltaY)
+
+        cEff.append(TCanvas(f'cEff_{ptString}', '', 800, 800))
+        cEff[iPt].DrawFrame(0.5, hEffPromptVsCut[iPt].GetMinimum()/5, nSets + 0.5, 1., f'{commonString};efficiency')
+        cEff[iPt].SetLogy()
+        hEffPromptVsCut[iPt].DrawCopy('same')
+        hEffFDVsCut[iPt].DrawCopy('same')
+        legEff.Draw()
+
+        cDistr.append(TCanvas(f'cDistr_{ptString}', '', 800, 800))
+        hFrameDistr = cDistr[iPt].DrawFrame(0.5, 0., nSets + 0.5, hRawYieldsVsCut[iPt].GetMaximum() * 1.2,
+                                            f'{commonString};raw yield')
+        hFrameDistr.GetYaxis().SetDecimals()
+        hRawYieldsVsCut[iPt].Draw('same')
+        hRawYieldPromptVsCut[iPt].DrawCopy('histsame')
+        hRawYieldFDVsCut[iPt].DrawCopy('histsame')
+        hRawYieldsVsCutReSum[iPt].Draw('same')
+        legDistr.Draw()
+        latInfo.DrawLatex(0.47, 0.65, f"#chi^{{2}} / ndf = {table['redChiSquare'][iPt]:.3f}")
+
+        cFrac.append(TCanvas(f'cFrac_{ptString}', '', 800, 800))
+        cFrac[iPt].DrawFrame(0.5, 0., nSets + 0.5, 1.8, f'{commonString};fraction')
+        hPromptFracVsCut[iPt].DrawCopy('Esame')
+        hFDFracVsCut[iPt].DrawCopy('Esame')
+        if compareToFc:
+            gPromptFracFcVsCut[iPt].Draw('2PZ')
+            gFDFracFcVsCut[iPt].Draw('2PZ')
+        if compareToNb:
+            gPromptFracNbVsCut[iPt].Draw('2PZ')
+            gFDFracNbVsCut[iPt].Draw('2PZ')
+        legFrac.Draw()
+
+        cCorrMatrix.append(TCanvas(f'cCorrMatrix_{ptString}', '', 800, 800))
+        cCorrMatrix[-1].cd().SetRightMargin(0.14)
+        hCorrMatrixCutSets[iPt].Draw('colz')
+
+    if not numbersOnly:
+        cCorrYield = TCanvas('cCorrYield', '', 800, 800)
+        cCorrYield.DrawFrame(ptLims[0], 1., ptLims[-1], hCorrYieldPrompt.GetMaximum() * 1.2,
+                             ';#it{p}_{T} (GeV/#it{c});corrected yield')
+        cCorrYield.SetLogy()
+        hCorrYieldPrompt.Draw('same')
+        hCorrYieldFD.Draw('same')
+        legEff.Draw()
+
+    outFile = TFile(outFileName, 'recreate')
+    if not numbersOnly:
+        cCorrYield.Write()
+    hCorrYieldPrompt.Write()
+    hCorrYieldFD.Write()
+    for covElem in product(range(2), range(2)):
+        hCovCorrYields[covElem[0]][covElem[1]].Write()
+    for iPt in range(nPtBins):
+        if not numbersOnly:
+            cDistr[iPt].Write()
+            cEff[iPt].Write()
+            cFrac[iPt].Write()
+        hRawYieldsVsCut[iPt].Write()
+        hRawYieldPromptVsCut[iPt].Write()
+        hRawYieldFDVsCut[iPt].Write()
+        hRawYieldsVsCutReSum[iPt].Write()
+        hEffPromptVsCut[iPt].Write()
+        hEffFDVsCut[iPt].Write()
+        hPromptFracVsCut[iPt].Write()
+        hFDFracVsCut[iPt].Write()
+        hCorrMatrixCutSets[iPt].Write()
+        if doLinearPlot:
+            cLinearPlot[iPt].Write()
+    if doToys:
+        DrawCutVarToys(table)
+    outFile.Close()
+    if numbersOnly:
+        return
+
+    outFileNamesPDF = [outFileName.replace('.root', f'_{suffix}.pdf')
+                       for suffix in ['Eff', 'Distr', 'Frac', 'CorrMatrix']]
+    for canvases, outFileNamePDF in zip([cEff, cDistr, cFrac, cCorrMatrix], outFileNamesPDF):
+        canvases[0].SaveAs(f'{outFileNamePDF}[')
+        for canvas in canvases:
+            canvas.SaveAs(outFileNamePDF)
+        canvases[-1].SaveAs(f'{outFileNamePDF}]')
+    if doLinearPlot:
+        for iPt in range(nPtBins):
+            for iformat in cutSetCfg['linearplot']['outfileformat']:
+                cLinearPlot[iPt].SaveAs(outFileName.replace('.root', f'_LinearPlot{iPt+1}_{iPt+2}.{iformat}'))
+
+
+def DrawCutVarToys(table):
+    '''
+    Helper method to write in the current directory the histograms of the distributions of the corrected yields
+    and fractions of the cut-variation toys, and the histograms of the quantiles of the corrected yields vs pT
+
+    Parameters
+    ----------
+    - table: dictionary with the numpy arrays of the table of results (see ComputeCutVarPromptFrac.py)
+    '''
+    ptLims = np.asarray(table['ptLims'], dtype=np.float64)
+    nPtBins, nToys, nSets = table['fracPromptToys'].shape
+    quantiles = table['toysQuantiles']
+    hCorrYieldToysQuantiles = {'Prompt': [], 'FD': []}
+    for quantile in quantiles:
+        for yieldType in hCorrYieldToysQuantiles:
+            hCorrYieldToysQuantiles[yieldType].append(
+                TH1F(f'hCorrYield{yieldType}Toys_Q{quantile*100:.0f}',
+                     f';#it{{p}}_{{T}} (GeV/#it{{c}});#it{{N}}_{{{yieldType}}} (quantile {quantile})', nPtBins, ptLims))
+    for iPt, (ptMin, ptMax) in enumerate(zip(ptLims[:-1], ptLims[1:])):
+        ptString = f'pT{ptMin:.0f}_{ptMax:.0f}'
+        corrYieldsToys, promptFracToys = table['corrYieldsToys'][iPt], table['fracPromptToys'][iPt]
+        for yieldsToys, yieldType, yieldTitle in zip(corrYieldsToys.T, ['Prompt', 'FD'], ['prompt', 'non-prompt']):
+            counts, edges = np.histogram(yieldsToys, bins=100)
+            hToys = TH1F(f'hCorrYield{yieldType}Toys_{ptString}',
+                         f'{ptMin:.0f} < #it{{p}}_{{T}} < {ptMax:.0f}  GeV/#it{{c}};#it{{N}}_{{{yieldTitle}}};toys',
+                         len(counts), edges[0], edges[-1])
+            SetHistoFromArrays(hToys, counts)
+            hToys.SetEntries(nToys)
+            hToys.Write()
+        for fracToys, fracType, fracTitle in zip([promptFracToys, 1 - promptFracToys], ['Prompt', 'FD'],
+                                                 ['prompt', 'FD']):
+            hToys = TH2F(f'h{fracType}FracVsCutToys_{ptString}',
+                         f'{ptMin:.0f} < #it{{p}}_{{T}} < {ptMax:.0f}  GeV/#it{{c}};cut set;#it{{f}}_{{{fracTitle}}}',
+                         nSets, 0.5, nSets + 0.5, 100, 0., 1.)
+            counts, _, _ = np.histogram2d(np.tile(np.arange(1, nSets + 1), nToys), fracToys.ravel(),
+                                          bins=[nSets, 100], range=[[0.5, nSets + 0.5], [0., 1.]])
+            for iCutSet, iBin in product(range(nSets), range(100)):
+                hToys.SetBinContent(iCutSet+1, iBin+1, counts[iCutSet, iBin])
+            hToys.SetEntries(nToys * nSets)
+            hToys.Write()
+        for iQuant, quantile in enumerate(np.quantile(corrYieldsToys, quantiles, axis=0)):
+            hCorrYieldToysQuantiles['Prompt'][iQuant].SetBinContent(iPt+1, quantile[0])
+            hCorrYieldToysQuantiles['FD'][iQuant].SetBinContent(iPt+1, quantile[1])
+    for hQuant in hCorrYieldToysQuantiles['Prompt'] + hCorrYieldToysQuantiles['FD']:
+        hQuant.Write()
@@ -96,6 +96,44 @@ def LoadDfFromRootOrParquet(inFileNames, inDirNames=None, inTreeNames=None):
     return dfOut
 
 
+def IterateDfFromRootOrParquet(inFileNames, inDirNames=None, inTreeNames=None, columns=None, chunkSize=1000000):
+    '''
+    Helper method to read pandas dataframes from either root or parquet files in chunks, without loading
+    the whole sample in memory
+
+    Arguments
+    ----------
+    - input file name of list of input file names
+    - input dir name of list of input dir names (needed only in case of root files)
+    - input tree name of list of input tree names (needed only in case of root files)
+    - list of columns to read (all if None)
+    - maximum number of entries per chunk
+
+    Returns
+    ----------
+    - generator of pandas dataframes
+    '''
+    import pyarrow.parquet as pq # pylint: disable=import-outside-toplevel
+
+    if not isinstance(inFileNames, list):
+        inFileNames = [inFileNames]
+    if not isinstance(inDirNames, list):
+        inDirNames = [inDirNames] * len(inFileNames)
+    if not isinstance(inTreeNames, list):
+        inTreeNames = [inTreeNames] * len(inFileNames)
+
+    for inFile, inDir, inTree in zip(inFileNames, inDirNames, inTreeNames):
+        if '.root' in inFile:
+            path = f'{inFile}:{inDir}/{inTree}' if inDir else f'{inFile}:{inTree}'
+            for dfChunk in uproot.iterate(path, expressions=columns, step_size=chunkSize, library='pd'):
+                yield dfChunk
+        elif '.parquet' in inFile:
+            for batch in pq.ParquetFile(inFile).iter_batches(batch_size=chunkSize, columns=columns):
+                yield batch.to_pandas()
+        else:
+            print('ERROR: only root or parquet files are supported! Skipping file')
+
+
 def GetMind0(ptList, d0List, ptThrs):
     '''
     Helper method to get minimum impact parameter for given pt threshold as in AOD filtering
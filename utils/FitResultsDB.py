@@ -0,0 +1,181 @@
+'''
+Script with helper methods to store and query per-bin invariant-mass fit results in a local SQLite database
+'''
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import numpy as np
+import pandas as pd
+from ROOT import TH1D # pylint: disable=import-error,no-name-in-module
+
+FITRESCOLUMNS = {'ConfigHash': 'TEXT NOT NULL',
+                 'ConfigName': 'TEXT',
+                 'CutSet': 'TEXT NOT NULL',
+                 'Cent': 'TEXT',
+                 'IsMC': 'INTEGER',
+                 'PtMin': 'REAL NOT NULL',
+                 'PtMax': 'REAL NOT NULL',
+                 'RawYield': 'REAL',
+                 'RawYieldUnc': 'REAL',
+                 'Sigma': 'REAL',
+                 'SigmaUnc': 'REAL',
+                 'Mean': 'REAL',
+                 'MeanUnc': 'REAL',
+                 'RedChiSquare': 'REAL',
+                 'Signal': 'REAL',
+                 'SignalUnc': 'REAL',
+                 'Bkg': 'REAL',
+                 'BkgUnc': 'REAL',
+                 'Signif': 'REAL',
+                 'SignifUnc': 'REAL',
+                 'FitStatus': 'INTEGER',
+                 'NumParsAtLimit': 'INTEGER',
+                 'Strategy': 'TEXT',
+                 'NEvents': 'REAL',
+                 'OutFile': 'TEXT',
+                 'Time': 'REAL'}
+
+
+def GetConfigHash(config):
+    '''
+    Helper method to get a short hash identifying a configuration
+
+    Parameters
+    ----------
+    - config: configuration (dictionary or any json-serialisable object)
+
+    Returns
+    ----------
+    - configHash: hexadecimal string of 16 characters
+    '''
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def OpenFitResultsDB(dbFileName):
+    '''
+    Helper method to open (and create if not existing) a database of fit results
+
+    Parameters
+    ----------
+    - dbFileName: name of the SQLite file
+
+    Returns
+    ----------
+    - connection: sqlite3 connection to the database
+    '''
+    connection = sqlite3.connect(os.path.expanduser(dbFileName), timeout=60)
+    columns = ', '.join(f'{col} {colType}' for col, colType in FITRESCOLUMNS.items())
+    connection.execute(f'CREATE TABLE IF NOT EXISTS fitresults ({columns}, '
+                       'PRIMARY KEY (ConfigHash, CutSet, Cent, IsMC, PtMin, PtMax))')
+    connection.execute('CREATE INDEX IF NOT EXISTS idxCutSetPt ON fitresults (CutSet, PtMin, PtMax)')
+    # add columns missing in databases created with previous versions
+    existingColumns = [colInfo[1] for colInfo in connection.execute('PRAGMA table_info(fitresults)')]
+    for col, colType in FITRESCOLUMNS.items():
+        if col not in existingColumns:
+            connection.execute(f'ALTER TABLE fitresults ADD COLUMN {col} {colType.replace(" NOT NULL", "")}')
+    connection.commit()
+
+    return connection
+
+
+def AppendFitResults(dbFileName, fitResults, configHash, cutSet, configName='', cent='', isMC=False, nEvents=0.,
+                     outFileName=''):
+    '''
+    Helper method to append the results of the fits of one output file to the database. Results
+    of fits with the same configuration, cut set and pT bin are overwritten
+
+    Parameters
+    ----------
+    - dbFileName: name of the SQLite file
+    - fitResults: list of dictionaries (one per pT bin) with keys among the columns of the database
+    - configHash: hash of the fit configuration
+    - cutSet: name of the cut set
+    - configName: name of the config file (optional)
+    - cent: centrality class (optional)
+    - isMC: flag for fits of MC distributions (optional)
+    - nEvents: number of events for normalisation (optional)
+    - outFileName: name of the output file of the fits (optional)
+    '''
+    rows = []
+    for result in fitResults:
+        row = {col: None for col in FITRESCOLUMNS}
+        row.update({'ConfigHash': configHash, 'ConfigName': configName, 'CutSet': cutSet, 'Cent': cent,
+                    'IsMC': int(isMC), 'NEvents': nEvents, 'OutFile': outFileName, 'Time': time.time()})
+        row.update({col: (float(val) if isinstance(val, (float, int, np.number)) else val)
+                    for col, val in result.items() if col in FITRESCOLUMNS})
+        rows.append(tuple(row[col] for col in FITRESCOLUMNS))
+
+    connection = OpenFitResultsDB(dbFileName)
+    with connection:
+        connection.executemany(f'INSERT OR REPLACE INTO fitresults ({", ".join(FITRESCOLUMNS)}) '
+                               f'VALUES ({", ".join("?" for _ in FITRESCOLUMNS)})', rows)
+    connection.close()
+
+
+def QueryFitResults(dbFileName, columns=None, **selections):
+    '''
+    Helper method to query the database of fit results
+
+    Parameters
+    ----------
+    - dbFileName: name of the SQLite file
+    - columns: list of columns to be returned (all if None)
+    - selections: column=value selections (a list of values selects any of them)
+
+    Returns
+    ----------
+    - dfResults: pandas dataframe with the selected fit results, sorted by pT
+    '''
+    conditions, values = [], []
+    for col, val in selections.items():
+        if col not in FITRESCOLUMNS:
+            raise ValueError(f'Column \'{col}\' not present in fit results database')
+        if isinstance(val, (list, tuple)):
+            conditions.append(f'{col} IN ({", ".join("?" for _ in val)})')
+            values.extend(val)
+        else:
+            conditions.append(f'{col} = ?')
+            values.append(val)
+    query = f'SELECT {", ".join(columns) if columns else "*"} FROM fitresults'
+    if conditions:
+        query += f' WHERE {" AND ".join(conditions)}'
+    query += ' ORDER BY PtMin, PtMax'
+
+    connection = OpenFitResultsDB(dbFileName)
+    dfResults = pd.read_sql_query(query, connection, params=values)
+    connection.close()
+
+    return dfResults
+
+
+def GetFitResultsHisto(dfResults, column, histoName=''):
+    '''
+    Helper method to build a pT-differential histogram from the fit results of a query
+
+    Parameters
+    ----------
+    - dfResults: pandas dataframe obtained with QueryFitResults, with exactly one row per pT bin
+    - column: column of the fit results to be put in the histogram (its uncertainty, if
+              stored as {column}Unc, is used as bin error)
+    - histoName: name of the histogram
+
+    Returns
+    ----------
+    - histo: TH1D with the selected fit results vs pT
+    '''
+    if dfResults.duplicated(['PtMin', 'PtMax']).any():
+        raise ValueError(f'More than one fit result per pT bin for histogram \'{histoName}\', narrow the query '
+                         'selecting also ConfigHash and/or Cent')
+    ptLims = np.unique(np.concatenate((dfResults['PtMin'].to_numpy(), dfResults['PtMax'].to_numpy())))
+    histo = TH1D(histoName, f';#it{{p}}_{{T}} (GeV/#it{{c}});{column}', len(ptLims)-1, np.asarray(ptLims, 'd'))
+    histo.SetDirectory(0)
+    for _, row in dfResults.iterrows():
+        ptBin = histo.FindBin((row['PtMin'] + row['PtMax']) / 2)
+        histo.SetBinContent(ptBin, row[column])
+        if f'{column}Unc' in row and pd.notna(row[f'{column}Unc']):
+            histo.SetBinError(ptBin, row[f'{column}Unc'])
+
+    return histo
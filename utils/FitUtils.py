@@ -2,6 +2,7 @@
 Module with function definitions and fit utils
 '''
 
+import ctypes
 from ROOT import TMath, TF1, kBlue, kGreen # pylint: disable=import-error,no-name-in-module
 
 def SingleGaus(x, par):
@@ -114,6 +115,34 @@ def ExpoPowLaw(x, par):
     return par[0] * TMath.Sqrt(x[0] - par[1]) * TMath.Exp(-1. * par[2] * (x[0] - par[1]))
 
 
+def GetNumParsAtLimit(func, relTolerance=1.e-3):
+    '''
+    Helper method to count the fitted parameters of a function that ended at (or close to) their limits
+
+    Parameters
+    ----------
+    - func: fitted ROOT.TF1
+    - relTolerance: distance from the limit, relative to the allowed range, below which a parameter
+                    is considered at limit
+
+    Returns
+    ----------
+    - numParsAtLimit: number of bounded (not fixed) parameters at limit
+    '''
+    numParsAtLimit = 0
+    for iPar in range(func.GetNpar()):
+        parMin, parMax = ctypes.c_double(), ctypes.c_double()
+        func.GetParLimits(iPar, parMin, parMax)
+        parRange = parMax.value - parMin.value
+        if parRange <= 0: # free or fixed parameter
+            continue
+        par = func.GetParameter(iPar)
+        if par - parMin.value < relTolerance * parRange or parMax.value - par < relTolerance * parRange:
+            numParsAtLimit += 1
+
+    return numParsAtLimit
+
+
 # pylint: disable=too-many-instance-attributes
 class BkgFitFuncCreator:
     '''
@@ -1,34 +1,130 @@
 '''
-Script for HEP data reading
+Script for HEP data reading.
+The tables are extracted once into numpy arrays and cached in hepDataCacheDir, keyed by the hash of the
+HEPData file and the table number
 '''
 
-import math
-from ROOT import TFile, TGraphAsymmErrors # pylint: disable=import-error,no-name-in-module
+import os
+import hashlib
+import numpy as np
+from ROOT import TFile, TH1F, TGraphAsymmErrors # pylint: disable=import-error,no-name-in-module
+from .AnalysisUtils import GetHistoArrays, SetHistoFromArrays
+
+hepDataCacheDir = os.environ.get('DMESON_HEPDATA_CACHE',
+                                 os.path.join(os.path.expanduser('~'), '.cache', 'DmesonAnalysis', 'hepdata'))
+hepDataFileHashes = {}
+hepDataTablesInMemory = {}
+
+
+def GetHepDataFileHash(HepDataFileName):
+    '''
+    Helper function to get the sha1 hash of a HEPData file (computed once per process for each
+    file path, size and modification time)
+
+    Parameters
+    ----------
+    - HepDataFileName: HEPData root file name
+
+    Returns
+    ----------
+    - fileHash: hexadecimal string of the sha1 hash of the file
+    '''
+    fileStat = os.stat(HepDataFileName)
+    key = (os.path.abspath(HepDataFileName), fileStat.st_size, fileStat.st_mtime)
+    if key not in hepDataFileHashes:
+        sha1 = hashlib.sha1()
+        with open(HepDataFileName, 'rb') as inFile:
+            for chunk in iter(lambda: inFile.read(1 << 20), b''):
+                sha1.update(chunk)
+        hepDataFileHashes[key] = sha1.hexdigest()
+    return hepDataFileHashes[key]
+
+
+def ReadHepDataArrays(HepDataFileName, tablenums):
+    '''
+    Function to read one or more tables of a HEPData root file as numpy arrays. The tables not yet
+    cached are read opening the file only once
+
+    Parameters
+    ----------
+    - HepDataFileName: HEPData root file name
+    - tablenums: table number or list of table numbers
+
+    Returns
+    ----------
+    - tables: dictionary (list of dictionaries if tablenums is a list) with numpy arrays xEdges (nBins+1),
+              y, statUnc, systUncLow and systUncHigh (nBins), the systematic uncertainties being the sum in
+              quadrature of the asymmetric (e2) and symmetric (e3) ones
+    '''
+    isList = isinstance(tablenums, (list, tuple, np.ndarray))
+    tablenums = [int(tablenum) for tablenum in tablenums] if isList else [int(tablenums)]
+    fileHash = GetHepDataFileHash(HepDataFileName)
+
+    tables, tablesToRead = {}, []
+    for tablenum in tablenums:
+        cacheFileName = os.path.join(hepDataCacheDir, f'{fileHash}_Table{tablenum}.npz')
+        if (fileHash, tablenum) in hepDataTablesInMemory:
+            tables[tablenum] = hepDataTablesInMemory[(fileHash, tablenum)]
+        elif os.path.isfile(cacheFileName):
+            with np.load(cacheFileName) as cacheFile:
+                tables[tablenum] = dict(cacheFile)
+        else:
+            tablesToRead.append(tablenum)
+
+    if tablesToRead:
+        infile = TFile(HepDataFileName)
+        for tablenum in tablesToRead:
+            table = infile.Get('Table %d' % tablenum)
+            if not table:
+                infile.Close()
+                raise ValueError(f'Table {tablenum} not found in {HepDataFileName}')
+            y, _, xEdges = GetHistoArrays(table.Get('Hist1D_y1'))
+            uncs = {}
+            for uncName in ['e1', 'e2plus', 'e2minus', 'e3']:
+                histoUnc = table.Get(f'Hist1D_y1_{uncName}')
+                uncs[uncName] = GetHistoArrays(histoUnc)[0] if histoUnc else np.zeros_like(y)
+            tables[tablenum] = {'xEdges': xEdges, 'y': y, 'statUnc': uncs['e1'],
+                                'systUncLow': np.sqrt(uncs['e2minus']**2 + uncs['e3']**2),
+                                'systUncHigh': np.sqrt(uncs['e2plus']**2 + uncs['e3']**2)}
+            try:
+                os.makedirs(hepDataCacheDir, exist_ok=True)
+                np.savez(os.path.join(hepDataCacheDir, f'{fileHash}_Table{tablenum}.npz'), **tables[tablenum])
+            except OSError as err:
+                print(f'WARNING: HEPData cache for table {tablenum} of {HepDataFileName} not saved ({err})')
+        infile.Close()
+
+    for tablenum in tablenums:
+        hepDataTablesInMemory[(fileHash, tablenum)] = tables[tablenum]
+    if isList:
+        return [dict(tables[tablenum]) for tablenum in tablenums]
+    return dict(tables[tablenums[0]])
+
 
 def ReadHepDataROOT(HepDataFileName, tablenum):
-    infile = TFile(HepDataFileName)
-    table = infile.Get('Table %d' % tablenum)
-    Hist1D_y1 = table.Get('Hist1D_y1')
-    Hist1D_y1_e1 = table.Get('Hist1D_y1_e1')
-    Hist1D_y1_e2plus = table.Get('Hist1D_y1_e2plus')
-    Hist1D_y1_e2minus = table.Get('Hist1D_y1_e2minus')
-    Hist1D_y1_e3 = table.Get('Hist1D_y1_e3')
-    Hist1D_y1.SetDirectory(0)
-    Hist1D_y1_e1.SetDirectory(0)
-    Hist1D_y1_e2plus.SetDirectory(0)
-    Hist1D_y1_e2minus.SetDirectory(0)
-    Hist1D_y1_e3.SetDirectory(0)
-    infile.Close()
+    '''
+    Function to read a table of a HEPData root file (see ReadHepDataArrays)
+
+    Parameters
+    ----------
+    - HepDataFileName: HEPData root file name
+    - tablenum: table number
+
+    Returns
+    ----------
+    - histoStat: histogram with the central values and the statistical uncertainties
+    - graphSyst: graph with the central values and the systematic uncertainties
+    '''
+    table = ReadHepDataArrays(HepDataFileName, tablenum)
+    xEdges = table['xEdges']
+    histoStat = TH1F('histoStat', '', len(xEdges) - 1, xEdges)
+    SetHistoFromArrays(histoStat, table['y'], table['statUnc'])
+    histoStat.SetDirectory(0)
 
     graphSyst = TGraphAsymmErrors()
-    histoStat = Hist1D_y1.Clone('histoStat')
-
-    for iPt in range(Hist1D_y1.GetNbinsX()):
-        histoStat.SetBinContent(iPt+1, Hist1D_y1.GetBinContent(iPt+1))
-        histoStat.SetBinError(iPt+1, Hist1D_y1_e1.GetBinContent(iPt+1))
-        systlow = math.sqrt(Hist1D_y1_e2minus.GetBinContent(iPt+1)**2+Hist1D_y1_e3.GetBinContent(iPt+1)**2)
-        systhigh = math.sqrt(Hist1D_y1_e2plus.GetBinContent(iPt+1)**2+Hist1D_y1_e3.GetBinContent(iPt+1)**2)
-        graphSyst.SetPoint(iPt, histoStat.GetBinCenter(iPt+1), histoStat.GetBinContent(iPt+1))
-        graphSyst.SetPointError(iPt, histoStat.GetBinWidth(iPt+1)/2, histoStat.GetBinWidth(iPt+1)/2, systlow, systhigh)
+    xUnc = np.diff(xEdges) / 2
+    for iPoint, (xPoint, yPoint) in enumerate(zip(xEdges[:-1] + xUnc, table['y'])):
+        graphSyst.SetPoint(iPoint, xPoint, yPoint)
+        graphSyst.SetPointError(iPoint, xUnc[iPoint], xUnc[iPoint], table['systUncLow'][iPoint],
+                                table['systUncHigh'][iPoint])
 
     return histoStat, graphSyst
@@ -1,10 +1,92 @@
 '''
-Script with helper functions to load model predictions from txt files
+Script with helper functions to load model predictions from txt files.
+The model files are parsed once and the splines (knots and coefficients) are cached in memory and in binary
+files in modelCacheDir, keyed by file path, reader arguments and modification time of the model file
 '''
 
+import os
+import hashlib
+from functools import wraps
 import numpy as np
 import pandas as pd
-from scipy.interpolate import InterpolatedUnivariateSpline
+from scipy.interpolate import InterpolatedUnivariateSpline, UnivariateSpline, BSpline
+
+modelCacheDir = os.environ.get('DMESON_MODEL_CACHE',
+                               os.path.join(os.path.expanduser('~'), '.cache', 'DmesonAnalysis', 'models'))
+modelsInMemory = {}
+
+
+def CachedModelReader(readFunc):
+    '''
+    Decorator for the model readers: the splines and the dataframe returned by the reader are stored in memory
+    and in a npz file in modelCacheDir (knots and coefficients of the splines and the dataframe values), so that
+    each model file is parsed only once. The cache is invalidated when the model file is modified
+    '''
+    @wraps(readFunc)
+    def ReadWithCache(fileName, *args, **kwargs):
+        mtime = os.path.getmtime(fileName)
+        key = f'{os.path.abspath(fileName)}|{readFunc.__name__}|{args}|{sorted(kwargs.items())}'
+        if key in modelsInMemory and modelsInMemory[key][0] == mtime:
+            splines, dfModel, ptMin, ptMax = modelsInMemory[key][1]
+            return dict(splines), dfModel.copy(), ptMin, ptMax
+
+        cacheFileName = os.path.join(modelCacheDir,
+                                     f'{readFunc.__name__}_{hashlib.sha1(key.encode()).hexdigest()[:16]}.npz')
+        result = None
+        if os.path.isfile(cacheFileName):
+            with np.load(cacheFileName) as cacheFile:
+                if cacheFile['mtime'] == mtime:
+                    splines = {name: UnivariateSpline._from_tck((cacheFile[f'{name}_t'], cacheFile[f'{name}_c'], #pylint: disable=protected-access
+                                                                 int(cacheFile[f'{name}_k'])), ext=2)
+                               for name in cacheFile['splinenames']}
+                    dfModel = pd.DataFrame(cacheFile['dfvalues'], columns=cacheFile['dfcolumns'])
+                    result = (splines, dfModel, float(cacheFile['ptmin']), float(cacheFile['ptmax']))
+        if result is None:
+            result = readFunc(fileName, *args, **kwargs)
+            splines, dfModel, ptMin, ptMax = result
+            try:
+                cacheArrays = {'mtime': mtime, 'ptmin': ptMin, 'ptmax': ptMax, 'splinenames': list(splines),
+                               'dfcolumns': [str(col) for col in dfModel.columns],
+                               'dfvalues': dfModel.to_numpy(dtype=np.float64)}
+                for name, spline in splines.items():
+                    cacheArrays[f'{name}_t'], cacheArrays[f'{name}_c'], cacheArrays[f'{name}_k'] = spline._eval_args #pylint: disable=protected-access
+                os.makedirs(modelCacheDir, exist_ok=True)
+                np.savez(cacheFileName, **cacheArrays)
+            except (ValueError, OSError) as err: # non-numeric dataframe or cache directory not writable
+                print(f'WARNING: model cache for {fileName} not saved ({err})')
+        modelsInMemory[key] = (mtime, result)
+        splines, dfModel, ptMin, ptMax = result
+
+        return dict(splines), dfModel.copy(), ptMin, ptMax
+
+    return ReadWithCache
+
+
+def EvaluateModel(splines, pt, ptMin=None, ptMax=None):
+    '''
+    Helper function to evaluate the central, min and max predictions of a model on an array of pT values
+    at once. The splines sharing the same knots are evaluated together as a single vector-valued B-spline
+
+    Parameters
+    -----------
+    splines: dictionary with splines {yCent, yMin, yMax} (see InterpolateModel)
+    pt: array of pT values
+    ptMin: if not None, the pT values below ptMin are evaluated in ptMin (constant extrapolation)
+    ptMax: if not None, the pT values above ptMax are evaluated in ptMax (constant extrapolation)
+
+    Returns:
+    -----------
+    predictions: array with shape (3, ...) with central, min and max values (central one if yMin, yMax missing)
+    '''
+    pt = np.clip(np.asarray(pt, dtype=np.float64), ptMin, ptMax) if ptMin is not None or ptMax is not None \
+        else np.asarray(pt, dtype=np.float64)
+    names = [name if name in splines else 'yCent' for name in ['yCent', 'yMin', 'yMax']]
+    tcks = [splines[name]._eval_args for name in names] #pylint: disable=protected-access
+    if all(np.array_equal(tck[0], tcks[0][0]) and tck[2] == tcks[0][2] for tck in tcks):
+        bSpline = BSpline(tcks[0][0], np.stack([tck[1] for tck in tcks], axis=-1), tcks[0][2], extrapolate=True)
+        return np.moveaxis(bSpline(pt), -1, 0)
+    return np.array([splines[name](pt) for name in names])
+
 
 def InterpolateModel(ptCent, yCent, yMin=None, yMax=None):
     '''
@@ -36,6 +118,7 @@ def InterpolateModel(ptCent, yCent, yMin=None, yMax=None):
     return splinesAll, min(ptCent), max(ptCent)
 
 
+@CachedModelReader
 def ReadFONLL(fileNameFONLL, isPtDiff=False):
     '''
     Helper function to read FONLL txt files
@@ -69,6 +152,7 @@ def ReadFONLL(fileNameFONLL, isPtDiff=False):
     return splineFONLL, dfFONLL, ptMin, ptMax
 
 
+@CachedModelReader
 def ReadGMVFNS(fileNameGMVFNS, isSACOT=False):
     '''
     Helper function to read GVMFS txt files
@@ -101,6 +185,7 @@ def ReadGMVFNS(fileNameGMVFNS, isSACOT=False):
     return splineGMVFNS, dfGMVFNS, ptMin, ptMax
 
 
+@CachedModelReader
 def ReadKtFact(fileNameKtFact):
     '''
     Helper function to read kT-factorisation txt files
@@ -124,6 +209,7 @@ def ReadKtFact(fileNameKtFact):
     return splineKtFact, dfKtFact, ptMin, ptMax
 
 
+@CachedModelReader
 def ReadTAMU(fileNameTAMU):
     '''
     Helper function to read TAMU txt files
@@ -150,6 +236,7 @@ def ReadTAMU(fileNameTAMU):
     return splineTAMU, dfTAMU, ptMin, ptMax
 
 
+@CachedModelReader
 def ReadTAMUv2(fileNameTAMUv2):
     '''
     Helper function to read TAMU v2 txt files
@@ -176,6 +263,7 @@ def ReadTAMUv2(fileNameTAMUv2):
     return splineTAMU, dfTAMU, ptMin, ptMax
 
 
+@CachedModelReader
 def ReadPHSD(fileNamePHSD):
     '''
     Helper function to read PHSD txt files
@@ -197,6 +285,7 @@ def ReadPHSD(fileNamePHSD):
     return splinePHSD, dfPHSD, ptMin, ptMax
 
 
+@CachedModelReader
 def ReadMCatsHQ(fileNameMCatsHQ):
     '''
     Helper function to read MCatsHQ txt files
@@ -222,6 +311,7 @@ def ReadMCatsHQ(fileNameMCatsHQ):
     return splineMCatsHQ, dfMCatsHQ, ptMin, ptMax
 
 
+@CachedModelReader
 def ReadCatania(fileNameCatania):
     '''
     Helper function to read Catania txt files
@@ -243,6 +333,7 @@ def ReadCatania(fileNameCatania):
     return splineCatania, dfCatania, ptMin, ptMax
 
 
+@CachedModelReader
 def ReadLIDO(fileName):
     '''
     Method to read LIDO Raa files
@@ -268,6 +359,7 @@ def ReadLIDO(fileName):
     return splineLIDO, dfLIDO, ptMin, ptMax
 
 
+@CachedModelReader
 def ReadLGR(fileName):
     '''
     Method to read LGR Raa files
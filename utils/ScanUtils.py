@@ -0,0 +1,1104 @@
+'''
+Module with utils for the working-point scans: cumulative count tensors on rectangular cut grids and
+vectorised figures of merit for all the tested cut sets
+'''
+
+import os
+import time
+import array
+import bisect
+import hashlib
+import numpy as np
+import pandas as pd
+import yaml
+from .AnalysisUtils import ComputeEfficiencyArrays, GetPromptFDFractionFcArrays, GetExpectedSignal
+from .AnalysisUtils import GetExpectedBkgFromSideBandsArrays
+
+scanCacheDir = os.environ.get('DMESON_SCAN_CACHE',
+                              os.path.join(os.path.expanduser('~'), '.cache', 'DmesonAnalysis', 'scan'))
+
+
+def GetCutGrid(cutVars):
+    '''
+    Helper method to get the grid of cut values to scan from the cutvars entry of a scan config file
+
+    Parameters
+    ----------
+    - cutVars: dictionary with min, max, step and upperlowercut ('Upper' or 'Lower') for each variable
+
+    Returns
+    ----------
+    - varNames: list of variable names
+    - cutRanges: list of arrays of cut values (increasing) for each variable
+    - upperLowerCuts: list of 'Upper' (variable < cut) or 'Lower' (variable > cut) for each variable
+    '''
+    varNames, cutRanges, upperLowerCuts = [], [], []
+    for var in cutVars:
+        varNames.append(var)
+        cutRanges.append(np.arange(cutVars[var]['min'], cutVars[var]['max'] + cutVars[var]['step'] / 10,
+                                   cutVars[var]['step']))
+        upperLowerCuts.append('Upper' if cutVars[var]['upperlowercut'] == 'Upper' else 'Lower')
+
+    return varNames, cutRanges, upperLowerCuts
+
+
+def GetCutSetValues(cutRanges):
+    '''
+    Helper method to get the cut values of all the cut sets of a rectangular grid, in the same order
+    as itertools.product(*cutRanges)
+
+    Parameters
+    ----------
+    - cutRanges: list of arrays of cut values for each variable
+
+    Returns
+    ----------
+    - cutSetValues: array with shape (nSets, nVars) of cut values
+    '''
+    grids = np.meshgrid(*[np.asarray(cutRange, dtype=np.float64) for cutRange in cutRanges], indexing='ij')
+
+    return np.stack([grid.ravel() for grid in grids], axis=-1)
+
+
+def GetCutBinIndices(values, cuts, upperLowerCut):
+    '''
+    Helper method to bin the values of a variable on the cut grid: a candidate with index idx passes
+    the cuts with index >= idx for 'Upper' cuts (variable < cut) and < idx for 'Lower' cuts (variable > cut).
+    Strict inequalities and NaN values are treated as in pandas queries
+
+    Parameters
+    ----------
+    - values: array of values of the variable
+    - cuts: array of cut values (increasing)
+    - upperLowerCut: 'Upper' or 'Lower'
+
+    Returns
+    ----------
+    - indices: array of indices in [0, number of cuts]
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    if upperLowerCut == 'Upper':
+        return np.searchsorted(cuts, values, side='right') # NaN values sorted at the end, i.e. never pass
+    indices = np.searchsorted(cuts, values, side='left')
+
+    return np.where(np.isnan(values), 0, indices)
+
+
+def GetMassBinIndices(masses, massBinEdges):
+    '''
+    Helper method to get the invariant-mass bin of each candidate as in numpy.histogram
+    (last bin closed on the right), -1 for candidates out of range
+
+    Parameters
+    ----------
+    - masses: array of invariant masses
+    - massBinEdges: array of invariant-mass bin edges
+
+    Returns
+    ----------
+    - indices: array of bin indices
+    '''
+    masses = np.asarray(masses, dtype=np.float64)
+    nMassBins = len(massBinEdges) - 1
+    indices = np.searchsorted(massBinEdges, masses, side='right') - 1
+    indices[masses == massBinEdges[-1]] = nMassBins - 1
+
+    return np.where((indices >= 0) & (indices < nMassBins), indices, -1)
+
+
+def BuildCutTensor(df, varNames, cutRanges, upperLowerCuts, massBinEdges=None, massName='inv_mass', tensor=None,
+                   weightName=None):
+    '''
+    Method to bin the cut variables of a sample on the cut grid into an N-dimensional count tensor
+    (with an additional invariant-mass axis if massBinEdges is passed)
+
+    Parameters
+    ----------
+    - df: pandas dataframe (or dictionary of arrays) with the cut variables
+    - varNames: list of variable names
+    - cutRanges: list of arrays of cut values for each variable
+    - upperLowerCuts: list of 'Upper' or 'Lower' for each variable
+    - massBinEdges: array of invariant-mass bin edges (optional)
+    - massName: name of the invariant-mass column
+    - tensor: count tensor to which the counts are added (optional, e.g. to stream a sample in chunks)
+    - weightName: name of the column with the weight of each entry (optional, e.g. THnSparse bin contents)
+
+    Returns
+    ----------
+    - tensor: array with shape (nCuts0+1, ..., nCutsN+1[, nMassBins]) of counts (see GetCutBinIndices)
+    '''
+    shape = [len(cutRange) + 1 for cutRange in cutRanges]
+    indices = [GetCutBinIndices(df[var], cutRange, upperLower)
+               for var, cutRange, upperLower in zip(varNames, cutRanges, upperLowerCuts)]
+    weights = np.asarray(df[weightName], dtype=np.float64) if weightName is not None else None
+    if massBinEdges is not None:
+        shape.append(len(massBinEdges) - 1)
+        massIndices = GetMassBinIndices(df[massName], massBinEdges)
+        inRange = massIndices >= 0
+        indices = [idx[inRange] for idx in indices] + [massIndices[inRange]]
+        if weights is not None:
+            weights = weights[inRange]
+
+    flatIndices = np.ravel_multi_index(indices, shape) if indices[0].size else np.zeros(0, dtype=np.int64)
+    counts = np.bincount(flatIndices, weights=weights, minlength=int(np.prod(shape))).reshape(shape)
+    if tensor is None:
+        return counts
+    tensor += counts
+
+    return tensor
+
+
+def CumulateCutTensor(tensor, upperLowerCuts):
+    '''
+    Method to get the counts of all the cut sets of the grid from a count tensor with cumulative sums
+    along the cut axes ('Upper' cuts from below, 'Lower' cuts from above)
+
+    Parameters
+    ----------
+    - tensor: count tensor from BuildCutTensor (modified in place)
+    - upperLowerCuts: list of 'Upper' or 'Lower' for each variable
+
+    Returns
+    ----------
+    - counts: array with shape (nCuts0, ..., nCutsN[, nMassBins]) of counts passing each cut set
+    '''
+    slices = []
+    for axis, upperLower in enumerate(upperLowerCuts):
+        if upperLower == 'Upper':
+            np.cumsum(tensor, axis=axis, out=tensor)
+            slices.append(slice(0, tensor.shape[axis] - 1))
+        else:
+            tensorRev = np.flip(tensor, axis=axis)
+            np.cumsum(tensorRev, axis=axis, out=tensorRev)
+            slices.append(slice(1, tensor.shape[axis]))
+
+    return np.ascontiguousarray(tensor[tuple(slices)])
+
+
+def GetCutSetCounts(df, varNames, cutRanges, upperLowerCuts, massBinEdges=None, massName='inv_mass', weightName=None):
+    '''
+    Method to get the number of candidates of a sample (per invariant-mass bin if massBinEdges is passed)
+    passing each cut set of a rectangular grid, without looping over the cut sets
+
+    Parameters
+    ----------
+    - df: pandas dataframe (or dictionary of arrays) with the cut variables
+    - varNames: list of variable names
+    - cutRanges: list of arrays of cut values for each variable
+    - upperLowerCuts: list of 'Upper' or 'Lower' for each variable
+    - massBinEdges: array of invariant-mass bin edges (optional)
+    - massName: name of the invariant-mass column
+    - weightName: name of the column with the weight of each entry (optional)
+
+    Returns
+    ----------
+    - counts: array with shape (nSets[, nMassBins]), cut sets ordered as in itertools.product(*cutRanges)
+    '''
+    tensor = BuildCutTensor(df, varNames, cutRanges, upperLowerCuts, massBinEdges, massName, weightName=weightName)
+    counts = CumulateCutTensor(tensor, upperLowerCuts)
+    nSets = int(np.prod([len(cutRange) for cutRange in cutRanges]))
+
+    return counts.reshape((nSets,) + counts.shape[len(cutRanges):])
+
+
+def BuildCutTemplates(dfChunks, selections, varNames, cutRanges, upperLowerCuts, massBinEdges, massName='inv_mass'):
+    '''
+    Method to stream a sample (e.g. the full background) once into invariant-mass x binned cut-variable templates
+    for several selections (e.g. pT bins), from which the mass spectra of all the cut sets of the grid are read
+
+    Parameters
+    ----------
+    - dfChunks: iterable of pandas dataframes (chunks of the sample)
+    - selections: list of pandas query strings, one per template (None or empty for no selection)
+    - varNames: list of variable names
+    - cutRanges: list of arrays of cut values for each variable
+    - upperLowerCuts: list of 'Upper' or 'Lower' for each variable
+    - massBinEdges: list of arrays of invariant-mass bin edges, one per template
+    - massName: name of the invariant-mass column
+
+    Returns
+    ----------
+    - templates: list of arrays with shape (nCuts0, ..., nCutsN, nMassBins) of counts passing each cut set
+    '''
+    tensors = [np.zeros([len(cutRange) + 1 for cutRange in cutRanges] + [len(massBinEdgesSel) - 1], dtype=np.int64)
+               for massBinEdgesSel in massBinEdges]
+    for dfChunk in dfChunks:
+        for selection, massBinEdgesSel, tensor in zip(selections, massBinEdges, tensors):
+            dfSel = dfChunk.query(selection) if selection else dfChunk
+            BuildCutTensor(dfSel, varNames, cutRanges, upperLowerCuts, massBinEdgesSel, massName, tensor=tensor)
+
+    return [CumulateCutTensor(tensor, upperLowerCuts) for tensor in tensors]
+
+
+def GetCutSetCountsFromTemplate(template, cutRanges, cutSetValues):
+    '''
+    Method to read the counts (or mass spectra) of cut sets lying on the grid of a template from BuildCutTemplates
+
+    Parameters
+    ----------
+    - template: array with shape (nCuts0, ..., nCutsN[, nMassBins]) from BuildCutTemplates
+    - cutRanges: list of arrays of cut values for each variable used to build the template
+    - cutSetValues: array with shape (nSets, nVars) of cut values
+
+    Returns
+    ----------
+    - counts: array with shape (nSets[, nMassBins])
+    '''
+    cutSetValues = np.atleast_2d(np.asarray(cutSetValues, dtype=np.float64))
+    indices = []
+    for iVar, cutRange in enumerate(cutRanges):
+        cutRange = np.asarray(cutRange, dtype=np.float64)
+        indicesVar = np.clip(np.searchsorted(cutRange, cutSetValues[:, iVar]), 0, len(cutRange) - 1)
+        if not np.allclose(cutRange[indicesVar], cutSetValues[:, iVar], rtol=1.e-9, atol=1.e-12):
+            raise ValueError(f'Cut values of variable {iVar} not on the grid of the template')
+        indices.append(indicesVar)
+
+    return template[tuple(indices)]
+
+
+def GetSparseBinArrays(sparse, axes):
+    '''
+    Method to export the filled bins of a THnSparse to numpy arrays, after a single projection on the
+    requested axes (the axis ranges set in the THnSparse are applied)
+
+    Parameters
+    ----------
+    - sparse: THnSparse
+    - axes: list of axis numbers to keep
+
+    Returns
+    ----------
+    - coords: array with shape (nFilledBins, nAxes) of bin numbers (0 and nBins+1 for under- and overflow)
+    - contents: array with shape (nFilledBins,) of bin contents
+    '''
+    sparseProj = sparse.Projection(len(axes), array.array('i', axes))
+    nFilledBins = sparseProj.GetNbins()
+    coords = np.zeros((nFilledBins, len(axes)), dtype=np.int64)
+    contents = np.zeros(nFilledBins)
+    coord = array.array('i', [0] * len(axes))
+    for iBin in range(nFilledBins):
+        contents[iBin] = sparseProj.GetBinContent(iBin, coord)
+        coords[iBin] = coord
+    sparseProj.Delete()
+
+    return coords, contents
+
+
+def GetExpectedBkgFromSideBandsChunks(massCounts, massBinEdges, bkgFunc='pol2', nSigmaForSB=4, mean=0., sigma=0.,
+                                      meanSecPeak=0., sigmaSecPeak=0., chunkSize=20000):
+    '''
+    Helper method to run GetExpectedBkgFromSideBandsArrays on chunks of cut sets, to limit the memory
+    needed by the design matrices for large grids
+
+    Parameters
+    ----------
+    - massCounts: bin contents of the invariant-mass distributions, shape (nSets, nBins)
+    - massBinEdges: bin edges of the invariant-mass distributions, shape (nBins+1,) or (nSets, nBins+1)
+    - chunkSize: maximum number of cut sets per chunk
+    - for the other parameters see GetExpectedBkgFromSideBandsArrays
+
+    Returns
+    ----------
+    - expBkg3s: array of expected backgrounds within 3 sigma from signal peak mean
+    - errExpBkg3s: array of errors on the expected backgrounds
+    '''
+    massBinEdges = np.asarray(massBinEdges, dtype=np.float64)
+    expBkg, errExpBkg = np.zeros(len(massCounts)), np.zeros(len(massCounts))
+    for iStart in range(0, len(massCounts), chunkSize):
+        expBkg[iStart:iStart+chunkSize], errExpBkg[iStart:iStart+chunkSize] = GetExpectedBkgFromSideBandsArrays(
+            massCounts[iStart:iStart+chunkSize], massBinEdges if massBinEdges.ndim == 1 else
+            massBinEdges[iStart:iStart+chunkSize], bkgFunc, nSigmaForSB, mean, sigma, meanSecPeak, sigmaSecPeak)
+
+    return expBkg, errExpBkg
+
+
+def ComputeScanFigures(nSelPrompt, nSelFD, expBkg, errExpBkg, scanConsts, signalFrom='prompt'):
+    '''
+    Method to compute the figures of merit of the working-point scans for many cut sets at once
+
+    Parameters
+    ----------
+    - nSelPrompt: array of numbers of selected prompt candidates
+    - nSelFD: array of numbers of selected FD candidates
+    - expBkg: array of background estimates in the signal region (not yet scaled)
+    - errExpBkg: array of uncertainties on the background estimates (not yet scaled)
+    - scanConsts: dictionary with the per-pT-bin constants nTotPrompt, nTotFD, preselEffPrompt(Unc),
+      preselEffFD(Unc), acc, accUnc, crossSecPrompt, crossSecFD, raaPrompt, raaFD, deltaPt, nExpEv, sigmaMB,
+      taa and bkgScale (factor to scale the background to the expected number of events)
+    - signalFrom: 'prompt' or 'feeddown', origin of the expected signal
+
+    Returns
+    ----------
+    - figures: dictionary with arrays EffAccPromptError, EffAccFDError, SError, BError, SignifError,
+      SoverBError, Signif, SoverB, S, B, EffAccPrompt, EffAccFD, fPrompt and fFD
+    '''
+    if signalFrom not in ['prompt', 'feeddown']:
+        raise ValueError(f'Signal origin \'{signalFrom}\' not implemented')
+
+    nSelPrompt = np.asarray(nSelPrompt, dtype=np.float64)
+    nSelFD = np.asarray(nSelFD, dtype=np.float64)
+    effPrompt, effPromptUnc = ComputeEfficiencyArrays(nSelPrompt, scanConsts['nTotPrompt'], np.sqrt(nSelPrompt),
+                                                      np.sqrt(scanConsts['nTotPrompt']))
+    effFD, effFDUnc = ComputeEfficiencyArrays(nSelFD, scanConsts['nTotFD'], np.sqrt(nSelFD),
+                                              np.sqrt(scanConsts['nTotFD']))
+    effAccPrompt = effPrompt * scanConsts['preselEffPrompt'] * scanConsts['acc']
+    effAccFD = effFD * scanConsts['preselEffFD'] * scanConsts['acc']
+    fPrompt, fFD = GetPromptFDFractionFcArrays(effAccPrompt, effAccFD, scanConsts['crossSecPrompt'],
+                                               scanConsts['crossSecFD'], scanConsts['raaPrompt'],
+                                               scanConsts['raaFD'])
+    fPrompt, fFD = fPrompt[..., 0], fFD[..., 0]
+
+    # expected signal, BR already included in cross section
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if signalFrom == 'prompt':
+            expSignal = GetExpectedSignal(scanConsts['crossSecPrompt'], scanConsts['deltaPt'], 1., effAccPrompt,
+                                          fPrompt, 1., 1., scanConsts['nExpEv'], scanConsts['sigmaMB'],
+                                          scanConsts['taa'], scanConsts['raaPrompt'])
+        else:
+            expSignal = GetExpectedSignal(scanConsts['crossSecFD'], scanConsts['deltaPt'], 1., effAccFD,
+                                          fFD, 1., 1., scanConsts['nExpEv'], scanConsts['sigmaMB'],
+                                          scanConsts['taa'], scanConsts['raaFD'])
+
+        # S/B and significance
+        expBkg = np.asarray(expBkg, dtype=np.float64) * scanConsts['bkgScale']
+        errExpBkg = np.asarray(errExpBkg, dtype=np.float64) * scanConsts['bkgScale']
+        hasBkg = expBkg > 0
+        safeBkg = np.where(hasBkg, expBkg, 1.)
+        expSoverB = np.where(hasBkg, expSignal / safeBkg, 0.)
+        expSignif = np.where(hasBkg, expSignal / np.sqrt(expSignal + safeBkg), 0.)
+        errSoverB = np.where(hasBkg, expSoverB * errExpBkg / safeBkg, 0.)
+        errSignif = np.where(hasBkg, expSignif * 0.5 * errExpBkg / (expSignal + safeBkg), 0.)
+
+        effAccPromptUnc = np.sqrt((effPromptUnc / effPrompt)**2
+                                  + (scanConsts['preselEffPromptUnc'] / scanConsts['preselEffPrompt'])**2
+                                  + (scanConsts['accUnc'] / scanConsts['acc'])**2) * effAccPrompt
+        effAccFDUnc = np.sqrt((effFDUnc / effFD)**2
+                              + (scanConsts['preselEffFDUnc'] / scanConsts['preselEffFD'])**2
+                              + (scanConsts['accUnc'] / scanConsts['acc'])**2) * effAccFD
+
+    return {'EffAccPromptError': effAccPromptUnc, 'EffAccFDError': effAccFDUnc, 'SError': np.zeros_like(expSignal),
+            'BError': errExpBkg, 'SignifError': errSignif, 'SoverBError': errSoverB, 'Signif': expSignif,
+            'SoverB': expSoverB, 'S': expSignal, 'B': expBkg, 'EffAccPrompt': effAccPrompt,
+            'EffAccFD': effAccFD, 'fPrompt': fPrompt, 'fFD': fFD}
+
+
+def GetCutSetCountsAtPoints(df, varNames, cutSetValues, upperLowerCuts, massBinEdges=None, massName='inv_mass',
+                            chunkSize=128):
+    '''
+    Method to get the number of candidates of a sample (per invariant-mass bin if massBinEdges is passed)
+    passing arbitrary cut sets. If the cut sets span a grid not much larger than their number (e.g. the levels of
+    a coarse-to-fine search) the cumulative count tensor of that grid is used, otherwise the candidates are
+    selected with masks, in chunks of cut sets
+
+    Parameters
+    ----------
+    - df: pandas dataframe (or dictionary of arrays) with the cut variables
+    - varNames: list of variable names
+    - cutSetValues: array with shape (nSets, nVars) of cut values
+    - upperLowerCuts: list of 'Upper' or 'Lower' for each variable
+    - massBinEdges: array of invariant-mass bin edges (optional)
+    - massName: name of the invariant-mass column
+    - chunkSize: number of cut sets per chunk for the selection with masks
+
+    Returns
+    ----------
+    - counts: array with shape (nSets[, nMassBins])
+    '''
+    cutSetValues = np.atleast_2d(np.asarray(cutSetValues, dtype=np.float64))
+    nSets = len(cutSetValues)
+    uniqueCuts, gridIndices = [], []
+    for iVar in range(len(varNames)):
+        uniqueCutsVar, gridIndicesVar = np.unique(cutSetValues[:, iVar], return_inverse=True)
+        uniqueCuts.append(uniqueCutsVar)
+        gridIndices.append(gridIndicesVar.ravel())
+    gridShape = [len(uniqueCutsVar) for uniqueCutsVar in uniqueCuts]
+    if int(np.prod(gridShape, dtype=object)) <= 4 * nSets:
+        counts = GetCutSetCounts(df, varNames, uniqueCuts, upperLowerCuts, massBinEdges, massName)
+        return counts[np.ravel_multi_index(gridIndices, gridShape)]
+
+    values = np.column_stack([np.asarray(df[var], dtype=np.float64) for var in varNames])
+    if massBinEdges is not None:
+        nMassBins = len(massBinEdges) - 1
+        massIndices = GetMassBinIndices(df[massName], massBinEdges)
+        values, massIndices = values[massIndices >= 0], massIndices[massIndices >= 0]
+        counts = np.zeros((nSets, nMassBins), dtype=np.int64)
+    else:
+        counts = np.zeros(nSets, dtype=np.int64)
+
+    for iStart in range(0, nSets, chunkSize):
+        cutsChunk = cutSetValues[iStart:iStart+chunkSize]
+        isSelected = np.ones((len(cutsChunk), len(values)), dtype=bool)
+        for iVar, upperLower in enumerate(upperLowerCuts):
+            if upperLower == 'Upper':
+                isSelected &= values[np.newaxis, :, iVar] < cutsChunk[:, iVar, np.newaxis]
+            else:
+                isSelected &= values[np.newaxis, :, iVar] > cutsChunk[:, iVar, np.newaxis]
+        if massBinEdges is not None:
+            iSetSel, iCandSel = np.nonzero(isSelected)
+            counts[iStart:iStart+len(cutsChunk)] = np.bincount(
+                iSetSel * nMassBins + massIndices[iCandSel], minlength=len(cutsChunk) * nMassBins
+            ).reshape(len(cutsChunk), nMassBins)
+        else:
+            counts[iStart:iStart+len(cutsChunk)] = np.count_nonzero(isSelected, axis=1)
+
+    return counts
+
+
+def GetCutSetMassCountsOwnRange(df, cutSetValues, varNames, upperLowerCuts, nMassBins=200, massName='inv_mass',
+                                chunkSize=128):
+    '''
+    Method to get the invariant-mass distributions of the candidates of a sample passing arbitrary cut sets, each
+    with nMassBins uniform bins between the minimum and maximum mass of the candidates selected by that cut set.
+    The bins are assigned as when filling a TH1F with these limits, so the candidates with the maximum mass end up
+    in the overflow and are not counted. Cut sets with less than two distinct masses get the limits of the sample
+
+    Parameters
+    ----------
+    - df: pandas dataframe (or dictionary of arrays) with the cut variables
+    - cutSetValues: array with shape (nSets, nVars) of cut values
+    - varNames: list of variable names
+    - upperLowerCuts: list of 'Upper' or 'Lower' for each variable
+    - nMassBins: number of invariant-mass bins
+    - massName: name of the invariant-mass column
+    - chunkSize: number of cut sets per chunk for the selection with masks
+
+    Returns
+    ----------
+    - counts: array with shape (nSets, nMassBins)
+    - massBinEdges: array with shape (nSets, nMassBins+1) of invariant-mass bin edges of each cut set
+    '''
+    cutSetValues = np.atleast_2d(np.asarray(cutSetValues, dtype=np.float64))
+    nSets = len(cutSetValues)
+    values = np.column_stack([np.asarray(df[var], dtype=np.float64) for var in varNames])
+    masses = np.asarray(df[massName], dtype=np.float64)
+    massLimsSample = (masses.min(), masses.max()) if len(masses) > 0 else (0., 1.)
+    counts = np.zeros((nSets, nMassBins), dtype=np.int64)
+    massMins, massMaxs = np.zeros(nSets), np.zeros(nSets)
+
+    for iStart in range(0, nSets, chunkSize):
+        cutsChunk = cutSetValues[iStart:iStart+chunkSize]
+        nSetsChunk = len(cutsChunk)
+        isSelected = np.ones((nSetsChunk, len(values)), dtype=bool)
+        for iVar, upperLower in enumerate(upperLowerCuts):
+            if upperLower == 'Upper':
+                isSelected &= values[np.newaxis, :, iVar] < cutsChunk[:, iVar, np.newaxis]
+            else:
+                isSelected &= values[np.newaxis, :, iVar] > cutsChunk[:, iVar, np.newaxis]
+        iSetSel, iCandSel = np.nonzero(isSelected)
+        massesSel = masses[iCandSel]
+        massMinsChunk, massMaxsChunk = np.full(nSetsChunk, np.inf), np.full(nSetsChunk, -np.inf)
+        np.minimum.at(massMinsChunk, iSetSel, massesSel)
+        np.maximum.at(massMaxsChunk, iSetSel, massesSel)
+        hasRange = massMaxsChunk > massMinsChunk
+        massMinsChunk = np.where(hasRange, massMinsChunk, massLimsSample[0])
+        massMaxsChunk = np.where(hasRange, massMaxsChunk, massLimsSample[1])
+        # same bin finding as TAxis::FindFixBin
+        massIndices = np.floor(nMassBins * (massesSel - massMinsChunk[iSetSel])
+                               / (massMaxsChunk[iSetSel] - massMinsChunk[iSetSel]))
+        inRange = (massesSel >= massMinsChunk[iSetSel]) & (massesSel < massMaxsChunk[iSetSel]) \
+            & (massIndices < nMassBins)
+        counts[iStart:iStart+nSetsChunk] = np.bincount(
+            iSetSel[inRange] * nMassBins + massIndices[inRange].astype(np.int64), minlength=nSetsChunk * nMassBins
+        ).reshape(nSetsChunk, nMassBins)
+        massMins[iStart:iStart+nSetsChunk], massMaxs[iStart:iStart+nSetsChunk] = massMinsChunk, massMaxsChunk
+
+    return counts, np.linspace(massMins, massMaxs, nMassBins + 1, axis=1)
+
+
+def ProposeCoarseToFine(nSteps, indices, fom, state, nPoints=5, shrink=0.5):
+    '''
+    Helper method to propose the next level of a coarse-to-fine grid search on the grid indices: each level
+    is a grid of nPoints per variable in a window around the best cut set, shrunk by a factor shrink at each level
+
+    Parameters
+    ----------
+    - nSteps: array of numbers of cut values for each variable
+    - indices: array with shape (nEvaluated, nVars) of grid indices of the evaluated cut sets
+    - fom: array of figures of merit of the evaluated cut sets
+    - state: dictionary with the current window (lowIdx, highIdx), updated in place
+    - nPoints: number of points per variable in each level
+    - shrink: shrinking factor of the window
+
+    Returns
+    ----------
+    - proposals: array with shape (nProposed, nVars) of grid indices
+    '''
+    if 'lowIdx' not in state:
+        state['lowIdx'], state['highIdx'] = np.zeros(len(nSteps), dtype=int), nSteps - 1
+    elif len(fom) > 0:
+        bestIdx = indices[np.argmax(fom)]
+        width = np.maximum(np.round((state['highIdx'] - state['lowIdx']) * shrink).astype(int), 1)
+        state['lowIdx'] = np.clip(bestIdx - width // 2, 0, np.maximum(nSteps - 1 - width, 0))
+        state['highIdx'] = np.minimum(state['lowIdx'] + width, nSteps - 1)
+    levelIdx = [np.unique(np.round(np.linspace(low, high, nPoints)).astype(int))
+                for low, high in zip(state['lowIdx'], state['highIdx'])]
+    grids = np.meshgrid(*levelIdx, indexing='ij')
+
+    return np.stack([grid.ravel() for grid in grids], axis=-1)
+
+
+def ProposeTPE(nSteps, indices, fom, rng, nProposals, nCandidates=1024, gamma=0.2):
+    '''
+    Helper method to propose cut sets with a tree-structured Parzen estimator on the grid indices: the evaluated
+    cut sets are split in good (best fraction gamma) and bad ones, per-variable kernel densities l and g are
+    built for the two groups and the candidates sampled from l with the largest l/g are proposed
+
+    Parameters
+    ----------
+    - nSteps: array of numbers of cut values for each variable
+    - indices: array with shape (nEvaluated, nVars) of grid indices of the evaluated cut sets
+    - fom: array of figures of merit of the evaluated cut sets
+    - rng: numpy random generator
+    - nProposals: number of cut sets to propose
+    - nCandidates: number of candidates sampled from the density of the good cut sets
+    - gamma: fraction of evaluated cut sets considered good
+
+    Returns
+    ----------
+    - proposals: array with shape (nProposals, nVars) of grid indices (ordered by decreasing l/g)
+    '''
+    order = np.argsort(-fom, kind='stable')
+    nGood = max(1, int(np.ceil(gamma * len(fom))))
+    good, bad = indices[order[:nGood]], indices[order[nGood:]]
+    candidates = np.zeros((nCandidates, len(nSteps)), dtype=int)
+    logRatio = np.zeros(nCandidates)
+    for iVar, nStepsVar in enumerate(nSteps):
+        gridIdx = np.arange(nStepsVar)
+        bandwidth = max(1., 0.1 * (nStepsVar - 1))
+        densities = []
+        for group in [good, bad]:
+            density = np.full(nStepsVar, 1. / nStepsVar) # uniform prior
+            if len(group) > 0:
+                kernels = np.exp(-0.5 * ((gridIdx[:, np.newaxis] - group[np.newaxis, :, iVar]) / bandwidth)**2)
+                density += np.sum(kernels / kernels.sum(axis=0), axis=1)
+            densities.append(density / density.sum())
+        candidates[:, iVar] = rng.choice(nStepsVar, size=nCandidates, p=densities[0])
+        logRatio += np.log(densities[0][candidates[:, iVar]]) - np.log(densities[1][candidates[:, iVar]])
+
+    return candidates[np.argsort(-logRatio, kind='stable')[:nProposals]]
+
+
+def RunCutSetSearch(evaluateFunc, cutRanges, strategy='coarsetofine', maxEvaluations=10000, maxTime=None,
+                    figureOfMerit='Signif', batchSize=256, seed=42, verbose=True, **strategyPars):
+    '''
+    Method to search the working point on the grid of cut values with an adaptive strategy instead of the
+    exhaustive scan, within a budget of evaluations and/or time
+
+    Parameters
+    ----------
+    - evaluateFunc: function returning a dictionary of arrays of figures of merit (as ComputeScanFigures) for
+      an array with shape (nSets, nVars) of cut values
+    - cutRanges: list of arrays of cut values for each variable (the proposed cut sets are on this grid)
+    - strategy: 'coarsetofine' (coarse-to-fine grid refinement), 'random', 'sobol' (scrambled Sobol sequence)
+      or 'tpe' (tree-structured Parzen estimator)
+    - maxEvaluations: maximum number of evaluated cut sets
+    - maxTime: maximum time in seconds (checked after each batch, no limit if None)
+    - figureOfMerit: name of the figure of merit to maximise
+    - batchSize: number of cut sets evaluated at once
+    - seed: seed of the random number generator
+    - verbose: print the progress of the search
+    - strategyPars: parameters of the strategy (nPoints and shrink for coarsetofine, nStartup, nCandidates
+      and gamma for tpe)
+
+    Returns
+    ----------
+    - cutSetValues: array with shape (nEvaluated, nVars) of cut values of the evaluated cut sets
+    - figures: dictionary of arrays of figures of merit of the evaluated cut sets
+    '''
+    if strategy not in ['coarsetofine', 'random', 'sobol', 'tpe']:
+        raise ValueError(f'Search strategy \'{strategy}\' not implemented')
+
+    nSteps = np.array([len(cutRange) for cutRange in cutRanges])
+    nGridSets = int(np.prod(nSteps, dtype=object))
+    rng = np.random.default_rng(seed)
+    if strategy == 'sobol':
+        from scipy.stats import qmc # pylint: disable=import-outside-toplevel
+        sampler = qmc.Sobol(d=len(nSteps), scramble=True, seed=seed)
+    state, visited, queue, nEmpty = {}, set(), np.zeros((0, len(nSteps)), dtype=int), 0
+    indices, figures = np.zeros((0, len(nSteps)), dtype=int), {}
+    fom = np.zeros(0)
+    startTime = time.time()
+    while len(fom) < min(maxEvaluations, nGridSets) and (maxTime is None or time.time() - startTime < maxTime):
+        if len(queue) == 0:
+            if strategy == 'coarsetofine':
+                proposals = ProposeCoarseToFine(nSteps, indices, fom, state, strategyPars.get('nPoints', 5),
+                                                strategyPars.get('shrink', 0.5))
+            elif strategy == 'random' or nEmpty > 0 or \
+                    (strategy == 'tpe' and len(fom) < strategyPars.get('nStartup', 64)):
+                proposals = rng.integers(0, nSteps, size=(batchSize, len(nSteps)))
+            elif strategy == 'sobol':
+                proposals = np.minimum((sampler.random(batchSize) * nSteps).astype(int), nSteps - 1)
+            else:
+                proposals = ProposeTPE(nSteps, indices, fom, rng, batchSize, strategyPars.get('nCandidates', 1024),
+                                       strategyPars.get('gamma', 0.2))
+            isNew = []
+            for proposal in map(tuple, proposals):
+                isNew.append(proposal not in visited)
+                visited.add(proposal)
+            queue = proposals[np.array(isNew, dtype=bool)]
+            if len(queue) == 0:
+                if strategy == 'coarsetofine':
+                    break # no new cut sets in the window: full resolution reached
+                nEmpty += 1 # only already evaluated cut sets proposed, next proposals random
+                continue
+            nEmpty = 0
+        batch, queue = queue[:min(batchSize, maxEvaluations - len(fom))], queue[batchSize:]
+        figuresBatch = evaluateFunc(np.column_stack([np.asarray(cutRange)[batch[:, iVar]]
+                                                     for iVar, cutRange in enumerate(cutRanges)]))
+        indices = np.concatenate((indices, batch))
+        for est, values in figuresBatch.items():
+            figures[est] = np.concatenate((figures.get(est, np.zeros(0)), values))
+        fom = np.nan_to_num(figures[figureOfMerit], nan=-np.inf)
+        if verbose:
+            print(f'{strategy} search: {len(fom)} cut sets evaluated, best {figureOfMerit} = {np.max(fom):.4g}, '
+                  f'time elapsed: {time.time()-startTime:.2f}s', end='\r')
+    if verbose:
+        print()
+
+    return np.column_stack([np.asarray(cutRange)[indices[:, iVar]] for iVar, cutRange in enumerate(cutRanges)]), \
+        figures
+
+
+def GetScanTopKFileName(fileName):
+    '''
+    Helper method to get the name of the file with the top-K index of a parquet scan output
+
+    Parameters
+    ----------
+    - fileName: name of the parquet file with the scan results
+
+    Returns
+    ----------
+    - topKFileName: name of the parquet file with the top-K index
+    '''
+    return fileName.replace('.parquet', '_TopK.parquet')
+
+
+def GetScanGroupColumns(columns):
+    '''
+    Helper method to get the columns identifying the pT bins (and parameter-cut bins) in a scan output
+
+    Parameters
+    ----------
+    - columns: list of columns of the scan output
+
+    Returns
+    ----------
+    - groupColumns: list of columns identifying the bins
+    '''
+    return [col for col in ['PtMin', 'PtMax', 'ParCutMin', 'ParCutMax'] if col in columns]
+
+
+def WriteScanParquet(outFileName, dfsScan, cutVarNames, figuresOfMerit=('Signif',), topK=100, rowGroupSize=65536):
+    '''
+    Method to write the results of a scan in a parquet file, with separate row groups for each pT bin and the
+    cut sets sorted by the cut values (so that the row-group statistics allow predicate pushdown), together
+    with an index with the top-K cut sets of each pT bin for each figure of merit
+
+    Parameters
+    ----------
+    - outFileName: name of the output parquet file (the top-K index is written in GetScanTopKFileName(outFileName))
+    - dfsScan: list of pandas dataframes with the results of the scan, one per pT bin
+    - cutVarNames: list of names of the cut variables
+    - figuresOfMerit: list of figures of merit (columns) for the top-K index
+    - topK: number of cut sets per pT bin and figure of merit stored in the index
+    - rowGroupSize: maximum number of cut sets per row group
+    '''
+    import pyarrow # pylint: disable=import-outside-toplevel
+    import pyarrow.parquet as pq # pylint: disable=import-outside-toplevel
+
+    writer, dfsTopK = None, []
+    for dfScan in dfsScan:
+        dfScan = dfScan.astype(np.float64).sort_values(cutVarNames, kind='stable').reset_index(drop=True)
+        table = pyarrow.Table.from_pandas(dfScan, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(outFileName, table.schema)
+        writer.write_table(table, row_group_size=rowGroupSize)
+        for fom in figuresOfMerit:
+            dfsTopK.append(GetScanTopKFromDf(dfScan, fom, topK).assign(FigureOfMerit=fom, IndexSize=topK))
+    if writer is not None:
+        writer.close()
+        pd.concat(dfsTopK, ignore_index=True).to_parquet(GetScanTopKFileName(outFileName), index=False)
+
+
+def ReadScanParquet(inFileNames, filters=None, columns=None):
+    '''
+    Method to read the results of a scan from parquet files, reading only the row groups compatible with
+    the filters
+
+    Parameters
+    ----------
+    - inFileNames: name or list of names of the parquet files written with WriteScanParquet
+    - filters: list of (column, operator, value) conditions in AND (optional)
+    - columns: list of columns to read (optional, all if None)
+
+    Returns
+    ----------
+    - dfScan: pandas dataframe with the selected cut sets
+    '''
+    if not isinstance(inFileNames, list):
+        inFileNames = [inFileNames]
+
+    return pd.concat([pd.read_parquet(inFileName, columns=columns, filters=filters if filters else None)
+                      for inFileName in inFileNames], ignore_index=True)
+
+
+def GetScanTopK(inFileNames, figureOfMerit='Signif', topK=10):
+    '''
+    Method to get the best cut sets of each pT bin of a scan, from the top-K index if it contains them,
+    otherwise from the full scan results
+
+    Parameters
+    ----------
+    - inFileNames: name or list of names of the parquet files written with WriteScanParquet
+    - figureOfMerit: figure of merit (column) used to rank the cut sets
+    - topK: number of cut sets per pT bin
+
+    Returns
+    ----------
+    - dfTopK: pandas dataframe with the best cut sets of each pT bin and their rank (column Rank)
+    '''
+    if not isinstance(inFileNames, list):
+        inFileNames = [inFileNames]
+
+    dfsTopK = []
+    for inFileName in inFileNames:
+        dfIndex = pd.DataFrame()
+        if os.path.isfile(GetScanTopKFileName(inFileName)):
+            dfIndex = pd.read_parquet(GetScanTopKFileName(inFileName), filters=[('FigureOfMerit', '==', figureOfMerit)])
+        if len(dfIndex) > 0 and dfIndex['IndexSize'].iloc[0] >= topK:
+            dfsTopK.append(dfIndex.query(f'Rank < {topK}').drop(columns=['FigureOfMerit', 'IndexSize']))
+        else:
+            dfsTopK.append(GetScanTopKFromDf(pd.read_parquet(inFileName), figureOfMerit, topK))
+
+    dfTopK = pd.concat(dfsTopK, ignore_index=True)
+
+    return dfTopK.sort_values(GetScanGroupColumns(dfTopK.columns) + ['Rank']).reset_index(drop=True)
+
+
+def GetScanTopKFromDf(dfScan, figureOfMerit='Signif', topK=10):
+    '''
+    Method to get the best cut sets of each pT bin from a dataframe with the results of a scan
+
+    Parameters
+    ----------
+    - dfScan: pandas dataframe with the results of the scan
+    - figureOfMerit: figure of merit (column) used to rank the cut sets
+    - topK: number of cut sets per pT bin
+
+    Returns
+    ----------
+    - dfTopK: pandas dataframe with the best cut sets of each pT bin and their rank (column Rank)
+    '''
+    groupColumns = GetScanGroupColumns(dfScan.columns)
+    dfTopK = dfScan.sort_values(figureOfMerit, ascending=False, kind='stable', na_position='last')
+    dfTopK = dfTopK.groupby(groupColumns, sort=False).head(topK)
+    dfTopK = dfTopK.assign(Rank=dfTopK.groupby(groupColumns, sort=False).cumcount())
+
+    return dfTopK.sort_values(groupColumns + ['Rank']).reset_index(drop=True)
+
+
+def GetParetoFront(objectives, maximise=None, blockSize=256, frontChunkSize=4096):
+    '''
+    Method to get the non-dominated points (Pareto front) of a set of points, in O(N log N) for two and three
+    objectives (sweep on the points sorted lexicographically, with a staircase of the front for three objectives).
+    For more objectives the sorted points are processed in blocks, each compared at once with the front found in
+    the previous blocks and with the preceding points of the block (vectorised, the front being preallocated), in
+    O(N F d) with F the size of the front and d the number of objectives, i.e. O(N^2 d) in the worst case of all
+    the points in the front.
+    Points with NaN objectives are never in the front, identical points are either all in the front or not
+
+    Parameters
+    ----------
+    - objectives: array with shape (nPoints, nObjectives)
+    - maximise: list of booleans, True if the objective has to be maximised (default all True)
+    - blockSize: number of points per block for more than three objectives
+    - frontChunkSize: number of points of the front compared at once with a block for more than three objectives
+
+    Returns
+    ----------
+    - isInFront: boolean array with shape (nPoints)
+    '''
+    objectives = np.atleast_2d(np.asarray(objectives, dtype=np.float64))
+    if maximise is not None:
+        objectives = np.where(np.asarray(maximise, dtype=bool), objectives, -objectives)
+    isInFront = np.zeros(len(objectives), dtype=bool)
+    isValid = np.all(np.isfinite(objectives), axis=1)
+    if not np.any(isValid):
+        return isInFront
+    points, pointIndices = np.unique(objectives[isValid], axis=0, return_inverse=True)
+    points = points[::-1] # lexicographically decreasing: the points dominating a point precede it
+    nPoints, nObjectives = points.shape
+    isInFrontUnique = np.zeros(nPoints, dtype=bool)
+
+    if nObjectives == 1:
+        isInFrontUnique[0] = True
+    elif nObjectives == 2:
+        isInFrontUnique[0] = True
+        isInFrontUnique[1:] = points[1:, 1] > np.maximum.accumulate(points[:-1, 1])
+    elif nObjectives == 3:
+        # staircase of the front in the plane of the last two objectives: first objective increasing,
+        # second objective decreasing
+        stairsFirst, stairsSecond = [], []
+        for iPoint, (_, first, second) in enumerate(points):
+            iStair = bisect.bisect_left(stairsFirst, first)
+            if iStair < len(stairsFirst) and stairsSecond[iStair] >= second:
+                continue
+            isInFrontUnique[iPoint] = True
+            iStairMin = iStair
+            while iStairMin > 0 and stairsSecond[iStairMin - 1] <= second:
+                iStairMin -= 1
+            if iStair < len(stairsFirst) and stairsFirst[iStair] == first:
+                iStair += 1
+            stairsFirst[iStairMin:iStair] = [first]
+            stairsSecond[iStairMin:iStair] = [second]
+    else:
+        # a point dominated by a point of a previous block is also dominated by a point of the front, and the
+        # first objective of the preceding points is never smaller, so only the other objectives are compared
+        def IsDominatedBy(dominators, points):
+            isDominatedBy = dominators[:, np.newaxis, 1] >= points[np.newaxis, :, 1]
+            for iObjective in range(2, nObjectives):
+                isDominatedBy &= dominators[:, np.newaxis, iObjective] >= points[np.newaxis, :, iObjective]
+            return isDominatedBy
+
+        front, nFront = np.empty((nPoints, nObjectives)), 0
+        for iStart in range(0, nPoints, blockSize):
+            block = points[iStart:iStart+blockSize]
+            isDominated = np.zeros(len(block), dtype=bool)
+            for iFront in range(0, nFront, frontChunkSize):
+                isDominated |= np.any(IsDominatedBy(front[iFront:min(iFront+frontChunkSize, nFront)], block), axis=0)
+            iCandidates = np.flatnonzero(~isDominated)
+            candidates = block[iCandidates]
+            isDominatedInBlock = np.any(np.triu(IsDominatedBy(candidates, candidates), k=1), axis=0)
+            iNewFront = iCandidates[~isDominatedInBlock]
+            isInFrontUnique[iStart + iNewFront] = True
+            front[nFront:nFront+len(iNewFront)] = block[iNewFront]
+            nFront += len(iNewFront)
+
+    isInFront[isValid] = isInFrontUnique[::-1][pointIndices.ravel()]
+
+    return isInFront
+
+
+def GetParetoFrontFromDf(dfScan, objectives):
+    '''
+    Method to get the Pareto front of each pT bin (and parameter-cut bin) from a dataframe with the results of a scan
+
+    Parameters
+    ----------
+    - dfScan: pandas dataframe with the results of the scan
+    - objectives: dictionary with the objectives (columns) as keys and 'max' or 'min' as values
+
+    Returns
+    ----------
+    - dfFront: pandas dataframe with the cut sets of the fronts
+    '''
+    groupColumns = GetScanGroupColumns(dfScan.columns)
+    maximise = [objectives[obj] == 'max' for obj in objectives]
+    dfsFront = [dfGroup[GetParetoFront(dfGroup[list(objectives)].to_numpy(), maximise)]
+                for _, dfGroup in dfScan.groupby(groupColumns, sort=True)]
+    if not dfsFront:
+        return dfScan.iloc[:0]
+
+    return pd.concat(dfsFront).reset_index(drop=True)
+
+
+def BuildScoreIndex(scores, weights=None, masses=None, massBinEdges=None, knotStep=1024):
+    '''
+    Method to build the sorted index of the ML scores of a sample, from which the number of candidates (and their
+    invariant-mass distribution if masses are passed) selected by any score threshold is read in O(log N).
+    The mass distributions are stored cumulatively every knotStep candidates, the remaining candidates
+    being added when the index is queried
+
+    Parameters
+    ----------
+    - scores: array of ML scores
+    - weights: array of weights of the candidates (optional)
+    - masses: array of invariant masses (optional)
+    - massBinEdges: array of invariant-mass bin edges (needed if masses are passed)
+    - knotStep: number of candidates between two stored cumulative mass distributions
+
+    Returns
+    ----------
+    - index: dictionary of numpy arrays
+    '''
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(scores, kind='stable') # NaN scores sorted at the end, i.e. never selected
+    weights = np.ones(len(scores)) if weights is None else np.asarray(weights, dtype=np.float64)[order]
+    index = {'scores': scores[order], 'cumWeights': np.concatenate(([0.], np.cumsum(weights)))}
+    if masses is not None:
+        nMassBins = len(massBinEdges) - 1
+        massIndices = GetMassBinIndices(np.asarray(masses)[order], massBinEdges)
+        blockIndices = np.arange(len(scores)) // knotStep
+        inRange = massIndices >= 0
+        blockCounts = np.bincount(blockIndices[inRange] * nMassBins + massIndices[inRange], weights=weights[inRange],
+                                  minlength=(len(scores) // knotStep + 1) * nMassBins).reshape(-1, nMassBins)
+        index['massKnots'] = np.concatenate((np.zeros((1, nMassBins)), np.cumsum(blockCounts[:-1], axis=0)))
+        index['massIndices'] = massIndices.astype(np.int32)
+        index['massWeights'] = weights
+        index['massBinEdges'] = np.asarray(massBinEdges, dtype=np.float64)
+        index['knotStep'] = np.array(knotStep)
+
+    return index
+
+
+def GetScoreIndexRange(index, scoreMins, scoreMaxs):
+    '''
+    Helper method to get the positions in the sorted index of the candidates with scoreMin < score < scoreMax
+    '''
+    iFirst = np.searchsorted(index['scores'], np.asarray(scoreMins, dtype=np.float64), side='right')
+    iLast = np.searchsorted(index['scores'], np.asarray(scoreMaxs, dtype=np.float64), side='left')
+
+    return iFirst, np.maximum(iFirst, iLast)
+
+
+def GetScoreIndexCounts(index, scoreMins, scoreMaxs):
+    '''
+    Method to get the (weighted) number of candidates with scoreMin < score < scoreMax from a sorted index
+
+    Parameters
+    ----------
+    - index: sorted index from BuildScoreIndex
+    - scoreMins: minimum score or array of minimum scores (-np.inf for upper thresholds only)
+    - scoreMaxs: maximum score or array of maximum scores (np.inf for lower thresholds only)
+
+    Returns
+    ----------
+    - counts: number of selected candidates (array if arrays of thresholds are passed)
+    '''
+    iFirst, iLast = GetScoreIndexRange(index, scoreMins, scoreMaxs)
+
+    return index['cumWeights'][iLast] - index['cumWeights'][iFirst]
+
+
+def GetScoreIndexMassCounts(index, scoreMins, scoreMaxs):
+    '''
+    Method to get the invariant-mass distributions of the candidates with scoreMin < score < scoreMax from
+    a sorted index built with the masses
+
+    Parameters
+    ----------
+    - index: sorted index from BuildScoreIndex
+    - scoreMins: array of minimum scores (-np.inf for upper thresholds only)
+    - scoreMaxs: array of maximum scores (np.inf for lower thresholds only)
+
+    Returns
+    ----------
+    - massCounts: array with shape (nThresholds, nMassBins) of bin contents
+    '''
+    knotStep, nMassBins = int(index['knotStep']), len(index['massBinEdges']) - 1
+
+    def GetMassCountsBelow(iCand):
+        iKnot = iCand // knotStep
+        massIndices = index['massIndices'][iKnot*knotStep:iCand]
+        inRange = massIndices >= 0
+        return index['massKnots'][iKnot] + np.bincount(massIndices[inRange], minlength=nMassBins,
+                                                       weights=index['massWeights'][iKnot*knotStep:iCand][inRange])
+
+    iFirst, iLast = GetScoreIndexRange(index, np.atleast_1d(scoreMins), np.atleast_1d(scoreMaxs))
+    massCounts = np.zeros((len(iFirst), nMassBins))
+    for iThr, (iFirstThr, iLastThr) in enumerate(zip(iFirst, iLast)):
+        massCounts[iThr] = GetMassCountsBelow(iLastThr) - GetMassCountsBelow(iFirstThr)
+
+    return massCounts
+
+
+def SaveScoreIndices(outFileName, indices, metaData=''):
+    '''
+    Method to save sorted score indices in a npz file
+
+    Parameters
+    ----------
+    - outFileName: name of the output npz file
+    - indices: dictionary of indices from BuildScoreIndex (keys without '__')
+    - metaData: string saved with the indices (e.g. hash of the inputs)
+    '''
+    arrays = {f'{name}__{key}': array for name, index in indices.items() for key, array in index.items()}
+    np.savez(outFileName, metaData=np.array(metaData), **arrays)
+
+
+def LoadScoreIndices(inFileName):
+    '''
+    Method to load the sorted score indices saved with SaveScoreIndices
+
+    Parameters
+    ----------
+    - inFileName: name of the input npz file
+
+    Returns
+    ----------
+    - indices: dictionary of indices
+    - metaData: string saved with the indices
+    '''
+    indices = {}
+    with np.load(inFileName) as inFile:
+        metaData = str(inFile['metaData'])
+        for arrayName in inFile.files:
+            if arrayName == 'metaData':
+                continue
+            name, key = arrayName.split('__')
+            indices.setdefault(name, {})[key] = inFile[arrayName]
+
+    return indices, metaData
+
+
+def GetScanCacheKey(cfgEntries, fileNames):
+    '''
+    Helper function to get the key of the cache of the quantities of a scan that do not depend on the cut sets
+
+    Parameters
+    ----------
+    - cfgEntries: list of config entries the cached quantities depend on
+    - fileNames: list of input file names (or lists of file names) the cached quantities depend on, None if absent
+
+    Returns
+    ----------
+    - cacheKey: hexadecimal string of the sha1 hash of the config entries and of the path, size and
+                modification time of the input files
+    '''
+    sha1 = hashlib.sha1(yaml.dump(cfgEntries, sort_keys=True).encode())
+    for fileName in fileNames:
+        for inFile in fileName if isinstance(fileName, list) else [fileName]:
+            if not inFile:
+                continue
+            inFile = os.path.expanduser(inFile)
+            fileStat = os.stat(inFile)
+            sha1.update(f'{os.path.abspath(inFile)}:{fileStat.st_size}:{fileStat.st_mtime}'.encode())
+
+    return sha1.hexdigest()
+
+
+def LoadScanCache(cacheKey):
+    '''
+    Helper function to load the quantities saved in the scan cache with SaveScanCache
+
+    Parameters
+    ----------
+    - cacheKey: key of the cache from GetScanCacheKey
+
+    Returns
+    ----------
+    - content: cached quantities, None if not found
+    '''
+    cacheFileName = os.path.join(scanCacheDir, f'{cacheKey}.yml')
+    if not os.path.isfile(cacheFileName):
+        return None
+    with open(cacheFileName, 'r') as cacheFile:
+        return yaml.safe_load(cacheFile)
+
+
+def SaveScanCache(cacheKey, content):
+    '''
+    Helper function to save quantities of a scan in the scan cache
+
+    Parameters
+    ----------
+    - cacheKey: key of the cache from GetScanCacheKey
+    - content: quantities to be cached (python builtin types only)
+    '''
+    try:
+        os.makedirs(scanCacheDir, exist_ok=True)
+        with open(os.path.join(scanCacheDir, f'{cacheKey}.yml'), 'w') as cacheFile:
+            yaml.safe_dump(content, cacheFile)
+    except OSError as err:
+        print(f'WARNING: scan cache {cacheKey} not saved ({err})')
@@ -0,0 +1,359 @@
+'''
+Module with utils for the simultaneous invariant-mass fit of several sets of selections
+'''
+
+import numpy as np
+from scipy.special import ndtr, xlogy
+
+NUMBKGPARS = {'expo': 2,
+              'pol0': 1,
+              'pol1': 2,
+              'pol2': 3,
+              'pol3': 4
+              }
+
+
+def GetGausIntegrals(lowEdges, highEdges, mean, sigma):
+    '''
+    Method to compute the integrals of a normalised Gaussian function in mass intervals
+
+    Parameters
+    ----------
+    - lowEdges: lower edges of the mass intervals
+    - highEdges: upper edges of the mass intervals
+    - mean: mean of the Gaussian function
+    - sigma: width of the Gaussian function (broadcastable to the mass intervals)
+
+    Returns
+    ----------
+    - integrals: integrals of the Gaussian function in the mass intervals
+    - derMean: derivatives of the integrals with respect to the mean
+    - derSigma: derivatives of the integrals with respect to the width
+    '''
+    zLow = (lowEdges - mean) / sigma
+    zHigh = (highEdges - mean) / sigma
+    pdfLow = np.exp(-0.5 * zLow**2) / np.sqrt(2 * np.pi)
+    pdfHigh = np.exp(-0.5 * zHigh**2) / np.sqrt(2 * np.pi)
+
+    integrals = ndtr(zHigh) - ndtr(zLow)
+    derMean = -(pdfHigh - pdfLow) / sigma
+    derSigma = -(pdfHigh * zHigh - pdfLow * zLow) / sigma
+
+    return integrals, derMean, derSigma
+
+
+def GetBkgIntegrals(lowEdges, highEdges, minMass, maxMass, bkgFunc, bkgPars):
+    '''
+    Method to compute the integrals of the background functions in mass intervals.
+    The functions are normalised to their integral in the fit range as in BkgFitFuncCreator,
+    so that the first parameter is the number of background candidates in [minMass, maxMass]
+
+    Parameters
+    ----------
+    - lowEdges: lower edges of the mass intervals, shape (nIntervals,) or (nSets, nIntervals)
+    - highEdges: upper edges of the mass intervals, same shape as lowEdges
+    - minMass: lower extreme of fitting interval
+    - maxMass: higher extreme of fitting interval
+    - bkgFunc: function to use. Currently implemented: 'expo', 'pol0', 'pol1', 'pol2', 'pol3'
+    - bkgPars: background parameters, shape (nSets, nPars)
+
+    Returns
+    ----------
+    - integrals: integrals of the background functions, shape (nSets, nIntervals)
+    - derPars: derivatives of the integrals with respect to the parameters, shape (nSets, nIntervals, nPars)
+    '''
+    if bkgFunc not in NUMBKGPARS:
+        raise ValueError(f'Function \'{bkgFunc}\' not implemented')
+
+    bkgPars = np.atleast_2d(bkgPars)
+    lowEdges = np.broadcast_to(lowEdges, (bkgPars.shape[0], np.shape(lowEdges)[-1]))
+    highEdges = np.broadcast_to(highEdges, lowEdges.shape)
+    width = maxMass - minMass
+    norm = bkgPars[:, 0:1]
+    derPars = np.zeros(lowEdges.shape + (bkgPars.shape[1],))
+
+    if bkgFunc == 'expo':
+        slope = bkgPars[:, 1:2]
+        isFlat = np.abs(slope * width) < 1.e-8
+        slope = np.where(isFlat, 1., slope)
+        # exponentials shifted by maxMass to avoid overflows, the ratio is not affected
+        expHigh = np.exp(slope * (highEdges - maxMass))
+        expLow = np.exp(slope * (lowEdges - maxMass))
+        expMin = np.exp(slope * (minMass - maxMass))
+        num = expHigh - expLow
+        den = 1. - expMin
+        derNum = highEdges * expHigh - lowEdges * expLow
+        derDen = maxMass - minMass * expMin
+        shape = np.where(isFlat, (highEdges - lowEdges) / width, num / den)
+        derShape = np.where(isFlat, (highEdges - lowEdges) * (highEdges + lowEdges - maxMass - minMass) / 2 / width,
+                            (derNum * den - num * derDen) / den**2)
+        derPars[..., 0] = shape
+        derPars[..., 1] = norm * derShape
+        return norm * shape, derPars
+
+    integrals = norm * (highEdges - lowEdges) / width
+    derPars[..., 0] = (highEdges - lowEdges) / width
+    for iPow in range(1, bkgPars.shape[1]):
+        meanPow = (maxMass**(iPow+1) - minMass**(iPow+1)) / (iPow+1) / width
+        term = (highEdges**(iPow+1) - lowEdges**(iPow+1)) / (iPow+1) - meanPow * (highEdges - lowEdges)
+        integrals = integrals + bkgPars[:, iPow:iPow+1] * term
+        derPars[..., iPow] = term
+
+    return integrals, derPars
+
+
+# pylint: disable=too-many-locals,too-many-arguments,too-many-statements
+def SimultaneousMassFit(massCounts, massBinEdges, minMass, maxMass, bkgFunc='expo', meanInit=1.87, sigmaInit=0.01,
+                        sigmaScaleFactors=None, fixMean=False, fixSigma=False, secPeakMean=None, secPeakSigma=None,
+                        useLikelihood=True, nMaxIter=1000):
+    '''
+    Method to perform a simultaneous binned fit of the invariant-mass distributions of several sets of
+    selections in the same pT bin. The Gaussian signal mean and width are shared among the sets (the width
+    of each set can be scaled by a fixed factor), while signal yields and background parameters are
+    different for each set. The covariance of the parameters is obtained from the Fisher information
+    at the minimum
+
+    Parameters
+    ----------
+    - massCounts: counts of the invariant-mass distributions, shape (nSets, nBins)
+    - massBinEdges: edges of the invariant-mass bins, shape (nBins+1,)
+    - minMass: lower extreme of fitting interval
+    - maxMass: higher extreme of fitting interval
+    - bkgFunc: background function. Currently implemented: 'expo', 'pol0', 'pol1', 'pol2', 'pol3'
+    - meanInit: initial value (or fixed value if fixMean) of the signal mean
+    - sigmaInit: initial value (or fixed value if fixSigma) of the signal width
+    - sigmaScaleFactors: list of scale factors of the signal width of each set (None means 1 for all sets)
+    - fixMean (bool, optional): whether to fix the signal mean
+    - fixSigma (bool, optional): whether to fix the signal width
+    - secPeakMean: initial value of the mean of the second peak (None if second peak not included)
+    - secPeakSigma: fixed width of the second peak
+    - useLikelihood (bool, optional): whether to use a Poisson likelihood fit instead of a chi2 fit
+    - nMaxIter (int, optional): max number of iterations for minimisation procedure
+
+    Returns
+    ----------
+    - fitResults (dictionary): dictionary with the fit results
+        rawYields, rawYieldsUnc, rawYieldsCov: signal yields of the sets with uncertainties and covariance
+        mean, meanUnc, sigma, sigmaUnc: shared signal mean and width
+        sigmas: signal width of each set
+        secPeakYields, secPeakYieldsUnc, secPeakMean, secPeakMeanUnc: second-peak parameters
+        bkgPars: background parameters of each set, shape (nSets, nPars)
+        signal, signalUnc, bkg, bkgUnc: signal and background within 3 sigma
+        pars, covMatrix: full parameter vector and covariance matrix
+        chiSquare, ndf, redChiSquare: chi2 (likelihood ratio in case of likelihood fit) of the fit
+        minMass, maxMass, bkgFunc: fit range and background function
+        converged (bool): status of the minimisation
+    '''
+    if bkgFunc not in NUMBKGPARS:
+        raise ValueError(f'Function \'{bkgFunc}\' not implemented')
+
+    massCounts = np.atleast_2d(np.asarray(massCounts, dtype=np.float64))
+    massBinEdges = np.asarray(massBinEdges, dtype=np.float64)
+    binCentres = (massBinEdges[:-1] + massBinEdges[1:]) / 2
+    binsInRange = (binCentres > minMass) & (binCentres < maxMass)
+    counts = massCounts[:, binsInRange]
+    lowEdges = massBinEdges[:-1][binsInRange]
+    highEdges = massBinEdges[1:][binsInRange]
+    minMass, maxMass = lowEdges[0], highEdges[-1] # normalise background to the bins used in the fit
+
+    nSets, nBins = counts.shape
+    nBkgPars = NUMBKGPARS[bkgFunc]
+    if sigmaScaleFactors is None:
+        sigmaScaleFactors = np.ones(nSets)
+    sigmaScaleFactors = np.asarray(sigmaScaleFactors, dtype=np.float64)
+    includeSecPeak = secPeakMean is not None and secPeakSigma is not None
+
+    # parameter vector: mean, sigma, second-peak mean, yields, second-peak yields, background parameters
+    parYields = 3 + np.arange(nSets)
+    parSecYields = 3 + nSets + np.arange(nSets)
+    parBkg = 3 + 2 * nSets + np.arange(nSets * nBkgPars).reshape(nSets, nBkgPars)
+    nPars = 3 + nSets * (2 + nBkgPars)
+
+    # initial values from the sidebands
+    sigmas = sigmaInit * sigmaScaleFactors
+    pars = np.zeros(nPars)
+    pars[0], pars[1] = meanInit, sigmaInit
+    pars[2] = secPeakMean if includeSecPeak else 0.
+    isSideBand = np.abs(binCentres[binsInRange] - meanInit) > 4 * np.max(sigmas)
+    if includeSecPeak:
+        isSideBand &= np.abs(binCentres[binsInRange] - secPeakMean) > 4 * secPeakSigma
+    for iSet in range(nSets):
+        isPeak = np.abs(binCentres[binsInRange] - meanInit) < 3 * sigmas[iSet]
+        bkgPerBin = np.mean(counts[iSet][isSideBand]) if np.any(isSideBand) else 0.
+        pars[parYields[iSet]] = max(np.sum(counts[iSet][isPeak]) - bkgPerBin * np.count_nonzero(isPeak), 1.)
+        if includeSecPeak:
+            isSecPeak = np.abs(binCentres[binsInRange] - secPeakMean) < 3 * secPeakSigma
+            pars[parSecYields[iSet]] = max(np.sum(counts[iSet][isSecPeak]) - bkgPerBin * np.count_nonzero(isSecPeak),
+                                           1.)
+        pars[parBkg[iSet][0]] = max(np.sum(counts[iSet]) - pars[parYields[iSet]] - pars[parSecYields[iSet]], 1.)
+        if bkgFunc == 'expo':
+            sbMask = isSideBand & (counts[iSet] > 0)
+            if np.count_nonzero(sbMask) > 1:
+                pars[parBkg[iSet][1]] = np.polyfit(binCentres[binsInRange][sbMask], np.log(counts[iSet][sbMask]), 1)[0]
+            else:
+                pars[parBkg[iSet][1]] = -1.
+
+    isFree = np.ones(nPars, dtype=bool)
+    isFree[0] = not fixMean
+    isFree[1] = not fixSigma
+    isFree[2] = includeSecPeak
+    isFree[parSecYields] = includeSecPeak
+
+    variance = np.maximum(counts, 1.)
+    setIdx = np.arange(nSets)
+
+    def _ModelAndJacobian(parVec):
+        sigmaSets = (parVec[1] * sigmaScaleFactors)[:, None]
+        yields = parVec[parYields][:, None]
+        gaus, gausDerMean, gausDerSigma = GetGausIntegrals(lowEdges, highEdges, parVec[0], sigmaSets)
+        bkg, bkgDer = GetBkgIntegrals(lowEdges, highEdges, minMass, maxMass, bkgFunc, parVec[parBkg])
+        model = yields * gaus + bkg
+        jac = np.zeros((nSets, nBins, nPars))
+        jac[:, :, 0] = yields * gausDerMean
+        jac[:, :, 1] = yields * gausDerSigma * sigmaScaleFactors[:, None]
+        jac[setIdx, :, parYields] = gaus
+        if includeSecPeak:
+            secYields = parVec[parSecYields][:, None]
+            gausSec, gausSecDerMean, _ = GetGausIntegrals(lowEdges, highEdges, parVec[2], secPeakSigma)
+            model += secYields * gausSec
+            jac[:, :, 2] = secYields * gausSecDerMean
+            jac[setIdx, :, parSecYields] = gausSec
+        for iPar in range(nBkgPars):
+            jac[setIdx, :, parBkg[:, iPar]] = bkgDer[..., iPar]
+        return model, jac
+
+    def _ObjectiveGradientInfo(parVec):
+        model, jac = _ModelAndJacobian(parVec)
+        jac = jac[:, :, isFree]
+        if useLikelihood:
+            model = np.maximum(model, 1.e-10)
+            # Baker-Cousins likelihood ratio, 2 * objective is the chi2-equivalent of the fit
+            objective = np.sum(model - counts + xlogy(counts, counts) - xlogy(counts, model))
+            derObjective = 1. - counts / model
+            weights = 1. / model
+        else:
+            objective = np.sum((counts - model)**2 / variance) / 2
+            derObjective = -(counts - model) / variance
+            weights = 1. / variance
+        gradient = np.einsum('sb,sbp->p', derObjective, jac)
+        fisherInfo = np.einsum('sbp,sb,sbq->pq', jac, weights, jac)
+        return objective, gradient, fisherInfo
+
+    def _ApplyBounds(parVec):
+        parVec[0] = np.clip(parVec[0], minMass, maxMass)
+        parVec[1] = np.clip(parVec[1], 1.e-5, (maxMass - minMass) / 2)
+        parVec[2] = np.clip(parVec[2], minMass, maxMass)
+        return parVec
+
+    # Levenberg-Marquardt minimisation with the Fisher information as approximate Hessian
+    damping = 1.e-3
+    converged = False
+    objective, gradient, fisherInfo = _ObjectiveGradientInfo(pars)
+    for _ in range(nMaxIter):
+        fisherDiag = np.diag(np.maximum(np.diag(fisherInfo), 1.e-12))
+        try:
+            step = np.linalg.solve(fisherInfo + damping * fisherDiag, -gradient)
+        except np.linalg.LinAlgError:
+            damping *= 10
+            continue
+        parsNew = pars.copy()
+        parsNew[isFree] += step
+        parsNew = _ApplyBounds(parsNew)
+        objectiveNew, gradientNew, fisherInfoNew = _ObjectiveGradientInfo(parsNew)
+        if objectiveNew <= objective:
+            pars, gradient, fisherInfo = parsNew, gradientNew, fisherInfoNew
+            objective, objectiveOld = objectiveNew, objective
+            damping = max(damping / 10, 1.e-9)
+            try:
+                estDistMin = gradient @ np.linalg.solve(fisherInfo, gradient) / 2
+            except np.linalg.LinAlgError:
+                estDistMin = np.inf
+            if estDistMin < 1.e-8 and objectiveOld - objective < 1.e-6:
+                converged = True
+                break
+        else:
+            damping *= 10
+            if damping > 1.e10:
+                break
+
+    # covariance matrix from the Fisher information at the minimum
+    covMatrix = np.zeros((nPars, nPars))
+    try:
+        covMatrix[np.ix_(isFree, isFree)] = np.linalg.inv(fisherInfo)
+    except np.linalg.LinAlgError:
+        covMatrix[np.ix_(isFree, isFree)] = np.nan
+        converged = False
+    parUnc = np.sqrt(np.abs(np.diag(covMatrix)))
+
+    chiSquare = 2 * objective
+    ndf = counts.size - np.count_nonzero(isFree)
+
+    # signal and background within 3 sigma
+    sigmas = pars[1] * sigmaScaleFactors
+    fracSignal = ndtr(3.) - ndtr(-3.)
+    bkgPars = pars[parBkg]
+    bkg, bkgDer = GetBkgIntegrals((pars[0] - 3 * sigmas)[:, None], (pars[0] + 3 * sigmas)[:, None],
+                                  minMass, maxMass, bkgFunc, bkgPars)
+    bkgUnc = np.array([np.sqrt(bkgDer[iSet, 0] @ covMatrix[np.ix_(parBkg[iSet], parBkg[iSet])] @ bkgDer[iSet, 0])
+                       for iSet in range(nSets)])
+
+    fitResults = {'rawYields': pars[parYields],
+                  'rawYieldsUnc': parUnc[parYields],
+                  'rawYieldsCov': covMatrix[np.ix_(parYields, parYields)],
+                  'mean': pars[0],
+                  'meanUnc': parUnc[0],
+                  'sigma': pars[1],
+                  'sigmaUnc': parUnc[1],
+                  'sigmas': sigmas,
+                  'secPeakYields': pars[parSecYields],
+                  'secPeakYieldsUnc': parUnc[parSecYields],
+                  'secPeakMean': pars[2],
+                  'secPeakMeanUnc': parUnc[2],
+                  'secPeakSigma': secPeakSigma if includeSecPeak else 0.,
+                  'bkgPars': bkgPars,
+                  'signal': pars[parYields] * fracSignal,
+                  'signalUnc': parUnc[parYields] * fracSignal,
+                  'bkg': bkg[:, 0],
+                  'bkgUnc': bkgUnc,
+                  'pars': pars,
+                  'covMatrix': covMatrix,
+                  'chiSquare': chiSquare,
+                  'ndf': ndf,
+                  'redChiSquare': chiSquare / ndf if ndf > 0 else 0.,
+                  'minMass': minMass,
+                  'maxMass': maxMass,
+                  'bkgFunc': bkgFunc,
+                  'converged': converged}
+
+    return fitResults
+
+
+def GetSimFitModel(fitResults, massBinEdges, iSet, component='total'):
+    '''
+    Method to compute the fitted model of one set in mass bins, to be used for plotting
+
+    Parameters
+    ----------
+    - fitResults: dictionary returned by SimultaneousMassFit
+    - massBinEdges: edges of the invariant-mass bins
+    - iSet: index of the set of selections
+    - component: 'total', 'signal' or 'bkg'
+
+    Returns
+    ----------
+    - model: expected counts in the mass bins
+    '''
+    massBinEdges = np.asarray(massBinEdges, dtype=np.float64)
+    lowEdges, highEdges = massBinEdges[:-1], massBinEdges[1:]
+    bkg, _ = GetBkgIntegrals(lowEdges, highEdges, fitResults['minMass'], fitResults['maxMass'],
+                             fitResults['bkgFunc'], fitResults['bkgPars'][iSet])
+    if component == 'bkg':
+        return bkg[0]
+    signal = fitResults['rawYields'][iSet] * GetGausIntegrals(lowEdges, highEdges, fitResults['mean'],
+                                                               fitResults['sigmas'][iSet])[0]
+    if component == 'signal':
+        return signal
+    if fitResults['secPeakSigma'] > 0.:
+        signal = signal + fitResults['secPeakYields'][iSet] * GetGausIntegrals(
+            lowEdges, highEdges, fitResults['secPeakMean'], fitResults['secPeakSigma'])[0]
+    return signal + bkg[0]